@@ -0,0 +1,5 @@
+"""
+Microbenchmarks for the image URL import pipeline.
+
+Run them with ``python -m benchmarks``; see ``benchmarks/run.py``.
+"""
@@ -0,0 +1,150 @@
+"""
+Timing, memory measurement and result comparison for the benchmarks.
+"""
+
+import gc
+import math
+import statistics
+import time
+import tracemalloc
+
+
+def percentile(values, fraction):
+    """
+    Return a percentile of measurements, using the nearest-rank method.
+
+    Args:
+        values: The measurements
+        fraction: The percentile as a fraction, e.g. 0.95
+
+    Returns:
+        float: The smallest value greater than or equal to ``fraction`` of the values
+    """
+    values = sorted(values)
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def run_once(func, setup=None, teardown=None):
+    """
+    Call ``func`` once and return how long it took.
+
+    ``setup`` and ``teardown`` are not timed.
+
+    Args:
+        func: Callable receiving the result of ``setup`` (or None)
+        setup: Optional callable preparing the call's argument
+        teardown: Optional callable receiving the result of ``func``
+
+    Returns:
+        float: Seconds spent in ``func``
+    """
+    state = setup() if setup is not None else None
+    start = time.perf_counter()
+    result = func(state)
+    elapsed = time.perf_counter() - start
+    if teardown is not None:
+        teardown(result)
+    return elapsed
+
+
+def measure_peak_memory(func, setup=None, teardown=None):
+    """
+    Return the peak Python memory allocated by one call of ``func``.
+
+    Memory allocated by C libraries outside Python's allocator (such as
+    Pillow's pixel buffers) is not traced.
+
+    Args:
+        func: Callable receiving the result of ``setup`` (or None)
+        setup: Optional callable preparing the call's argument
+        teardown: Optional callable receiving the result of ``func``
+
+    Returns:
+        int: Bytes allocated at the peak, above what was allocated before the call
+    """
+    state = setup() if setup is not None else None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = func(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    if teardown is not None:
+        teardown(result)
+    return max(0, peak - baseline)
+
+
+def measure(func, iterations=20, warmup=2, setup=None, teardown=None, size=None):
+    """
+    Benchmark a callable.
+
+    Timed runs and the memory run are separate, so tracing does not slow
+    down the timings.
+
+    Args:
+        func: Callable receiving the result of ``setup`` (or None)
+        iterations: Number of timed calls
+        warmup: Number of untimed calls first
+        setup: Optional callable preparing each call's argument; not timed
+        teardown: Optional callable receiving each call's result; not timed
+        size: Bytes processed per call, to report throughput in bytes
+
+    Returns:
+        dict: Latency statistics in seconds, calls per second, bytes per
+        second (if ``size`` is given) and peak memory in bytes
+    """
+    for _ in range(warmup):
+        run_once(func, setup, teardown)
+    timings = [run_once(func, setup, teardown) for _ in range(iterations)]
+
+    total = sum(timings)
+    result = {
+        "iterations": iterations,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "p95": percentile(timings, 0.95),
+        "max": max(timings),
+        "mean": statistics.mean(timings),
+        "stdev": statistics.stdev(timings) if iterations > 1 else 0.0,
+        "ops_per_second": iterations / total if total else None,
+        "peak_memory": measure_peak_memory(func, setup, teardown),
+    }
+    if size is not None:
+        result["size"] = size
+        result["bytes_per_second"] = size * iterations / total if total else None
+    return result
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Compare two benchmark runs.
+
+    Args:
+        baseline: Results of the earlier run, as written by the benchmark runner
+        current: Results of the new run
+        threshold: Relative increase in median latency or peak memory
+            reported as a regression
+
+    Returns:
+        list: One dict per benchmark present in both runs, with the
+        'latency' and 'memory' ratios (current / baseline) and a
+        'regression' flag
+    """
+    rows = []
+    for name, new in current["benchmarks"].items():
+        old = baseline["benchmarks"].get(name)
+        if old is None:
+            continue
+        latency = new["median"] / old["median"] if old["median"] else None
+        memory = new["peak_memory"] / old["peak_memory"] if old["peak_memory"] else None
+        rows.append(
+            {
+                "name": name,
+                "latency": latency,
+                "memory": memory,
+                "regression": any(ratio is not None and ratio > 1 + threshold for ratio in (latency, memory)),
+            }
+        )
+    return rows
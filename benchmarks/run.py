@@ -0,0 +1,281 @@
+"""
+Benchmark runner for the image URL import pipeline.
+
+Images of several formats and sizes are served by a local HTTP server (the
+one the tests use), including slow and chunked responses, so downloads do
+real network I/O without leaving the machine. Each stage of an import is
+measured on its own:
+
+- ``validate_url_security``
+- the download (``download_image``)
+- validation by Wagtail's upload form
+- ``save_object``
+- the whole import of one URL
+
+Usage::
+
+    python -m benchmarks
+    python -m benchmarks --iterations 50 --only download
+    python -m benchmarks --compare benchmarks/results/1.0.1.json
+
+Results are written as JSON (by default to ``benchmarks/results/<version>.json``),
+with latency statistics, throughput and peak memory per benchmark. With
+``--compare``, the run is compared with earlier results and the command
+exits with status 1 if any benchmark got slower or used more memory than
+``--threshold`` allows.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime, timezone
+from io import BytesIO
+
+import django
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# name: (Pillow format, content type, size)
+IMAGES = {
+    "png-64": ("PNG", "image/png", (64, 64)),
+    "png-1024": ("PNG", "image/png", (1024, 768)),
+    "jpeg-1024": ("JPEG", "image/jpeg", (1024, 768)),
+    "jpeg-3000": ("JPEG", "image/jpeg", (3000, 2000)),
+    "webp-1024": ("WEBP", "image/webp", (1024, 768)),
+    "gif-256": ("GIF", "image/gif", (256, 256)),
+}
+SLOW_DELAY = 0.02  # Seconds before the slow route responds
+CHUNK_SIZE = 16 * 1024  # Bytes per chunk of the chunked route
+
+
+def make_benchmark_image(image_format, size):
+    """
+    Create an image that compresses like a photo rather than a flat colour.
+
+    Args:
+        image_format: Pillow format name
+        size: (width, height) in pixels
+
+    Returns:
+        bytes: The encoded image
+    """
+    from PIL import Image as PILImage
+
+    channels = [PILImage.effect_noise(size, sigma) for sigma in (32, 48, 64)]
+    image = PILImage.merge("RGB", channels)
+    buffer = BytesIO()
+    image.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+class Pipeline:
+    """
+    The benchmarked stages, set up against a local image server.
+
+    Args:
+        server: A running ``tests.server.ImageServer``
+        user: The user images are imported as
+    """
+
+    def __init__(self, server, user):
+        from image_url_upload.jobs import get_import_view
+
+        self.server = server
+        self.view = get_import_view(user)
+        self.files = {}
+        for name, (image_format, content_type, size) in IMAGES.items():
+            self.files[name] = (make_benchmark_image(image_format, size), content_type)
+            server.add(f"/{name}", self.files[name][0], content_type=content_type)
+
+        body, content_type = self.files["jpeg-1024"]
+        server.add("/slow", body, content_type=content_type, delay=SLOW_DELAY)
+        server.add("/chunked", body, content_type=content_type, chunk_size=CHUNK_SIZE)
+        self.files["slow"] = self.files["chunked"] = (body, content_type)
+
+    def get_cases(self):
+        """
+        Return the benchmarks.
+
+        Returns:
+            dict: name -> keyword arguments for ``harness.measure()``
+        """
+        from image_url_upload.download import download_image
+        from image_url_upload.utils import validate_url_security
+
+        cases = {
+            "validate_url_security": {
+                # An IP literal, so no DNS lookup is made
+                "func": lambda state: validate_url_security("https://93.184.216.34/image.jpg"),
+            },
+        }
+        for name, (body, content_type) in self.files.items():
+            url = self.server.url(f"/{name}")
+            cases[f"download[{name}]"] = {
+                "func": lambda state, url=url: download_image(url),
+                "teardown": lambda file: file.close(),
+                "size": len(body),
+            }
+
+        for name in IMAGES:
+            body, content_type = self.files[name]
+            cases[f"form_validation[{name}]"] = {
+                "setup": lambda name=name: self.make_form(name),
+                "func": lambda form: form.is_valid(),
+                "size": len(body),
+            }
+            cases[f"save_object[{name}]"] = {
+                "setup": lambda name=name: self.make_valid_form(name),
+                "func": self.view.save_object,
+                "teardown": self.delete_image,
+                "size": len(body),
+            }
+            cases[f"import[{name}]"] = {
+                "func": lambda state, url=self.server.url(f"/{name}"): self.import_url(url),
+                "teardown": lambda response_data: self.delete_images(),
+                "size": len(body),
+            }
+        return cases
+
+    def make_form(self, name):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from wagtail.models import Collection
+
+        body, content_type = self.files[name]
+        return self.view.get_upload_form_class()(
+            data={"title": name, "collection": Collection.get_first_root_node().pk},
+            files={"file": SimpleUploadedFile(f"{name}.{content_type.split('/')[1]}", body, content_type)},
+            user=self.view.request.user,
+        )
+
+    def make_valid_form(self, name):
+        form = self.make_form(name)
+        if not form.is_valid():
+            raise ValueError(f"Benchmark image {name} is invalid: {form.errors.as_json()}")
+        return form
+
+    def import_url(self, url):
+        from wagtail.models import Collection
+
+        return next(self.view.import_from_urls([url], Collection.get_first_root_node().pk))
+
+    def delete_image(self, image):
+        image.file.delete(save=False)
+        image.delete()
+
+    def delete_images(self):
+        for image in self.view.model.objects.all():
+            self.delete_image(image)
+
+
+def run_benchmarks(pipeline, iterations=20, warmup=2, only=None, stream=None):
+    """
+    Run the pipeline's benchmarks.
+
+    Args:
+        pipeline: The Pipeline
+        iterations: Timed calls per benchmark
+        warmup: Untimed calls per benchmark
+        only: Optional substring; benchmarks whose names lack it are skipped
+        stream: Optional text stream for progress output
+
+    Returns:
+        dict: Benchmark name -> measurements
+    """
+    from .harness import measure
+
+    results = {}
+    for name, case in pipeline.get_cases().items():
+        if only and only not in name:
+            continue
+        results[name] = measure(iterations=iterations, warmup=warmup, **case)
+        if stream is not None:
+            result = results[name]
+            stream.write(
+                f"{name:<32} median {result['median'] * 1000:9.3f} ms  p95 {result['p95'] * 1000:9.3f} ms  "
+                f"{result['ops_per_second']:9.1f}/s  peak {result['peak_memory'] / 1024:9.1f} KiB\n"
+            )
+    return results
+
+
+def get_environment():
+    """Describe the machine and versions the benchmarks ran with."""
+    import PIL
+    import wagtail
+
+    import image_url_upload
+
+    return {
+        "version": image_url_upload.__version__,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "wagtail": wagtail.__version__,
+        "pillow": PIL.__version__,
+        "platform": platform.platform(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def print_comparison(rows, stream):
+    for row in rows:
+        latency = f"{row['latency']:.2f}x" if row["latency"] is not None else "-"
+        memory = f"{row['memory']:.2f}x" if row["memory"] is not None else "-"
+        flag = "  REGRESSION" if row["regression"] else ""
+        stream.write(f"{row['name']:<32} latency {latency:>7}  memory {memory:>7}{flag}\n")
+
+
+def main(argv=None):
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the image import pipeline.")
+    parser.add_argument("--iterations", type=int, default=20, help="Timed calls per benchmark (default: 20).")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed calls per benchmark (default: 2).")
+    parser.add_argument("--only", help="Only run benchmarks whose name contains this text.")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<version>.json).")
+    parser.add_argument("--compare", help="Earlier results file to compare with.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown or memory growth reported as a regression (default: 0.1).",
+    )
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+    django.setup()
+
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test.utils import override_settings
+
+    from tests.server import ImageServer
+
+    from .harness import compare
+
+    environment = get_environment()
+    # A throwaway database and media directory, as for the tests
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with tempfile.TemporaryDirectory() as media_root, ImageServer() as server, override_settings(
+            MEDIA_ROOT=media_root, WAGTAIL_IMAGE_URL_PREVENT_SSRF=False, WAGTAIL_IMAGE_URL_RETRY_ATTEMPTS=1
+        ):
+            user = get_user_model().objects.create_superuser("benchmark", "benchmark@example.com", "benchmark")
+            results = run_benchmarks(Pipeline(server, user), args.iterations, args.warmup, args.only, sys.stdout)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{environment['version']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment, "benchmarks": results}, f, indent=2)
+    sys.stdout.write(f"Results written to {output}\n")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(baseline, {"benchmarks": results}, args.threshold)
+        print_comparison(rows, sys.stdout)
+        if any(row["regression"] for row in rows):
+            return 1
+    return 0
@@ -18,3 +18,7 @@ class ImageUrlUploadConfig(AppConfig):
     name = "image_url_upload"
     label = "image_url_upload"
     verbose_name = _("Image URL Upload")
+
+    def ready(self):
+        # Connect the metrics signal receiver
+        from . import metrics  # noqa: F401
@@ -0,0 +1,298 @@
+"""
+Bulk imports of image URLs from CSV or NDJSON input.
+
+Used by the ``import_images_from_url`` management command. Input is read
+lazily, one chunk of rows at a time, so files with hundreds of thousands of
+URLs are never held in memory. Each chunk goes through the same validation
+and save pipeline as the admin views (downloads in a thread pool, saves in
+the calling thread).
+
+After every chunk, the number of input rows that are finished is written to
+a checkpoint file. A run that is interrupted can be resumed from there; rows
+of the chunk that was in progress are imported again, but URLs that were
+already saved are recognised from their recorded source and not downloaded
+again.
+"""
+
+import csv
+import json
+import logging
+import os
+import tempfile
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+
+from django.utils.translation import gettext as _
+from wagtail.models import Collection
+
+from .indexing import flush_search_index
+from .jobs import get_import_view
+from .renditions import generate_renditions, get_new_image_ids
+from .timing import ImportTimer, report_timings
+from .utils import normalize_url
+from .views import NewImage
+
+IMPORT_CHUNK_SIZE = 100  # Rows per chunk, and between checkpoints
+
+logger = logging.getLogger(__name__)
+
+ImportRow = namedtuple("ImportRow", ["line", "url", "collection", "title", "tags", "error"])
+
+
+def parse_tags(value):
+    """
+    Normalize the 'tags' of an input row.
+
+    Args:
+        value: A list of tag names, or a comma-separated string
+
+    Returns:
+        list: Tag names, without blanks
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [str(tag).strip() for tag in value if str(tag).strip()]
+
+
+def make_row(line, data):
+    """Build an ImportRow from a parsed CSV or NDJSON record."""
+    url = str(data.get("url") or "").strip()
+    return ImportRow(
+        line=line,
+        url=url,
+        collection=data.get("collection") or None,
+        title=str(data.get("title") or "").strip() or None,
+        tags=parse_tags(data.get("tags")),
+        error=None if url else _("Missing URL."),
+    )
+
+
+def read_csv_rows(stream):
+    """
+    Read import rows from CSV with a header row.
+
+    The header must include a 'url' column; 'collection', 'title' and 'tags'
+    (comma-separated) columns are optional.
+
+    Args:
+        stream: A text stream
+
+    Yields:
+        ImportRow: One row per data line
+    """
+    reader = csv.DictReader(stream)
+    if reader.fieldnames is None:
+        return
+    if "url" not in reader.fieldnames:
+        raise ValueError(_("The CSV header must include a 'url' column."))
+    for data in reader:
+        yield make_row(reader.line_num, data)
+
+
+def read_ndjson_rows(stream):
+    """
+    Read import rows from newline-delimited JSON.
+
+    Each line holds an object with a 'url' and optional 'collection', 'title'
+    and 'tags' (a list or comma-separated string) keys, or just a URL string.
+
+    Args:
+        stream: A text stream
+
+    Yields:
+        ImportRow: One row per non-blank line
+    """
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield ImportRow(line_number, "", None, None, [], _("Invalid JSON."))
+            continue
+        if isinstance(data, str):
+            data = {"url": data}
+        if not isinstance(data, dict):
+            yield ImportRow(line_number, "", None, None, [], _("Expected a JSON object or string."))
+            continue
+        yield make_row(line_number, data)
+
+
+def read_rows(stream, input_format=None):
+    """
+    Read import rows from a stream.
+
+    Args:
+        stream: A text stream
+        input_format: 'csv' or 'ndjson'; detected from the first line if None
+
+    Yields:
+        ImportRow: The rows, in input order
+    """
+    if input_format is None:
+        first_line = stream.readline()
+        input_format = "ndjson" if first_line.lstrip().startswith(("{", '"')) else "csv"
+        stream = chain([first_line], stream)
+
+    if input_format == "ndjson":
+        yield from read_ndjson_rows(stream)
+    else:
+        yield from read_csv_rows(stream)
+
+
+class Checkpoint:
+    """
+    Progress of a bulk import, stored as JSON.
+
+    Args:
+        path: The checkpoint file
+        source: Name of the input, so a checkpoint is not resumed for another input
+    """
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = source
+        self.position = 0
+        self.counts = Counter()
+
+    def load(self):
+        """
+        Load the saved progress, if any.
+
+        Returns:
+            bool: True if a checkpoint was found
+
+        Raises:
+            ValueError: If the checkpoint belongs to a different input
+        """
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+
+        if data.get("source") != self.source:
+            raise ValueError(
+                _("Checkpoint {path} belongs to the input '{source}'.").format(
+                    path=self.path, source=data.get("source")
+                )
+            )
+        self.position = data["position"]
+        self.counts = Counter(data.get("counts", {}))
+        return True
+
+    def save(self):
+        """Write the progress atomically, so a crash never leaves a partial file."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, encoding="utf-8", suffix=".tmp") as f:
+            json.dump({"source": self.source, "position": self.position, "counts": self.counts}, f)
+        os.replace(f.name, self.path)
+
+
+def get_status(response_data):
+    """Return 'saved', 'duplicate' or 'failed' for an import's response data."""
+    if not response_data.get("success"):
+        return "failed"
+    return "duplicate" if response_data.get("duplicate") else "saved"
+
+
+class BulkImporter:
+    """
+    Imports rows of image URLs on behalf of a user.
+
+    Args:
+        user: The user the images are imported as
+        collection_id: Collection for rows without one; defaults to the root collection
+        max_workers: Number of concurrent downloads
+        chunk_size: Rows per chunk, and between checkpoint saves
+        checkpoint: Optional Checkpoint to resume from and update
+        on_result: Optional callable receiving (row, status, response_data)
+            for every row
+    """
+
+    def __init__(
+        self, user, collection_id=None, max_workers=None, chunk_size=IMPORT_CHUNK_SIZE, checkpoint=None, on_result=None
+    ):
+        self.view = get_import_view(user)
+        self.collection_id = collection_id or Collection.get_first_root_node().pk
+        self.max_workers = max_workers or self.view.get_max_workers()
+        self.chunk_size = chunk_size
+        self.checkpoint = checkpoint
+        self.on_result = on_result
+        self.counts = Counter(checkpoint.counts if checkpoint else {})
+
+    def has_access(self):
+        """Return True if the user may add images."""
+        return self.view.has_access(self.view.request)
+
+    def run(self, rows):
+        """
+        Import rows, skipping those finished according to the checkpoint.
+
+        Args:
+            rows: Iterable of ImportRow objects, e.g. from read_rows()
+
+        Returns:
+            Counter: Number of rows per status, including earlier runs
+        """
+        position = self.checkpoint.position if self.checkpoint else 0
+        rows = iter(rows)
+        if position:
+            logger.info(f"Resuming bulk import after {position} rows")
+            # Consume without importing; the input is still streamed
+            next(islice(rows, position - 1, position), None)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                results = []
+                for row, response_data in zip(chunk, self.import_chunk(executor, chunk)):
+                    status = get_status(response_data)
+                    self.counts[status] += 1
+                    results.append(response_data)
+                    if self.on_result is not None:
+                        self.on_result(row, status, response_data)
+                generate_renditions(get_new_image_ids(results))
+                flush_search_index()
+
+                position += len(chunk)
+                if self.checkpoint is not None:
+                    self.checkpoint.position = position
+                    self.checkpoint.counts = self.counts
+                    self.checkpoint.save()
+
+        return self.counts
+
+    def import_chunk(self, executor, chunk):
+        """
+        Download and save one chunk of rows.
+
+        Args:
+            executor: The thread pool running downloads
+            chunk: The ImportRow objects
+
+        Yields:
+            dict: Response data for each row, in input order
+        """
+        urls = [row.url for row in chunk if not row.error]
+        sources = self.view.get_image_sources(urls)
+
+        def download(row):
+            timer = ImportTimer(row.url)
+            entry = NewImage(row.url, None, row.collection or self.collection_id, timer, title=row.title, tags=row.tags)
+            if row.error:
+                timer.error = "invalid_row"
+                return entry, self.view.get_error_response_data(row.error)
+            with timer.activate():
+                file, response_data = self.view.download(row.url, sources.get(normalize_url(row.url)))
+            return entry._replace(file=file), response_data
+
+        for entry, response_data in self.view.save_downloads(executor.map(download, chunk)):
+            report_timings(type(self), entry.timer, response_data)
+            yield response_data
@@ -0,0 +1,287 @@
+"""
+Discovery of image URLs in sitemaps and feeds.
+
+discover_image_urls() reads the image URLs listed in:
+
+- image sitemaps: the ``<image:loc>`` of each ``<image:image>``
+- sitemap indexes: each child sitemap in turn (one level deep)
+- RSS and Atom feeds: Media RSS ``<media:content>`` and
+  ``<media:thumbnail>``, and RSS ``<enclosure>`` and Atom
+  ``<link rel="enclosure">`` elements with an image type
+
+Documents are parsed with an ``XMLPullParser`` fed chunk by chunk as they
+are downloaded, and each entry is removed from the tree once it has been
+read, so memory use stays flat however long the document is (sitemaps may be
+up to 50 MB). Gzip-compressed sitemaps are decompressed as they are read.
+The URLs found in each chunk are reported straight away, so their imports
+can start before the rest of the document arrives.
+"""
+
+import logging
+import xml.etree.ElementTree as ET
+import zlib
+from urllib.parse import urljoin, urlparse
+
+import requests
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+
+from .download import CHUNK_SIZE, DOWNLOAD_TIMEOUT
+from .exceptions import DiscoveryError
+from .session import get_session
+from .throttle import host_throttle
+from .utils import normalize_url, validate_url_security
+
+DISCOVERY_MAX_SIZE = 50 * 1024 * 1024  # The sitemap protocol's limit, uncompressed
+DISCOVERY_MAX_URLS = 1000
+DISCOVERY_MAX_SITEMAPS = 50  # Child sitemaps read from a sitemap index
+
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+IMAGE_NS = "{http://www.google.com/schemas/sitemap-image/1.1}"
+MEDIA_NS = "{http://search.yahoo.com/mrss/}"
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+RSS1_NS = "{http://purl.org/rss/1.0/}"
+
+# Entries are removed from the tree once read
+ENTRY_TAGS = {f"{SITEMAP_NS}url", f"{SITEMAP_NS}sitemap", "item", f"{RSS1_NS}item", f"{ATOM_NS}entry"}
+GZIP_MAGIC = b"\x1f\x8b"
+
+logger = logging.getLogger(__name__)
+
+
+def get_max_size():
+    """Return the maximum size of a sitemap or feed, in bytes after decompression."""
+    return getattr(settings, "WAGTAIL_IMAGE_URL_DISCOVERY_MAX_SIZE", DISCOVERY_MAX_SIZE)
+
+
+def get_max_sitemaps():
+    """Return the maximum number of child sitemaps read from a sitemap index."""
+    return getattr(settings, "WAGTAIL_IMAGE_URL_DISCOVERY_MAX_SITEMAPS", DISCOVERY_MAX_SITEMAPS)
+
+
+def read_document(url, timeout=DOWNLOAD_TIMEOUT, max_size=None):
+    """
+    Download a sitemap or feed, yielding its contents chunk by chunk.
+
+    The host's throttle slot (see ``throttle.py``) is held until the whole
+    document has been read.
+
+    Args:
+        url: The document URL
+        timeout: Connect/read timeout in seconds
+        max_size: Maximum number of bytes to accept, after decompression
+
+    Yields:
+        bytes: The next chunk of the document
+
+    Raises:
+        DiscoveryError: If the URL is not allowed or the document is too large
+        requests.exceptions.RequestException: If the request itself fails
+    """
+    is_valid, error_message = validate_url_security(url)
+    if not is_valid:
+        raise DiscoveryError(error_message)
+
+    max_size = get_max_size() if max_size is None else max_size
+    with host_throttle(url):
+        response = get_session().get(url, timeout=timeout, stream=True)
+        try:
+            response.raise_for_status()
+            decompressor = None
+            size = 0
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if not chunk:
+                    continue
+                # Sitemaps are often served as .xml.gz files, not gzip-encoded responses
+                if size == 0 and decompressor is None and chunk.startswith(GZIP_MAGIC):
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                if decompressor is not None:
+                    try:
+                        # Never inflate more than the size budget allows
+                        chunk = decompressor.decompress(chunk, max_size - size + 1)
+                    except zlib.error as e:
+                        raise DiscoveryError(_("The sitemap or feed is not valid gzip data.")) from e
+                size += len(chunk)
+                if size > max_size:
+                    logger.warning(f"Sitemap or feed too large: {url} (more than {max_size} bytes)")
+                    raise DiscoveryError(
+                        _("The sitemap or feed exceeds the maximum size of {size} MB.").format(
+                            size=max_size // (1024 * 1024)
+                        )
+                    )
+                if chunk:
+                    yield chunk
+        finally:
+            response.close()
+
+
+def get_link(element, base_url):
+    """
+    Return the image or child sitemap an element links to, if any.
+
+    Args:
+        element: A parsed element, complete with its children
+        base_url: The document URL, for relative links
+
+    Returns:
+        tuple or None: ('image' or 'sitemap', absolute URL)
+    """
+    tag, attrib = element.tag, element.attrib
+    if tag == f"{IMAGE_NS}loc":
+        kind, url = "image", element.text
+    elif tag == f"{SITEMAP_NS}sitemap":
+        kind, url = "sitemap", element.findtext(f"{SITEMAP_NS}loc")
+    elif tag in (f"{MEDIA_NS}content", f"{MEDIA_NS}thumbnail"):
+        # Thumbnails are always images; content is skipped only if it says it is something else
+        medium, content_type = attrib.get("medium", "image"), attrib.get("type", "image/")
+        if medium != "image" or not content_type.startswith("image/"):
+            return None
+        kind, url = "image", attrib.get("url")
+    elif tag == "enclosure":
+        if not attrib.get("type", "").startswith("image/"):
+            return None
+        kind, url = "image", attrib.get("url")
+    elif tag == f"{ATOM_NS}link":
+        if attrib.get("rel") != "enclosure" or not attrib.get("type", "").startswith("image/"):
+            return None
+        kind, url = "image", attrib.get("href")
+    else:
+        return None
+
+    url = urljoin(base_url, (url or "").strip())
+    if urlparse(url).scheme not in ("http", "https"):
+        return None
+    return kind, url
+
+
+def parse_links(chunks, base_url):
+    """
+    Parse a sitemap or feed incrementally, yielding the links found in each chunk.
+
+    Documents with a DTD are rejected: sitemaps and feeds have no use for
+    one, and entity expansion is a denial of service vector.
+
+    Args:
+        chunks: Iterable of the document's bytes
+        base_url: The document URL, for relative links
+
+    Yields:
+        list: ('image' or 'sitemap', URL) tuples, possibly empty
+
+    Raises:
+        DiscoveryError: If the document declares a DTD
+        xml.etree.ElementTree.ParseError: If the document is not well-formed
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    # Open elements, from the root down
+    stack = []
+    prolog = b""
+
+    def read_events():
+        links = []
+        for event, element in parser.read_events():
+            if event == "start":
+                stack.append(element)
+                continue
+            stack.pop()
+            link = get_link(element, base_url)
+            if link is not None:
+                links.append(link)
+            if element.tag in ENTRY_TAGS and stack:
+                stack[-1].remove(element)
+        return links
+
+    for chunk in chunks:
+        if prolog is not None:
+            prolog += chunk
+            if b"<!DOCTYPE" in prolog:
+                raise DiscoveryError(_("Sitemaps and feeds with a DTD are not supported."))
+        parser.feed(chunk)
+        links = read_events()
+        if stack:
+            # A DTD can only come before the root element
+            prolog = None
+        yield links
+    parser.close()
+    yield read_events()
+
+
+def read_links(url):
+    """
+    Download and parse a sitemap or feed, yielding the links found in each chunk.
+
+    Args:
+        url: The document URL
+
+    Yields:
+        list: ('image' or 'sitemap', URL) tuples, possibly empty
+
+    Raises:
+        DiscoveryError: If the document cannot be downloaded or parsed
+    """
+    try:
+        yield from parse_links(read_document(url), url)
+    except ET.ParseError as e:
+        logger.warning(f"Invalid sitemap or feed {url}: {e}")
+        raise DiscoveryError(_("The sitemap or feed is not valid XML.")) from e
+    except requests.exceptions.Timeout as e:
+        logger.error(f"Timeout downloading sitemap or feed {url}")
+        raise DiscoveryError(_("Request timeout - the server took too long to respond.")) from e
+    except requests.exceptions.HTTPError as e:
+        logger.error(f"HTTP error downloading sitemap or feed {url}: {e}")
+        raise DiscoveryError(_("HTTP error: {status}").format(status=e.response.status_code)) from e
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Download failed for sitemap or feed {url}: {e}")
+        raise DiscoveryError(_("Download failed: {error}").format(error=str(e))) from e
+
+
+def discover_image_urls(url, max_urls=DISCOVERY_MAX_URLS):
+    """
+    Find the image URLs listed in a sitemap or feed, as the document is read.
+
+    Each URL is reported once, by its normalized form. For a sitemap index,
+    the child sitemaps are read after the index; one that cannot be read is
+    skipped.
+
+    Args:
+        url: The sitemap or feed URL
+        max_urls: Stop after this many image URLs
+
+    Yields:
+        list: The new image URLs found in each chunk, possibly empty
+
+    Raises:
+        DiscoveryError: If the sitemap or feed itself cannot be read
+    """
+    max_sitemaps = get_max_sitemaps()
+    seen = set()
+    sitemaps = []
+
+    def collect(links, is_index):
+        image_urls = []
+        for kind, link in links:
+            if kind == "sitemap":
+                if is_index and link not in sitemaps and len(sitemaps) < max_sitemaps:
+                    sitemaps.append(link)
+                continue
+            key = normalize_url(link)
+            if key not in seen and len(seen) < max_urls:
+                seen.add(key)
+                image_urls.append(link)
+        return image_urls
+
+    for links in read_links(url):
+        yield collect(links, is_index=True)
+        if len(seen) >= max_urls:
+            logger.info(f"Stopped discovering images in {url} after {max_urls} URLs")
+            return
+
+    for sitemap_url in sitemaps:
+        try:
+            for links in read_links(sitemap_url):
+                yield collect(links, is_index=False)
+                if len(seen) >= max_urls:
+                    logger.info(f"Stopped discovering images in {url} after {max_urls} URLs")
+                    return
+        except DiscoveryError as e:
+            logger.warning(f"Skipping sitemap {sitemap_url} of {url}: {e}")
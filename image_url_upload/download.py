@@ -0,0 +1,557 @@
+"""
+Streaming download helpers for image URL upload.
+
+Images are read from the remote server in chunks and spooled into a bounded
+buffer, so oversized responses are rejected as soon as the size budget is
+exceeded instead of being buffered in full. Large images are spooled to a
+named temporary file, which Wagtail's form reads in place and the storage
+backend moves rather than copies, so no copy of them is held in memory.
+
+The SHA-1 of the body (the same digest Wagtail stores as ``Image.file_hash``)
+is computed as the chunks arrive, so duplicates can be found before anything
+is saved, and the first bytes are inspected (see ``probe.py``) so non-images
+and oversized images are rejected before the rest is transferred. Transient
+failures are retried (see ``retry.py``).
+"""
+
+import hashlib
+import logging
+import tempfile
+import time
+from io import BytesIO
+
+import requests
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+
+from .exceptions import (  # noqa: F401
+    CachedFailureError,
+    DownloadError,
+    EmptyFileError,
+    FileTooLargeError,
+    HostThrottledError,
+    HostUnavailableError,
+    ImageTooLargeError,
+    InvalidContentTypeError,
+    InvalidImageError,
+    NotModified,
+)
+from .failures import atrack_failures, track_failures
+from .probe import ImageProbe
+from .retry import RetryPolicy
+from .session import get_async_client, get_session, httpx
+from .throttle import ahost_throttle, host_throttle
+from .timing import record_bytes, record_duration, record_phase
+from .utils import get_filename_from_url
+
+ALLOWED_CONTENT_TYPES = {
+    "image/jpeg",
+    "image/jpg",
+    "image/png",
+    "image/gif",
+    "image/bmp",
+    "image/webp",
+}
+# Generic types some servers use for images; the real type is sniffed from the data
+SNIFFED_CONTENT_TYPES = {
+    "application/octet-stream",
+    "binary/octet-stream",
+}
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB in bytes
+DOWNLOAD_TIMEOUT = 10  # seconds
+CHUNK_SIZE = 64 * 1024  # 64 KB
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadedFile(UploadedFile):
+    """
+    An image downloaded from a URL.
+
+    Besides the usual UploadedFile attributes, this keeps the source URL,
+    the SHA-1 of the contents, the probed image format and dimensions, and
+    the response's cache validators so the import can be deduplicated and
+    recorded.
+    """
+
+    def __init__(
+        self, file, name, content_type, size, url, content_hash="", image_info=None, etag="", last_modified=""
+    ):
+        super().__init__(file=file, name=name, content_type=content_type, size=size)
+        self.url = url
+        self.content_hash = content_hash
+        self.image_info = image_info
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @classmethod
+    def from_buffer(cls, buffer, **kwargs):
+        """
+        Wrap a DownloadBuffer, without copying its contents.
+
+        Args:
+            buffer: The DownloadBuffer holding the image
+            **kwargs: The other DownloadedFile arguments
+
+        Returns:
+            DownloadedFile: A TemporaryDownloadedFile if the buffer is on disk
+        """
+        file_class = TemporaryDownloadedFile if buffer.on_disk else cls
+        return file_class(file=buffer.file, **kwargs)
+
+
+class TemporaryDownloadedFile(DownloadedFile):
+    """
+    A downloaded image spooled to a named temporary file.
+
+    Like Django's TemporaryUploadedFile, this exposes the file's path, so
+    Wagtail's image field reads the file in place instead of loading it into
+    memory, and ``FileSystemStorage`` moves it into place instead of copying.
+    """
+
+    def temporary_file_path(self):
+        """Return the full path of the file."""
+        return self.file.name
+
+    def close(self):
+        try:
+            return self.file.close()
+        except FileNotFoundError:
+            # The file was moved into storage, so there is nothing to delete
+            pass
+
+
+class DownloadBuffer:
+    """
+    A buffer for a download that moves to disk when it grows large.
+
+    The data is kept in memory up to ``FILE_UPLOAD_MAX_MEMORY_SIZE`` and
+    moved to a named temporary file in ``FILE_UPLOAD_TEMP_DIR`` beyond that,
+    or straight away if the expected size is already over it. Other file
+    methods are passed through to the current file.
+
+    Args:
+        expected_size: The declared size of the download, if known
+    """
+
+    def __init__(self, expected_size=None):
+        self.max_memory_size = settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        self.file = BytesIO()
+        self.on_disk = False
+        if expected_size is not None and expected_size > self.max_memory_size:
+            self.rollover()
+
+    def rollover(self):
+        """Move the data written so far to a temporary file."""
+        if self.on_disk:
+            return
+        data = self.file
+        self.file = tempfile.NamedTemporaryFile(suffix=".download", dir=settings.FILE_UPLOAD_TEMP_DIR)
+        self.file.write(data.getbuffer())
+        data.close()
+        self.on_disk = True
+
+    def write(self, data):
+        if not self.on_disk and self.file.tell() + len(data) > self.max_memory_size:
+            self.rollover()
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+def get_content_type(response):
+    """
+    Return the normalized media type of a response.
+
+    Args:
+        response: The ``requests`` response
+
+    Returns:
+        str: The lowercased media type without parameters (e.g. 'image/png')
+    """
+    return response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+
+
+def get_content_length(response):
+    """
+    Return the declared ``Content-Length`` of a response.
+
+    Args:
+        response: The ``requests`` response
+
+    Returns:
+        int or None: The declared length, or None if missing or malformed
+    """
+    try:
+        return int(response.headers.get("Content-Length"))
+    except (TypeError, ValueError):
+        return None
+
+
+def create_buffer(expected_size=None):
+    """
+    Create a spooled buffer for a download.
+
+    Args:
+        expected_size: The declared size of the download, if known
+
+    Returns:
+        DownloadBuffer: The empty buffer
+    """
+    return DownloadBuffer(expected_size)
+
+
+def check_response_headers(url, response, max_size):
+    """
+    Reject a response based on its headers, before the body is read.
+
+    Args:
+        url: The image URL (for logging)
+        response: A ``requests`` or ``httpx`` response
+        max_size: Maximum number of bytes to accept
+
+    Returns:
+        str: The normalized content type
+
+    Raises:
+        InvalidContentTypeError: If the content type is not allowed
+        FileTooLargeError: If the declared length exceeds ``max_size``
+    """
+    content_type = get_content_type(response)
+    if content_type not in ALLOWED_CONTENT_TYPES and content_type not in SNIFFED_CONTENT_TYPES:
+        logger.warning(f"Invalid content type for {url}: {content_type}")
+        raise InvalidContentTypeError()
+
+    content_length = get_content_length(response)
+    if content_length is not None and content_length > max_size:
+        logger.warning(f"File too large for {url}: {content_length} bytes (Content-Length)")
+        raise FileTooLargeError(max_size)
+
+    return content_type
+
+
+def build_uploaded_file(url, response, buffer, size, content_type, content_hash="", image_info=None):
+    """
+    Wrap a downloaded buffer in a Django file object.
+
+    Args:
+        url: The image URL
+        response: The ``requests`` or ``httpx`` response the buffer was read from
+        buffer: The DownloadBuffer holding the image data, positioned at 0
+        size: Number of bytes in the buffer
+        content_type: The normalized content type
+        content_hash: SHA-1 hex digest of the buffer contents
+        image_info: The ImageInfo found by probing the data, if any; its
+            sniffed content type takes precedence over ``content_type``
+
+    Returns:
+        DownloadedFile: The downloaded image, ready to be passed to a form
+
+    Raises:
+        EmptyFileError: If the buffer is empty
+    """
+    if size == 0:
+        buffer.close()
+        logger.warning(f"Empty file downloaded from {url}")
+        raise EmptyFileError()
+
+    if image_info is not None:
+        content_type = image_info.content_type
+
+    return DownloadedFile.from_buffer(
+        buffer,
+        name=get_filename_from_url(url, content_type),
+        content_type=content_type,
+        size=size,
+        url=url,
+        content_hash=content_hash,
+        image_info=image_info,
+        etag=response.headers.get("ETag", ""),
+        last_modified=response.headers.get("Last-Modified", ""),
+    )
+
+
+def read_limited(
+    response, max_size=MAX_FILE_SIZE, chunk_size=CHUNK_SIZE, progress=None, probe=None, deadline_at=None
+):
+    """
+    Read a streamed response body into a spooled buffer.
+
+    Reading stops as soon as ``max_size`` is exceeded. The body is hashed
+    as it is read. Bodies declared larger than the in-memory limit are
+    written to disk from the first chunk.
+
+    Args:
+        response: A ``requests`` response opened with ``stream=True``
+        max_size: Maximum number of bytes to accept
+        chunk_size: Number of bytes to read per iteration
+        progress: Optional callable receiving the number of bytes read so far
+            after each chunk
+        probe: Optional ImageProbe fed each chunk, so unacceptable images
+            are rejected before the rest of the body is read
+        deadline_at: Optional ``time.monotonic()`` value after which reading
+            stops, so a server trickling the body can't outlast the download
+            deadline (see ``RetryPolicy.get_deadline_at()``)
+
+    Returns:
+        tuple: (buffer: DownloadBuffer positioned at 0, size: int,
+        content_hash: SHA-1 hex digest of the body)
+
+    Raises:
+        FileTooLargeError: If the body is larger than ``max_size``
+        InvalidImageError: If ``probe`` finds the data is not an image
+        ImageTooLargeError: If ``probe`` finds the image has too many pixels
+        requests.exceptions.ReadTimeout: If ``deadline_at`` passes
+    """
+    buffer = create_buffer(get_content_length(response))
+    hasher = hashlib.sha1()
+    size = 0
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if deadline_at is not None and time.monotonic() > deadline_at:
+                raise requests.exceptions.ReadTimeout("Download deadline exceeded", response=response)
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_size:
+                raise FileTooLargeError(max_size)
+            if probe is not None:
+                probe.feed(chunk)
+            hasher.update(chunk)
+            buffer.write(chunk)
+            if progress is not None:
+                progress(size)
+        if probe is not None and size:
+            probe.close()
+    except BaseException:
+        buffer.close()
+        raise
+
+    buffer.seek(0)
+    return buffer, size, hasher.hexdigest()
+
+
+def fetch_image(
+    url, timeout=DOWNLOAD_TIMEOUT, max_size=MAX_FILE_SIZE, headers=None, progress=None, deadline_at=None
+):
+    """
+    Make a single attempt at downloading an image from a URL.
+
+    The response is rejected up front if its ``Content-Type`` is not an
+    allowed image type or its ``Content-Length`` exceeds ``max_size``. If
+    the host is rate limited (see ``throttle.py``), this waits for its turn.
+
+    Args:
+        url: The image URL
+        timeout: Connect/read timeout in seconds
+        max_size: Maximum number of bytes to accept
+        headers: Extra request headers, e.g. for a conditional request
+        progress: Optional callable receiving the number of bytes read so far
+        deadline_at: Optional ``time.monotonic()`` value by which the body must be read
+
+    Returns:
+        DownloadedFile: The downloaded image, ready to be passed to a form
+
+    Raises:
+        NotModified: If a conditional request got a 304 response
+        DownloadError: If the response is not an acceptable image
+        requests.exceptions.RequestException: If the request itself fails
+    """
+    start = time.perf_counter()
+    with host_throttle(url):
+        record_duration("throttle", time.perf_counter() - start)
+        with record_phase("ttfb"):
+            response = get_session().get(url, timeout=timeout, stream=True, headers=headers)
+        try:
+            response.raise_for_status()
+            if response.status_code == 304:
+                raise NotModified()
+            content_type = check_response_headers(url, response, max_size)
+            probe = ImageProbe.from_settings()
+
+            try:
+                with record_phase("download"):
+                    buffer, size, content_hash = read_limited(
+                        response, max_size=max_size, progress=progress, probe=probe, deadline_at=deadline_at
+                    )
+                record_bytes("download", size)
+            except FileTooLargeError:
+                logger.warning(f"File too large for {url}: more than {max_size} bytes")
+                raise
+        finally:
+            response.close()
+
+    return build_uploaded_file(url, response, buffer, size, content_type, content_hash, probe.info)
+
+
+def download_image(url, timeout=DOWNLOAD_TIMEOUT, max_size=MAX_FILE_SIZE, headers=None, progress=None):
+    """
+    Download an image from a URL with bounded memory usage.
+
+    Transient failures are retried with backoff within the download deadline
+    (see ``retry.py``), which also cuts off a body that trickles in. URLs
+    that failed recently and hosts that keep timing out fail right away (see
+    ``failures.py``); only the outcome of the last attempt is recorded there.
+
+    Args:
+        url: The image URL
+        timeout: Connect/read timeout in seconds, per attempt
+        max_size: Maximum number of bytes to accept
+        headers: Extra request headers, e.g. for a conditional request
+        progress: Optional callable receiving the number of bytes read so far;
+            this starts again from 0 if an attempt is retried
+
+    Returns:
+        DownloadedFile: The downloaded image, ready to be passed to a form
+
+    Raises:
+        NotModified: If a conditional request got a 304 response
+        DownloadError: If the response is not an acceptable image, or the
+            URL or host failed recently
+        requests.exceptions.RequestException: If the request itself fails
+    """
+    with track_failures(url):
+        policy = RetryPolicy.from_settings()
+        deadline_at = policy.get_deadline_at()
+        return policy.call(
+            url,
+            lambda attempt_timeout: fetch_image(
+                url, attempt_timeout, max_size, headers=headers, progress=progress, deadline_at=deadline_at
+            ),
+            timeout,
+            deadline_at=deadline_at,
+        )
+
+
+async def aread_limited(
+    response, max_size=MAX_FILE_SIZE, chunk_size=CHUNK_SIZE, progress=None, probe=None, deadline_at=None
+):
+    """
+    Async version of read_limited() for ``httpx`` streamed responses.
+
+    Args:
+        response: An ``httpx`` response opened with ``client.stream()``
+        max_size: Maximum number of bytes to accept
+        chunk_size: Number of bytes to read per iteration
+        progress: Optional callable receiving the number of bytes read so far
+            after each chunk
+        probe: Optional ImageProbe fed each chunk, so unacceptable images
+            are rejected before the rest of the body is read
+        deadline_at: Optional ``time.monotonic()`` value after which reading stops
+
+    Returns:
+        tuple: (buffer, size, content_hash) as for read_limited()
+
+    Raises:
+        FileTooLargeError: If the body is larger than ``max_size``
+        InvalidImageError: If ``probe`` finds the data is not an image
+        ImageTooLargeError: If ``probe`` finds the image has too many pixels
+        httpx.ReadTimeout: If ``deadline_at`` passes
+    """
+    buffer = create_buffer(get_content_length(response))
+    hasher = hashlib.sha1()
+    size = 0
+    try:
+        async for chunk in response.aiter_bytes(chunk_size=chunk_size):
+            if deadline_at is not None and time.monotonic() > deadline_at:
+                raise httpx.ReadTimeout("Download deadline exceeded", request=response.request)
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_size:
+                raise FileTooLargeError(max_size)
+            if probe is not None:
+                probe.feed(chunk)
+            hasher.update(chunk)
+            buffer.write(chunk)
+            if progress is not None:
+                progress(size)
+        if probe is not None and size:
+            probe.close()
+    except BaseException:
+        buffer.close()
+        raise
+
+    buffer.seek(0)
+    return buffer, size, hasher.hexdigest()
+
+
+async def afetch_image(
+    url, timeout=DOWNLOAD_TIMEOUT, max_size=MAX_FILE_SIZE, headers=None, progress=None, deadline_at=None
+):
+    """
+    Async version of fetch_image() that does not block the event loop.
+
+    Args:
+        url: The image URL
+        timeout: Connect/read timeout in seconds
+        max_size: Maximum number of bytes to accept
+        headers: Extra request headers, e.g. for a conditional request
+        progress: Optional callable receiving the number of bytes read so far
+        deadline_at: Optional ``time.monotonic()`` value by which the body must be read
+
+    Returns:
+        DownloadedFile: The downloaded image, ready to be passed to a form
+
+    Raises:
+        NotModified: If a conditional request got a 304 response
+        DownloadError: If the response is not an acceptable image
+        httpx.HTTPError: If the request itself fails
+    """
+    start = time.perf_counter()
+    async with ahost_throttle(url):
+        record_duration("throttle", time.perf_counter() - start)
+        start = time.perf_counter()
+        async with get_async_client().stream("GET", url, timeout=timeout, headers=headers) as response:
+            record_duration("ttfb", time.perf_counter() - start)
+            response.raise_for_status()
+            if response.status_code == 304:
+                raise NotModified()
+            content_type = check_response_headers(url, response, max_size)
+            probe = ImageProbe.from_settings()
+
+            try:
+                with record_phase("download"):
+                    buffer, size, content_hash = await aread_limited(
+                        response, max_size=max_size, progress=progress, probe=probe, deadline_at=deadline_at
+                    )
+                record_bytes("download", size)
+            except FileTooLargeError:
+                logger.warning(f"File too large for {url}: more than {max_size} bytes")
+                raise
+
+    return build_uploaded_file(url, response, buffer, size, content_type, content_hash, probe.info)
+
+
+async def adownload_image(url, timeout=DOWNLOAD_TIMEOUT, max_size=MAX_FILE_SIZE, headers=None, progress=None):
+    """
+    Async version of download_image() that does not block the event loop.
+
+    Args:
+        url: The image URL
+        timeout: Connect/read timeout in seconds, per attempt
+        max_size: Maximum number of bytes to accept
+        headers: Extra request headers, e.g. for a conditional request
+        progress: Optional callable receiving the number of bytes read so far
+
+    Returns:
+        DownloadedFile: The downloaded image, ready to be passed to a form
+
+    Raises:
+        NotModified: If a conditional request got a 304 response
+        DownloadError: If the response is not an acceptable image, or the
+            URL or host failed recently
+        httpx.HTTPError: If the request itself fails
+    """
+    async with atrack_failures(url):
+        policy = RetryPolicy.from_settings()
+        deadline_at = policy.get_deadline_at()
+        return await policy.acall(
+            url,
+            lambda attempt_timeout: afetch_image(
+                url, attempt_timeout, max_size, headers=headers, progress=progress, deadline_at=deadline_at
+            ),
+            timeout,
+            deadline_at=deadline_at,
+        )
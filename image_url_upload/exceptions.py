@@ -0,0 +1,152 @@
+"""
+Exceptions raised while importing images from URLs.
+"""
+
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+def format_expiry(expires):
+    """
+    Format a timestamp a cached failure expires at.
+
+    Args:
+        expires: Unix timestamp
+
+    Returns:
+        tuple: (local time as 'HH:MM:SS', seconds from now)
+    """
+    expires_at = timezone.localtime(datetime.fromtimestamp(expires, tz=dt_timezone.utc))
+    return expires_at.strftime("%H:%M:%S"), max(1, round(expires - time.time()))
+
+
+class DownloadError(Exception):
+    """
+    Base class for download failures that are reported back to the user.
+
+    Attributes:
+        message: Translatable, user-facing error message
+    """
+
+    message = _("Download failed.")
+
+    def __init__(self, message=None):
+        if message is not None:
+            self.message = message
+        super().__init__(str(self.message))
+
+
+class InvalidContentTypeError(DownloadError):
+    """Raised when the response is not one of the allowed image types."""
+
+    message = _("Invalid file type. Allowed types: JPEG, PNG, GIF, BMP, WEBP.")
+
+
+class FileTooLargeError(DownloadError):
+    """Raised when the response exceeds the maximum allowed size."""
+
+    def __init__(self, max_size):
+        super().__init__(
+            _("File size exceeds maximum allowed size of {size} MB.").format(size=max_size // (1024 * 1024))
+        )
+
+
+class EmptyFileError(DownloadError):
+    """Raised when the response body is empty."""
+
+    message = _("The downloaded file is empty.")
+
+
+class InvalidImageError(DownloadError):
+    """Raised when the downloaded data is not a recognisable image."""
+
+    message = _("The file is not a valid image. Allowed types: JPEG, PNG, GIF, BMP, WEBP.")
+
+
+class ImageTooLargeError(DownloadError):
+    """Raised when an image has more pixels (across all frames) than allowed."""
+
+    message = _("The image has too many pixels.")
+
+    def __init__(self, num_pixels=None, max_pixels=None):
+        if num_pixels is None:
+            super().__init__()
+        else:
+            super().__init__(
+                _("The image has too many pixels ({num_pixels}). Maximum pixels {max_pixels}.").format(
+                    num_pixels=num_pixels, max_pixels=max_pixels
+                )
+            )
+
+
+class HostThrottledError(DownloadError):
+    """Raised when a host's rate or concurrency limit left no slot in time."""
+
+    def __init__(self, host):
+        super().__init__(
+            _("Too many downloads from {host} right now. Please try again later.").format(host=host)
+        )
+
+
+class CachedFailureError(DownloadError):
+    """
+    Raised when a URL failed recently and its failure is still cached.
+
+    Attributes:
+        failure: The CachedFailure
+        retry_after: Seconds until the URL will be tried again
+    """
+
+    def __init__(self, failure):
+        self.failure = failure
+        if failure.status:
+            reason = _("HTTP error: {status}").format(status=failure.status)
+        elif failure.failure_class == "timeout":
+            reason = _("Request timeout - the server took too long to respond.")
+        else:
+            reason = _("Could not connect to the server.")
+        expires_at, self.retry_after = format_expiry(failure.expires)
+        super().__init__(
+            _("{reason} This failure is cached until {time} (in {seconds} seconds).").format(
+                reason=reason, time=expires_at, seconds=self.retry_after
+            )
+        )
+
+
+class HostUnavailableError(DownloadError):
+    """
+    Raised when a host's circuit breaker is open after repeated failures.
+
+    Attributes:
+        host: The host
+        retry_after: Seconds until downloads from the host are tried again
+    """
+
+    def __init__(self, host, open_until):
+        self.host = host
+        expires_at, self.retry_after = format_expiry(open_until)
+        super().__init__(
+            _(
+                "{host} did not respond to recent downloads. This failure is cached until {time} "
+                "(in {seconds} seconds)."
+            ).format(host=host, time=expires_at, seconds=self.retry_after)
+        )
+
+
+class DiscoveryError(DownloadError):
+    """Raised when a sitemap or feed cannot be read."""
+
+    message = _("The sitemap or feed could not be read.")
+
+
+class UnsafeAddressError(DownloadError):
+    """Raised when a hostname resolves to a private or reserved IP address."""
+
+    message = _("URLs pointing to private IP addresses are not allowed.")
+
+
+class NotModified(Exception):
+    """Raised when a conditional request reports that the source is unchanged."""
@@ -0,0 +1,343 @@
+"""
+Negative caching of failed downloads for image URL upload.
+
+Two mechanisms keep known-bad URLs and unreachable hosts from tying up
+workers with repeated timeouts:
+
+- Failed URLs are remembered per normalized URL, together with the class of
+  failure (client error, server error, timeout, connection failure). Until
+  the entry expires, imports of the URL fail immediately with the cached
+  reason.
+- A per-host circuit breaker opens after a number of consecutive timeouts or
+  connection failures. While it is open, downloads from the host fail
+  immediately; once the cooldown has passed, a single trial download is let
+  through, and closes the circuit again if the host responds.
+
+State is kept in Django's cache, so it is shared by every process using the
+same cache backend.
+"""
+
+import logging
+import time
+from collections import namedtuple
+from contextlib import asynccontextmanager, contextmanager
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .exceptions import CachedFailureError, HostThrottledError, HostUnavailableError
+from .models import get_url_hash
+from .policy import normalize_hostname
+from .session import httpx
+from .utils import get_domain_from_url
+
+CLIENT_ERROR = "client_error"
+SERVER_ERROR = "server_error"
+TIMEOUT = "timeout"
+CONNECTION_ERROR = "connection_error"
+
+# Seconds a failure is cached, per failure class
+FAILURE_CACHE_TTLS = {
+    CLIENT_ERROR: 300,
+    SERVER_ERROR: 60,
+    TIMEOUT: 120,
+    CONNECTION_ERROR: 120,
+}
+# Client errors that say nothing about the URL itself
+TRANSIENT_STATUS_CODES = {408, 425, 429}
+CIRCUIT_BREAKER_THRESHOLD = 5  # Consecutive timeouts/connection failures that open a host's circuit
+CIRCUIT_BREAKER_COOLDOWN = 30  # Seconds before a trial download is let through
+CIRCUIT_TRIAL_TIMEOUT = 60  # Seconds before a trial that never reported back may be retried
+KEY_PREFIX = "image_url_upload:failures"
+
+logger = logging.getLogger(__name__)
+
+CachedFailure = namedtuple("CachedFailure", ["failure_class", "status", "expires"])
+
+
+def get_failure_cache():
+    """Return the Django cache holding failure state."""
+    return caches[getattr(settings, "WAGTAIL_IMAGE_URL_FAILURE_CACHE", "default")]
+
+
+def get_failure_ttls():
+    """Return the number of seconds each failure class is cached; 0 disables caching it."""
+    return {**FAILURE_CACHE_TTLS, **getattr(settings, "WAGTAIL_IMAGE_URL_FAILURE_CACHE_TTLS", {})}
+
+
+def classify_failure(exc):
+    """
+    Classify a download exception.
+
+    Args:
+        exc: An exception raised by ``requests`` or ``httpx``
+
+    Returns:
+        tuple or None: (failure_class, status_code or None), or None if the
+        exception is not a cacheable failure
+    """
+    if isinstance(exc, requests.exceptions.HTTPError) or (
+        httpx is not None and isinstance(exc, httpx.HTTPStatusError)
+    ):
+        status = getattr(exc.response, "status_code", None)
+        if not isinstance(status, int) or status in TRANSIENT_STATUS_CODES:
+            return None
+        if 400 <= status < 500:
+            return CLIENT_ERROR, status
+        if status >= 500:
+            return SERVER_ERROR, status
+        return None
+
+    # Connect timeouts are connection errors too, so timeouts go first
+    if isinstance(exc, requests.exceptions.Timeout) or (
+        httpx is not None and isinstance(exc, httpx.TimeoutException)
+    ):
+        return TIMEOUT, None
+    if isinstance(exc, requests.exceptions.ConnectionError) or (
+        httpx is not None and isinstance(exc, httpx.TransportError)
+    ):
+        return CONNECTION_ERROR, None
+    return None
+
+
+def make_url_key(url):
+    return f"{KEY_PREFIX}:url:{get_url_hash(url)}"
+
+
+def get_cached_failure(url):
+    """
+    Return the cached failure of a URL, if any.
+
+    Args:
+        url: The image URL
+
+    Returns:
+        CachedFailure or None: The unexpired failure
+    """
+    failure = get_failure_cache().get(make_url_key(url))
+    if failure is None:
+        return None
+    return CachedFailure(*failure)
+
+
+def cache_failure(url, failure_class, status=None):
+    """
+    Remember that a URL failed.
+
+    Args:
+        url: The image URL
+        failure_class: One of the failure classes returned by classify_failure()
+        status: The HTTP status code, for HTTP errors
+
+    Returns:
+        CachedFailure or None: The cached failure, or None if failures of
+        this class are not cached
+    """
+    ttl = get_failure_ttls().get(failure_class)
+    if not ttl:
+        return None
+    failure = CachedFailure(failure_class, status, time.time() + ttl)
+    get_failure_cache().set(make_url_key(url), tuple(failure), timeout=ttl)
+    logger.info(f"Caching {failure_class} failure of {url} for {ttl}s")
+    return failure
+
+
+def clear_cached_failure(url):
+    """Forget a URL's cached failure, e.g. after it was fixed at the source."""
+    get_failure_cache().delete(make_url_key(url))
+
+
+class HostCircuitBreaker:
+    """
+    Cache-backed circuit breaker for one host.
+
+    Args:
+        host: The normalized hostname
+        threshold: Consecutive timeouts/connection failures that open the circuit
+        cooldown: Seconds the circuit stays open before a trial download
+        cache: The Django cache holding the shared state
+    """
+
+    def __init__(self, host, threshold=CIRCUIT_BREAKER_THRESHOLD, cooldown=CIRCUIT_BREAKER_COOLDOWN, cache=None):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.cache = cache or get_failure_cache()
+        self.is_trial = False
+
+    @classmethod
+    def for_url(cls, url):
+        """
+        Create the circuit breaker for a URL's host.
+
+        Returns:
+            HostCircuitBreaker or None: The breaker, or None if disabled
+        """
+        threshold = getattr(settings, "WAGTAIL_IMAGE_URL_CIRCUIT_BREAKER_THRESHOLD", CIRCUIT_BREAKER_THRESHOLD)
+        if not threshold:
+            return None
+        return cls(
+            normalize_hostname(get_domain_from_url(url)),
+            threshold=threshold,
+            cooldown=getattr(settings, "WAGTAIL_IMAGE_URL_CIRCUIT_BREAKER_COOLDOWN", CIRCUIT_BREAKER_COOLDOWN),
+        )
+
+    def make_key(self, name):
+        return f"{KEY_PREFIX}:host:{self.host}:{name}"
+
+    def before_request(self):
+        """
+        Check that a download from the host may start.
+
+        Returns:
+            bool: True if this download is the trial of a half-open circuit
+
+        Raises:
+            HostUnavailableError: If the circuit is open
+        """
+        state = self.cache.get_many([self.make_key("open_until"), self.make_key("failures")])
+        open_until = state.get(self.make_key("open_until"))
+        if open_until is not None:
+            raise HostUnavailableError(self.host, open_until)
+        if state.get(self.make_key("failures"), 0) < self.threshold:
+            return False
+
+        # Half-open: only one download gets to find out if the host is back
+        if self.cache.add(self.make_key("trial"), 1, timeout=CIRCUIT_TRIAL_TIMEOUT):
+            logger.info(f"Trying {self.host} again after its circuit was opened")
+            self.is_trial = True
+            return True
+        raise HostUnavailableError(self.host, time.time() + self.cooldown)
+
+    def record_success(self):
+        """Close the circuit after the host responded."""
+        self.cache.delete_many([self.make_key("failures"), self.make_key("trial")])
+
+    def record_failure(self):
+        """
+        Count a timeout or connection failure, opening the circuit at the threshold.
+
+        Returns:
+            bool: True if the circuit is now open
+        """
+        failures_key = self.make_key("failures")
+        # The count expires if the host stays quiet, so old failures do not add up
+        window = self.cooldown * 10
+        self.cache.add(failures_key, 0, timeout=window)
+        try:
+            failures = self.cache.incr(failures_key)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.set(failures_key, 1, timeout=window)
+            failures = 1
+
+        self.cache.delete(self.make_key("trial"))
+        if failures < self.threshold:
+            return False
+
+        logger.warning(f"Opening circuit for {self.host} for {self.cooldown}s after {failures} failures")
+        self.cache.set(self.make_key("open_until"), time.time() + self.cooldown, timeout=self.cooldown)
+        return True
+
+    def release_trial(self):
+        """Let another download try the host, when a trial ended without reaching it."""
+        self.cache.delete(self.make_key("trial"))
+
+
+def check_failures(url):
+    """
+    Fail fast for URLs that failed recently and hosts that are down.
+
+    Args:
+        url: The image URL
+
+    Returns:
+        HostCircuitBreaker or None: The host's breaker, to report the outcome to
+
+    Raises:
+        CachedFailureError: If the URL's last failure is still cached
+        HostUnavailableError: If the host's circuit is open
+    """
+    failure = get_cached_failure(url)
+    if failure is not None:
+        logger.info(f"Skipping {url}: {failure.failure_class} failure cached")
+        raise CachedFailureError(failure)
+
+    breaker = HostCircuitBreaker.for_url(url)
+    if breaker is not None:
+        breaker.before_request()
+    return breaker
+
+
+def record_outcome(url, breaker, exc=None):
+    """
+    Update the failure cache and circuit breaker after a download.
+
+    Args:
+        url: The image URL
+        breaker: The breaker returned by check_failures()
+        exc: The exception the download failed with, or None on success
+    """
+    if isinstance(exc, HostThrottledError):
+        # The host was never contacted
+        if breaker is not None and breaker.is_trial:
+            breaker.release_trial()
+        return
+
+    failure = classify_failure(exc) if exc is not None else None
+    if failure is not None:
+        cache_failure(url, *failure)
+
+    if breaker is None:
+        return
+    if failure is not None and failure[0] in (TIMEOUT, CONNECTION_ERROR):
+        breaker.record_failure()
+    else:
+        # Any response, even an error status, means the host is reachable
+        breaker.record_success()
+
+
+@contextmanager
+def track_failures(url):
+    """
+    Fail fast for known-bad URLs and hosts, and record the download's outcome.
+
+    Args:
+        url: The image URL
+
+    Raises:
+        CachedFailureError: If the URL's last failure is still cached
+        HostUnavailableError: If the host's circuit is open
+    """
+    breaker = check_failures(url)
+    try:
+        yield
+    except Exception as e:
+        record_outcome(url, breaker, e)
+        raise
+    else:
+        record_outcome(url, breaker)
+
+
+@asynccontextmanager
+async def atrack_failures(url):
+    """
+    Async version of track_failures().
+
+    Args:
+        url: The image URL
+
+    Raises:
+        CachedFailureError: If the URL's last failure is still cached
+        HostUnavailableError: If the host's circuit is open
+    """
+    breaker = await sync_to_async(check_failures, thread_sensitive=False)(url)
+    try:
+        yield
+    except Exception as e:
+        await sync_to_async(record_outcome, thread_sensitive=False)(url, breaker, e)
+        raise
+    else:
+        await sync_to_async(record_outcome, thread_sensitive=False)(url, breaker)
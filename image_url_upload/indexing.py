@@ -0,0 +1,285 @@
+"""
+Indexing of images inserted with ``bulk_create()``.
+
+``bulk_create()`` sends no ``post_save`` signals, so Wagtail's handlers, which
+queue a search index update, a reference index update and (optionally)
+feature detection for each saved image, do not run. index_new_images() does
+that work for a batch of new images at once:
+
+- the references of each image are added to Wagtail's reference index,
+- once the transaction commits, the images are added to each search backend
+  with a single ``add_bulk()`` call (or queued, see below),
+- with ``WAGTAILIMAGES_FEATURE_DETECTION_ENABLED``, focal point detection is
+  queued as Wagtail 6.4+ does, or run right away on older versions, where
+  Wagtail detects focal points before saving.
+
+With ``WAGTAIL_IMAGE_URL_DEFER_SEARCH_INDEX``, search indexing is taken off
+the request path: the IDs of new images are queued in this process, and added
+to the search backends in batches by a background thread, when the queue is
+full, after each batch of the job worker and bulk importer, and when the
+process exits. Images saved one at a time are saved normally, with every
+signal receiver, except that Wagtail's search index handler is skipped for
+saves inside search_index_deferred().
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from wagtail.models import ReferenceIndex
+from wagtail.search import index
+from wagtail.search.backends import get_search_backends_with_name
+from wagtail.search.signal_handlers import post_save_signal_handler
+from wagtail.signal_handlers import reference_index_auto_update_disabled
+
+try:
+    from wagtail.images.tasks import set_image_focal_point_task
+except ImportError:  # Wagtail < 6.4 detects focal points in a pre_save handler
+    set_image_focal_point_task = None
+
+SEARCH_INDEX_BATCH_SIZE = 100  # Queued images that are indexed together
+SEARCH_INDEX_FLUSH_INTERVAL = 5  # Seconds between background flushes of the queue
+
+logger = logging.getLogger(__name__)
+
+_queue = {}  # Model -> dict of queued image IDs, in order
+_queue_lock = threading.Lock()
+
+_deferred = threading.local()
+_wrapped_models = set()  # Models whose search index handler is replaced by index_on_save()
+_wrapped_models_lock = threading.Lock()
+
+
+def add_references(model, images):
+    """
+    Add the outbound references of new images to Wagtail's reference index.
+
+    Must be called within a transaction.
+
+    Args:
+        model: The image model
+        images: Saved images of ``model``
+    """
+    if not ReferenceIndex.is_indexed(model) or getattr(reference_index_auto_update_disabled, "value", False):
+        return
+
+    for image in images:
+        ReferenceIndex.create_or_update_for_object(image)
+
+
+def add_to_search_index(model, image_ids):
+    """
+    Add images to every search backend that is updated automatically.
+
+    The images are loaded as ``manage.py update_index`` loads them, with the
+    related objects of their search fields (e.g. tags) prefetched.
+
+    Args:
+        model: The image model
+        image_ids: IDs of saved images of ``model``; deleted ones are skipped
+
+    Returns:
+        int: Number of images indexed
+    """
+    if not index.class_is_indexed(model) or not getattr(model, "search_auto_update", True):
+        return 0
+
+    try:
+        images = [image.get_indexed_instance() for image in model.get_indexed_objects().filter(pk__in=image_ids)]
+    except Exception:
+        # Best effort; `manage.py update_index` adds them later
+        logger.exception(f"Could not load {len(image_ids)} images to index")
+        return 0
+    images = [image for image in images if image is not None]
+    if not images:
+        return 0
+
+    for backend_name, backend in get_search_backends_with_name(with_auto_update=True):
+        try:
+            backend.add_bulk(model, images)
+        except Exception:
+            # The images are saved; `manage.py update_index` adds them later
+            logger.exception(f"Could not add {len(images)} images to the '{backend_name}' search backend")
+    return len(images)
+
+
+def is_search_index_deferred():
+    """Return True if new images are queued for the search index instead of being indexed on commit."""
+    return getattr(settings, "WAGTAIL_IMAGE_URL_DEFER_SEARCH_INDEX", False)
+
+
+def get_search_index_batch_size():
+    """Return the number of queued images that are indexed together, and fill the queue."""
+    return max(1, getattr(settings, "WAGTAIL_IMAGE_URL_SEARCH_INDEX_BATCH_SIZE", SEARCH_INDEX_BATCH_SIZE))
+
+
+def get_queued_count():
+    """Return the number of images waiting to be added to the search index."""
+    with _queue_lock:
+        return sum(len(image_ids) for image_ids in _queue.values())
+
+
+def clear_search_index_queue():
+    """Discard the queued images without indexing them."""
+    with _queue_lock:
+        _queue.clear()
+
+
+def queue_for_search_index(model, image_ids):
+    """
+    Queue images to be added to the search index by the next flush.
+
+    The import that fills the queue flushes it, so it never holds more than
+    one batch.
+
+    Args:
+        model: The image model
+        image_ids: IDs of saved images of ``model``
+    """
+    with _queue_lock:
+        _queue.setdefault(model, {}).update(dict.fromkeys(image_ids))
+        is_full = sum(len(queued) for queued in _queue.values()) >= get_search_index_batch_size()
+    if is_full:
+        flush_search_index()
+    else:
+        start_flusher()
+
+
+def flush_search_index():
+    """
+    Add the queued images to the search index, one batch at a time.
+
+    Images deleted since they were queued are skipped.
+
+    Returns:
+        int: Number of images indexed
+    """
+    with _queue_lock:
+        queued = list(_queue.items())
+        _queue.clear()
+
+    count = 0
+    batch_size = get_search_index_batch_size()
+    for model, image_ids in queued:
+        image_ids = list(image_ids)
+        for start in range(0, len(image_ids), batch_size):
+            count += add_to_search_index(model, image_ids[start:start + batch_size])
+    if count:
+        logger.info(f"Added {count} queued images to the search index")
+    return count
+
+
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+def run_flusher(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            flush_search_index()
+        except Exception:
+            logger.exception("Could not flush the search index queue")
+        finally:
+            # This thread outlives the request cycle that would close it
+            connection.close()
+
+
+def start_flusher():
+    """Start this process's background flush thread, if it is not running."""
+    global _flusher_pid
+
+    pid = os.getpid()
+    if _flusher_pid == pid:
+        return
+    with _flusher_lock:
+        # A forked child does not inherit its parent's thread
+        if _flusher_pid == pid:
+            return
+        interval = getattr(settings, "WAGTAIL_IMAGE_URL_SEARCH_INDEX_FLUSH_INTERVAL", SEARCH_INDEX_FLUSH_INTERVAL)
+        if interval:
+            threading.Thread(target=run_flusher, args=(interval,), name="image-url-search-index", daemon=True).start()
+        _flusher_pid = pid
+
+
+atexit.register(flush_search_index)
+
+
+def index_on_save(sender, instance, **kwargs):
+    """Run Wagtail's search index handler, unless the save is in a search_index_deferred() block."""
+    if getattr(_deferred, "active", False):
+        return
+    post_save_signal_handler(sender=sender, instance=instance, **kwargs)
+
+
+@contextmanager
+def search_index_deferred(model):
+    """
+    Skip Wagtail's search indexing of ``model`` instances saved in this thread, within the block.
+
+    Other ``post_save`` receivers still run. The first call replaces
+    Wagtail's handler for the model with index_on_save(), which behaves the
+    same outside the block.
+
+    Args:
+        model: The image model
+    """
+    with _wrapped_models_lock:
+        if model not in _wrapped_models:
+            if post_save.disconnect(post_save_signal_handler, sender=model):
+                post_save.connect(index_on_save, sender=model, weak=False)
+            _wrapped_models.add(model)
+
+    _deferred.active = True
+    try:
+        yield
+    finally:
+        _deferred.active = False
+
+
+def detect_features(images):
+    """Detect the focal points of new images, if Wagtail's feature detection is enabled."""
+    if not getattr(settings, "WAGTAILIMAGES_FEATURE_DETECTION_ENABLED", False):
+        return
+
+    for image in images:
+        if image.has_focal_point():
+            continue
+        if set_image_focal_point_task is not None:
+            set_image_focal_point_task.enqueue(image._meta.app_label, image._meta.model_name, str(image.pk))
+        else:
+            image.set_focal_point(image.get_suggested_focal_point())
+            type(image).objects.filter(pk=image.pk).update(
+                focal_point_x=image.focal_point_x,
+                focal_point_y=image.focal_point_y,
+                focal_point_width=image.focal_point_width,
+                focal_point_height=image.focal_point_height,
+            )
+
+
+def index_new_images(images):
+    """
+    Do the work of Wagtail's ``post_save`` handlers for images inserted with ``bulk_create()``.
+
+    Must be called within the transaction that inserted them.
+
+    Args:
+        images: The new images, all of the same model
+    """
+    if not images:
+        return
+
+    model = type(images[0])
+    image_ids = [image.pk for image in images]
+    add_references(model, images)
+    if is_search_index_deferred():
+        transaction.on_commit(lambda: queue_for_search_index(model, image_ids))
+    else:
+        transaction.on_commit(lambda: add_to_search_index(model, image_ids))
+    detect_features(images)
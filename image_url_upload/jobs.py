@@ -0,0 +1,167 @@
+"""
+Background worker for queued image URL imports.
+
+Workers lease a few items at a time (see ``ImportItemQuerySet.lease()``), so
+any number of ``process_image_url_imports`` processes on any number of nodes
+can share one queue. The lease of the items still waiting is renewed after
+each import, so a slow round does not lose them to another worker. An item
+whose worker dies is picked up again once its lease expires, up to a maximum
+number of attempts.
+"""
+
+import logging
+import os
+import socket
+import time
+from itertools import groupby
+
+from django.conf import settings
+from django.http import HttpRequest
+from django.utils.translation import gettext as _
+from wagtail.models import Collection
+
+from .indexing import flush_search_index
+from .models import ImportItem
+from .renditions import generate_renditions, get_new_image_ids
+from .views import AddFromURLBatchView
+
+JOB_BATCH_SIZE = 10  # Items leased per round
+JOB_LEASE_SECONDS = 300
+JOB_MAX_ATTEMPTS = 3
+JOB_POLL_INTERVAL = 5  # seconds
+
+logger = logging.getLogger(__name__)
+
+
+def get_worker_id():
+    """Return an identifier for this worker process, e.g. 'web-1:4242'."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def get_import_view(user):
+    """
+    Set up the batch import view to import images on behalf of a user.
+
+    Renditions of new images are not generated in the background; callers
+    generate them with generate_renditions() after each batch.
+
+    Args:
+        user: The user who queued the job
+
+    Returns:
+        AddFromURLBatchView: The view, ready for import_from_urls()
+    """
+    request = HttpRequest()
+    request.user = user
+    view = AddFromURLBatchView()
+    view.setup(request)
+    view.model = view.get_model()
+    view.prewarm_renditions_in_background = False
+    return view
+
+
+class ImportWorker:
+    """
+    Processes queued ImportItems until the queue is empty or it is stopped.
+
+    Args:
+        worker_id: Identifier recorded on leased items
+        batch_size: Number of items to lease per round
+        lease_seconds: How long a lease lasts before other workers may retry the item
+        max_attempts: Number of leases after which an item is marked as failed
+    """
+
+    def __init__(self, worker_id=None, batch_size=None, lease_seconds=None, max_attempts=None):
+        self.worker_id = worker_id or get_worker_id()
+        self.batch_size = batch_size or getattr(settings, "WAGTAIL_IMAGE_URL_JOB_BATCH_SIZE", JOB_BATCH_SIZE)
+        self.lease_seconds = lease_seconds or getattr(
+            settings, "WAGTAIL_IMAGE_URL_JOB_LEASE_SECONDS", JOB_LEASE_SECONDS
+        )
+        self.max_attempts = max_attempts or getattr(settings, "WAGTAIL_IMAGE_URL_JOB_MAX_ATTEMPTS", JOB_MAX_ATTEMPTS)
+        self.stopped = False
+
+    def run(self, once=False, poll_interval=JOB_POLL_INTERVAL):
+        """
+        Process items until stopped.
+
+        Args:
+            once: Return as soon as the queue is empty instead of polling
+            poll_interval: Seconds to wait before checking an empty queue again
+
+        Returns:
+            int: Number of items processed
+        """
+        total = 0
+        while not self.stopped:
+            processed = self.run_once()
+            total += processed
+            if not processed:
+                if once:
+                    break
+                time.sleep(poll_interval)
+        return total
+
+    def stop(self):
+        """Stop after the current round."""
+        self.stopped = True
+
+    def run_once(self):
+        """
+        Lease and process one round of items.
+
+        Returns:
+            int: Number of items leased
+        """
+        items = ImportItem.objects.lease(self.worker_id, self.batch_size, self.lease_seconds)
+        for job, job_items in groupby(items, key=lambda item: item.job):
+            try:
+                self.process_items(job, list(job_items))
+            except Exception:
+                # The items' leases will expire and they will be retried
+                logger.exception(f"Worker {self.worker_id} failed processing import job {job.pk}")
+        return len(items)
+
+    def process_items(self, job, items):
+        """
+        Import leased items of a single job.
+
+        Args:
+            job: The ImportJob the items belong to
+            items: The leased ImportItems
+        """
+        pending = []
+        for item in items:
+            if item.attempts > self.max_attempts:
+                self.fail(item, _("Gave up after {count} attempts.").format(count=self.max_attempts))
+            else:
+                pending.append(item)
+        if not pending:
+            return
+
+        if job.user is None:
+            for item in pending:
+                self.fail(item, _("The user who queued this import no longer exists."))
+            return
+
+        view = get_import_view(job.user)
+        if not view.has_access(view.request):
+            for item in pending:
+                self.fail(item, _("You do not have permission to add images."))
+            return
+
+        collection_id = job.collection_id or Collection.get_first_root_node().pk
+        results = []
+        for index, (item, response_data) in enumerate(
+            zip(pending, view.import_from_urls([item.url for item in pending], collection_id))
+        ):
+            results.append(response_data)
+            if not item.complete(response_data):
+                logger.warning(f"Lease on import item {item.pk} expired before it was completed")
+            if index < len(pending) - 1:
+                ImportItem.objects.renew_lease(item.lease_token, self.lease_seconds)
+        generate_renditions(get_new_image_ids(results))
+        flush_search_index()
+
+    def fail(self, item, error_message):
+        """Mark an item as failed without importing it."""
+        item.complete({"success": False, "error_message": error_message})
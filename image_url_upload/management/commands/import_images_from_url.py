@@ -0,0 +1,108 @@
+"""
+Management command importing images from a list of URLs.
+"""
+
+import os
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from image_url_upload.bulk import IMPORT_CHUNK_SIZE, BulkImporter, Checkpoint, read_rows
+
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+
+
+class Command(BaseCommand):
+    help = (
+        "Import images from URLs listed in a CSV or NDJSON file (or stdin). Rows have a 'url' and "
+        "optional 'collection', 'title' and 'tags'."
+    )
+    stealth_options = ("stdin",)
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", nargs="?", default="-", help="Input file, or '-' to read stdin (default).")
+        parser.add_argument("--user", required=True, help="Username of the user the images are imported as.")
+        parser.add_argument(
+            "--format",
+            choices=("csv", "ndjson"),
+            dest="input_format",
+            help="Input format. Detected from the file extension or first line if not given.",
+        )
+        parser.add_argument("--collection", type=int, help="ID of the collection for rows without one.")
+        parser.add_argument("--workers", type=int, help="Number of concurrent downloads.")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help="Rows imported between checkpoint saves.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="File recording progress. If it exists, the import resumes where it stopped.",
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options["user"])
+        input_name = options["input"]
+        input_format = options["input_format"]
+        if input_format is None and input_name.lower().endswith(NDJSON_EXTENSIONS):
+            input_format = "ndjson"
+
+        checkpoint = None
+        if options["checkpoint"]:
+            source = input_name if input_name == "-" else os.path.abspath(input_name)
+            checkpoint = Checkpoint(options["checkpoint"], source)
+            try:
+                if checkpoint.load():
+                    self.stdout.write(f"Resuming after {checkpoint.position} rows")
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        self.verbosity = options["verbosity"]
+        importer = BulkImporter(
+            user,
+            collection_id=options["collection"],
+            max_workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            checkpoint=checkpoint,
+            on_result=self.report,
+        )
+        if not importer.has_access():
+            raise CommandError(f"User '{user}' does not have permission to add images.")
+
+        if input_name == "-":
+            counts = self.run(importer, options.get("stdin") or sys.stdin, input_format)
+        else:
+            try:
+                stream = open(input_name, encoding="utf-8", newline="")
+            except OSError as e:
+                raise CommandError(f"Cannot read {input_name}: {e}")
+            with stream:
+                counts = self.run(importer, stream, input_format)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Saved {counts['saved']}, duplicates {counts['duplicate']}, failed {counts['failed']}"
+            )
+        )
+
+    def get_user(self, username):
+        User = get_user_model()
+        try:
+            return User._default_manager.get_by_natural_key(username)
+        except User.DoesNotExist:
+            raise CommandError(f"User '{username}' does not exist.")
+
+    def run(self, importer, stream, input_format):
+        try:
+            return importer.run(read_rows(stream, input_format))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+    def report(self, row, status, response_data):
+        """Print failures, and every row at verbosity 2."""
+        if status == "failed":
+            self.stderr.write(f"Line {row.line}: {row.url}: {response_data.get('error_message')}")
+        elif self.verbosity >= 2:
+            self.stdout.write(f"Line {row.line}: {row.url}: {status}")
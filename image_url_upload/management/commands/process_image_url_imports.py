@@ -0,0 +1,59 @@
+"""
+Management command running a background worker for queued image URL imports.
+"""
+
+import signal
+
+from django.core.management.base import BaseCommand
+
+from image_url_upload.jobs import JOB_POLL_INTERVAL, ImportWorker
+
+
+class Command(BaseCommand):
+    help = (
+        "Import images queued through the 'Add from URL' job endpoint. "
+        "Run as many workers as needed, on any number of nodes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queue is empty instead of waiting for new jobs.",
+        )
+        parser.add_argument("--batch-size", type=int, help="Number of items to lease per round.")
+        parser.add_argument(
+            "--lease-seconds",
+            type=int,
+            help="Seconds before an unfinished item may be retried by another worker.",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            help="Number of attempts after which an item is marked as failed.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=JOB_POLL_INTERVAL,
+            help="Seconds to wait before checking an empty queue again.",
+        )
+
+    def handle(self, *args, **options):
+        worker = ImportWorker(
+            batch_size=options["batch_size"],
+            lease_seconds=options["lease_seconds"],
+            max_attempts=options["max_attempts"],
+        )
+
+        # Finish the current round on SIGTERM (e.g. during a deploy) so no
+        # lease is left to expire
+        previous_handler = signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+
+        self.stdout.write(f"Worker {worker.worker_id} started")
+        try:
+            processed = worker.run(once=options["once"], poll_interval=options["poll_interval"])
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} items"))
@@ -0,0 +1,312 @@
+"""
+Import metrics for image URL upload, in Prometheus text format.
+
+Every finished import (see ``timing.report_timings()``) updates:
+
+- ``image_url_imports_total{outcome}``: imports by outcome: 'success',
+  'duplicate', or an error code from get_error_code()
+- ``image_url_downloaded_bytes_total``: bytes of image data downloaded
+- ``image_url_download_size_bytes``: histogram of image sizes
+- ``image_url_import_duration_seconds{phase}``: histogram of the time spent
+  in each phase, and in total
+
+Recording only updates a dict in this process, so it adds no I/O to an
+import. A background thread adds the changes to counters in Django's cache
+every ``WAGTAIL_IMAGE_URL_METRICS_FLUSH_INTERVAL`` seconds, where every
+worker process sharing the cache (e.g. Redis or Memcached) adds to the same
+totals. The scrape endpoint (``MetricsView``) reads the totals from there.
+"""
+
+import atexit
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import receiver
+
+from .exceptions import DownloadError
+from .failures import classify_failure
+from .retry import get_error_response
+from .signals import image_import_timed
+
+METRICS_FLUSH_INTERVAL = 10  # Seconds between writes of this process's metrics to the cache
+KEY_PREFIX = "image_url_upload:metrics"
+INDEX_KEY = f"{KEY_PREFIX}:index"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (10_000, 50_000, 100_000, 500_000, 1_000_000, 2_500_000, 5_000_000, 10_000_000)
+
+# name: (type, help)
+METRIC_FAMILIES = {
+    "image_url_imports_total": ("counter", "Image URL imports by outcome."),
+    "image_url_downloaded_bytes_total": ("counter", "Bytes of image data downloaded."),
+    "image_url_download_size_bytes": ("histogram", "Size of downloaded images."),
+    "image_url_import_duration_seconds": ("histogram", "Time spent in each phase of an image URL import."),
+}
+# name: (bucket upper bounds, scale); sums are stored as integers of value * scale
+HISTOGRAMS = {
+    "image_url_download_size_bytes": (SIZE_BUCKETS, 1),
+    "image_url_import_duration_seconds": (DURATION_BUCKETS, 1_000_000),
+}
+
+logger = logging.getLogger(__name__)
+
+
+def get_error_code(exc):
+    """
+    Return a short code for why an import failed, for use as a metric label.
+
+    Args:
+        exc: The exception the download failed with
+
+    Returns:
+        str: e.g. 'invalid_content_type', 'http_4xx', 'timeout' or 'unexpected'
+    """
+    if isinstance(exc, DownloadError):
+        name = type(exc).__name__.removesuffix("Error")
+        return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+    response = get_error_response(exc)
+    if response is not None and isinstance(getattr(response, "status_code", None), int):
+        return f"http_{response.status_code // 100}xx"
+    failure = classify_failure(exc)
+    if failure is not None:
+        return failure[0]
+    return "unexpected"
+
+
+def format_bound(bound):
+    return str(int(bound)) if float(bound).is_integer() else str(bound)
+
+
+class MetricsRegistry:
+    """
+    Metric changes in this process that have not been written to the cache yet.
+
+    Values are integers keyed by series, a (name, labels) tuple where labels
+    is a tuple of (name, value) pairs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = defaultdict(int)
+
+    def inc(self, name, labels=(), amount=1):
+        """Add to a counter."""
+        with self._lock:
+            self._values[(name, labels)] += amount
+
+    def observe(self, name, value, labels=()):
+        """Record a value in a histogram."""
+        buckets, scale = HISTOGRAMS[name]
+        bound = next((format_bound(bound) for bound in buckets if value <= bound), "+Inf")
+        with self._lock:
+            # Buckets are stored per bound and made cumulative when rendered
+            self._values[(f"{name}_bucket", labels + (("le", bound),))] += 1
+            self._values[(f"{name}_count", labels)] += 1
+            self._values[(f"{name}_sum", labels)] += round(value * scale)
+
+    def collect(self):
+        """
+        Take the changes recorded so far.
+
+        Returns:
+            dict: Series -> change since the last collect()
+        """
+        with self._lock:
+            values, self._values = self._values, defaultdict(int)
+        return dict(values)
+
+
+registry = MetricsRegistry()
+
+
+def clear_metrics():
+    """Discard this process's metric changes that have not been flushed."""
+    registry.collect()
+
+
+def is_metrics_enabled():
+    """Return True if imports are counted."""
+    return getattr(settings, "WAGTAIL_IMAGE_URL_METRICS", True)
+
+
+def get_metrics_cache():
+    """Return the Django cache holding the totals of all processes."""
+    return caches[getattr(settings, "WAGTAIL_IMAGE_URL_METRICS_CACHE", "default")]
+
+
+def make_series_key(series):
+    return f"{KEY_PREFIX}:{hashlib.sha1(repr(series).encode()).hexdigest()}"
+
+
+def add_to_index(cache, series):
+    """
+    Add series to the list of series with totals in the cache.
+
+    The list is updated under a short-lived lock, as the throttle's buckets are.
+
+    Returns:
+        bool: False if the lock could not be taken; the series are added on a later flush
+    """
+    lock_key = f"{KEY_PREFIX}:lock"
+    for _ in range(50):
+        if cache.add(lock_key, 1, timeout=5):
+            try:
+                index = cache.get(INDEX_KEY) or []
+                cache.set(INDEX_KEY, list(dict.fromkeys(index + series)), timeout=None)
+                return True
+            finally:
+                cache.delete(lock_key)
+        time.sleep(0.01)
+    return False
+
+
+def flush():
+    """
+    Add this process's metric changes to the totals in the cache.
+
+    Returns:
+        int: Number of series written
+    """
+    values = registry.collect()
+    if not values:
+        return 0
+
+    try:
+        cache = get_metrics_cache()
+        index = set(cache.get(INDEX_KEY) or [])
+        missing = [series for series in values if series not in index]
+        if missing and not add_to_index(cache, missing):
+            logger.warning("Could not update the metrics index; new series are listed on the next flush")
+        for series, value in values.items():
+            key = make_series_key(series)
+            if not cache.add(key, value, timeout=None):
+                try:
+                    cache.incr(key, value)
+                except ValueError:
+                    # Evicted since add()
+                    cache.set(key, value, timeout=None)
+    except Exception:
+        # Metrics are best effort; never let them break imports
+        logger.exception("Could not write import metrics to the cache")
+        return 0
+    return len(values)
+
+
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+def run_flusher(interval):
+    while True:
+        time.sleep(interval)
+        flush()
+
+
+def start_flusher():
+    """Start this process's background flush thread, if it is not running."""
+    global _flusher_pid
+
+    pid = os.getpid()
+    if _flusher_pid == pid:
+        return
+    with _flusher_lock:
+        # A forked child does not inherit its parent's thread
+        if _flusher_pid == pid:
+            return
+        interval = getattr(settings, "WAGTAIL_IMAGE_URL_METRICS_FLUSH_INTERVAL", METRICS_FLUSH_INTERVAL)
+        if interval:
+            threading.Thread(target=run_flusher, args=(interval,), name="image-url-metrics", daemon=True).start()
+        _flusher_pid = pid
+
+
+atexit.register(flush)
+
+
+@receiver(image_import_timed)
+def record_import(sender, timings, success, response_data, **kwargs):
+    """Update the metrics for a finished import."""
+    if not is_metrics_enabled():
+        return
+
+    if not success:
+        outcome = timings.get("error") or "error"
+    elif response_data.get("duplicate"):
+        outcome = "duplicate"
+    else:
+        outcome = "success"
+    registry.inc("image_url_imports_total", (("outcome", outcome),))
+
+    size = timings["bytes"].get("download")
+    if size:
+        registry.inc("image_url_downloaded_bytes_total", amount=size)
+        registry.observe("image_url_download_size_bytes", size)
+
+    for phase, milliseconds in timings["phases_ms"].items():
+        registry.observe("image_url_import_duration_seconds", milliseconds / 1000, (("phase", phase),))
+    registry.observe("image_url_import_duration_seconds", timings["total_ms"] / 1000, (("phase", "total"),))
+
+    start_flusher()
+
+
+def get_totals():
+    """
+    Return the totals of all processes, including this process's latest changes.
+
+    Returns:
+        dict: Series -> value
+    """
+    flush()
+    cache = get_metrics_cache()
+    keys = {make_series_key(series): series for series in cache.get(INDEX_KEY) or []}
+    return {keys[key]: value for key, value in cache.get_many(list(keys)).items()}
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + "}"
+
+
+def render_prometheus(totals):
+    """
+    Format metric totals in the Prometheus text exposition format.
+
+    Args:
+        totals: Series -> value, as returned by get_totals()
+
+    Returns:
+        str: The exposition, one line per sample
+    """
+    lines = []
+    for family, (kind, help_text) in METRIC_FAMILIES.items():
+        lines.append(f"# HELP {family} {help_text}")
+        lines.append(f"# TYPE {family} {kind}")
+
+        if kind == "counter":
+            for (name, labels), value in sorted(totals.items()):
+                if name == family:
+                    lines.append(f"{family}{format_labels(labels)} {value}")
+            continue
+
+        buckets, scale = HISTOGRAMS[family]
+        labelsets = sorted(labels for name, labels in totals if name == f"{family}_count")
+        for labels in labelsets:
+            cumulative = 0
+            for bound in [format_bound(bound) for bound in buckets] + ["+Inf"]:
+                cumulative += totals.get((f"{family}_bucket", labels + (("le", bound),)), 0)
+                lines.append(f"{family}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{family}_sum{format_labels(labels)} {totals.get((f'{family}_sum', labels), 0) / scale}")
+            lines.append(f"{family}_count{format_labels(labels)} {totals[(f'{family}_count', labels)]}")
+    return "\n".join(lines) + "\n"
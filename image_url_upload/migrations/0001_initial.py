@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+from wagtail.images import get_image_model_string
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(get_image_model_string()),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.TextField(verbose_name='source URL')),
+                ('url_hash', models.CharField(editable=False, max_length=40, unique=True)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+                ('content_hash', models.CharField(blank=True, db_index=True, max_length=40)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='url_sources', to=get_image_model_string(), verbose_name='image')),
+            ],
+            options={
+                'verbose_name': 'image source',
+                'verbose_name_plural': 'image sources',
+            },
+        ),
+    ]
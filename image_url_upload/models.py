@@ -0,0 +1,365 @@
+"""
+Models for image URL upload.
+"""
+
+import hashlib
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from wagtail.images import get_image_model_string
+
+from .utils import normalize_url
+
+
+def get_url_hash(url):
+    """
+    Return the lookup key for a URL.
+
+    Args:
+        url: The URL (normalized by this function)
+
+    Returns:
+        str: SHA-1 hex digest of the normalized URL
+    """
+    return hashlib.sha1(normalize_url(url).encode("utf-8")).hexdigest()
+
+
+class ImageSourceQuerySet(models.QuerySet):
+    def for_url(self, url):
+        """Filter to the source recorded for ``url``, if any."""
+        return self.filter(url_hash=get_url_hash(url))
+
+    def for_urls(self, urls):
+        """Filter to the sources recorded for any of ``urls``."""
+        return self.filter(url_hash__in={get_url_hash(url) for url in urls})
+
+    def for_user(self, user, permission_policy):
+        """Filter to sources whose image ``user`` is allowed to choose."""
+        return self.filter(image__in=permission_policy.instances_user_has_permission_for(user, "choose"))
+
+
+class ImageSourceManager(models.Manager.from_queryset(ImageSourceQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().select_related("image")
+
+    def record(self, url, image, etag="", last_modified=""):
+        """
+        Record (or update) the image imported from a URL.
+
+        Args:
+            url: The source URL
+            image: The Wagtail image the URL was imported as
+            etag: The ``ETag`` response header, if any
+            last_modified: The ``Last-Modified`` response header, if any
+
+        Returns:
+            ImageSource: The saved record
+        """
+        source, _created = self.update_or_create(
+            url_hash=get_url_hash(url),
+            defaults={
+                "url": normalize_url(url),
+                "image": image,
+                "etag": etag or "",
+                "last_modified": last_modified or "",
+                "content_hash": image.file_hash or "",
+            },
+        )
+        return source
+
+    def record_many(self, records):
+        """
+        Record the images imported from several URLs, in one query where the database supports upserts.
+
+        Args:
+            records: (url, image, etag, last_modified) tuples; of repeated URLs, the last one is recorded
+        """
+        sources = {}
+        for url, image, etag, last_modified in records:
+            url_hash = get_url_hash(url)
+            sources[url_hash] = self.model(
+                url_hash=url_hash,
+                url=normalize_url(url),
+                image=image,
+                etag=etag or "",
+                last_modified=last_modified or "",
+                content_hash=image.file_hash or "",
+            )
+        if not sources:
+            return
+
+        features = connections[self.db].features
+        if not features.supports_update_conflicts:
+            for source in sources.values():
+                self.record(source.url, source.image, etag=source.etag, last_modified=source.last_modified)
+            return
+
+        self.bulk_create(
+            sources.values(),
+            update_conflicts=True,
+            # MySQL matches on every unique key instead
+            unique_fields=["url_hash"] if features.supports_update_conflicts_with_target else None,
+            update_fields=["url", "image", "etag", "last_modified", "content_hash", "updated_at"],
+        )
+
+
+class ImageSource(models.Model):
+    """
+    Normalized source URL of an imported image.
+
+    Lets re-imports of a known URL return the existing image instead of
+    downloading and saving it again.
+    """
+
+    url = models.TextField(verbose_name=_("source URL"))
+    url_hash = models.CharField(max_length=40, unique=True, editable=False)
+    image = models.ForeignKey(
+        get_image_model_string(),
+        on_delete=models.CASCADE,
+        related_name="url_sources",
+        verbose_name=_("image"),
+    )
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    content_hash = models.CharField(max_length=40, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ImageSourceManager()
+
+    class Meta:
+        verbose_name = _("image source")
+        verbose_name_plural = _("image sources")
+
+    def __str__(self):
+        return self.url
+
+    def get_conditional_headers(self):
+        """
+        Return request headers for revalidating the source.
+
+        Returns:
+            dict: ``If-None-Match`` and/or ``If-Modified-Since`` headers
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ImportJobManager(models.Manager):
+    def enqueue(self, user, urls, collection_id=None):
+        """
+        Queue URLs for import by a background worker.
+
+        Args:
+            user: The user the images are imported as
+            urls: The image URLs
+            collection_id: The ID of the collection to add the images to
+
+        Returns:
+            ImportJob: The new job
+        """
+        with transaction.atomic():
+            job = self.create(user=user, collection_id=collection_id)
+            ImportItem.objects.bulk_create(ImportItem(job=job, url=url) for url in urls)
+        return job
+
+
+class ImportJob(models.Model):
+    """
+    A list of URLs queued for import by a background worker.
+
+    Jobs are created by the enqueue view and processed item by item by the
+    ``process_image_url_imports`` management command.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        verbose_name=_("user"),
+    )
+    collection = models.ForeignKey(
+        "wagtailcore.Collection",
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        verbose_name=_("collection"),
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ImportJobManager()
+
+    class Meta:
+        verbose_name = _("import job")
+        verbose_name_plural = _("import jobs")
+
+    def __str__(self):
+        return f"Import job {self.pk}"
+
+    def get_status_counts(self):
+        """
+        Count the job's items by status.
+
+        Returns:
+            dict: Status -> number of items, for every status
+        """
+        counts = dict.fromkeys(ImportItem.Status.values, 0)
+        for row in self.items.order_by().values("status").annotate(count=Count("pk")):
+            counts[row["status"]] = row["count"]
+        return counts
+
+
+class ImportItemQuerySet(models.QuerySet):
+    def leasable(self, now=None):
+        """Filter to items that are pending or whose lease has expired."""
+        now = now or timezone.now()
+        return self.filter(
+            Q(status=ImportItem.Status.PENDING) | Q(status=ImportItem.Status.RUNNING, lease_expires_at__lt=now)
+        )
+
+    def lease(self, worker, limit, duration):
+        """
+        Claim up to ``limit`` items for a worker.
+
+        Candidate rows are locked with ``SELECT ... FOR UPDATE SKIP LOCKED``
+        where the database supports it, so concurrent workers on other nodes
+        skip them instead of waiting. The claim itself is a conditional
+        update, so two workers can never hold the same item even on databases
+        without row locks.
+
+        Args:
+            worker: Identifier of the claiming worker, for diagnostics
+            limit: Maximum number of items to claim
+            duration: Lease length in seconds; after it expires, other
+                workers may claim the items again
+
+        Returns:
+            list: The claimed ImportItem objects, in queue order
+        """
+        now = timezone.now()
+        token = uuid.uuid4()
+
+        with transaction.atomic():
+            candidates = list(
+                self.leasable(now)
+                .select_for_update(skip_locked=True)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:limit]
+            )
+            if not candidates:
+                return []
+            self.leasable(now).filter(pk__in=candidates).update(
+                status=ImportItem.Status.RUNNING,
+                lease_token=token,
+                leased_by=worker[:255],
+                lease_expires_at=now + timedelta(seconds=duration),
+                attempts=models.F("attempts") + 1,
+                updated_at=now,
+            )
+
+        return list(self.filter(lease_token=token).select_related("job", "job__user").order_by("pk"))
+
+    def renew_lease(self, token, duration):
+        """
+        Extend the lease of the items a worker still holds under ``token``.
+
+        Items that were completed, or claimed by another worker after the
+        lease expired, no longer carry the token and are left alone.
+
+        Args:
+            token: The lease token of the items
+            duration: New lease length in seconds, from now
+
+        Returns:
+            int: Number of items whose lease was extended
+        """
+        now = timezone.now()
+        return self.filter(lease_token=token, status=ImportItem.Status.RUNNING).update(
+            lease_expires_at=now + timedelta(seconds=duration),
+            updated_at=now,
+        )
+
+
+class ImportItem(models.Model):
+    """
+    A single URL of an import job, and the outcome of importing it.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", _("Pending")
+        RUNNING = "running", _("Running")
+        SUCCEEDED = "succeeded", _("Succeeded")
+        DUPLICATE = "duplicate", _("Duplicate")
+        FAILED = "failed", _("Failed")
+
+    FINISHED_STATUSES = (Status.SUCCEEDED, Status.DUPLICATE, Status.FAILED)
+
+    job = models.ForeignKey(ImportJob, on_delete=models.CASCADE, related_name="items", verbose_name=_("job"))
+    url = models.TextField(verbose_name=_("URL"))
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    image = models.ForeignKey(
+        get_image_model_string(),
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        verbose_name=_("image"),
+    )
+    error_message = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    lease_token = models.UUIDField(null=True, blank=True, editable=False)
+    leased_by = models.CharField(max_length=255, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ImportItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _("import item")
+        verbose_name_plural = _("import items")
+        indexes = [
+            models.Index(fields=["status", "lease_expires_at"], name="image_url_item_lease_idx"),
+            models.Index(fields=["lease_token"], name="image_url_item_token_idx"),
+        ]
+
+    def __str__(self):
+        return self.url
+
+    def complete(self, response_data):
+        """
+        Store the outcome of an import, if the item is still leased by us.
+
+        Args:
+            response_data: The response data returned by the import view
+
+        Returns:
+            bool: False if the lease expired and another worker claimed the item
+        """
+        if response_data.get("success"):
+            status = self.Status.DUPLICATE if response_data.get("duplicate") else self.Status.SUCCEEDED
+        else:
+            status = self.Status.FAILED
+
+        self.status = status
+        self.image_id = response_data.get("image_id")
+        self.error_message = str(response_data.get("error_message", ""))
+        updated = ImportItem.objects.filter(pk=self.pk, lease_token=self.lease_token).update(
+            status=self.status,
+            image_id=self.image_id,
+            error_message=self.error_message,
+            lease_token=None,
+            lease_expires_at=None,
+            updated_at=timezone.now(),
+        )
+        return bool(updated)
@@ -0,0 +1,397 @@
+"""
+Optional ingest-time normalization for image URL upload.
+
+Downloaded originals can be reduced before they are saved, so Wagtail does
+not store, and decode again for every rendition, more pixels or bytes than
+the site needs. The stage can:
+
+- downscale images larger than a maximum width/height (JPEGs are decoded
+  at reduced scale with Pillow's draft mode where possible),
+- apply the EXIF orientation to the pixels,
+- transcode formats such as BMP, or PNGs over a size threshold, to WEBP or
+  JPEG at a configured quality.
+
+Images that need none of this are saved unchanged. Animated images are never
+touched. Decoding and encoding run in a process pool, so a batch of large
+images does not hold the GIL that the request thread and download threads
+need. Downloads spooled to disk are passed to the pool by path and
+memory-mapped there, rather than copied into the worker. An image the pool
+does not finish within ``WAGTAIL_IMAGE_URL_NORMALIZE_TIMEOUT`` seconds is
+saved unchanged, and the pool is replaced.
+
+Enable it with the ``WAGTAIL_IMAGE_URL_NORMALIZE`` setting::
+
+    WAGTAIL_IMAGE_URL_NORMALIZE = {
+        "max_width": 3840,
+        "max_height": 3840,
+        "auto_orient": True,
+        "transcode": {"BMP": "WEBP", "PNG": "WEBP"},
+        "transcode_min_size": {"PNG": 1024 * 1024},  # bytes
+        "quality": 85,
+    }
+"""
+
+import asyncio
+import hashlib
+import logging
+import mmap
+import multiprocessing
+import os
+import threading
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+from .download import DownloadedFile, create_buffer
+from .probe import ImageInfo
+from .timing import record_phase
+from .utils import EXTENSION_MAP
+
+NORMALIZE_WORKERS = 2  # Processes; 0 runs normalization in the calling thread
+NORMALIZE_TIMEOUT = 30  # Seconds to wait for the pool to normalize an image
+NORMALIZE_QUALITY = 85
+CONTENT_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "GIF": "image/gif",
+    "BMP": "image/bmp",
+    "WEBP": "image/webp",
+}
+# EXIF orientations that swap width and height
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_normalize_options():
+    """
+    Return the normalization options, or None if the stage is disabled.
+
+    Returns:
+        dict or None: Options with every key filled in
+    """
+    options = getattr(settings, "WAGTAIL_IMAGE_URL_NORMALIZE", None)
+    if not options:
+        return None
+    return {
+        "max_width": options.get("max_width"),
+        "max_height": options.get("max_height"),
+        "auto_orient": options.get("auto_orient", True),
+        "transcode": {key.upper(): value.upper() for key, value in options.get("transcode", {}).items()},
+        "transcode_min_size": {key.upper(): value for key, value in options.get("transcode_min_size", {}).items()},
+        "quality": options.get("quality", NORMALIZE_QUALITY),
+    }
+
+
+def get_target_size(width, height, max_width, max_height):
+    """
+    Return the size an image is downscaled to, keeping its aspect ratio.
+
+    Args:
+        width: Current width
+        height: Current height
+        max_width: Maximum width, or None
+        max_height: Maximum height, or None
+
+    Returns:
+        tuple or None: (width, height), or None if the image already fits
+    """
+    scale = min(
+        max_width / width if max_width else 1,
+        max_height / height if max_height else 1,
+    )
+    if scale >= 1:
+        return None
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def has_alpha(image):
+    """Return True if an image has transparency."""
+    return image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+
+
+@contextmanager
+def open_source(source):
+    """
+    Open an encoded image for Pillow.
+
+    Args:
+        source: The image data, or the path of a file holding it
+
+    Yields:
+        tuple: (file-like object, size in bytes); files are memory-mapped
+        rather than read into memory
+    """
+    if isinstance(source, bytes):
+        yield BytesIO(source), len(source)
+        return
+    with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield mapped, len(mapped)
+
+
+def normalize_image_data(source, options):
+    """
+    Downscale, orient and transcode an encoded image.
+
+    Runs in a worker process, so it only depends on Pillow and its arguments.
+
+    Args:
+        source: The encoded image, or the path of a file holding it
+        options: Options as returned by get_normalize_options()
+
+    Returns:
+        tuple or None: (data, format, width, height) of the new image, or
+        None if the original should be kept
+    """
+    with open_source(source) as (fp, size), PILImage.open(fp) as image:
+        source_format = image.format
+        if getattr(image, "n_frames", 1) > 1 or source_format not in CONTENT_TYPES:
+            return None
+
+        orientation = image.getexif().get(0x0112, 1) if options["auto_orient"] else 1
+        width, height = image.size
+        if orientation in TRANSPOSED_ORIENTATIONS:
+            width, height = height, width
+        target_size = get_target_size(width, height, options["max_width"], options["max_height"])
+
+        target_format = options["transcode"].get(source_format)
+        if target_format is not None and size < options["transcode_min_size"].get(source_format, 0):
+            target_format = None
+        if target_format == "JPEG" and has_alpha(image):
+            # JPEG cannot store transparency
+            target_format = None
+
+        if target_size is None and orientation == 1 and target_format is None:
+            return None
+
+        if target_size is not None and source_format == "JPEG":
+            # Let libjpeg decode at 1/2, 1/4 or 1/8 scale if that is still large enough
+            draft_size = target_size[::-1] if orientation in TRANSPOSED_ORIENTATIONS else target_size
+            image.draft(image.mode, draft_size)
+
+        icc_profile = image.info.get("icc_profile")
+        if orientation != 1:
+            image = ImageOps.exif_transpose(image)
+        if target_size is not None:
+            if image.mode not in ("RGB", "RGBA", "L", "LA"):
+                image = image.convert("RGBA" if has_alpha(image) else "RGB")
+            image = image.resize(target_size, PILImage.Resampling.LANCZOS)
+
+        output_format = target_format or source_format
+        save_options = {}
+        if output_format in ("JPEG", "WEBP"):
+            save_options["quality"] = options["quality"]
+            if image.mode not in ("RGB", "L", "RGBA") or (output_format == "JPEG" and image.mode == "RGBA"):
+                image = image.convert("RGBA" if output_format == "WEBP" and has_alpha(image) else "RGB")
+        if icc_profile and output_format in ("JPEG", "PNG", "WEBP"):
+            save_options["icc_profile"] = icc_profile
+
+        output = BytesIO()
+        image.save(output, format=output_format, **save_options)
+
+    result = output.getvalue()
+    if target_size is None and orientation == 1 and len(result) >= size:
+        # Transcoding alone made the file larger
+        return None
+    return result, output_format, image.width, image.height
+
+
+def get_pool():
+    """
+    Return the process pool, creating it on first use.
+
+    Returns:
+        ProcessPoolExecutor or None: The pool, or None if normalization runs
+        in the calling thread
+    """
+    global _pool
+
+    workers = getattr(settings, "WAGTAIL_IMAGE_URL_NORMALIZE_WORKERS", NORMALIZE_WORKERS)
+    if not workers:
+        return None
+    pool = _pool
+    if pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Forking a threaded web server process is unsafe, so workers are
+                # started fresh and load Django to import this module
+                _pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=django.setup,
+                )
+            pool = _pool
+    return pool
+
+
+def shutdown_pool():
+    """Stop the process pool; the next normalization starts a new one."""
+    global _pool
+
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+@receiver(setting_changed)
+def shutdown_pool_on_setting_changed(sender, setting, **kwargs):
+    """Resize the pool when its setting changes."""
+    if setting == "WAGTAIL_IMAGE_URL_NORMALIZE_WORKERS":
+        shutdown_pool()
+
+
+def build_normalized_file(file, result):
+    """
+    Wrap normalized image data in a DownloadedFile replacing ``file``.
+
+    Args:
+        file: The original DownloadedFile
+        result: The tuple returned by normalize_image_data()
+
+    Returns:
+        DownloadedFile: The normalized image, hashed like Wagtail hashes saved files
+    """
+    data, image_format, width, height = result
+    content_type = CONTENT_TYPES[image_format]
+    buffer = create_buffer(len(data))
+    buffer.write(data)
+    buffer.seek(0)
+    return DownloadedFile.from_buffer(
+        buffer,
+        name=os.path.splitext(file.name)[0] + EXTENSION_MAP[content_type],
+        content_type=content_type,
+        size=len(data),
+        url=file.url,
+        content_hash=hashlib.sha1(data).hexdigest(),
+        image_info=ImageInfo(content_type, width, height, 1),
+        etag=file.etag,
+        last_modified=file.last_modified,
+    )
+
+
+def get_source(file):
+    """Return the path of a file spooled to disk, or else its contents."""
+    if hasattr(file, "temporary_file_path"):
+        file.flush()
+        return file.temporary_file_path()
+    file.seek(0)
+    data = file.read()
+    file.seek(0)
+    return data
+
+
+def finish(file, result):
+    """
+    Replace a downloaded file with its normalized version, if there is one.
+
+    Args:
+        file: The DownloadedFile
+        result: The tuple returned by normalize_image_data(), or None
+
+    Returns:
+        DownloadedFile: The normalized image, or ``file`` if unchanged
+    """
+    if result is None:
+        return file
+    normalized = build_normalized_file(file, result)
+    logger.info(f"Normalized {file.url}: {file.size} -> {normalized.size} bytes, {normalized.content_type}")
+    file.close()
+    return normalized
+
+
+def normalize_download(file):
+    """
+    Apply the configured normalization to a downloaded image.
+
+    Failures are logged and the original is kept, so normalization never
+    causes an import to fail. If the pool takes longer than
+    ``WAGTAIL_IMAGE_URL_NORMALIZE_TIMEOUT``, the original is kept too, and
+    the pool is replaced in case a worker is stuck.
+
+    Args:
+        file: The DownloadedFile
+
+    Returns:
+        DownloadedFile: The normalized image, or ``file`` if unchanged
+    """
+    options = get_normalize_options()
+    if options is None:
+        return file
+
+    source = get_source(file)
+    pool = get_pool()
+    timeout = getattr(settings, "WAGTAIL_IMAGE_URL_NORMALIZE_TIMEOUT", NORMALIZE_TIMEOUT)
+    try:
+        with record_phase("normalize"):
+            if pool is None:
+                result = normalize_image_data(source, options)
+            else:
+                future = pool.submit(normalize_image_data, source, options)
+                result = future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        # A worker may be stuck on the image; the next normalization starts a new pool
+        logger.error(f"Normalizing {file.url} took more than {timeout}s; keeping the original")
+        shutdown_pool()
+        return file
+    except BrokenExecutor:
+        # A worker died; the next normalization starts a new pool
+        logger.exception(f"Normalization pool broken by {file.url}; keeping the original")
+        shutdown_pool()
+        return file
+    except Exception:
+        logger.exception(f"Could not normalize {file.url}; keeping the original")
+        return file
+    return finish(file, result)
+
+
+async def anormalize_download(file):
+    """
+    Async version of normalize_download() that waits without blocking the event loop.
+
+    Args:
+        file: The DownloadedFile
+
+    Returns:
+        DownloadedFile: The normalized image, or ``file`` if unchanged
+    """
+    options = get_normalize_options()
+    if options is None:
+        return file
+
+    source = get_source(file)
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    timeout = getattr(settings, "WAGTAIL_IMAGE_URL_NORMALIZE_TIMEOUT", NORMALIZE_TIMEOUT)
+    try:
+        with record_phase("normalize"):
+            # wait_for() cancels the future when the timeout expires
+            result = await asyncio.wait_for(
+                loop.run_in_executor(pool, normalize_image_data, source, options), timeout
+            )
+    except asyncio.TimeoutError:
+        # A worker may be stuck on the image; the next normalization starts a new pool
+        logger.error(f"Normalizing {file.url} took more than {timeout}s; keeping the original")
+        shutdown_pool()
+        return file
+    except BrokenExecutor:
+        # A worker died; the next normalization starts a new pool
+        logger.exception(f"Normalization pool broken by {file.url}; keeping the original")
+        shutdown_pool()
+        return file
+    except Exception:
+        logger.exception(f"Could not normalize {file.url}; keeping the original")
+        return file
+    return finish(file, result)
@@ -0,0 +1,203 @@
+"""
+Compiled domain allow/block policy for image URL upload.
+
+The ``WAGTAIL_IMAGE_URL_ALLOWED_DOMAINS`` and ``WAGTAIL_IMAGE_URL_BLOCKED_DOMAINS``
+settings are compiled once into reversed-label tries, so a lookup costs
+O(number of labels in the hostname) regardless of how many entries the lists
+hold. The compiled policy is rebuilt whenever either setting changes.
+
+Entries are either exact hostnames (``example.com``) or wildcard suffix
+rules (``*.example.com``), which match any subdomain but not the apex
+domain itself. Ports are ignored and internationalized names are compared
+in their IDNA (punycode) form.
+"""
+
+import logging
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def normalize_hostname(value):
+    """
+    Normalize a hostname or ``host:port`` string for comparison.
+
+    Args:
+        value: The hostname, optionally with a port or trailing dot
+
+    Returns:
+        str: The lowercased ASCII (IDNA) hostname without port
+    """
+    host = value.strip().lower()
+
+    if host.startswith("["):
+        # Bracketed IPv6 literal, optionally followed by a port
+        host = host[1:].split("]", 1)[0]
+    elif host.count(":") == 1:
+        host = host.split(":", 1)[0]
+
+    host = host.rstrip(".")
+
+    try:
+        return host.encode("idna").decode("ascii")
+    except UnicodeError:
+        return host
+
+
+class _Node:
+    """A trie node: the next labels, and whether a rule ends here."""
+
+    __slots__ = ("children", "exact", "wildcard")
+
+    def __init__(self):
+        self.children = {}
+        self.exact = False  # An exact rule ends here
+        self.wildcard = False  # A wildcard rule covers every subdomain of here
+
+
+class DomainTrie:
+    """
+    Set of exact and wildcard domain rules stored as a trie of reversed labels.
+
+    ``img.cdn.example.com`` is stored under the path
+    ``com -> example -> cdn -> img``, so matching walks at most one node per
+    label of the hostname being checked.
+    """
+
+    def __init__(self, domains=()):
+        self.root = _Node()
+        self.size = 0
+        for domain in domains:
+            self.add(domain)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, domain):
+        """
+        Add an exact (``example.com``) or wildcard (``*.example.com``) rule.
+
+        Args:
+            domain: The rule to add
+        """
+        domain = domain.strip().lower()
+        wildcard = domain.startswith("*.")
+        if wildcard:
+            domain = domain[2:]
+
+        node = self.root
+        for label in reversed(normalize_hostname(domain).split(".")):
+            node = node.children.setdefault(label, _Node())
+        if wildcard:
+            node.wildcard = True
+        else:
+            node.exact = True
+        self.size += 1
+
+    def match(self, hostname):
+        """
+        Check whether a normalized hostname matches any rule.
+
+        Args:
+            hostname: Hostname as returned by normalize_hostname()
+
+        Returns:
+            bool: True if an exact or wildcard rule matches
+        """
+        node = self.root
+        for label in reversed(hostname.split(".")):
+            if node.wildcard:
+                return True
+            node = node.children.get(label)
+            if node is None:
+                return False
+        return node.exact
+
+
+class DomainPolicy:
+    """
+    Compiled allow/block lists.
+
+    If an allow list is configured, only matching hosts are allowed and the
+    block list is not consulted. Otherwise every host not matching the block
+    list is allowed.
+    """
+
+    def __init__(self, allowed_domains=None, blocked_domains=()):
+        self.allowed = DomainTrie(allowed_domains) if allowed_domains is not None else None
+        self.blocked = DomainTrie(blocked_domains or ())
+
+    @classmethod
+    def from_settings(cls):
+        """Build a policy from the current Django settings."""
+        return cls(
+            allowed_domains=getattr(settings, "WAGTAIL_IMAGE_URL_ALLOWED_DOMAINS", None),
+            blocked_domains=getattr(settings, "WAGTAIL_IMAGE_URL_BLOCKED_DOMAINS", []),
+        )
+
+    def is_allowed(self, hostname):
+        """
+        Check a hostname against the policy.
+
+        Args:
+            hostname: Hostname as returned by normalize_hostname()
+
+        Returns:
+            tuple: (is_allowed: bool, reason: 'not_allowed', 'blocked' or None)
+        """
+        if self.allowed is not None:
+            if self.allowed.match(hostname):
+                return True, None
+            return False, "not_allowed"
+
+        if self.blocked.match(hostname):
+            return False, "blocked"
+
+        return True, None
+
+
+def get_domain_policy():
+    """
+    Return the compiled policy for the current settings, building it on first use.
+
+    Returns:
+        DomainPolicy: The shared policy
+    """
+    global _policy
+
+    policy = _policy
+    if policy is None:
+        with _policy_lock:
+            if _policy is None:
+                _policy = DomainPolicy.from_settings()
+                logger.debug(
+                    f"Compiled domain policy: {len(_policy.allowed or ())} allowed, {len(_policy.blocked)} blocked"
+                )
+            policy = _policy
+    return policy
+
+
+def reset_domain_policy():
+    """
+    Discard the compiled policy so it is rebuilt from settings on next use.
+
+    Call this after updating the domain lists at runtime (e.g. from a threat feed).
+    """
+    global _policy
+
+    with _policy_lock:
+        _policy = None
+
+
+@receiver(setting_changed)
+def reset_domain_policy_on_setting_changed(sender, setting, **kwargs):
+    """Rebuild the compiled policy when the domain lists change."""
+    if setting in ("WAGTAIL_IMAGE_URL_ALLOWED_DOMAINS", "WAGTAIL_IMAGE_URL_BLOCKED_DOMAINS"):
+        reset_domain_policy()
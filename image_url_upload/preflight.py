@@ -0,0 +1,213 @@
+"""
+Preflight checks of image URLs, without importing them.
+
+check_url() fetches only the start of an image with a ``Range`` request and
+reports what an import would find: the content type, the size, and the
+dimensions parsed from the header (see ``probe.py``). Images that fit in the
+requested range are read whole, so their SHA-1 is known too and duplicates
+can be found by content. Servers that ignore ``Range`` send the whole file;
+the connection is closed once the range has been read.
+
+Results are cached per normalized URL for
+``WAGTAIL_IMAGE_URL_PREFLIGHT_CACHE_TTL`` seconds. Rejections by the checks
+(a disallowed type, a file too large, not an image) are cached with them;
+request failures are not cached. The failure cache and host circuit breakers
+(see ``failures.py``) are read, so known-bad URLs and hosts fail fast, but
+never updated: a check uses a shorter timeout than an import, and a slow
+host timing out here says little about whether the import will.
+"""
+
+import hashlib
+import logging
+import re
+
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext as _
+
+from .download import (
+    ALLOWED_CONTENT_TYPES,
+    CHUNK_SIZE,
+    MAX_FILE_SIZE,
+    SNIFFED_CONTENT_TYPES,
+    get_content_length,
+    get_content_type,
+)
+from .exceptions import (
+    DownloadError,
+    EmptyFileError,
+    FileTooLargeError,
+    ImageTooLargeError,
+    InvalidContentTypeError,
+    InvalidImageError,
+)
+from .failures import check_failures
+from .models import get_url_hash
+from .probe import ImageProbe
+from .session import get_session
+from .throttle import host_throttle
+
+PREFLIGHT_BYTES = 64 * 1024  # Bytes requested from the start of the image
+PREFLIGHT_TIMEOUT = 5  # seconds
+PREFLIGHT_CACHE_TTL = 300  # seconds
+KEY_PREFIX = "image_url_upload:preflight"
+
+# Rejections that hold for as long as the image is unchanged, so are cached with valid results
+REJECTIONS = (InvalidContentTypeError, FileTooLargeError, EmptyFileError, InvalidImageError, ImageTooLargeError)
+
+logger = logging.getLogger(__name__)
+
+
+def get_preflight_cache():
+    """Return the Django cache holding preflight results."""
+    return caches[getattr(settings, "WAGTAIL_IMAGE_URL_PREFLIGHT_CACHE", "default")]
+
+
+def get_preflight_cache_ttl():
+    """Return the number of seconds a preflight result is cached; 0 disables caching."""
+    return getattr(settings, "WAGTAIL_IMAGE_URL_PREFLIGHT_CACHE_TTL", PREFLIGHT_CACHE_TTL)
+
+
+def make_url_key(url):
+    return f"{KEY_PREFIX}:{get_url_hash(url)}"
+
+
+def get_total_size(response):
+    """
+    Return the size of the whole file a (possibly partial) response is part of.
+
+    Args:
+        response: The ``requests`` response to a ``Range`` request
+
+    Returns:
+        int or None: The size, or None if the server did not say
+    """
+    if response.status_code == 206:
+        match = re.match(r"bytes \d+-\d+/(\d+)$", response.headers.get("Content-Range", "").strip())
+        return int(match.group(1)) if match else None
+    return get_content_length(response)
+
+
+def get_error_message(exc):
+    """
+    Return the user-facing message for a failed check.
+
+    Args:
+        exc: The exception the check failed with
+
+    Returns:
+        str: The message, worded as for a failed import
+    """
+    if isinstance(exc, DownloadError):
+        return str(exc.message)
+    if isinstance(exc, requests.exceptions.Timeout):
+        return _("Request timeout - the server took too long to respond.")
+    if isinstance(exc, requests.exceptions.HTTPError):
+        return _("HTTP error: {status}").format(status=exc.response.status_code)
+    return _("Download failed: {error}").format(error=str(exc))
+
+
+def fetch_image_head(url, timeout=PREFLIGHT_TIMEOUT, max_size=MAX_FILE_SIZE):
+    """
+    Fetch the start of an image and inspect it.
+
+    Args:
+        url: The image URL
+        timeout: Connect/read timeout in seconds
+        max_size: Maximum file size an import accepts
+
+    Returns:
+        dict: 'content_type', 'size', 'width', 'height' and 'content_hash',
+        each None (or '' for the hash) if it could not be found
+
+    Raises:
+        DownloadError: If the response is not an acceptable image
+        requests.exceptions.RequestException: If the request itself fails
+    """
+    with host_throttle(url):
+        response = get_session().get(
+            url, timeout=timeout, stream=True, headers={"Range": f"bytes=0-{PREFLIGHT_BYTES - 1}"}
+        )
+        try:
+            response.raise_for_status()
+            content_type = get_content_type(response)
+            if content_type not in ALLOWED_CONTENT_TYPES and content_type not in SNIFFED_CONTENT_TYPES:
+                raise InvalidContentTypeError()
+            size = get_total_size(response)
+            if size is not None and size > max_size:
+                raise FileTooLargeError(max_size)
+
+            probe = ImageProbe.from_settings()
+            hasher = hashlib.sha1()
+            read = 0
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                chunk = chunk[: PREFLIGHT_BYTES - read]
+                probe.feed(chunk)
+                hasher.update(chunk)
+                read += len(chunk)
+                if read >= PREFLIGHT_BYTES:
+                    break
+        finally:
+            response.close()
+
+    if size is None and read < PREFLIGHT_BYTES:
+        # The body ended before the range did, so this was the whole file
+        size = read
+    if size == 0:
+        raise EmptyFileError()
+
+    is_complete = read == size
+    if is_complete:
+        info = probe.close()
+    else:
+        if probe.info is None and probe.content_type is not None:
+            probe.parse_header()
+        info = probe.info
+
+    return {
+        "content_type": info.content_type if info else probe.content_type or content_type,
+        "size": size,
+        "width": info.width if info else None,
+        "height": info.height if info else None,
+        "content_hash": hasher.hexdigest() if is_complete else "",
+    }
+
+
+def check_url(url, timeout=PREFLIGHT_TIMEOUT):
+    """
+    Check what importing an image URL would find, without downloading it.
+
+    The URL must already have passed ``validate_url_security()``.
+
+    Args:
+        url: The image URL
+        timeout: Connect/read timeout in seconds
+
+    Returns:
+        dict: 'valid', and either 'error_message' or the details returned by
+        fetch_image_head()
+    """
+    cache = get_preflight_cache()
+    key = make_url_key(url)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    try:
+        breaker = check_failures(url)
+        if breaker is not None and breaker.is_trial:
+            # Whether the host is back is for an import to find out
+            breaker.release_trial()
+        result = {"valid": True, **fetch_image_head(url, timeout)}
+    except REJECTIONS as e:
+        result = {"valid": False, "error_message": get_error_message(e)}
+    except (DownloadError, requests.exceptions.RequestException) as e:
+        # Request failures, cached failures and throttling say nothing lasting about the image
+        logger.info(f"Preflight check of {url} failed: {e}")
+        return {"valid": False, "error_message": get_error_message(e)}
+
+    ttl = get_preflight_cache_ttl()
+    if ttl:
+        cache.set(key, result, timeout=ttl)
+    return result
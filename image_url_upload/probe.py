@@ -0,0 +1,340 @@
+"""
+Early image inspection for image URL upload.
+
+Downloads are inspected as they stream in: the first bytes are matched
+against known image signatures, and once enough of the file has arrived
+its header is parsed for the format and dimensions. Files that are not
+images, or whose pixel count exceeds ``WAGTAILIMAGES_MAX_IMAGE_PIXELS``
+(counting every frame of an animated GIF, like Wagtail does), are rejected
+before the rest of the body is transferred or any pixel data is decoded.
+"""
+
+import logging
+import struct
+import warnings
+from collections import namedtuple
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image as PILImage
+
+from .exceptions import ImageTooLargeError, InvalidImageError
+
+SNIFF_SIZE = 16 * 1024  # Bytes collected before the header is first parsed
+PROBE_LIMIT = 256 * 1024  # Bytes after which header parsing is left to Wagtail
+MAX_IMAGE_PIXELS = 128 * 1000000  # Wagtail's default
+
+logger = logging.getLogger(__name__)
+
+ImageInfo = namedtuple("ImageInfo", ["content_type", "width", "height", "frames"])
+
+SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+)
+
+
+def sniff_image_type(data):
+    """
+    Identify an image format from the first bytes of a file.
+
+    Args:
+        data: The start of the file (at least 12 bytes for WEBP)
+
+    Returns:
+        str or None: The media type, or None if no known signature matches
+    """
+    for signature, content_type in SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def get_webp_size(data):
+    """
+    Read the canvas size from a WEBP header.
+
+    Pillow decodes the whole file to open a WEBP image, so the VP8/VP8L/VP8X
+    chunk header is parsed directly instead.
+
+    Args:
+        data: The start of the file
+
+    Returns:
+        tuple or None: (width, height), or None if the header is incomplete
+    """
+    chunk = data[12:16]
+    if chunk == b"VP8X" and len(data) >= 30:
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return width, height
+    if chunk == b"VP8 " and len(data) >= 30 and data[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25 and data[20] == 0x2F:
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    return None
+
+
+def get_header_size(data):
+    """
+    Parse the dimensions from the start of an image file with Pillow.
+
+    Only the header is read; no pixel data is decoded.
+
+    Args:
+        data: The start of the file
+
+    Returns:
+        tuple or None: (width, height), or None if the header is incomplete
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", PILImage.DecompressionBombWarning)
+            with PILImage.open(BytesIO(data)) as image:
+                return image.size
+    except PILImage.DecompressionBombError as e:
+        raise ImageTooLargeError() from e
+    except (OSError, SyntaxError, ValueError, struct.error):
+        return None
+
+
+class GIFFrameCounter:
+    """
+    Count the frames of a GIF as its bytes arrive.
+
+    Walks the GIF block structure (extensions, image descriptors and their
+    data sub-blocks) incrementally, keeping only the bytes of the block
+    currently being parsed.
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.finished = False
+        self._buffer = bytearray()
+        self._skip = 0
+        self._state = self._read_header
+
+    def feed(self, data):
+        """
+        Parse the next chunk of the file.
+
+        Args:
+            data: The next bytes of the file
+
+        Returns:
+            int: Number of frames seen so far
+        """
+        if self.finished:
+            return self.frames
+
+        if self._skip:
+            skipped = min(self._skip, len(data))
+            self._skip -= skipped
+            data = data[skipped:]
+        self._buffer += data
+
+        while not self.finished and not self._skip:
+            if not self._state():
+                break
+        return self.frames
+
+    def _consume(self, size):
+        # Remove and return ``size`` bytes, or None if not all have arrived
+        if len(self._buffer) < size:
+            return None
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def _skip_bytes(self, size):
+        skipped = min(size, len(self._buffer))
+        del self._buffer[:skipped]
+        self._skip = size - skipped
+
+    def _read_header(self):
+        header = self._consume(13)
+        if header is None:
+            return False
+        self._state = self._read_block
+        flags = header[10]
+        if flags & 0x80:
+            self._skip_bytes(3 * 2 ** ((flags & 0x07) + 1))
+        return True
+
+    def _read_block(self):
+        introducer = self._consume(1)
+        if introducer is None:
+            return False
+        if introducer == b"\x21":
+            self._state = self._read_extension_label
+        elif introducer == b"\x2c":
+            self._state = self._read_image_descriptor
+        else:
+            # Trailer (0x3B), or a malformed file that Pillow will reject
+            self.finished = True
+        return True
+
+    def _read_extension_label(self):
+        if self._consume(1) is None:
+            return False
+        self._state = self._read_sub_block
+        return True
+
+    def _read_image_descriptor(self):
+        # 9-byte descriptor, then the local colour table and LZW code size
+        descriptor = self._consume(9)
+        if descriptor is None:
+            return False
+        self.frames += 1
+        flags = descriptor[8]
+        self._state = self._read_lzw_code_size
+        if flags & 0x80:
+            self._skip_bytes(3 * 2 ** ((flags & 0x07) + 1))
+        return True
+
+    def _read_lzw_code_size(self):
+        if self._consume(1) is None:
+            return False
+        self._state = self._read_sub_block
+        return True
+
+    def _read_sub_block(self):
+        size = self._consume(1)
+        if size is None:
+            return False
+        if size[0] == 0:
+            self._state = self._read_block
+        else:
+            self._skip_bytes(size[0])
+        return True
+
+
+class ImageProbe:
+    """
+    Inspect a download chunk by chunk and reject unacceptable images early.
+
+    Args:
+        max_pixels: Maximum width x height x frames, or None to disable the check
+    """
+
+    def __init__(self, max_pixels=MAX_IMAGE_PIXELS):
+        self.max_pixels = max_pixels
+        self.content_type = None
+        self.size = None
+        self.frames = 1
+        self._head = bytearray()
+        self._probing = True
+        self._gif_frames = None
+
+    @classmethod
+    def from_settings(cls):
+        """Create a probe using Wagtail's ``WAGTAILIMAGES_MAX_IMAGE_PIXELS`` limit."""
+        return cls(max_pixels=getattr(settings, "WAGTAILIMAGES_MAX_IMAGE_PIXELS", MAX_IMAGE_PIXELS))
+
+    @property
+    def info(self):
+        """The ImageInfo found so far, or None if the header has not been parsed."""
+        if self.size is None:
+            return None
+        return ImageInfo(self.content_type, self.size[0], self.size[1], self.frames)
+
+    def feed(self, chunk):
+        """
+        Inspect the next chunk of the download.
+
+        Args:
+            chunk: The next bytes of the file
+
+        Raises:
+            InvalidImageError: If the file does not start with an image signature
+            ImageTooLargeError: If the image has too many pixels
+        """
+        if self._gif_frames is not None:
+            self.frames = max(1, self._gif_frames.feed(chunk))
+            self.check_pixels()
+
+        if not self._probing:
+            return
+
+        self._head += chunk
+        if self.content_type is None and len(self._head) >= 12:
+            self.sniff()
+        if len(self._head) >= SNIFF_SIZE:
+            self.parse_header()
+
+    def close(self):
+        """
+        Finish inspecting a complete download.
+
+        Returns:
+            ImageInfo or None: The image's format and dimensions, or None if
+            the header could not be found within PROBE_LIMIT bytes
+
+        Raises:
+            InvalidImageError: If the file is not an image
+            ImageTooLargeError: If the image has too many pixels
+        """
+        if self._probing:
+            if self.content_type is None:
+                self.sniff()
+            self.parse_header()
+            if self.size is None:
+                raise InvalidImageError()
+        return self.info
+
+    def sniff(self):
+        """
+        Identify the file from its signature.
+
+        Raises:
+            InvalidImageError: If no known image signature matches
+        """
+        self.content_type = sniff_image_type(bytes(self._head[:12]))
+        if self.content_type is None:
+            logger.warning("Downloaded file does not start with a known image signature")
+            raise InvalidImageError()
+
+    def parse_header(self):
+        """Parse the format and dimensions from the bytes collected so far."""
+        head = bytes(self._head)
+        if self.content_type == "image/webp":
+            self.size = get_webp_size(head)
+        else:
+            self.size = get_header_size(head)
+
+        if self.size is None:
+            if len(head) >= PROBE_LIMIT:
+                # Leave it to Wagtail's validation once the download completes
+                logger.debug(f"No {self.content_type} header found in the first {PROBE_LIMIT} bytes")
+                self._probing = False
+                self._head = bytearray()
+            return
+
+        self._probing = False
+        self._head = bytearray()
+        if self.content_type == "image/gif":
+            self._gif_frames = GIFFrameCounter()
+            self.frames = max(1, self._gif_frames.feed(head))
+        self.check_pixels()
+
+    def check_pixels(self):
+        """
+        Reject images with more pixels than allowed.
+
+        Raises:
+            ImageTooLargeError: If width x height x frames exceeds max_pixels
+        """
+        if self.max_pixels is None or self.size is None:
+            return
+        width, height = self.size
+        num_pixels = width * height * self.frames
+        if num_pixels > self.max_pixels:
+            logger.warning(f"Rejected {width}x{height} image with {self.frames} frames")
+            raise ImageTooLargeError(num_pixels, self.max_pixels)
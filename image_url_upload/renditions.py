@@ -0,0 +1,180 @@
+"""
+Rendition pre-warming for image URL upload.
+
+Wagtail generates renditions the first time a template or the admin asks
+for them, so the first page view using a newly imported image pays for
+decoding and resizing it. Filter specs listed in the
+``WAGTAIL_IMAGE_URL_PREWARM_RENDITIONS`` setting are generated right after
+import instead:
+
+- by the admin views, in a background thread pool once the transaction
+  saving the image has committed,
+- by the job worker and the bulk importer, after each batch.
+
+Each image is only queued once at a time, however many URLs of a batch
+resolve to it.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection, transaction
+from django.dispatch import receiver
+from wagtail.images import get_image_model
+
+PREWARM_WORKERS = 2  # Threads; 0 generates renditions in the calling thread
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def get_rendition_specs():
+    """
+    Return the filter specs to generate for new images.
+
+    Returns:
+        list: Filter specs such as 'fill-300x200' or 'width-800|format-webp'
+    """
+    return list(dict.fromkeys(getattr(settings, "WAGTAIL_IMAGE_URL_PREWARM_RENDITIONS", None) or []))
+
+
+def get_new_image_ids(results):
+    """
+    Return the IDs of images saved by an import, without repeats.
+
+    Args:
+        results: Response data of each imported URL
+
+    Returns:
+        list: Image IDs, excluding failures and existing images
+    """
+    image_ids = (
+        response_data.get("image_id")
+        for response_data in results
+        if response_data.get("success") and not response_data.get("duplicate")
+    )
+    return list(dict.fromkeys(image_id for image_id in image_ids if image_id is not None))
+
+
+def generate_renditions(image_ids, specs=None):
+    """
+    Generate renditions of images, skipping those that already exist.
+
+    A failing image is logged and does not stop the others.
+
+    Args:
+        image_ids: IDs of the images
+        specs: Filter specs; defaults to get_rendition_specs()
+
+    Returns:
+        int: Number of images whose renditions were generated
+    """
+    specs = get_rendition_specs() if specs is None else specs
+    if not specs or not image_ids:
+        return 0
+
+    count = 0
+    for image in get_image_model().objects.filter(pk__in=image_ids):
+        try:
+            image.get_renditions(*specs)
+        except Exception:
+            logger.exception(f"Could not generate renditions of image {image.pk}")
+        else:
+            count += 1
+    logger.info(f"Generated {len(specs)} renditions each for {count} images")
+    return count
+
+
+def get_pool():
+    """
+    Return the background thread pool, creating it on first use.
+
+    Returns:
+        ThreadPoolExecutor or None: The pool, or None if renditions are
+        generated in the calling thread
+    """
+    global _pool
+
+    workers = getattr(settings, "WAGTAIL_IMAGE_URL_PREWARM_WORKERS", PREWARM_WORKERS)
+    if not workers:
+        return None
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-url-renditions")
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the thread pool after its queued work; the next schedule starts a new one."""
+    global _pool
+
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+@receiver(setting_changed)
+def shutdown_pool_on_setting_changed(sender, setting, **kwargs):
+    """Resize the pool when its setting changes."""
+    if setting == "WAGTAIL_IMAGE_URL_PREWARM_WORKERS":
+        shutdown_pool()
+
+
+def run_in_background(image_ids, specs):
+    try:
+        generate_renditions(image_ids, specs)
+    except Exception:
+        logger.exception("Could not generate renditions")
+    finally:
+        with _lock:
+            _pending.difference_update(image_ids)
+        # Pool threads outlive the request cycle that would close this
+        connection.close()
+
+
+def submit(image_ids, specs):
+    """Generate renditions of images that are not queued already."""
+    with _lock:
+        image_ids = [image_id for image_id in image_ids if image_id not in _pending]
+        _pending.update(image_ids)
+    if not image_ids:
+        return
+
+    pool = get_pool()
+    if pool is None:
+        try:
+            generate_renditions(image_ids, specs)
+        finally:
+            with _lock:
+                _pending.difference_update(image_ids)
+    else:
+        pool.submit(run_in_background, image_ids, specs)
+
+
+def schedule_renditions(image_ids):
+    """
+    Generate renditions of images in the background once the current transaction commits.
+
+    Images that are still queued from an earlier call are skipped.
+
+    Args:
+        image_ids: IDs of the images
+
+    Returns:
+        bool: True if renditions were scheduled
+    """
+    specs = get_rendition_specs()
+    image_ids = list(dict.fromkeys(image_ids))
+    if not specs or not image_ids:
+        return False
+
+    # Queued on commit, so a rolled back image is never queued
+    transaction.on_commit(lambda: submit(image_ids, specs))
+    return True
@@ -0,0 +1,184 @@
+"""
+DNS resolution with SSRF vetting for image URL upload.
+
+Hostnames are resolved once and every returned address is checked against
+private and reserved ranges. Results are kept in a TTL-bounded LRU cache,
+which both the URL validation and the HTTP connection layer use. Outgoing
+connections are made to the vetted addresses only (see ``session.py``), so
+the hostname cannot be re-resolved to an internal address between the check
+and the request (DNS rebinding).
+"""
+
+import ipaddress
+import logging
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .exceptions import UnsafeAddressError
+from .timing import record_phase
+
+DNS_CACHE_TTL = 60  # seconds
+DNS_CACHE_SIZE = 1024  # hostnames
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a fixed number of seconds.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """Return the cached value for ``key``, or None if missing or expired."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Store ``value`` under ``key``, evicting the least recently used entry if full."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_dns_cache():
+    """
+    Return the shared resolution cache, creating it from settings on first use.
+
+    Returns:
+        TTLCache: The cache
+    """
+    global _cache
+
+    cache = _cache
+    if cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTLCache(
+                    maxsize=getattr(settings, "WAGTAIL_IMAGE_URL_DNS_CACHE_SIZE", DNS_CACHE_SIZE),
+                    ttl=getattr(settings, "WAGTAIL_IMAGE_URL_DNS_CACHE_TTL", DNS_CACHE_TTL),
+                )
+            cache = _cache
+    return cache
+
+
+@receiver(setting_changed)
+def reset_dns_cache_on_setting_changed(sender, setting, **kwargs):
+    """Rebuild the cache when its settings change."""
+    global _cache
+
+    if setting in ("WAGTAIL_IMAGE_URL_DNS_CACHE_SIZE", "WAGTAIL_IMAGE_URL_DNS_CACHE_TTL"):
+        with _cache_lock:
+            _cache = None
+
+
+def is_private_address(address):
+    """
+    Check whether an IP address is private, loopback, link-local or reserved.
+
+    Args:
+        address: The IP address as a string or ``ipaddress`` object
+
+    Returns:
+        bool: True if the address must not be connected to
+    """
+    ip = ipaddress.ip_address(address)
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return (
+        ip.is_private
+        or ip.is_loopback
+        or ip.is_link_local
+        or ip.is_reserved
+        or ip.is_multicast
+        or ip.is_unspecified
+    )
+
+
+def resolve_host(hostname):
+    """
+    Resolve a hostname to its IP addresses, using the TTL cache.
+
+    IP literals are returned as-is without a lookup.
+
+    Args:
+        hostname: The hostname to resolve
+
+    Returns:
+        tuple: The resolved addresses as strings, in resolver order
+
+    Raises:
+        socket.gaierror: If the hostname cannot be resolved
+    """
+    hostname = hostname.rstrip(".").lower()
+
+    try:
+        return (str(ipaddress.ip_address(hostname.strip("[]"))),)
+    except ValueError:
+        pass
+
+    cache = get_dns_cache()
+    addresses = cache.get(hostname)
+    if addresses is None:
+        with record_phase("dns"):
+            infos = socket.getaddrinfo(hostname, None, type=socket.SOCK_STREAM)
+        # Keep resolver order, without duplicates
+        addresses = tuple(dict.fromkeys(info[4][0] for info in infos))
+        cache.set(hostname, addresses)
+        logger.debug(f"Resolved {hostname} to {', '.join(addresses)}")
+    return addresses
+
+
+def get_safe_addresses(hostname):
+    """
+    Resolve a hostname and make sure none of its addresses are private.
+
+    Args:
+        hostname: The hostname to resolve
+
+    Returns:
+        tuple: The vetted addresses
+
+    Raises:
+        UnsafeAddressError: If any address is private or reserved
+        socket.gaierror: If the hostname cannot be resolved
+    """
+    addresses = resolve_host(hostname)
+    for address in addresses:
+        if is_private_address(address):
+            logger.warning(f"Blocked {hostname}: resolves to private address {address}")
+            raise UnsafeAddressError()
+    return addresses
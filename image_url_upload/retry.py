@@ -0,0 +1,342 @@
+"""
+Retries for transient download failures in image URL upload.
+
+Rate limiting (429), overloaded or restarting origins (502, 503, 504),
+timeouts and dropped connections are retried with capped exponential
+backoff and full jitter, or after the delay a ``Retry-After`` header asks
+for. Every download has a deadline covering all of its attempts and the
+waits between them.
+
+Retries are only made for idempotent requests, and are limited by a retry
+budget per host: each first attempt earns a fraction of a retry, so under
+sustained pressure retries add at most that fraction of extra load instead
+of multiplying it.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .policy import normalize_hostname
+from .resolver import TTLCache
+from .session import httpx
+from .utils import get_domain_from_url
+
+RETRY_ATTEMPTS = 3  # Attempts per download, including the first
+RETRY_BACKOFF = 0.5  # Seconds before the first retry, doubled for each further retry
+RETRY_MAX_BACKOFF = 10  # Maximum seconds between attempts (unless the server asks for longer)
+RETRY_BUDGET_RATIO = 0.2  # Retries earned per first attempt
+RETRY_BUDGET_MIN_PER_SECOND = 1  # Retries earned per second regardless of traffic
+RETRY_BUDGET_MAX = 10  # Maximum number of saved-up retries per host
+DOWNLOAD_DEADLINE = 30  # Seconds for all attempts of a download
+RETRY_STATUS_CODES = {408, 429, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+logger = logging.getLogger(__name__)
+
+
+class RetryBudget:
+    """
+    Token bucket limiting the share of requests to a host that are retries.
+
+    Args:
+        ratio: Retries earned per first attempt
+        min_per_second: Retries earned per second, so quiet hosts can still retry
+        max_tokens: Maximum number of saved-up retries
+    """
+
+    def __init__(
+        self, ratio=RETRY_BUDGET_RATIO, min_per_second=RETRY_BUDGET_MIN_PER_SECOND, max_tokens=RETRY_BUDGET_MAX
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, amount=0):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self.updated) * self.min_per_second + amount)
+        self.updated = now
+
+    def deposit(self):
+        """Record a first attempt."""
+        with self._lock:
+            self._refill(self.ratio)
+
+    def withdraw(self):
+        """
+        Take a retry from the budget.
+
+        Returns:
+            bool: False if the budget is exhausted
+        """
+        with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+_budgets = TTLCache(maxsize=1024, ttl=600)
+_budgets_lock = threading.Lock()
+
+
+def get_retry_budget(host):
+    """Return the retry budget shared by all downloads from a host in this process."""
+    with _budgets_lock:
+        budget = _budgets.get(host)
+        if budget is None:
+            budget = RetryBudget(
+                ratio=getattr(settings, "WAGTAIL_IMAGE_URL_RETRY_BUDGET", RETRY_BUDGET_RATIO),
+            )
+            _budgets.set(host, budget)
+        return budget
+
+
+def clear_retry_budgets():
+    """Forget all hosts' retry budgets."""
+    _budgets.clear()
+
+
+@receiver(setting_changed)
+def reset_retry_budgets_on_setting_changed(sender, setting, **kwargs):
+    """Start with fresh budgets when their settings change."""
+    if setting == "WAGTAIL_IMAGE_URL_RETRY_BUDGET":
+        clear_retry_budgets()
+
+
+def get_error_response(exc):
+    """Return the response of an HTTP status error, or None for other errors."""
+    if isinstance(exc, requests.exceptions.HTTPError) or (
+        httpx is not None and isinstance(exc, httpx.HTTPStatusError)
+    ):
+        return exc.response
+    return None
+
+
+def is_retryable(exc):
+    """
+    Return True if a failed attempt may succeed when repeated.
+
+    Args:
+        exc: The exception the attempt failed with
+    """
+    response = get_error_response(exc)
+    if response is not None:
+        return getattr(response, "status_code", None) in RETRY_STATUS_CODES
+    if isinstance(exc, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    return httpx is not None and isinstance(exc, (httpx.TimeoutException, httpx.TransportError))
+
+
+def parse_retry_after(value, now=None):
+    """
+    Parse a ``Retry-After`` header.
+
+    Args:
+        value: The header value, either seconds or an HTTP date
+        now: Current Unix time, for testing
+
+    Returns:
+        float or None: Seconds to wait, or None if missing or malformed
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - (now if now is not None else time.time()))
+
+
+def get_retry_after(exc):
+    """Return the delay requested by a failed attempt's ``Retry-After`` header, if any."""
+    response = get_error_response(exc)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return parse_retry_after(headers.get("Retry-After"))
+    except AttributeError:
+        return None
+
+
+class RetryPolicy:
+    """
+    Decides whether and when to retry a download.
+
+    Args:
+        attempts: Maximum attempts per download, including the first
+        backoff: Seconds before the first retry; doubled for each further retry
+        max_backoff: Maximum computed delay between attempts
+        deadline: Seconds for all attempts and the waits between them, or None
+        method: The HTTP method; only idempotent requests are retried
+    """
+
+    def __init__(
+        self,
+        attempts=RETRY_ATTEMPTS,
+        backoff=RETRY_BACKOFF,
+        max_backoff=RETRY_MAX_BACKOFF,
+        deadline=DOWNLOAD_DEADLINE,
+        method="GET",
+    ):
+        self.attempts = max(1, attempts) if method.upper() in IDEMPOTENT_METHODS else 1
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.method = method.upper()
+
+    @classmethod
+    def from_settings(cls, method="GET"):
+        """Create a policy configured by the ``WAGTAIL_IMAGE_URL_RETRY_*`` settings."""
+        return cls(
+            attempts=getattr(settings, "WAGTAIL_IMAGE_URL_RETRY_ATTEMPTS", RETRY_ATTEMPTS),
+            backoff=getattr(settings, "WAGTAIL_IMAGE_URL_RETRY_BACKOFF", RETRY_BACKOFF),
+            max_backoff=getattr(settings, "WAGTAIL_IMAGE_URL_RETRY_MAX_BACKOFF", RETRY_MAX_BACKOFF),
+            deadline=getattr(settings, "WAGTAIL_IMAGE_URL_DOWNLOAD_DEADLINE", DOWNLOAD_DEADLINE),
+            method=method,
+        )
+
+    def get_backoff(self, retry):
+        """
+        Return a jittered delay before a retry.
+
+        Args:
+            retry: 1 for the first retry, 2 for the second, ...
+
+        Returns:
+            float: Seconds, drawn uniformly from 0 to the capped exponential delay
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (retry - 1)))
+
+    def get_delay(self, exc, attempt, budget, remaining):
+        """
+        Decide whether to retry after a failed attempt.
+
+        Args:
+            exc: The exception the attempt failed with
+            attempt: Number of the failed attempt (1 for the first)
+            budget: The host's RetryBudget
+            remaining: Seconds left before the deadline, or None
+
+        Returns:
+            float or None: Seconds to wait before the next attempt, or None
+            to give up
+        """
+        if attempt >= self.attempts or not is_retryable(exc):
+            return None
+
+        retry_after = get_retry_after(exc)
+        if retry_after is not None:
+            # Spread out clients that were all told the same time
+            delay = retry_after + random.uniform(0, self.backoff)
+        else:
+            delay = self.get_backoff(attempt)
+
+        if remaining is not None and delay >= remaining:
+            logger.info(f"Not retrying: waiting {delay:.1f}s would exceed the download deadline")
+            return None
+        if not budget.withdraw():
+            logger.warning("Not retrying: retry budget exhausted")
+            return None
+        return delay
+
+    def get_attempt_timeout(self, timeout, deadline_at):
+        """Return the timeout for the next attempt, shortened to fit the deadline."""
+        if deadline_at is None:
+            return timeout
+        return max(0.001, min(timeout, deadline_at - time.monotonic()))
+
+    def get_deadline_at(self):
+        """Return the ``time.monotonic()`` value at which a download starting now must end, or None."""
+        return time.monotonic() + self.deadline if self.deadline else None
+
+    def _start(self, url):
+        budget = get_retry_budget(normalize_hostname(get_domain_from_url(url)))
+        budget.deposit()
+        return budget
+
+    def _next_delay(self, url, exc, attempt, budget, deadline_at):
+        remaining = deadline_at - time.monotonic() if deadline_at is not None else None
+        delay = self.get_delay(exc, attempt, budget, remaining)
+        if delay is not None:
+            logger.info(f"Retrying {url} in {delay:.2f}s after attempt {attempt} failed: {exc}")
+        return delay
+
+    def call(self, url, func, timeout, deadline_at=None):
+        """
+        Call ``func`` until it succeeds, it fails permanently, or the retries run out.
+
+        Args:
+            url: The URL being downloaded (for the host's budget and logging)
+            func: Callable taking the attempt's timeout in seconds
+            timeout: Timeout for each attempt
+            deadline_at: The deadline from get_deadline_at(), if ``func`` also
+                checks it; by default the deadline starts now
+
+        Returns:
+            The result of ``func``
+
+        Raises:
+            Exception: The exception of the last attempt
+        """
+        budget = self._start(url)
+        if deadline_at is None:
+            deadline_at = self.get_deadline_at()
+        attempt = 1
+        while True:
+            try:
+                return func(self.get_attempt_timeout(timeout, deadline_at))
+            except Exception as e:
+                delay = self._next_delay(url, e, attempt, budget, deadline_at)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, url, func, timeout, deadline_at=None):
+        """
+        Async version of call() for coroutine functions.
+
+        Args:
+            url: The URL being downloaded (for the host's budget and logging)
+            func: Coroutine function taking the attempt's timeout in seconds
+            timeout: Timeout for each attempt
+            deadline_at: The deadline from get_deadline_at(), as for call()
+
+        Returns:
+            The result of ``func``
+
+        Raises:
+            Exception: The exception of the last attempt
+        """
+        budget = self._start(url)
+        if deadline_at is None:
+            deadline_at = self.get_deadline_at()
+        attempt = 1
+        while True:
+            try:
+                return await func(self.get_attempt_timeout(timeout, deadline_at))
+            except Exception as e:
+                delay = self._next_delay(url, e, attempt, budget, deadline_at)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,283 @@
+"""
+Shared HTTP session for image URL upload.
+
+All downloads go through a single process-wide ``requests.Session`` so
+connections to the same host are kept alive and reused across imports
+instead of paying a new TCP and TLS handshake for every URL. The async view
+uses an ``httpx.AsyncClient`` per event loop for the same reason.
+
+The clients are shared by every user and request, so they keep no cookies:
+a ``Set-Cookie`` from one import is never sent with another.
+
+When SSRF protection is enabled, both clients connect only to addresses
+vetted by ``resolver.get_safe_addresses()``, while TLS still verifies the
+original hostname.
+"""
+
+import asyncio
+import http.cookiejar
+import logging
+import os
+import threading
+import weakref
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+from .resolver import get_safe_addresses
+from .timing import record_phase
+
+try:
+    import httpcore
+    import httpx
+except ImportError:  # pragma: no cover
+    httpcore = httpx = None
+
+POOL_CONNECTIONS = 10  # Number of per-host connection pools to keep
+POOL_MAXSIZE = 10  # Number of connections kept alive per host
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def is_ssrf_protection_enabled():
+    """Return True if connections must be pinned to vetted addresses."""
+    return getattr(settings, "WAGTAIL_IMAGE_URL_PREVENT_SSRF", True)
+
+
+class PinnedConnectionMixin:
+    """
+    urllib3 connection that connects to vetted addresses of its host.
+
+    Each resolved address is tried in turn; the hostname itself is still
+    used for the Host header, SNI and certificate verification.
+    """
+
+    def connect(self):
+        with record_phase("connect"):
+            return super().connect()
+
+    def _new_conn(self):
+        if not is_ssrf_protection_enabled():
+            return super()._new_conn()
+
+        hostname = self._dns_host
+        try:
+            addresses = get_safe_addresses(hostname)
+        except OSError as e:
+            raise NewConnectionError(self, f"Failed to resolve {hostname}: {e}") from e
+
+        error = None
+        try:
+            for address in addresses:
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (ConnectTimeoutError, NewConnectionError) as e:
+                    error = e
+        finally:
+            self._dns_host = hostname
+        raise error
+
+
+class PinnedHTTPConnection(PinnedConnectionMixin, HTTPConnection):
+    pass
+
+
+class PinnedHTTPSConnection(PinnedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class PinnedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = PinnedHTTPConnection
+
+
+class PinnedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = PinnedHTTPSConnection
+
+
+class PinnedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools use pinned connections."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": PinnedHTTPConnectionPool,
+            "https": PinnedHTTPSConnectionPool,
+        }
+
+
+def create_cookie_policy():
+    """Return a cookie policy that refuses every cookie, for the shared clients."""
+    return http.cookiejar.DefaultCookiePolicy(allowed_domains=[])
+
+
+def create_session():
+    """
+    Create a ``requests.Session`` with per-host connection pools and no cookies.
+
+    Pool sizes are read from the ``WAGTAIL_IMAGE_URL_POOL_CONNECTIONS`` and
+    ``WAGTAIL_IMAGE_URL_POOL_MAXSIZE`` settings.
+
+    Returns:
+        requests.Session: The configured session
+    """
+    adapter = PinnedHTTPAdapter(
+        pool_connections=getattr(settings, "WAGTAIL_IMAGE_URL_POOL_CONNECTIONS", POOL_CONNECTIONS),
+        pool_maxsize=getattr(settings, "WAGTAIL_IMAGE_URL_POOL_MAXSIZE", POOL_MAXSIZE),
+    )
+    session = requests.Session()
+    session.cookies.set_policy(create_cookie_policy())
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """
+    Return the process-wide HTTP session, creating it on first use.
+
+    Returns:
+        requests.Session: The shared session
+    """
+    global _session
+
+    session = _session
+    if session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+            session = _session
+    return session
+
+
+def reset_session():
+    """Close the shared session so the next call to get_session() creates a new one."""
+    global _session
+
+    with _session_lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+
+def create_async_client():
+    """
+    Create an ``httpx.AsyncClient`` sized like the synchronous session.
+
+    Returns:
+        httpx.AsyncClient: The configured client
+
+    Raises:
+        ImproperlyConfigured: If httpx is not installed
+    """
+    if httpx is None:
+        raise ImproperlyConfigured(
+            "The async image URL import view requires httpx. Install it with "
+            "'pip install wagtail-image-from-url[async]'."
+        )
+
+    pool_connections = getattr(settings, "WAGTAIL_IMAGE_URL_POOL_CONNECTIONS", POOL_CONNECTIONS)
+    pool_maxsize = getattr(settings, "WAGTAIL_IMAGE_URL_POOL_MAXSIZE", POOL_MAXSIZE)
+    return httpx.AsyncClient(
+        follow_redirects=True,
+        cookies=http.cookiejar.CookieJar(policy=create_cookie_policy()),
+        transport=PinnedAsyncHTTPTransport(
+            limits=httpx.Limits(max_keepalive_connections=pool_connections * pool_maxsize),
+        ),
+    )
+
+
+if httpcore is not None:
+
+    class PinnedAsyncNetworkBackend(httpcore.AsyncNetworkBackend):
+        """httpcore network backend that connects to vetted addresses only."""
+
+        def __init__(self, backend):
+            self._backend = backend
+
+        async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+            with record_phase("connect"):
+                return await self._connect_tcp(host, port, timeout, local_address, socket_options)
+
+        async def _connect_tcp(self, host, port, timeout, local_address, socket_options):
+            if not is_ssrf_protection_enabled():
+                return await self._backend.connect_tcp(host, port, timeout, local_address, socket_options)
+
+            try:
+                addresses = await sync_to_async(get_safe_addresses, thread_sensitive=False)(host)
+            except OSError as e:
+                raise httpcore.ConnectError(str(e)) from e
+
+            error = None
+            for address in addresses:
+                try:
+                    return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+                except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                    error = e
+            raise error
+
+        async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+            return await self._backend.connect_unix_socket(path, timeout, socket_options)
+
+        async def sleep(self, seconds):
+            await self._backend.sleep(seconds)
+
+    class PinnedAsyncHTTPTransport(httpx.AsyncHTTPTransport):
+        """httpx transport using PinnedAsyncNetworkBackend."""
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            # httpx does not expose httpcore's network_backend option
+            self._pool._network_backend = PinnedAsyncNetworkBackend(self._pool._network_backend)
+
+
+def get_async_client():
+    """
+    Return the HTTP client for the running event loop, creating it on first use.
+
+    httpx clients are bound to the loop they were first used on, so one
+    client is kept per loop.
+
+    Returns:
+        httpx.AsyncClient: The shared client
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = _async_clients[loop] = create_async_client()
+    return client
+
+
+@receiver(setting_changed)
+def reset_session_on_setting_changed(sender, setting, **kwargs):
+    """Rebuild the shared session when pool settings change."""
+    if setting in ("WAGTAIL_IMAGE_URL_POOL_CONNECTIONS", "WAGTAIL_IMAGE_URL_POOL_MAXSIZE"):
+        logger.debug(f"{setting} changed, resetting HTTP session")
+        reset_session()
+        _async_clients.clear()
+
+
+def _reset_session_after_fork():
+    # Pooled sockets must not be shared between a parent and its forked
+    # children (e.g. gunicorn with --preload).
+    global _session, _session_lock
+
+    _session = None
+    _session_lock = threading.Lock()
+    _async_clients.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_session_after_fork)
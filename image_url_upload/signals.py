@@ -0,0 +1,14 @@
+"""
+Signals sent by image URL upload.
+"""
+
+from django.dispatch import Signal
+
+# Sent when the import of a URL finishes, whether it succeeded or not.
+# Arguments:
+#   sender: The view (or bulk importer) class that ran the import
+#   url: The image URL
+#   timings: ImportTimer.as_dict(), i.e. 'total_ms', 'phases_ms', 'bytes' and 'error'
+#   success: True if the image was saved or already existed
+#   response_data: The import's response data
+image_import_timed = Signal()
@@ -13,6 +13,10 @@
   // State
   let urlFieldCounter = 1;
   let isUploading = false;
+  let preflightTimer = null;
+  // Preflight results by URL; a pending check is stored as null
+  const preflightResults = {};
+  const PREFLIGHT_DELAY = 600;
 
   /**
    * Create a new URL input field
@@ -113,6 +117,15 @@
           </svg>
         `
       },
+      checked: {
+        borderClass: 'w-border-grey-200',
+        textClass: 'w-text-grey-700',
+        icon: `
+          <svg class="w-w-5 w-h-5 w-text-grey-400" fill="currentColor" viewBox="0 0 20 20" aria-hidden="true">
+            <path fill-rule="evenodd" d="M10 18a8 8 0 100-16 8 8 0 000 16zm3.707-9.293a1 1 0 00-1.414-1.414L9 10.586 7.707 9.293a1 1 0 00-1.414 1.414l2 2a1 1 0 001.414 0l4-4z" clip-rule="evenodd" />
+          </svg>
+        `
+      },
       duplicate: {
         borderClass: 'w-border-warning-300',
         textClass: 'w-text-warning-700 w-font-medium',
@@ -129,11 +142,392 @@
       $fieldGroup.addClass(config.borderClass);
       $statusIcon.html(config.icon);
       $statusText.removeClass(
-        'w-text-primary-700 w-text-positive-700 w-text-critical-700 w-text-warning-700'
+        'w-text-primary-700 w-text-positive-700 w-text-critical-700 w-text-warning-700 w-text-grey-700'
       ).addClass(config.textClass);
     }
   }
 
+  /**
+   * Format a byte count for display
+   * @param {number} bytes - Number of bytes
+   * @returns {string} Human readable size
+   */
+  function formatBytes(bytes) {
+    if (bytes < 1024 * 1024) {
+      return `${Math.round(bytes / 1024)} KB`;
+    }
+    return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+  }
+
+  /**
+   * Split a list into consecutive chunks of at most the server's batch size
+   * @param {Array} items - The items to split
+   * @returns {Array} The chunks, in order
+   */
+  function chunkBatch(items) {
+    const batchSize = parseInt($('#fetch-urls-button').data('batch-size'), 10) || items.length || 1;
+    const chunks = [];
+    for (let start = 0; start < items.length; start += batchSize) {
+      chunks.push(items.slice(start, start + batchSize));
+    }
+    return chunks;
+  }
+
+  /**
+   * Show what the preflight check found for a URL
+   * @param {jQuery} $fieldGroup - The field group element
+   * @param {Object} result - The URL's preflight result from the server
+   */
+  function showPreflight($fieldGroup, result) {
+    if (!result.valid) {
+      updateInlineStatus($fieldGroup, 'error', '✗ ' + (result.error_message || 'Invalid image URL'));
+      return;
+    }
+    if (result.duplicate) {
+      updateInlineStatus($fieldGroup, 'duplicate', '⚠️ Already in the library');
+      return;
+    }
+    const details = [];
+    if (result.content_type) {
+      details.push(result.content_type.replace('image/', '').toUpperCase());
+    }
+    if (result.width && result.height) {
+      details.push(`${result.width}×${result.height}`);
+    }
+    if (result.size) {
+      details.push(formatBytes(result.size));
+    }
+    updateInlineStatus($fieldGroup, 'checked', details.length ? details.join(' · ') : 'Ready');
+  }
+
+  /**
+   * Check the entered URLs that have not been checked yet, a batch per request
+   */
+  function runPreflight() {
+    const preflightUrl = $('#fetch-urls-button').data('preflight-url');
+    if (!preflightUrl || isUploading) {
+      return;
+    }
+
+    const urls = [];
+    $('#url-fields-container .url-field-group').each(function() {
+      const url = $(this).find('.url-input').val().trim();
+      if (url && isValidUrl(url) && !(url in preflightResults) && !urls.includes(url)) {
+        urls.push(url);
+      }
+    });
+    if (urls.length === 0) {
+      return;
+    }
+
+    urls.forEach((url) => {
+      preflightResults[url] = null;
+    });
+    chunkBatch(urls).forEach((batch) => {
+      $.ajax({
+        url: preflightUrl,
+        type: 'POST',
+        data: {
+          urls: batch,
+          csrfmiddlewaretoken: $('input[name="csrfmiddlewaretoken"]').val()
+        },
+        traditional: true,
+        dataType: 'json'
+      }).done((response) => {
+        if (!response.success) {
+          batch.forEach((url) => delete preflightResults[url]);
+          return;
+        }
+        response.results.forEach((result) => {
+          preflightResults[result.url] = result;
+        });
+        $('#url-fields-container .url-field-group').each(function() {
+          const result = preflightResults[$(this).find('.url-input').val().trim()];
+          // Fields being imported show the import's progress instead
+          if (result && !isUploading) {
+            showPreflight($(this), result);
+          }
+        });
+      }).fail(() => {
+        // The import reports the problem, if there is one
+        batch.forEach((url) => delete preflightResults[url]);
+      });
+    });
+  }
+
+  /**
+   * Show the final result of a URL import
+   * @param {jQuery} $fieldGroup - The field group element
+   * @param {Object} result - The URL's result from the server
+   * @returns {Object} Summary used to decide whether to redirect
+   */
+  function showResult($fieldGroup, result) {
+    if (!result.success) {
+      updateInlineStatus($fieldGroup, 'error', '✗ ' + (result.error_message || 'Upload failed'));
+      return { success: false };
+    }
+    if (result.duplicate) {
+      updateInlineStatus($fieldGroup, 'duplicate', '⚠️ Already exists');
+      return { success: true, duplicate: true };
+    }
+    updateInlineStatus($fieldGroup, 'success', '✓ Uploaded successfully');
+    return { success: true, duplicate: false };
+  }
+
+  /**
+   * Show a progress event from the streaming endpoint
+   * @param {jQuery} $fieldGroup - The field group element
+   * @param {Object} event - The progress event
+   */
+  function showProgress($fieldGroup, event) {
+    const messages = {
+      queued: 'Queued...',
+      downloading: event.bytes ? `Downloading... ${formatBytes(event.bytes)}` : 'Downloading...',
+      validating: 'Saving...'
+    };
+    updateInlineStatus($fieldGroup, 'uploading', messages[event.status] || 'Uploading...');
+  }
+
+  /**
+   * Import URLs through the streaming endpoint, updating each field live
+   * @param {string} streamUrl - The streaming endpoint URL
+   * @param {Object} postData - Form fields to post
+   * @param {Array} urlFields - The fields being imported, in posted order
+   * @param {Array} uploadResults - Collects the final result of each URL, by index
+   * @param {Function} [addField] - Creates the field of a URL first reported
+   *   by the stream (discovery), returning it as {$fieldGroup, url}
+   * @param {Function} [onError] - Receives stream-level error messages
+   * @returns {Promise} Resolves when the stream ends
+   */
+  async function streamImport(streamUrl, postData, urlFields, uploadResults, addField, onError) {
+    const response = await fetch(streamUrl, {
+      method: 'POST',
+      body: new URLSearchParams($.param(postData, true)),
+      credentials: 'same-origin',
+      headers: { 'X-Requested-With': 'XMLHttpRequest' }
+    });
+
+    if (!response.ok) {
+      throw new Error(response.statusText);
+    }
+
+    // Request errors come back as a single JSON document
+    if (!(response.headers.get('Content-Type') || '').startsWith('application/x-ndjson')) {
+      const data = await response.json();
+      throw new Error(data.error_message || 'Upload failed');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+
+    const handleLine = (line) => {
+      if (!line.trim()) {
+        return;
+      }
+      const event = JSON.parse(line);
+      if (event.index === undefined) {
+        if (event.status === 'error' && onError) {
+          onError(event.error_message);
+        }
+        return;
+      }
+      if (!urlFields[event.index] && addField) {
+        urlFields[event.index] = addField(event);
+      }
+      const $fieldGroup = urlFields[event.index].$fieldGroup;
+      if (['saved', 'duplicate', 'failed'].includes(event.status)) {
+        uploadResults[event.index] = showResult($fieldGroup, event);
+      } else {
+        showProgress($fieldGroup, event);
+      }
+    };
+
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) {
+        break;
+      }
+      buffered += decoder.decode(value, { stream: true });
+      const lines = buffered.split('\n');
+      buffered = lines.pop();
+      lines.forEach(handleLine);
+    }
+    handleLine(buffered + decoder.decode());
+
+    if (urlFields.some((field, index) => !uploadResults[index])) {
+      throw new Error('The connection closed before all images were imported');
+    }
+  }
+
+  /**
+   * Show or hide the loading state of a button
+   * @param {jQuery} $button - The button
+   * @param {boolean} loading - Whether an import is running
+   */
+  function setLoading($button, loading) {
+    $button.prop('disabled', loading);
+    $button.find('.button-text').toggleClass('w-hidden', loading);
+    $button.find('.button-loading').toggleClass('w-hidden', !loading);
+  }
+
+  /**
+   * Import a batch of URL fields in one request, streaming progress if the browser can
+   * @param {jQuery} $button - The fetch button, holding the endpoint URLs
+   * @param {Array} urlFields - The fields to import, at most one batch
+   * @returns {Promise} Resolves with the final result of each field, in order
+   */
+  function importBatch($button, urlFields) {
+    const uploadResults = [];
+    const postData = {
+      urls: urlFields.map(({url}) => url),
+      csrfmiddlewaretoken: $('input[name="csrfmiddlewaretoken"]').val()
+    };
+
+    const $collectionInput = $('select[name="collection"]');
+    if ($collectionInput.length > 0) {
+      postData.collection = $collectionInput.val();
+    }
+
+    const streamUrl = $button.data('stream-url');
+    let request;
+
+    if (streamUrl && window.fetch && window.ReadableStream && window.TextDecoder) {
+      // Stream per-URL progress over a single connection
+      request = streamImport(streamUrl, postData, urlFields, uploadResults).catch((error) => {
+        urlFields.forEach(({$fieldGroup}, index) => {
+          // Fields that already have a final result keep it
+          if (!uploadResults[index]) {
+            updateInlineStatus($fieldGroup, 'error', `✗ Error: ${error.message}`);
+            uploadResults[index] = { success: false };
+          }
+        });
+      });
+    } else {
+      request = $.ajax({
+        url: $button.data('batch-url'),
+        type: 'POST',
+        data: postData,
+        traditional: true,
+        dataType: 'json',
+        success: (response) => {
+          if (!response.success) {
+            urlFields.forEach(({$fieldGroup}) => {
+              updateInlineStatus(
+                $fieldGroup,
+                'error',
+                '✗ ' + (response.error_message || 'Upload failed')
+              );
+              uploadResults.push({ success: false });
+            });
+            return;
+          }
+
+          response.results.forEach((result, index) => {
+            uploadResults.push(showResult(urlFields[index].$fieldGroup, result));
+          });
+        },
+        error: (xhr) => {
+          const errorMsg = xhr.responseJSON?.error_message || xhr.statusText;
+          urlFields.forEach(({$fieldGroup}) => {
+            updateInlineStatus($fieldGroup, 'error', `✗ Error: ${errorMsg}`);
+            uploadResults.push({ success: false });
+          });
+        }
+      });
+    }
+
+    return Promise.resolve(request).catch(() => {}).then(() => uploadResults);
+  }
+
+  /**
+   * Redirect to the gallery if every import succeeded and at least one image was added
+   * @param {Array} uploadResults - The final result of each URL
+   */
+  function redirectIfDone(uploadResults) {
+    const allSuccessful = uploadResults.every(result => result.success);
+    const hasNewImages = uploadResults.some(result => result.success && !result.duplicate);
+
+    if (allSuccessful && hasNewImages) {
+      // Show a brief success message before redirecting
+      setTimeout(() => {
+        window.location.href = '/admin/images-w-url/';
+      }, 1000);
+    }
+  }
+
+  /**
+   * Import every image found in a sitemap or feed, adding a field for each
+   * @param {jQuery} $button - The discover button
+   */
+  function discoverImport($button) {
+    const $status = $('#discover-status');
+    const documentUrl = $('#discover-url-input').val().trim();
+
+    if (!isValidUrl(documentUrl)) {
+      $status.removeClass('w-hidden').text('✗ Invalid URL format');
+      return;
+    }
+
+    isUploading = true;
+    setLoading($button, true);
+    $status.removeClass('w-hidden').text('Reading the sitemap or feed...');
+
+    // Discovered URLs replace the empty fields
+    $('#url-fields-container .url-field-group').filter(function() {
+      return !$(this).find('.url-input').val().trim();
+    }).remove();
+
+    const urlFields = [];
+    const uploadResults = [];
+    const postData = {
+      url: documentUrl,
+      csrfmiddlewaretoken: $('input[name="csrfmiddlewaretoken"]').val()
+    };
+
+    const $collectionInput = $('select[name="collection"]');
+    if ($collectionInput.length > 0) {
+      postData.collection = $collectionInput.val();
+    }
+
+    const addField = (event) => {
+      urlFieldCounter++;
+      const $fieldGroup = createUrlField(urlFieldCounter);
+      $fieldGroup.find('.url-input').val(event.url).prop('readonly', true);
+      $('#url-fields-container').append($fieldGroup);
+      updateFieldNumbers();
+      $status.text(`Found ${urlFields.length + 1} images...`);
+      return { $fieldGroup, url: event.url };
+    };
+    let streamError = null;
+
+    streamImport($button.data('discover-url'), postData, urlFields, uploadResults, addField, (message) => {
+      streamError = message;
+    }).then(() => {
+      if (streamError) {
+        $status.text(`✗ ${streamError} The images found before the error were imported.`);
+      } else if (urlFields.length === 0) {
+        $status.text('No images were found.');
+      } else {
+        $status.text(`Imported the ${urlFields.length} images found.`);
+      }
+    }).catch((error) => {
+      $status.text(`✗ Error: ${error.message}`);
+      urlFields.forEach(({$fieldGroup}, index) => {
+        if (!uploadResults[index]) {
+          updateInlineStatus($fieldGroup, 'error', `✗ Error: ${error.message}`);
+          uploadResults[index] = { success: false };
+        }
+      });
+    }).then(() => {
+      isUploading = false;
+      setLoading($button, false);
+      if (!streamError) {
+        redirectIfDone(uploadResults);
+      }
+    });
+  }
+
   /**
    * Validate URL format
    * @param {string} url - The URL to validate
@@ -168,6 +562,23 @@
       });
     });
 
+    // Check URLs as they are typed (delegated event)
+    $(document).on('input', '#url-fields-container .url-input', function() {
+      if (isUploading) {
+        return;
+      }
+      const $fieldGroup = $(this).closest('.url-field-group');
+      const result = preflightResults[$(this).val().trim()];
+      if (result) {
+        showPreflight($fieldGroup, result);
+      } else {
+        $fieldGroup.find('.url-status').addClass('w-hidden');
+      }
+
+      clearTimeout(preflightTimer);
+      preflightTimer = setTimeout(runPreflight, PREFLIGHT_DELAY);
+    });
+
     // Remove URL field (delegated event)
     $(document).on('click', '.remove-url-btn', function() {
       if (isUploading) {
@@ -197,7 +608,6 @@
       }
 
       const $button = $(this);
-      const uploadUrl = $button.data('url');
 
       // Collect all URL fields with their values
       const urlFields = [];
@@ -210,6 +620,12 @@
             updateInlineStatus($fieldGroup, 'error', '✗ Invalid URL format');
             return;
           }
+          // URLs the preflight check rejected are not submitted
+          const preflight = preflightResults[url];
+          if (preflight && !preflight.valid) {
+            showPreflight($fieldGroup, preflight);
+            return;
+          }
           urlFields.push({ $fieldGroup, url });
         }
       });
@@ -222,77 +638,39 @@
 
       // Set uploading state
       isUploading = true;
-      $button.prop('disabled', true);
-      $button.find('.button-text').addClass('w-hidden');
-      $button.find('.button-loading').removeClass('w-hidden');
+      setLoading($button, true);
 
-      // Upload all URLs and track results
-      const uploadResults = [];
-      const requests = urlFields.map(({$fieldGroup, url}) => {
+      urlFields.forEach(({$fieldGroup}) => {
         // Show uploading status
         updateInlineStatus($fieldGroup, 'uploading', 'Uploading...');
-
-        const postData = {
-          url: url,
-          csrfmiddlewaretoken: $('input[name="csrfmiddlewaretoken"]').val()
-        };
-
-        const $collectionInput = $('select[name="collection"]');
-        if ($collectionInput.length > 0) {
-          postData.collection = $collectionInput.val();
-        }
-
-        return $.ajax({
-          url: uploadUrl,
-          type: 'POST',
-          data: postData,
-          dataType: 'json',
-          success: (response) => {
-            if (response.success) {
-              if (response.duplicate) {
-                updateInlineStatus($fieldGroup, 'duplicate', '⚠️ Already exists');
-                uploadResults.push({ success: true, duplicate: true });
-              } else {
-                updateInlineStatus($fieldGroup, 'success', '✓ Uploaded successfully');
-                uploadResults.push({ success: true, duplicate: false });
-              }
-            } else {
-              updateInlineStatus(
-                $fieldGroup,
-                'error',
-                '✗ ' + (response.error_message || 'Upload failed')
-              );
-              uploadResults.push({ success: false });
-            }
-          },
-          error: (xhr) => {
-            const errorMsg = xhr.responseJSON?.error_message || xhr.statusText;
-            updateInlineStatus($fieldGroup, 'error', `✗ Error: ${errorMsg}`);
-            uploadResults.push({ success: false });
-          }
-        });
       });
 
-      // When all requests complete, re-enable button and check for redirect
-      $.when.apply($, requests).always(() => {
+      // Import the fields a batch at a time, as the server limits URLs per request
+      const uploadResults = [];
+      const request = chunkBatch(urlFields).reduce(
+        (previous, batch) => previous.then(() => importBatch($button, batch)).then((results) => {
+          uploadResults.push(...results);
+        }),
+        Promise.resolve()
+      );
+
+      // When every batch completes, re-enable button and check for redirect
+      request.then(() => {
         isUploading = false;
-        $button.prop('disabled', false);
-        $button.find('.button-text').removeClass('w-hidden');
-        $button.find('.button-loading').addClass('w-hidden');
-
-        // Check if all uploads were successful (including duplicates)
-        const allSuccessful = uploadResults.every(result => result.success);
-        const hasNewImages = uploadResults.some(result => result.success && !result.duplicate);
-
-        // Redirect to gallery if all were successful and at least one new image was added
-        if (allSuccessful && hasNewImages) {
-          // Show a brief success message before redirecting
-          setTimeout(() => {
-            window.location.href = '/admin/images-w-url/';
-          }, 1000);
-        }
+        setLoading($button, false);
+        redirectIfDone(uploadResults);
       });
     });
+
+    // Discover button handler
+    $('#discover-button').on('click', function(e) {
+      e.preventDefault();
+
+      if (isUploading) {
+        return;
+      }
+      discoverImport($(this));
+    });
   }
 
   // Initialize when DOM is ready
@@ -0,0 +1,280 @@
+"""
+Per-host outbound rate limiting for image URL upload.
+
+Limits are shared by every worker process through Django's cache framework,
+so they hold across a whole cluster as long as the processes share a cache
+backend (e.g. Redis or Memcached; the default local-memory cache only
+covers a single process). Two limits can be set per host:
+
+- ``rate``/``burst``: a token bucket refilled at ``rate`` requests per
+  second, holding at most ``burst`` tokens.
+- ``concurrency``: the number of downloads from the host that may run at
+  the same time. Each running download holds a cache key that expires after
+  ``WAGTAIL_IMAGE_URL_THROTTLE_LEASE`` seconds, so slots held by a crashed
+  process are freed eventually.
+
+A download that cannot start right away waits (up to
+``WAGTAIL_IMAGE_URL_THROTTLE_TIMEOUT`` seconds) instead of hitting the host.
+
+Example settings::
+
+    # Applied to every host (default: no limits)
+    WAGTAIL_IMAGE_URL_RATE_LIMIT = {"rate": 5, "burst": 10, "concurrency": 4}
+
+    # Per-host overrides; "*.example.com" matches subdomains
+    WAGTAIL_IMAGE_URL_HOST_RATE_LIMITS = {
+        "images.partner-cdn.com": {"rate": 1, "burst": 2, "concurrency": 1},
+    }
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .exceptions import HostThrottledError
+from .policy import normalize_hostname
+from .utils import get_domain_from_url
+
+THROTTLE_TIMEOUT = 30  # seconds to wait for a permit before giving up
+THROTTLE_LEASE = 120  # seconds before a concurrency slot of a crashed process expires
+POLL_INTERVAL = 0.05  # seconds between attempts while waiting
+KEY_PREFIX = "image_url_upload:throttle"
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_rule(rule):
+    """Normalize an exact (``example.com``) or wildcard (``*.example.com``) host rule."""
+    if rule.startswith("*."):
+        return "*." + normalize_hostname(rule[2:])
+    return normalize_hostname(rule)
+
+
+def get_host_limits(hostname):
+    """
+    Return the limits configured for a host.
+
+    Exact entries in ``WAGTAIL_IMAGE_URL_HOST_RATE_LIMITS`` win over wildcard
+    entries, and more specific wildcards over less specific ones; hosts
+    without an entry use ``WAGTAIL_IMAGE_URL_RATE_LIMIT``.
+
+    Args:
+        hostname: Hostname as returned by normalize_hostname()
+
+    Returns:
+        dict or None: The host's 'rate', 'burst' and 'concurrency' limits,
+        or None if the host is not limited
+    """
+    host_limits = getattr(settings, "WAGTAIL_IMAGE_URL_HOST_RATE_LIMITS", {})
+    if host_limits:
+        rules = {normalize_rule(rule): limits for rule, limits in host_limits.items()}
+        if hostname in rules:
+            return rules[hostname]
+        labels = hostname.split(".")
+        for index in range(1, len(labels)):
+            wildcard = "*." + ".".join(labels[index:])
+            if wildcard in rules:
+                return rules[wildcard]
+    return getattr(settings, "WAGTAIL_IMAGE_URL_RATE_LIMIT", None)
+
+
+class HostLimiter:
+    """
+    Cache-backed token bucket and concurrency cap for one host.
+
+    Args:
+        host: The normalized hostname
+        rate: Requests per second, or None for no rate limit
+        burst: Maximum number of requests allowed at once after an idle period
+        concurrency: Maximum number of simultaneous downloads, or None
+        cache: The Django cache holding the shared state
+        lease: Seconds before a concurrency slot expires
+    """
+
+    def __init__(self, host, rate=None, burst=None, concurrency=None, cache=None, lease=THROTTLE_LEASE):
+        self.host = host
+        self.rate = rate
+        self.burst = max(1, burst or 1)
+        self.concurrency = concurrency
+        self.cache = cache or caches["default"]
+        self.lease = lease
+
+    @classmethod
+    def for_url(cls, url):
+        """
+        Create the limiter configured for a URL's host.
+
+        Args:
+            url: The image URL
+
+        Returns:
+            HostLimiter or None: The limiter, or None if the host is not limited
+        """
+        host = normalize_hostname(get_domain_from_url(url))
+        limits = get_host_limits(host)
+        if not limits or not (limits.get("rate") or limits.get("concurrency")):
+            return None
+        return cls(
+            host,
+            rate=limits.get("rate"),
+            burst=limits.get("burst"),
+            concurrency=limits.get("concurrency"),
+            cache=caches[getattr(settings, "WAGTAIL_IMAGE_URL_THROTTLE_CACHE", "default")],
+            lease=getattr(settings, "WAGTAIL_IMAGE_URL_THROTTLE_LEASE", THROTTLE_LEASE),
+        )
+
+    def make_key(self, *parts):
+        return ":".join((KEY_PREFIX, self.host) + tuple(str(part) for part in parts))
+
+    def try_acquire(self):
+        """
+        Try to start a download without waiting.
+
+        Returns:
+            tuple: (permit, wait); permit is None if the download may not
+            start yet, in which case wait is the suggested delay in seconds
+        """
+        permit = self.acquire_slot()
+        if permit is None:
+            return None, POLL_INTERVAL
+
+        wait = self.take_token()
+        if wait:
+            self.release(permit)
+            return None, wait
+        return permit, 0
+
+    def acquire_slot(self):
+        """
+        Claim a free concurrency slot.
+
+        Returns:
+            str or None: The slot's cache key ('' if concurrency is not
+            limited), or None if all slots are taken
+        """
+        if not self.concurrency:
+            return ""
+        token = uuid.uuid4().hex
+        for slot in range(self.concurrency):
+            key = self.make_key("slot", slot)
+            if self.cache.add(key, token, timeout=self.lease):
+                return key
+        return None
+
+    def take_token(self):
+        """
+        Take a token from the bucket.
+
+        The bucket is read and updated under a short-lived lock, so processes
+        sharing the cache see a consistent token count.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is available
+        """
+        if not self.rate:
+            return 0
+
+        lock_key = self.make_key("lock")
+        if not self.cache.add(lock_key, 1, timeout=5):
+            return POLL_INTERVAL
+
+        try:
+            bucket_key = self.make_key("bucket")
+            now = time.time()
+            tokens, updated = self.cache.get(bucket_key) or (self.burst, now)
+            tokens = min(self.burst, tokens + max(0, now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / self.rate
+            # Keep the bucket until it would be full again anyway
+            self.cache.set(bucket_key, (tokens, now), timeout=int(self.burst / self.rate) + 1)
+            return wait
+        finally:
+            self.cache.delete(lock_key)
+
+    def release(self, permit):
+        """Free the concurrency slot held by a permit."""
+        if permit:
+            self.cache.delete(permit)
+
+
+def get_throttle_timeout():
+    """Return the number of seconds to wait for a permit."""
+    return getattr(settings, "WAGTAIL_IMAGE_URL_THROTTLE_TIMEOUT", THROTTLE_TIMEOUT)
+
+
+def give_up(limiter, timeout):
+    logger.warning(f"Gave up waiting {timeout}s for a download slot for {limiter.host}")
+    raise HostThrottledError(limiter.host)
+
+
+@contextmanager
+def host_throttle(url):
+    """
+    Wait until a download from the URL's host is allowed, and hold its slot.
+
+    Args:
+        url: The image URL
+
+    Raises:
+        HostThrottledError: If no slot became available within the timeout
+    """
+    limiter = HostLimiter.for_url(url)
+    if limiter is None:
+        yield
+        return
+
+    timeout = get_throttle_timeout()
+    deadline = time.monotonic() + timeout
+    while True:
+        permit, wait = limiter.try_acquire()
+        if permit is not None:
+            break
+        if time.monotonic() + wait > deadline:
+            give_up(limiter, timeout)
+        time.sleep(wait)
+
+    try:
+        yield
+    finally:
+        limiter.release(permit)
+
+
+@asynccontextmanager
+async def ahost_throttle(url):
+    """
+    Async version of host_throttle() that waits without blocking the event loop.
+
+    Args:
+        url: The image URL
+
+    Raises:
+        HostThrottledError: If no slot became available within the timeout
+    """
+    limiter = HostLimiter.for_url(url)
+    if limiter is None:
+        yield
+        return
+
+    timeout = get_throttle_timeout()
+    deadline = time.monotonic() + timeout
+    while True:
+        permit, wait = await sync_to_async(limiter.try_acquire, thread_sensitive=False)()
+        if permit is not None:
+            break
+        if time.monotonic() + wait > deadline:
+            give_up(limiter, timeout)
+        await asyncio.sleep(wait)
+
+    try:
+        yield
+    finally:
+        await sync_to_async(limiter.release, thread_sensitive=False)(permit)
@@ -0,0 +1,182 @@
+"""
+Per-phase timing of image URL imports.
+
+Each import of a URL gets an ImportTimer. While it is active (see
+``ImportTimer.activate()``), the code of each phase records its duration in
+it, without the timer being passed around:
+
+- ``validate``: URL security checks
+- ``dns``: hostname resolution (not cached)
+- ``connect``: opening a connection, including TLS (not for reused connections)
+- ``throttle``: waiting for the host's rate limit
+- ``ttfb``: from sending the request until the response headers arrive
+- ``download``: reading the body; also records the bytes read
+- ``normalize``: downscaling or transcoding
+- ``duplicate_check``: looking up an existing image with the same contents
+- ``form``: validation by the upload form (decodes the image)
+- ``save``: ``save_object()``, i.e. storage and search index; images saved
+  together share the time of their batch evenly
+
+Phases can overlap (``dns`` happens within ``validate`` or ``connect``,
+``connect`` within ``ttfb``), and retried downloads add up their attempts.
+A failed import also records an error code (see ``metrics.get_error_code()``).
+
+When an import finishes, report_timings() logs the timings as a structured
+record and sends the ``image_import_timed`` signal; the single URL views also
+return them in a ``Server-Timing`` header.
+"""
+
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .signals import image_import_timed
+
+logger = logging.getLogger(__name__)
+
+_current_timer = contextvars.ContextVar("image_url_upload_timer", default=None)
+
+
+class ImportTimer:
+    """
+    Durations and byte counts of the phases of one URL import.
+
+    Args:
+        url: The image URL
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.bytes = {}
+        self.error = None
+
+    def add(self, name, seconds):
+        """Add time spent in a phase."""
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def add_bytes(self, name, count):
+        """Add bytes transferred in a phase."""
+        self.bytes[name] = self.bytes.get(name, 0) + count
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as (part of) a phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    @contextmanager
+    def activate(self):
+        """Make this the timer phases are recorded in, for the enclosed block."""
+        token = _current_timer.set(self)
+        try:
+            yield self
+        finally:
+            _current_timer.reset(token)
+
+    @property
+    def total(self):
+        """Seconds since the timer was created."""
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        """
+        Return the timings as plain data.
+
+        Returns:
+            dict: The URL, milliseconds per phase (and in total), bytes per
+            phase and the error code, if any
+        """
+        return {
+            "url": self.url,
+            "total_ms": round(self.total * 1000, 3),
+            "phases_ms": {name: round(seconds * 1000, 3) for name, seconds in self.durations.items()},
+            "bytes": dict(self.bytes),
+            "error": self.error,
+        }
+
+    def get_server_timing(self):
+        """
+        Format the timings as a ``Server-Timing`` header value.
+
+        Returns:
+            str: e.g. 'validate;dur=0.2, download;dur=41.5;desc="48213 bytes", total;dur=63.0'
+        """
+        metrics = []
+        for name, seconds in self.durations.items():
+            metric = f"{name};dur={seconds * 1000:.1f}"
+            if name in self.bytes:
+                metric += f';desc="{self.bytes[name]} bytes"'
+            metrics.append(metric)
+        metrics.append(f"total;dur={self.total * 1000:.1f}")
+        return ", ".join(metrics)
+
+
+def get_current_timer():
+    """Return the active ImportTimer, or None outside an import."""
+    return _current_timer.get()
+
+
+@contextmanager
+def record_phase(name):
+    """Time the enclosed block as a phase of the active import, if any."""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+    else:
+        with timer.phase(name):
+            yield
+
+
+def record_duration(name, seconds):
+    """Add time spent in a phase of the active import, if any."""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add(name, seconds)
+
+
+def record_bytes(name, count):
+    """Add bytes transferred in a phase of the active import, if any."""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add_bytes(name, count)
+
+
+def record_error(code):
+    """Record why the active import failed, if any import is active."""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.error = code
+
+
+def is_server_timing_enabled():
+    """Return True if single URL imports return a ``Server-Timing`` header."""
+    return getattr(settings, "WAGTAIL_IMAGE_URL_SERVER_TIMING", True)
+
+
+def report_timings(sender, timer, response_data):
+    """
+    Log an import's timings and send the ``image_import_timed`` signal.
+
+    Args:
+        sender: The view (or bulk importer) class that ran the import
+        timer: The import's ImportTimer
+        response_data: The import's response data
+    """
+    timings = timer.as_dict()
+    success = bool(response_data.get("success"))
+    phases = ", ".join(f"{name}={ms:.1f}ms" for name, ms in timings["phases_ms"].items())
+    logger.info(
+        f"Import of {timer.url} took {timings['total_ms']:.1f}ms ({phases})",
+        extra={"image_import": {**timings, "success": success}},
+    )
+    image_import_timed.send(
+        sender=sender, url=timer.url, timings=timings, success=success, response_data=response_data
+    )
@@ -0,0 +1,17 @@
+"""
+URL configuration for views that cannot be registered as Wagtail admin URLs.
+
+Include these in your project's URLconf, e.g.::
+
+    path("image-url-upload/", include("image_url_upload.urls")),
+"""
+
+from django.urls import path
+
+from .views import AsyncAddFromURLView, MetricsView
+
+urlpatterns = [
+    path("add_from_url/async/", AsyncAddFromURLView.as_view(), name="add_from_url_async"),
+    # For scrapers without an admin session; requires WAGTAIL_IMAGE_URL_METRICS_TOKEN
+    path("metrics/", MetricsView.as_view(), name="image_url_metrics"),
+]
@@ -4,11 +4,25 @@ Utility functions for image URL upload.
 
 import ipaddress
 import logging
-from urllib.parse import urlparse
+import os
+from urllib.parse import urlparse, urlunparse
 
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
+from .exceptions import UnsafeAddressError
+from .policy import get_domain_policy, normalize_hostname
+from .resolver import get_safe_addresses, is_private_address
+
+EXTENSION_MAP = {
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/bmp": ".bmp",
+    "image/webp": ".webp",
+}
+
 logger = logging.getLogger(__name__)
 
 
@@ -30,10 +44,67 @@ def get_domain_from_url(url):
         return None
 
 
+def normalize_url(url):
+    """
+    Normalize a URL so equivalent spellings compare equal.
+
+    The scheme and hostname are lowercased, the hostname is IDNA-encoded,
+    default ports and fragments are dropped and an empty path becomes '/'.
+    The query string is kept as-is, since it can select a different image.
+
+    Args:
+        url: The URL to normalize
+
+    Returns:
+        str: The normalized URL
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    hostname = normalize_hostname(parsed.hostname or "")
+    if ":" in hostname:
+        hostname = f"[{hostname}]"
+
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    default_port = {"http": 80, "https": 443}.get(scheme)
+    netloc = hostname if port is None or port == default_port else f"{hostname}:{port}"
+
+    return urlunparse((scheme, netloc, parsed.path or "/", parsed.params, parsed.query, ""))
+
+
+def get_filename_from_url(url, content_type=None):
+    """
+    Build a filename for an image downloaded from a URL.
+
+    Query parameters and fragments are ignored. If the URL path has no
+    filename or extension, one is generated from the content type.
+
+    Args:
+        url: The image URL
+        content_type: The media type of the downloaded image
+
+    Returns:
+        str: The filename, at most 255 characters long
+    """
+    url_path = url.split("?")[0].split("#")[0]
+    filename = os.path.basename(url_path)
+
+    if not filename or "." not in filename:
+        extension = EXTENSION_MAP.get(content_type, ".jpg")
+        filename = f"image{extension}"
+
+    return filename[:255]  # Max filename length on most filesystems
+
+
 def is_domain_allowed(url):
     """
     Check if a domain is allowed based on allow/block lists.
 
+    The lists are compiled once into a DomainPolicy (see ``policy.py``), so
+    this supports wildcard rules such as ``*.example.com`` and ignores ports.
+
     Args:
         url: The URL to check
 
@@ -45,28 +116,27 @@ def is_domain_allowed(url):
     if not domain:
         return False, _("Invalid URL format.")
 
-    allowed_domains = getattr(settings, 'WAGTAIL_IMAGE_URL_ALLOWED_DOMAINS', None)
-    if allowed_domains is not None:
-        allowed_domains = {domain.lower() for domain in allowed_domains}
-        if domain not in allowed_domains:
-            logger.warning(f"Domain {domain} not in allowed list")
-            return False, _("Domain '{domain}' is not in the allowed domains list.").format(domain=domain)
-        return True, None
+    hostname = normalize_hostname(urlparse(url).hostname or domain)
+    is_allowed, reason = get_domain_policy().is_allowed(hostname)
 
-    blocked_domains = getattr(settings, 'WAGTAIL_IMAGE_URL_BLOCKED_DOMAINS', [])
-    blocked_domains = {domain.lower() for domain in blocked_domains}
-    if domain in blocked_domains:
-        logger.warning(f"Domain {domain} is blocked")
-        return False, _("Domain '{domain}' is blocked.").format(domain=domain)
+    if reason == "not_allowed":
+        logger.warning(f"Domain {hostname} not in allowed list")
+        return False, _("Domain '{domain}' is not in the allowed domains list.").format(domain=hostname)
 
-    return True, None
+    if reason == "blocked":
+        logger.warning(f"Domain {hostname} is blocked")
+        return False, _("Domain '{domain}' is blocked.").format(domain=hostname)
+
+    return is_allowed, None
 
 
 def is_private_ip(url):
     """
     Check if URL points to a private/internal IP address.
 
-    This helps prevent Server-Side Request Forgery (SSRF) attacks.
+    This helps prevent Server-Side Request Forgery (SSRF) attacks. Hostnames
+    are resolved (through the cache in ``resolver.py``) and every returned
+    address is checked.
 
     Args:
         url: The URL to check
@@ -83,13 +153,22 @@ def is_private_ip(url):
 
         try:
             ip = ipaddress.ip_address(hostname)
-            return ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved
+            return is_private_address(ip)
         except ValueError:
             # Not an IP address, it's a hostname
             # Check for localhost variations
             if hostname.lower() in ('localhost', '127.0.0.1', '::1'):
                 return True
-            return False
+
+        try:
+            get_safe_addresses(hostname)
+        except UnsafeAddressError:
+            return True
+        except OSError as e:
+            # Unresolvable hosts cannot be reached anyway; the connection
+            # layer re-checks whatever address is eventually connected to.
+            logger.info(f"Could not resolve {hostname}: {e}")
+        return False
     except Exception as e:
         logger.warning(f"Error checking private IP for {url}: {e}")
         return False
@@ -2,33 +2,96 @@
 Views for image URL upload functionality.
 """
 
+import itertools
+import json
 import logging
 import os
+import queue
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
-from django.core.files.uploadedfile import SimpleUploadedFile
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils.crypto import constant_time_compare
 from django.utils.translation import gettext_lazy as _
+from django.views.generic import View
 from wagtail.admin.widgets.button import HeaderButton
+from wagtail.images.utils import find_image_duplicates
 from wagtail.images.views.images import IndexView as ImageIndexView
 from wagtail.images.views.multiple import AddView
 
-from .utils import validate_url_security
+from .discovery import DISCOVERY_MAX_URLS, discover_image_urls
+from .download import (  # noqa: F401
+    ALLOWED_CONTENT_TYPES,
+    MAX_FILE_SIZE,
+    DownloadError,
+    adownload_image,
+    download_image,
+)
+from .exceptions import NotModified
+from .indexing import (
+    index_new_images,
+    is_search_index_deferred,
+    queue_for_search_index,
+    search_index_deferred,
+)
+from .metrics import PROMETHEUS_CONTENT_TYPE, get_error_code, get_totals, render_prometheus
+from .models import ImageSource, ImportItem, ImportJob
+from .normalize import anormalize_download, normalize_download
+from .preflight import check_url
+from .renditions import schedule_renditions
+from .session import httpx
+from .timing import (
+    ImportTimer,
+    is_server_timing_enabled,
+    record_duration,
+    record_error,
+    record_phase,
+    report_timings,
+)
+from .utils import normalize_url, validate_url_security
 
-
-ALLOWED_CONTENT_TYPES = {
-    "image/jpeg",
-    "image/jpg",
-    "image/png",
-    "image/gif",
-    "image/bmp",
-    "image/webp",
-}
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB in bytes
+BATCH_MAX_URLS = 50
+BATCH_MAX_WORKERS = 4
+JOB_MAX_URLS = 1000
+STREAM_PROGRESS_BYTES = 256 * 1024  # Minimum download progress between events
 
 logger = logging.getLogger(__name__)
 
+# A downloaded file to save with create_images()
+NewImage = namedtuple("NewImage", ["url", "file", "collection", "timer", "title", "tags"], defaults=(None, None))
+
+
+class PrefetchedCollectionsPolicy:
+    """
+    Permission policy for upload forms that answers their collection lookup
+    from collections fetched once, so a batch of forms queries them once.
+
+    Args:
+        policy: The form's permission policy, which answers everything else
+        collections: The evaluated QuerySet of collections the user can add to
+    """
+
+    def __init__(self, policy, collections):
+        self.policy = policy
+        self.collections = collections
+
+    def collections_user_has_permission_for(self, user, action):
+        if action == "add":
+            return self.collections
+        return self.policy.collections_user_has_permission_for(user, action)
+
+    def __getattr__(self, name):
+        return getattr(self.policy, name)
+
 
 class CustomImageIndexView(ImageIndexView):
     """
@@ -64,6 +127,9 @@ class AddFromURLView(AddView):
     """
 
     template_name = "image_url_upload/add_via_url.html"
+    # Generate configured renditions of new images in a background thread pool.
+    # Callers that generate them themselves after a batch set this to False.
+    prewarm_renditions_in_background = True
 
     def get_context_data(self, **kwargs):
         """Add breadcrumbs and header to context."""
@@ -73,8 +139,14 @@ class AddFromURLView(AddView):
             {"url": "", "label": _("Add from URL")},
         ]
         context["header_title"] = _("Add image from URL")
+        # The page splits longer lists into requests of this size
+        context["batch_max_urls"] = self.get_max_urls()
         return context
 
+    def get_max_urls(self):
+        """Return the maximum number of URLs accepted per request."""
+        return getattr(settings, "WAGTAIL_IMAGE_URL_BATCH_MAX_URLS", BATCH_MAX_URLS)
+
     def post(self, request):
         """
         Handle image upload from URL.
@@ -88,149 +160,1407 @@ class AddFromURLView(AddView):
         image_url = request.POST.get("url")
 
         if not image_url:
-            return JsonResponse(
-                {
-                    "success": False,
-                    "error_message": _("Please provide a URL."),
-                }
-            )
+            return JsonResponse(self.get_error_response_data(_("Please provide a URL.")))
+
+        timer = ImportTimer(image_url)
+        with timer.activate():
+            response_data = self.import_from_url(image_url, request.POST.get("collection", 1))
+        return self.get_timed_response(timer, response_data)
+
+    def get_timed_response(self, timer, response_data):
+        """
+        Report the timings of a single URL import and build its response.
+
+        Args:
+            timer: The import's ImportTimer
+            response_data: The import's response data
+
+        Returns:
+            JsonResponse with a ``Server-Timing`` header, unless disabled by
+            the ``WAGTAIL_IMAGE_URL_SERVER_TIMING`` setting
+        """
+        report_timings(type(self), timer, response_data)
+        response = JsonResponse(response_data)
+        if is_server_timing_enabled():
+            response["Server-Timing"] = timer.get_server_timing()
+        return response
+
+    def has_access(self, request):
+        """
+        Check that the user may access the Wagtail admin and add images.
+
+        Used where Wagtail's own permission check does not run, e.g. in the
+        async view and the background import worker.
+
+        Args:
+            request: The HTTP request
+
+        Returns:
+            bool: True if the user may import images
+        """
+        user = request.user
+        if not user.is_authenticated or not user.has_perms(["wagtailadmin.access_admin"]):
+            return False
+
+        self.model = self.get_model()
+        return self.user_has_permission(self.permission_required)
+
+    def get_error_response_data(self, error_message):
+        """
+        Build the response data for a failed import.
+
+        Args:
+            error_message: The user-facing error message
+
+        Returns:
+            dict: Response data with success set to False
+        """
+        return {
+            "success": False,
+            "error_message": error_message,
+        }
+
+    def get_invalid_response_data(self, form):
+        """
+        Build the response data for a download rejected by the upload form.
+
+        Unlike Wagtail's version, errors on fields other than 'file' (e.g.
+        an unknown collection) are reported too.
+
+        Args:
+            form: The invalid upload form
+
+        Returns:
+            dict: Response data with success set to False
+        """
+        if "file" in form.errors:
+            return super().get_invalid_response_data(form)
+        return self.get_error_response_data(
+            "\n".join(f"{field}: {error}" for field, errors in form.errors.items() for error in errors)
+        )
+
+    def import_from_url(self, image_url, collection):
+        """
+        Download an image from a URL and save it to the image library.
+
+        Args:
+            image_url: The image URL
+            collection: The ID of the collection to add the image to
+
+        Returns:
+            dict: Response data with success/error status and image data
+        """
+        file, response_data = self.download(image_url, self.get_image_source(image_url))
+        if response_data is not None:
+            return response_data
+
+        return self.create_image(image_url, file, collection)
+
+    def get_image_source(self, image_url):
+        """
+        Return the recorded source for a URL, if its image is usable by the user.
+
+        Args:
+            image_url: The image URL
+
+        Returns:
+            ImageSource or None: The source, with its image preloaded
+        """
+        return (
+            ImageSource.objects.for_url(image_url)
+            .for_user(self.request.user, self.permission_policy)
+            .first()
+        )
+
+    def get_image_sources(self, image_urls):
+        """
+        Return the recorded sources for several URLs.
 
+        Args:
+            image_urls: The image URLs
+
+        Returns:
+            dict: Normalized URL -> ImageSource
+        """
+        sources = ImageSource.objects.for_urls(image_urls).for_user(self.request.user, self.permission_policy)
+        return {source.url: source for source in sources}
+
+    def should_revalidate_sources(self):
+        """Return True if known sources are revalidated with a conditional request."""
+        return getattr(settings, "WAGTAIL_IMAGE_URL_REVALIDATE_SOURCES", False)
+
+    def get_existing_image_response_data(self, image):
+        """
+        Build the response data for a URL that was already imported.
+
+        Args:
+            image: The existing image
+
+        Returns:
+            dict: Response data flagged as a duplicate
+        """
+        return {
+            "success": True,
+            self.context_object_id_name: image.pk,
+            "duplicate": True,
+        }
+
+    def download(self, image_url, source=None, progress=None):
+        """
+        Validate a URL and download the image it points to.
+
+        If the URL was imported before (``source``), the existing image is
+        returned instead, optionally after a conditional request confirms the
+        source is unchanged. This does not touch the database, so it is safe
+        to call from worker threads.
+
+        Args:
+            image_url: The image URL
+            source: The ImageSource recorded for the URL, if any
+            progress: Optional callable receiving the number of bytes downloaded so far
+
+        Returns:
+            tuple: (file: DownloadedFile or None, response_data: dict or None);
+            response_data is set when there is nothing to save
+        """
         # Validate URL security (domain allow/block lists and SSRF protection)
-        is_valid, error_message = validate_url_security(image_url)
+        with record_phase("validate"):
+            is_valid, error_message = validate_url_security(image_url)
         if not is_valid:
-            return JsonResponse(
-                {
-                    "success": False,
-                    "error_message": error_message,
-                }
-            )
+            record_error("blocked")
+            return None, self.get_error_response_data(error_message)
+
+        headers = None
+        if source is not None:
+            if not self.should_revalidate_sources():
+                logger.info(f"Image already imported from {image_url}")
+                return None, self.get_existing_image_response_data(source.image)
+            headers = source.get_conditional_headers()
 
         try:
-            # Download the image data
             logger.info(f"Downloading image from: {image_url}")
-            response = requests.get(image_url, timeout=10)
-            response.raise_for_status()
-
-            # Validate content type
-            content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
-            if content_type not in ALLOWED_CONTENT_TYPES:
-                logger.warning(f"Invalid content type for {image_url}: {content_type}")
-                return JsonResponse(
-                    {
-                        "success": False,
-                        "error_message": _("Invalid file type. Allowed types: JPEG, PNG, GIF, BMP, WEBP."),
-                    }
-                )
+            return normalize_download(download_image(image_url, headers=headers, progress=progress)), None
+        except NotModified:
+            logger.info(f"Image already imported and unchanged: {image_url}")
+            return None, self.get_existing_image_response_data(source.image)
+        except DownloadError as e:
+            record_error(get_error_code(e))
+            return None, self.get_error_response_data(e.message)
+        except requests.exceptions.Timeout as e:
+            record_error(get_error_code(e))
+            logger.error(f"Timeout downloading image from {image_url}")
+            return None, self.get_error_response_data(_("Request timeout - the server took too long to respond."))
+        except requests.exceptions.HTTPError as e:
+            record_error(get_error_code(e))
+            logger.error(f"HTTP error downloading {image_url}: {e}")
+            return None, self.get_error_response_data(
+                _("HTTP error: {status}").format(status=e.response.status_code)
+            )
+        except requests.exceptions.RequestException as e:
+            record_error(get_error_code(e))
+            logger.error(f"Download failed for {image_url}: {e}")
+            return None, self.get_error_response_data(_("Download failed: {error}").format(error=str(e)))
+        except Exception as e:
+            logger.exception(f"Unexpected error processing {image_url}")
+            record_error(get_error_code(e))
+            return None, self.get_error_response_data(_("Unexpected error: {error}").format(error=str(e)))
 
-            # Validate file size
-            file_size = len(response.content)
-            if file_size > MAX_FILE_SIZE:
-                logger.warning(f"File too large for {image_url}: {file_size} bytes")
-                return JsonResponse(
-                    {
-                        "success": False,
-                        "error_message": _("File size exceeds maximum allowed size of {size} MB.").format(
-                            size=MAX_FILE_SIZE // (1024 * 1024)
-                        ),
-                    }
-                )
+    def find_existing_image(self, file):
+        """
+        Find an image the user can choose with the same contents as a download.
 
-            if file_size == 0:
-                logger.warning(f"Empty file downloaded from {image_url}")
-                return JsonResponse(
-                    {
-                        "success": False,
-                        "error_message": _("The downloaded file is empty."),
-                    }
-                )
+        This uses the indexed ``file_hash`` column, so duplicates are found
+        before anything is written.
 
-            # Extract filename from URL, removing query params and fragments
-            url_path = image_url.split("?")[0].split("#")[0]
-            filename = os.path.basename(url_path)
-
-            # If no filename or no extension, generate one based on content type
-            if not filename or "." not in filename:
-                extension_map = {
-                    "image/jpeg": ".jpg",
-                    "image/jpg": ".jpg",
-                    "image/png": ".png",
-                    "image/gif": ".gif",
-                    "image/bmp": ".bmp",
-                    "image/webp": ".webp",
-                }
-                extension = extension_map.get(content_type, ".jpg")
-                filename = f"image{extension}"
-
-            # Sanitize filename and limit length
-            filename = filename[:255]  # Max filename length on most filesystems
-
-            # Wrap in Django file object
-            file = SimpleUploadedFile(
-                name=filename,
-                content=response.content,
-                content_type=content_type,
-            )
+        Args:
+            file: The downloaded file
+
+        Returns:
+            Image or None: The existing image
+        """
+        if not file.content_hash:
+            return None
+
+        return (
+            self.permission_policy.instances_user_has_permission_for(self.request.user, "choose")
+            .filter(file_hash=file.content_hash)
+            .order_by("pk")
+            .first()
+        )
+
+    def get_upload_form_data(self, upload_form_class, file, collection, title=None, tags=None):
+        """
+        Build the upload form data for a downloaded file.
+
+        Args:
+            upload_form_class: The upload form class
+            file: The downloaded file
+            collection: The ID of the collection to add the image to
+            title: The image title; defaults to the file name without extension
+            tags: Tag names to add, if the image form has a 'tags' field
+
+        Returns:
+            dict: The form data
+        """
+        data = {
+            "title": title or os.path.splitext(file.name)[0],
+            "collection": collection,
+        }
+        if tags and "tags" in upload_form_class.base_fields:
+            data["tags"] = ", ".join(f'"{tag}"' if "," in tag or " " in tag else tag for tag in tags)
+        return data
+
+    def save_object(self, form):
+        """
+        Save the image of a valid upload form.
+
+        With deferred search indexing, the image is saved as usual, but
+        Wagtail's search index handler, which would index it before the
+        response is sent, is skipped, and the image is queued instead.
+
+        Args:
+            form: The valid upload form
+
+        Returns:
+            Image: The saved image
+        """
+        if not is_search_index_deferred():
+            return super().save_object(form)
+
+        with transaction.atomic():
+            with search_index_deferred(self.model):
+                image = super().save_object(form)
+            transaction.on_commit(lambda: queue_for_search_index(self.model, [image.pk]))
+        return image
+
+    def create_image(self, image_url, file, collection, title=None, tags=None):
+        """
+        Validate a downloaded file with Wagtail's upload form and save it.
+
+        If an image with the same contents already exists, it is returned
+        instead and nothing is saved.
+
+        Args:
+            image_url: The URL the file was downloaded from
+            file: The downloaded file
+            collection: The ID of the collection to add the image to
+            title: The image title; defaults to the file name without extension
+            tags: Tag names to add, if the image form has a 'tags' field
+
+        Returns:
+            dict: Response data with success/error status and image data
+        """
+        try:
+            with record_phase("duplicate_check"):
+                existing_image = self.find_existing_image(file)
+            if existing_image is not None:
+                logger.info(f"Duplicate image detected: {image_url}")
+                self.record_image_source(file, existing_image)
+                return self.get_existing_image_response_data(existing_image)
 
             # Use Wagtail's upload form for validation
             upload_form_class = self.get_upload_form_class()
-            form = upload_form_class(
-                data={
-                    "title": os.path.splitext(filename)[0],
-                    "collection": request.POST.get("collection", 1),
-                },
-                files={"file": file},
-                user=request.user,
-            )
+            data = self.get_upload_form_data(upload_form_class, file, collection, title=title, tags=tags)
+            form = upload_form_class(data=data, files={"file": file}, user=self.request.user)
+
+            with record_phase("form"):
+                is_valid = form.is_valid()
 
-            if form.is_valid():
+            if is_valid:
                 # Save using Wagtail's method (includes duplicate checking)
-                self.object = self.save_object(form)
+                with record_phase("save"):
+                    self.object = self.save_object(form)
+                    if "tags" in data:
+                        # save_object() saves with commit=False, which skips tags
+                        form.save_m2m()
 
                 # Get response data (includes duplicate info)
                 response_data = self.get_edit_object_response_data()
 
-                # If duplicate detected, remove the newly created object
+                # If a duplicate was saved concurrently, remove the newly created object
                 if response_data.get("duplicate"):
                     logger.info(f"Duplicate image detected: {image_url}")
+                    existing_image = find_image_duplicates(
+                        image=self.object,
+                        user=self.request.user,
+                        permission_policy=self.permission_policy,
+                    ).first()
                     self.object.delete()
+                    if existing_image is not None:
+                        self.record_image_source(file, existing_image)
                 else:
                     logger.info(f"Image uploaded successfully: {self.object.title}")
+                    self.record_image_source(file, self.object)
+                    if self.prewarm_renditions_in_background:
+                        schedule_renditions([self.object.pk])
 
-                return JsonResponse(response_data)
+                return response_data
             else:
                 # Return form validation errors
                 logger.warning(f"Form validation failed for {image_url}: {form.errors}")
-                return JsonResponse(self.get_invalid_response_data(form))
+                record_error("invalid_form")
+                return self.get_invalid_response_data(form)
 
-        except requests.exceptions.Timeout:
-            logger.error(f"Timeout downloading image from {image_url}")
-            return JsonResponse(
-                {
-                    "success": False,
-                    "error_message": _("Request timeout - the server took too long to respond."),
-                }
+        except Exception as e:
+            logger.exception(f"Unexpected error processing {image_url}")
+            record_error("unexpected")
+            return self.get_error_response_data(_("Unexpected error: {error}").format(error=str(e)))
+        finally:
+            file.close()
+
+    def record_image_source(self, file, image):
+        """
+        Remember which image a URL was imported as.
+
+        Args:
+            file: The DownloadedFile the image was created from
+            image: The saved (or pre-existing duplicate) image
+        """
+        ImageSource.objects.record(file.url, image, etag=file.etag, last_modified=file.last_modified)
+
+    def use_bulk_save(self):
+        """Return True if the downloads of a batch are saved together, with create_images()."""
+        return getattr(settings, "WAGTAIL_IMAGE_URL_BULK_SAVE", False)
+
+    def save_downloads(self, downloads):
+        """
+        Save the files of a batch of downloads.
+
+        With bulk save, all downloads are waited for and saved together with
+        create_images(); otherwise each is saved with create_image() as soon
+        as it is downloaded.
+
+        Args:
+            downloads: Iterable of (NewImage, response_data) pairs; response_data is set,
+                and the file is None, when there is nothing to save
+
+        Yields:
+            tuple: (NewImage, response_data) for each download, in order
+        """
+        if not self.use_bulk_save():
+            for entry, response_data in downloads:
+                if response_data is None:
+                    with entry.timer.activate():
+                        response_data = self.create_image(
+                            entry.url, entry.file, entry.collection, title=entry.title, tags=entry.tags
+                        )
+                yield entry, response_data
+            return
+
+        downloads = list(downloads)
+        results = iter(self.create_images([entry for entry, response_data in downloads if response_data is None]))
+        for entry, response_data in downloads:
+            yield entry, (next(results) if response_data is None else response_data)
+
+    def find_existing_images(self, content_hashes, exclude_ids=()):
+        """
+        Find images the user can choose with any of several contents.
+
+        Args:
+            content_hashes: Content hashes of downloaded files; empty ones are ignored
+            exclude_ids: IDs of images to leave out
+
+        Returns:
+            dict: Content hash -> existing image (the oldest one, if several)
+        """
+        content_hashes = {content_hash for content_hash in content_hashes if content_hash}
+        if not content_hashes:
+            return {}
+
+        images = (
+            self.permission_policy.instances_user_has_permission_for(self.request.user, "choose")
+            .filter(file_hash__in=content_hashes)
+            .exclude(pk__in=exclude_ids)
+            .order_by("-pk")
+        )
+        return {image.file_hash: image for image in images}
+
+    def get_bulk_upload_form_class(self):
+        """
+        Return the upload form class for create_images().
+
+        The collections the user can add images to are looked up once, when
+        this is called, instead of by every form.
+
+        Returns:
+            tuple: (form class, dict of collection ID as a string -> Collection)
+        """
+        upload_form_class = self.get_upload_form_class()
+        collections = upload_form_class.permission_policy.collections_user_has_permission_for(
+            self.request.user, "add"
+        )
+        collections_by_id = {str(collection.pk): collection for collection in collections}
+        policy = PrefetchedCollectionsPolicy(upload_form_class.permission_policy, collections)
+        form_class = type(upload_form_class.__name__, (upload_form_class,), {"permission_policy": policy})
+        return form_class, collections_by_id
+
+    def get_bulk_upload_form(self, upload_form_class, collections, entry):
+        """
+        Build the upload form for one file of create_images().
+
+        A valid collection is set on the image directly, so validating the
+        form makes no query for it; an invalid one is left to the form to report.
+
+        Args:
+            upload_form_class: The form class from get_bulk_upload_form_class()
+            collections: Collection ID as a string -> Collection
+            entry: The NewImage
+
+        Returns:
+            Form: The unvalidated upload form
+        """
+        data = self.get_upload_form_data(
+            upload_form_class, entry.file, entry.collection, title=entry.title, tags=entry.tags
+        )
+        collection = collections.get(str(entry.collection))
+        # Setting a collection spares the query for the model's default one
+        instance = self.model(collection=collection or next(iter(collections.values()), None))
+        form = upload_form_class(data=data, files={"file": entry.file}, instance=instance, user=self.request.user)
+        if "collection" in form.fields and collection is not None:
+            del form.fields["collection"]
+        return form
+
+    def create_images(self, entries):
+        """
+        Validate and save several downloaded files together.
+
+        Works like create_image() for each file, but with a fixed number of
+        queries however many files there are (apart from tags and the
+        reference index): existing duplicates and the
+        user's collections are looked up once, every form is validated
+        before anything is written, and the new images are saved in one
+        transaction by save_images(). Files with the same contents are saved
+        once, and the others reported as duplicates of it.
+
+        The response data of new images does not include Wagtail's edit form.
+
+        Args:
+            entries: The NewImage tuples
+
+        Returns:
+            list: Response data for each entry, in order
+        """
+        results = [None] * len(entries)
+        try:
+            forms, same_contents, sources = self.validate_entries(entries, results)
+            if not forms and not sources:
+                return results
+
+            started = time.perf_counter()
+            uploads = [(form, [entries[i].file for i in same_contents[index]]) for index, form in forms.items()]
+            try:
+                saved = self.save_images(uploads, sources)
+            except Exception as e:
+                logger.exception(f"Unexpected error saving {len(forms)} images")
+                saved = None
+                error_data = self.get_error_response_data(_("Unexpected error: {error}").format(error=str(e)))
+            else:
+                error_data = None
+            save_duration = (time.perf_counter() - started) / max(len(forms), 1)
+
+            new_image_ids = self.set_saved_results(entries, results, forms, same_contents, saved, error_data)
+            for index in forms:
+                entries[index].timer.add("save", save_duration)
+
+            if new_image_ids and self.prewarm_renditions_in_background:
+                schedule_renditions(new_image_ids)
+            return results
+        finally:
+            for entry in entries:
+                entry.file.close()
+
+    def validate_entries(self, entries, results):
+        """
+        Find the duplicates among downloaded files, and validate the forms of the others.
+
+        Existing duplicates and the user's collections are looked up once.
+        The results of existing duplicates and invalid forms are set in
+        ``results``; files with the same contents as an earlier entry are
+        grouped with it.
+
+        Args:
+            entries: The NewImage tuples
+            results: Response data for each entry, in order, filled in here
+
+        Returns:
+            tuple: (forms, same_contents, sources); valid forms by entry index, the
+                indexes of all entries with the contents of each form's entry, and
+                (file, image) pairs of duplicates of existing images
+        """
+        started = time.perf_counter()
+        existing_images = self.find_existing_images(entry.file.content_hash for entry in entries)
+        upload_form_class, collections = self.get_bulk_upload_form_class()
+        lookup_duration = (time.perf_counter() - started) / max(len(entries), 1)
+
+        sources = []  # (file, image) pairs of duplicates of existing images
+        forms = {}  # Entry index -> valid form
+        same_contents = {}  # Index of the entry saving some contents -> indexes of all entries with them
+        first_of_hash = {}  # Content hash -> index of the entry saving it
+        for index, entry in enumerate(entries):
+            with entry.timer.activate():
+                record_duration("duplicate_check", lookup_duration)
+                content_hash = entry.file.content_hash
+                if content_hash in existing_images:
+                    logger.info(f"Duplicate image detected: {entry.url}")
+                    sources.append((entry.file, existing_images[content_hash]))
+                    results[index] = self.get_existing_image_response_data(existing_images[content_hash])
+                    continue
+                if content_hash in first_of_hash:
+                    logger.info(f"Duplicate image detected: {entry.url}")
+                    same_contents[first_of_hash[content_hash]].append(index)
+                    continue
+
+                form = self.get_bulk_upload_form(upload_form_class, collections, entry)
+                with record_phase("form"):
+                    is_valid = form.is_valid()
+                if is_valid:
+                    forms[index] = form
+                    same_contents[index] = [index]
+                    if content_hash:
+                        first_of_hash[content_hash] = index
+                else:
+                    logger.warning(f"Form validation failed for {entry.url}: {form.errors}")
+                    record_error("invalid_form")
+                    results[index] = self.get_invalid_response_data(form)
+        return forms, same_contents, sources
+
+    def set_saved_results(self, entries, results, forms, same_contents, saved, error_data):
+        """
+        Set the response data of the entries whose forms were saved by save_images().
+
+        Args:
+            entries: The NewImage tuples
+            results: Response data for each entry, in order, filled in here
+            forms: Valid forms by entry index, in the order they were saved
+            same_contents: Entry index -> indexes of all entries with its contents
+            saved: The (image, created) pairs from save_images(), or None if saving failed
+            error_data: The response data for every saved entry if saving failed
+
+        Returns:
+            list: IDs of the new images
+        """
+        new_image_ids = []
+        for position, index in enumerate(forms):
+            if saved is None:
+                for i in same_contents[index]:
+                    results[i] = error_data
+                    entries[i].timer.error = "unexpected"
+                continue
+
+            image, created = saved[position]
+            if created:
+                logger.info(f"Image uploaded successfully: {image.title}")
+                new_image_ids.append(image.pk)
+                results[index] = {"success": True, self.context_object_id_name: image.pk, "duplicate": False}
+            else:
+                logger.info(f"Duplicate image detected: {entries[index].url}")
+                results[index] = self.get_existing_image_response_data(image)
+            for i in same_contents[index][1:]:
+                results[i] = self.get_existing_image_response_data(image)
+        return new_image_ids
+
+    def save_images(self, uploads, sources=()):
+        """
+        Save the images of validated upload forms in one transaction.
+
+        The images are inserted with one ``bulk_create`` where the database
+        returns the new IDs, and indexed in one pass by index_new_images();
+        otherwise they are saved one by one, with Wagtail's usual signals.
+        ``bulk_create`` bypasses the model's ``save()`` and sends no
+        ``pre_save`` or ``post_save`` signals, so receivers of those signals
+        do not run for batch imports on such databases.
+        An image whose contents another import saved in the meantime is
+        deleted again, as in create_image(), and the existing image returned.
+        If anything fails, nothing is saved and the stored files are deleted.
+
+        Args:
+            uploads: (form, files) pairs; the valid upload form, and the downloaded files
+                whose URLs are recorded as sources of its image
+            sources: (file, image) pairs of downloads of existing images
+
+        Returns:
+            list: (image, created) for each upload, in order
+        """
+        images = []
+        try:
+            with transaction.atomic():
+                for form, files in uploads:
+                    image = form.save(commit=False)
+                    image.uploaded_by_user = self.request.user
+                    images.append(image)
+
+                use_bulk_create = connection.features.can_return_rows_from_bulk_insert
+                if use_bulk_create:
+                    self.model.objects.bulk_create(images)
+                else:
+                    for image in images:
+                        image.save()
+
+                concurrent_images = self.find_existing_images(
+                    [image.file_hash for image in images], exclude_ids=[image.pk for image in images]
+                )
+                saved = []
+                sources = list(sources)
+                for (form, files), image in zip(uploads, images):
+                    existing_image = concurrent_images.get(image.file_hash)
+                    if existing_image is not None:
+                        image.delete()
+                        saved.append((existing_image, False))
+                    else:
+                        if "tags" in form.data:
+                            # save(commit=False) skips tags
+                            form.save_m2m()
+                        saved.append((image, True))
+                    sources.extend((file, saved[-1][0]) for file in files)
+
+                if use_bulk_create:
+                    index_new_images([image for image, created in saved if created])
+                ImageSource.objects.record_many(
+                    (file.url, image, file.etag, file.last_modified) for file, image in sources
+                )
+        except Exception:
+            for image in images:
+                if image.file and image.file._committed:
+                    image.file.storage.delete(image.file.name)
+            raise
+        return saved
+
+
+class AddFromURLBatchView(AddFromURLView):
+    """
+    AJAX view for importing several image URLs in a single request.
+
+    Downloads run concurrently in a bounded thread pool; validation and
+    saving happen sequentially in the request thread so database access
+    stays on a single connection.
+    """
+
+    http_method_names = ["post"]
+
+    def post(self, request):
+        """
+        Handle a batch of image URLs.
+
+        Args:
+            request: The HTTP request containing one or more 'urls' and an optional 'collection'
+
+        Returns:
+            JsonResponse with a 'results' list holding one entry per URL, in
+            the same order and shape as the single URL view's response
+        """
+        image_urls, error_data = self.get_image_urls(request)
+        if error_data is not None:
+            return JsonResponse(error_data)
+
+        collection = request.POST.get("collection", 1)
+        results = [
+            {"url": image_url, **response_data}
+            for image_url, response_data in zip(image_urls, self.import_from_urls(image_urls, collection))
+        ]
+
+        return JsonResponse({"success": True, "results": results})
+
+    def get_image_urls(self, request):
+        """
+        Read and check the 'urls' POST field.
+
+        Args:
+            request: The HTTP request
+
+        Returns:
+            tuple: (image_urls: list, error_data: dict or None)
+        """
+        image_urls = [url.strip() for url in request.POST.getlist("urls") if url.strip()]
+
+        if not image_urls:
+            return image_urls, self.get_error_response_data(_("Please provide at least one URL."))
+
+        max_urls = self.get_max_urls()
+        if len(image_urls) > max_urls:
+            return image_urls, self.get_error_response_data(
+                _("Too many URLs. At most {count} URLs can be imported at once.").format(count=max_urls)
             )
-        except requests.exceptions.HTTPError as e:
+
+        return image_urls, None
+
+    def get_max_workers(self):
+        """Return the number of concurrent downloads allowed per batch."""
+        return getattr(settings, "WAGTAIL_IMAGE_URL_BATCH_MAX_WORKERS", BATCH_MAX_WORKERS)
+
+    def import_from_urls(self, image_urls, collection):
+        """
+        Download and save several images.
+
+        Args:
+            image_urls: The image URLs
+            collection: The ID of the collection to add the images to
+
+        Yields:
+            dict: Response data for each URL, in input order
+        """
+        max_workers = max(1, min(self.get_max_workers(), len(image_urls)))
+        logger.info(f"Importing {len(image_urls)} images with {max_workers} download workers")
+
+        sources = self.get_image_sources(image_urls)
+        batch_sources = [sources.get(normalize_url(image_url)) for image_url in image_urls]
+
+        def download(image_url, source):
+            # Each URL is timed separately, across the worker and calling threads
+            timer = ImportTimer(image_url)
+            with timer.activate():
+                file, response_data = self.download(image_url, source)
+            return NewImage(image_url, file, collection, timer), response_data
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            downloads = executor.map(download, image_urls, batch_sources)
+            for entry, response_data in self.save_downloads(downloads):
+                report_timings(type(self), entry.timer, response_data)
+                yield response_data
+
+
+class AddFromURLStreamView(AddFromURLBatchView):
+    """
+    AJAX view importing several image URLs over one streamed response.
+
+    Accepts the same fields as AddFromURLBatchView, but instead of a single
+    JSON document it streams newline-delimited JSON (NDJSON) events as the
+    import progresses, so the admin UI can update each URL live. Every event
+    has the URL's 'index' and 'url' and a 'status':
+
+    - ``queued``: the URL is waiting for a download slot
+    - ``downloading``: with the number of 'bytes' received so far
+    - ``validating``: the download finished and the image is being saved
+    - ``saved``, ``duplicate`` or ``failed``: final, with the same data as
+      the URL's entry in the batch view's results
+
+    A last ``{"status": "complete"}`` event marks the end of the stream.
+    """
+
+    http_method_names = ["post"]
+
+    def post(self, request):
+        """
+        Handle a batch of image URLs, streaming progress events.
+
+        Args:
+            request: The HTTP request containing one or more 'urls' and an optional 'collection'
+
+        Returns:
+            StreamingHttpResponse of NDJSON events, or a JsonResponse with
+            the error if the request is invalid
+        """
+        image_urls, error_data = self.get_image_urls(request)
+        if error_data is not None:
+            return JsonResponse(error_data)
+
+        return self.get_streaming_response(self.stream_import(image_urls, request.POST.get("collection", 1)))
+
+    def get_streaming_response(self, events):
+        """
+        Build the NDJSON response for a stream of progress events.
+
+        Args:
+            events: Iterable of event dicts
+
+        Returns:
+            StreamingHttpResponse: One JSON document per line
+        """
+        response = StreamingHttpResponse(
+            (json.dumps(event, cls=DjangoJSONEncoder) + "\n" for event in events),
+            content_type="application/x-ndjson",
+        )
+        response["Cache-Control"] = "no-cache"
+        # Stop nginx from buffering the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    def get_event(self, index, image_url, status, **data):
+        """Build a progress event for the URL at ``index``."""
+        return {"index": index, "url": image_url, "status": status, **data}
+
+    def get_result_event(self, index, image_url, response_data):
+        """Build the final event for a URL from its response data."""
+        if not response_data.get("success"):
+            status = "failed"
+        elif response_data.get("duplicate"):
+            status = "duplicate"
+        else:
+            status = "saved"
+        return self.get_event(index, image_url, status, **response_data)
+
+    def stream_import(self, image_urls, collection):
+        """
+        Download and save several images, yielding progress events.
+
+        Args:
+            image_urls: The image URLs
+            collection: The ID of the collection to add the images to
+
+        Yields:
+            dict: Progress events, as described in the class docstring
+        """
+        return self.stream_import_batches([image_urls], collection)
+
+    def stream_import_batches(self, url_batches, collection):
+        """
+        Download and save images as their URLs arrive, yielding progress events.
+
+        Downloads run in a bounded thread pool and report back through a
+        queue; each image is saved in the calling thread as soon as its
+        download completes. The URLs of each batch are queued as soon as the
+        batch is read, and the downloads finished in the meantime are saved
+        before the next batch is read. If reading a batch raises a
+        DownloadError, an ``error`` event is sent and the URLs queued so far
+        are still imported.
+
+        Args:
+            url_batches: Iterable of lists of image URLs, possibly produced
+                lazily (e.g. by discover_image_urls())
+            collection: The ID of the collection to add the images to
+
+        Yields:
+            dict: Progress events, as described in the class docstring
+        """
+        image_urls = []
+        events = queue.Queue()
+        # Threads are only started as downloads are submitted
+        executor = ThreadPoolExecutor(max_workers=max(1, self.get_max_workers()))
+        remaining = 0
+        try:
+            batches = iter(url_batches)
+            while True:
+                batch, error_event = self.read_batch(batches)
+                if error_event is not None:
+                    yield error_event
+                if batch is None:
+                    break
+
+                remaining += len(batch)
+                yield from self.queue_batch(executor, events, image_urls, batch)
+                # Save what finished downloading before reading the next batch
+                remaining = yield from self.drain_events(events, image_urls, collection, remaining, block=False)
+
+            yield from self.drain_events(events, image_urls, collection, remaining, block=True)
+        finally:
+            # Don't start queued downloads if the client went away
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        yield {"status": "complete"}
+
+    def read_batch(self, batches):
+        """
+        Read the next batch of image URLs.
+
+        Args:
+            batches: Iterator of lists of image URLs
+
+        Returns:
+            tuple: (batch, error_event); the batch is None once there are no
+                more, or reading it raised a DownloadError, reported by the event
+        """
+        try:
+            return next(batches), None
+        except StopIteration:
+            return None, None
+        except DownloadError as e:
+            return None, {"status": "error", "error_message": e.message}
+
+    def queue_batch(self, executor, events, image_urls, batch):
+        """
+        Submit the downloads of a batch of image URLs.
+
+        Args:
+            executor: The download thread pool
+            events: Queue the downloads report to
+            image_urls: The URLs queued so far, extended here
+            batch: List of image URLs
+
+        Yields:
+            dict: A ``queued`` event for each URL
+        """
+        sources = self.get_image_sources(batch) if batch else {}
+        for image_url in batch:
+            index = len(image_urls)
+            image_urls.append(image_url)
+            yield self.get_event(index, image_url, "queued")
+            executor.submit(self.fetch, events, index, image_url, sources.get(normalize_url(image_url)))
+
+    def fetch(self, events, index, image_url, source):
+        """
+        Download an image in a worker thread, reporting progress to ``events``.
+
+        Args:
+            events: Queue of (index, kind, value) tuples
+            index: The index of the URL
+            image_url: The image URL
+            source: The ImageSource recorded for the URL, if any
+        """
+        reported = 0
+
+        def progress(size):
+            nonlocal reported
+            if size - reported >= STREAM_PROGRESS_BYTES:
+                reported = size
+                events.put((index, "downloading", size))
+
+        events.put((index, "downloading", 0))
+        timer = ImportTimer(image_url)
+        result = (None, self.get_error_response_data(_("Download failed.")))
+        try:
+            with timer.activate():
+                result = self.download(image_url, source, progress=progress)
+        finally:
+            events.put((index, "downloaded", (timer, result)))
+
+    def drain_events(self, events, image_urls, collection, remaining, block):
+        """
+        Handle the events reported by the downloads, saving each downloaded image.
+
+        Args:
+            events: Queue of (index, kind, value) tuples
+            image_urls: The URLs queued so far
+            collection: The ID of the collection to add the images to
+            remaining: The number of downloads not reported as finished
+            block: Whether to wait until every download has finished, rather
+                than stop when no event is waiting
+
+        Yields:
+            dict: Progress events
+
+        Returns:
+            int: The number of downloads still not reported as finished
+        """
+        while remaining:
+            try:
+                index, kind, value = events.get(block=block)
+            except queue.Empty:
+                break
+            remaining -= kind == "downloaded"
+            yield from self.handle_event(image_urls[index], collection, index, kind, value)
+        return remaining
+
+    def handle_event(self, image_url, collection, index, kind, value):
+        """
+        Turn an event reported by a download into progress events, saving the image once downloaded.
+
+        Args:
+            image_url: The image URL
+            collection: The ID of the collection to add the image to
+            index: The index of the URL
+            kind: ``downloading`` or ``downloaded``
+            value: The bytes read so far, or the timer and download result
+
+        Yields:
+            dict: Progress events
+        """
+        if kind == "downloading":
+            yield self.get_event(index, image_url, "downloading", bytes=value)
+            return
+
+        timer, (file, response_data) = value
+        if response_data is None:
+            yield self.get_event(index, image_url, "validating")
+            with timer.activate():
+                response_data = self.create_image(image_url, file, collection)
+        report_timings(type(self), timer, response_data)
+        yield self.get_result_event(index, image_url, response_data)
+
+
+class AddFromURLDiscoverView(AddFromURLStreamView):
+    """
+    AJAX view importing the images listed in a sitemap or feed, over one streamed response.
+
+    Takes the 'url' of an image sitemap (or sitemap index), or of an RSS or
+    Atom feed, and an optional 'collection'. The document is parsed as it
+    downloads (see ``discovery.py``) and each new image URL found is queued
+    for import right away, so images are saved while the rest of the
+    document is still being read.
+
+    The events are those of AddFromURLStreamView; as the URLs are not known
+    up front, a URL's ``queued`` event is the first to report it. If the
+    document cannot be read to the end, an ``{"status": "error",
+    "error_message": ...}`` event follows the last URL found, and the URLs
+    found until then are still imported.
+    """
+
+    def post(self, request):
+        """
+        Handle a sitemap or feed URL, streaming progress events.
+
+        The first chunk of the document is read before the response starts,
+        so a URL that is not allowed or does not point to a readable sitemap
+        or feed is reported as a plain JSON error.
+
+        Args:
+            request: The HTTP request containing 'url' and an optional 'collection'
+
+        Returns:
+            StreamingHttpResponse of NDJSON events, or a JsonResponse with
+            the error if the request is invalid
+        """
+        document_url = request.POST.get("url", "").strip()
+        if not document_url:
+            return JsonResponse(self.get_error_response_data(_("Please provide a sitemap or feed URL.")))
+
+        url_batches = discover_image_urls(document_url, max_urls=self.get_max_urls())
+        try:
+            first_batch = next(url_batches, [])
+        except DownloadError as e:
+            return JsonResponse(self.get_error_response_data(e.message))
+
+        events = self.stream_import_batches(
+            itertools.chain([first_batch], url_batches), request.POST.get("collection", 1)
+        )
+        return self.get_streaming_response(events)
+
+    def get_max_urls(self):
+        """Return the maximum number of image URLs imported per sitemap or feed."""
+        return getattr(settings, "WAGTAIL_IMAGE_URL_DISCOVERY_MAX_URLS", DISCOVERY_MAX_URLS)
+
+
+class AddFromURLPreflightView(AddFromURLBatchView):
+    """
+    AJAX view checking image URLs before they are imported.
+
+    Accepts the same fields as AddFromURLBatchView. Each URL goes through
+    the same security checks as an import, then only the start of the image
+    is fetched (see ``preflight.py``), so the admin UI can flag bad URLs as
+    they are typed, before they are submitted for import.
+    """
+
+    http_method_names = ["post"]
+
+    def post(self, request):
+        """
+        Check a batch of image URLs.
+
+        Args:
+            request: The HTTP request containing one or more 'urls'
+
+        Returns:
+            JsonResponse with a 'results' list holding one entry per URL, in
+            the same order; see preflight_urls()
+        """
+        image_urls, error_data = self.get_image_urls(request)
+        if error_data is not None:
+            return JsonResponse(error_data)
+
+        results = [
+            {"url": image_url, **result} for image_url, result in zip(image_urls, self.preflight_urls(image_urls))
+        ]
+        return JsonResponse({"success": True, "results": results})
+
+    def preflight_urls(self, image_urls):
+        """
+        Check several image URLs concurrently.
+
+        URLs that were imported before are not fetched at all. Whether an
+        image is already in the library is looked up for every URL at once,
+        by source URL and, for images small enough to be fetched whole, by
+        contents.
+
+        Args:
+            image_urls: The image URLs
+
+        Returns:
+            list: Per URL, a dict with 'valid' and 'duplicate', and either
+            'error_message' or the 'content_type', 'size', 'width' and
+            'height' found (each None if unknown), and for duplicates the
+            existing image's ID
+        """
+        sources = self.get_image_sources(image_urls)
+
+        def check(image_url):
+            is_valid, error_message = validate_url_security(image_url)
+            if not is_valid:
+                return {"valid": False, "error_message": error_message}
+            if normalize_url(image_url) in sources:
+                return {"valid": True}
+            return check_url(image_url)
+
+        max_workers = max(1, min(self.get_max_workers(), len(image_urls)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(check, image_urls))
+
+        existing = self.find_existing_images(result.get("content_hash") for result in results)
+        response = []
+        for image_url, result in zip(image_urls, results):
+            result = dict(result)
+            source = sources.get(normalize_url(image_url))
+            image = source.image if source is not None else existing.get(result.pop("content_hash", ""))
+            result["duplicate"] = image is not None
+            if image is not None:
+                result[self.context_object_id_name] = image.pk
+            response.append(result)
+        return response
+
+
+class ImportJobCreateView(AddFromURLBatchView):
+    """
+    AJAX view that queues image URLs for a background worker.
+
+    Returns as soon as the job is stored; the ``process_image_url_imports``
+    management command does the downloading, and ImportJobStatusView reports
+    progress.
+    """
+
+    http_method_names = ["post"]
+
+    def post(self, request):
+        """
+        Queue a list of image URLs.
+
+        Args:
+            request: The HTTP request containing one or more 'urls' and an optional 'collection'
+
+        Returns:
+            JsonResponse with the job ID and the URL to poll for its status
+        """
+        image_urls, error_data = self.get_image_urls(request)
+        if error_data is not None:
+            return JsonResponse(error_data)
+
+        collection = self.get_collection(request.POST.get("collection", 1))
+        if collection is None:
+            return JsonResponse(self.get_error_response_data(_("Select a collection you can add images to.")))
+
+        job = ImportJob.objects.enqueue(request.user, image_urls, collection.pk)
+        logger.info(f"Queued import job {job.pk} with {len(image_urls)} URLs")
+
+        return JsonResponse(
+            {
+                "success": True,
+                "job_id": job.pk,
+                "status_url": reverse("add_from_url_job_status", args=(job.pk,)),
+            },
+            status=202,
+        )
+
+    def get_collection(self, collection_id):
+        """
+        Find the collection a job adds its images to.
+
+        As with the upload form of a synchronous import, only collections the
+        user can add images to are accepted.
+
+        Args:
+            collection_id: The collection ID, as posted
+
+        Returns:
+            Collection or None: The collection, or None if the ID is not one
+            of the user's
+        """
+        collections = self.permission_policy.collections_user_has_permission_for(self.request.user, "add")
+        return next((collection for collection in collections if str(collection.pk) == str(collection_id)), None)
+
+    def get_max_urls(self):
+        """Return the maximum number of URLs accepted per job."""
+        return getattr(settings, "WAGTAIL_IMAGE_URL_JOB_MAX_URLS", JOB_MAX_URLS)
+
+
+class ImportJobStatusView(AddFromURLView):
+    """
+    AJAX view reporting the progress of a queued import job.
+
+    Users can only see their own jobs.
+    """
+
+    http_method_names = ["get"]
+
+    def dispatch(self, request, job_id):
+        self.job_id = job_id
+        return super().dispatch(request)
+
+    def get(self, request):
+        """
+        Report a job's progress.
+
+        Args:
+            request: The HTTP request
+
+        Returns:
+            JsonResponse with per-status counts, whether the job is finished,
+            and one result per URL in queue order
+        """
+        job = get_object_or_404(ImportJob, pk=self.job_id, user=request.user)
+        counts = job.get_status_counts()
+        results = [
+            {
+                "url": item["url"],
+                "status": item["status"],
+                self.context_object_id_name: item["image_id"],
+                "error_message": item["error_message"],
+            }
+            for item in job.items.order_by("pk").values("url", "status", "image_id", "error_message")
+        ]
+
+        return JsonResponse(
+            {
+                "success": True,
+                "job_id": job.pk,
+                "finished": not counts[ImportItem.Status.PENDING] and not counts[ImportItem.Status.RUNNING],
+                "counts": counts,
+                "results": results,
+            }
+        )
+
+
+class MetricsView(View):
+    """
+    Import metrics of all worker processes, in the Prometheus text format.
+
+    Available to superusers, and to scrapers sending the
+    ``WAGTAIL_IMAGE_URL_METRICS_TOKEN`` setting as a bearer token.
+    """
+
+    http_method_names = ["get"]
+
+    def has_access(self, request):
+        """
+        Check whether the request may read the metrics.
+
+        Args:
+            request: The HTTP request
+
+        Returns:
+            bool: True for superusers, or if the request has the metrics token
+        """
+        if request.user.is_authenticated and request.user.is_superuser:
+            return True
+        token = getattr(settings, "WAGTAIL_IMAGE_URL_METRICS_TOKEN", None)
+        authorization = request.headers.get("Authorization", "")
+        return bool(token) and constant_time_compare(authorization, f"Bearer {token}")
+
+    def get(self, request):
+        """
+        Render the metrics.
+
+        Args:
+            request: The HTTP request
+
+        Returns:
+            HttpResponse in the Prometheus text exposition format
+        """
+        if not self.has_access(request):
+            raise PermissionDenied
+        return HttpResponse(render_prometheus(get_totals()), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+class AsyncAddFromURLView(AddFromURLView):
+    """
+    Async variant of AddFromURLView for ASGI deployments.
+
+    The download runs on the event loop without blocking a thread; only the
+    permission checks and the Wagtail form validation/save are handed off to
+    synchronous code. This view must be routed through
+    ``image_url_upload.urls`` rather than Wagtail's admin URLs, whose access
+    check is synchronous.
+    """
+
+    http_method_names = ["post"]
+
+    async def dispatch(self, request, *args, **kwargs):
+        """Check admin access and add permission before handling the request."""
+        if httpx is None:
+            raise ImproperlyConfigured(
+                "AsyncAddFromURLView requires httpx. Install it with 'pip install wagtail-image-from-url[async]'."
+            )
+
+        # Wagtail's permission-checking dispatch queries the database, so it
+        # is bypassed in favour of has_access() running in a thread.
+        if not await sync_to_async(self.has_access)(request):
+            raise PermissionDenied
+        return await View.dispatch(self, request, *args, **kwargs)
+
+    async def post(self, request):
+        """
+        Handle image upload from URL.
+
+        Args:
+            request: The HTTP request containing 'url' and optional 'collection'
+
+        Returns:
+            JsonResponse with success/error status and image data
+        """
+        image_url = request.POST.get("url")
+
+        if not image_url:
+            return JsonResponse(self.get_error_response_data(_("Please provide a URL.")))
+
+        timer = ImportTimer(image_url)
+        with timer.activate():
+            response_data = await self.aimport_from_url(image_url, request.POST.get("collection", 1))
+        # Signal receivers may use the database
+        return await sync_to_async(self.get_timed_response)(timer, response_data)
+
+    async def aimport_from_url(self, image_url, collection):
+        """
+        Async version of import_from_url().
+
+        Args:
+            image_url: The image URL
+            collection: The ID of the collection to add the image to
+
+        Returns:
+            dict: Response data with success/error status and image data
+        """
+        source = await sync_to_async(self.get_image_source)(image_url)
+        file, response_data = await self.adownload(image_url, source)
+        if response_data is not None:
+            return response_data
+
+        return await sync_to_async(self.create_image)(image_url, file, collection)
+
+    async def adownload(self, image_url, source=None):
+        """
+        Async version of download().
+
+        Args:
+            image_url: The image URL
+            source: The ImageSource recorded for the URL, if any
+
+        Returns:
+            tuple: (file: DownloadedFile or None, response_data: dict or None)
+        """
+        # Validate URL security (domain allow/block lists and SSRF protection).
+        # This may resolve the hostname, so it runs in a worker thread.
+        with record_phase("validate"):
+            is_valid, error_message = await sync_to_async(validate_url_security, thread_sensitive=False)(image_url)
+        if not is_valid:
+            record_error("blocked")
+            return None, self.get_error_response_data(error_message)
+
+        headers = None
+        if source is not None:
+            if not self.should_revalidate_sources():
+                logger.info(f"Image already imported from {image_url}")
+                return None, self.get_existing_image_response_data(source.image)
+            headers = source.get_conditional_headers()
+
+        try:
+            logger.info(f"Downloading image from: {image_url}")
+            return await anormalize_download(await adownload_image(image_url, headers=headers)), None
+        except NotModified:
+            logger.info(f"Image already imported and unchanged: {image_url}")
+            return None, self.get_existing_image_response_data(source.image)
+        except DownloadError as e:
+            record_error(get_error_code(e))
+            return None, self.get_error_response_data(e.message)
+        except httpx.TimeoutException as e:
+            record_error(get_error_code(e))
+            logger.error(f"Timeout downloading image from {image_url}")
+            return None, self.get_error_response_data(_("Request timeout - the server took too long to respond."))
+        except httpx.HTTPStatusError as e:
+            record_error(get_error_code(e))
             logger.error(f"HTTP error downloading {image_url}: {e}")
-            return JsonResponse(
-                {
-                    "success": False,
-                    "error_message": _("HTTP error: {status}").format(status=e.response.status_code),
-                }
+            return None, self.get_error_response_data(
+                _("HTTP error: {status}").format(status=e.response.status_code)
             )
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
+            record_error(get_error_code(e))
             logger.error(f"Download failed for {image_url}: {e}")
-            return JsonResponse(
-                {
-                    "success": False,
-                    "error_message": _("Download failed: {error}").format(error=str(e)),
-                }
-            )
+            return None, self.get_error_response_data(_("Download failed: {error}").format(error=str(e)))
         except Exception as e:
             logger.exception(f"Unexpected error processing {image_url}")
-            return JsonResponse(
-                {
-                    "success": False,
-                    "error_message": _("Unexpected error: {error}").format(error=str(e)),
-                }
-            )
+            record_error(get_error_code(e))
+            return None, self.get_error_response_data(_("Unexpected error: {error}").format(error=str(e)))
@@ -12,7 +12,17 @@ from django.utils.translation import gettext_lazy as _
 from wagtail import hooks
 from wagtail.admin.menu import MenuItem
 
-from .views import  CustomImageIndexView, AddFromURLView
+from .views import (
+    AddFromURLBatchView,
+    AddFromURLDiscoverView,
+    AddFromURLPreflightView,
+    AddFromURLStreamView,
+    AddFromURLView,
+    CustomImageIndexView,
+    ImportJobCreateView,
+    ImportJobStatusView,
+    MetricsView,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +41,41 @@ def register_admin_urls():
             AddFromURLView.as_view(),
             name="add_from_url"
         ),
+        path(
+            "images/add_from_url/batch/",
+            AddFromURLBatchView.as_view(),
+            name="add_from_url_batch"
+        ),
+        path(
+            "images/add_from_url/stream/",
+            AddFromURLStreamView.as_view(),
+            name="add_from_url_stream"
+        ),
+        path(
+            "images/add_from_url/discover/",
+            AddFromURLDiscoverView.as_view(),
+            name="add_from_url_discover"
+        ),
+        path(
+            "images/add_from_url/preflight/",
+            AddFromURLPreflightView.as_view(),
+            name="add_from_url_preflight"
+        ),
+        path(
+            "images/add_from_url/jobs/",
+            ImportJobCreateView.as_view(),
+            name="add_from_url_job"
+        ),
+        path(
+            "images/add_from_url/jobs/<int:job_id>/",
+            ImportJobStatusView.as_view(),
+            name="add_from_url_job_status"
+        ),
+        path(
+            "images/add_from_url/metrics/",
+            MetricsView.as_view(),
+            name="add_from_url_metrics"
+        ),
     ]
 
 
@@ -0,0 +1,29 @@
+import shutil
+
+import pytest
+from django.conf import settings
+from django.core.cache import caches
+
+from image_url_upload.indexing import clear_search_index_queue
+from image_url_upload.metrics import clear_metrics
+from image_url_upload.retry import clear_retry_budgets
+
+
+@pytest.fixture(autouse=True, scope="session")
+def media_root():
+    """Delete the temporary MEDIA_ROOT of the test settings once the tests are done."""
+    yield settings.MEDIA_ROOT
+    shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Don't let throttling, failure, retry, metrics and search index queue state leak between tests."""
+    for cache in caches.all():
+        cache.clear()
+    clear_retry_budgets()
+    clear_metrics()
+    clear_search_index_queue()
+    yield
+    for cache in caches.all():
+        cache.clear()
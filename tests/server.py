@@ -0,0 +1,173 @@
+"""
+Local stand-in HTTP server for tests that need real network I/O.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image as PILImage
+
+
+def make_image_bytes(image_format="PNG", size=(1, 1), color=(255, 0, 0)):
+    """
+    Create a valid image of the given format and dimensions.
+
+    Args:
+        image_format: Pillow format name (e.g. 'PNG', 'JPEG')
+        size: (width, height) in pixels
+        color: Fill colour
+
+    Returns:
+        bytes: The encoded image
+    """
+    buffer = BytesIO()
+    PILImage.new("RGB", size, color).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def make_noise_image_bytes(image_format="PNG", size=(1, 1)):
+    """
+    Create an image of random noise, which barely compresses.
+
+    Args:
+        image_format: Pillow format name (e.g. 'PNG', 'JPEG')
+        size: (width, height) in pixels
+
+    Returns:
+        bytes: The encoded image
+    """
+    buffer = BytesIO()
+    PILImage.merge("RGB", [PILImage.effect_noise(size, sigma) for sigma in (32, 48, 64)]).save(
+        buffer, format=image_format
+    )
+    return buffer.getvalue()
+
+
+class Route:
+    """A canned response served by ImageServer."""
+
+    def __init__(
+        self,
+        body=b"",
+        content_type="image/png",
+        status=200,
+        headers=None,
+        delay=0,
+        chunk_size=None,
+        etag=None,
+        fail_first=0,
+        fail_status=503,
+        fail_headers=None,
+    ):
+        self.body = body
+        self.content_type = content_type
+        self.status = status
+        self.headers = headers or {}
+        self.delay = delay
+        self.chunk_size = chunk_size
+        self.etag = etag
+        # The first ``fail_first`` requests get an empty ``fail_status`` response
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.fail_headers = fail_headers or {}
+        self.requests = []
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def _respond(self, send_body):
+        route = self.server.routes.get(self.path.split("?")[0])
+        if route is None:
+            route = Route(b"Not found", content_type="text/plain", status=404)
+        route.requests.append(self)
+
+        if route.delay:
+            time.sleep(route.delay)
+
+        if len(route.requests) <= route.fail_first:
+            self.send_response(route.fail_status)
+            for name, value in route.fail_headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if route.etag is not None and self.headers.get("If-None-Match") == route.etag:
+            self.send_response(304)
+            self.send_header("ETag", route.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(route.status)
+        if route.etag is not None:
+            self.send_header("ETag", route.etag)
+        self.send_header("Content-Type", route.content_type)
+        for name, value in route.headers.items():
+            self.send_header(name, value)
+
+        if route.chunk_size:
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            if send_body:
+                for offset in range(0, len(route.body), route.chunk_size):
+                    chunk = route.body[offset:offset + route.chunk_size]
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            return
+
+        if "Content-Length" not in route.headers:
+            self.send_header("Content-Length", str(len(route.body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(route.body)
+
+
+class ImageServer:
+    """
+    Threaded HTTP server bound to an ephemeral localhost port.
+
+    Usage::
+
+        with ImageServer() as server:
+            server.add("/a.png", make_image_bytes())
+            requests.get(server.url("/a.png"))
+    """
+
+    def __init__(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.routes = {}
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def add(self, path, body=b"", **kwargs):
+        """Serve ``body`` at ``path``; see Route for the supported options."""
+        route = self.httpd.routes[path] = Route(body, **kwargs)
+        return route
+
+    def url(self, path):
+        """Return the absolute URL for ``path``."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 BASE_DIR = os.path.dirname(PROJECT_DIR)
@@ -47,6 +48,29 @@ DATABASES = {
     }
 }
 ROOT_URLCONF = "tests.urls"
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "APP_DIRS": True,
+        "OPTIONS": {
+            "context_processors": [
+                "django.template.context_processors.debug",
+                "django.template.context_processors.request",
+                "django.contrib.auth.context_processors.auth",
+                "django.contrib.messages.context_processors.messages",
+            ],
+        },
+    },
+]
 STATIC_URL = "/static/"
+# Keep uploaded and rendered images out of the working directory; worker
+# processes started by the tests inherit the variable and share the directory
+MEDIA_ROOT = os.environ.get("IMAGE_URL_UPLOAD_TEST_MEDIA_ROOT") or tempfile.mkdtemp(prefix="image_url_upload_media_")
+os.environ["IMAGE_URL_UPLOAD_TEST_MEDIA_ROOT"] = MEDIA_ROOT
 USE_TZ = True
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
+
+# Flush metrics only when they are read, so they cannot leak between tests
+WAGTAIL_IMAGE_URL_METRICS_FLUSH_INTERVAL = 0
+# No background thread indexing queued images outside the test's transaction
+WAGTAIL_IMAGE_URL_SEARCH_INDEX_FLUSH_INTERVAL = 0
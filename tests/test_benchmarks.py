@@ -0,0 +1,95 @@
+"""
+Tests for the benchmark harness and runner.
+"""
+
+import tempfile
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from benchmarks.harness import compare, measure, measure_peak_memory, percentile
+from benchmarks.run import Pipeline, run_benchmarks
+from tests.server import ImageServer
+
+
+class TestHarness:
+    """Test the measurements."""
+
+    def test_percentile(self):
+        """Test the nearest-rank percentile."""
+        values = list(range(1, 21))
+        assert percentile(values, 0.95) == 19
+        assert percentile(values, 0.5) == 10
+        assert percentile([3.0], 0.95) == 3.0
+
+    def test_measure(self):
+        """Test setup and teardown run around every call, including warmup and the memory run."""
+        calls = []
+
+        result = measure(
+            lambda state: calls.append(state) or state,
+            iterations=5,
+            warmup=2,
+            setup=lambda: "state",
+            teardown=lambda value: calls.append(f"teardown {value}"),
+            size=1000,
+        )
+
+        assert calls.count("state") == 8
+        assert calls.count("teardown state") == 8
+        assert result["iterations"] == 5
+        assert result["min"] <= result["median"] <= result["p95"] <= result["max"]
+        assert result["bytes_per_second"] == pytest.approx(result["ops_per_second"] * 1000)
+
+    def test_peak_memory(self):
+        """Test allocations made by the call are measured."""
+        assert measure_peak_memory(lambda state: bytearray(1024 * 1024)) >= 1024 * 1024
+
+    def test_compare(self):
+        """Test slower or more memory-hungry benchmarks are flagged."""
+        baseline = {
+            "benchmarks": {
+                "same": {"median": 1.0, "peak_memory": 100},
+                "slower": {"median": 1.0, "peak_memory": 100},
+                "bigger": {"median": 1.0, "peak_memory": 100},
+                "removed": {"median": 1.0, "peak_memory": 100},
+            }
+        }
+        current = {
+            "benchmarks": {
+                "same": {"median": 1.05, "peak_memory": 90},
+                "slower": {"median": 1.5, "peak_memory": 100},
+                "bigger": {"median": 1.0, "peak_memory": 200},
+                "added": {"median": 1.0, "peak_memory": 100},
+            }
+        }
+
+        rows = {row["name"]: row for row in compare(baseline, current, threshold=0.1)}
+
+        assert set(rows) == {"same", "slower", "bigger"}
+        assert not rows["same"]["regression"]
+        assert rows["slower"]["regression"]
+        assert rows["slower"]["latency"] == 1.5
+        assert rows["bigger"]["regression"]
+
+
+@override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False)
+class RunBenchmarksTests(TestCase):
+    """Test the pipeline benchmarks run end to end."""
+
+    def test_run(self):
+        """Each stage should be measured without leaving images behind."""
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+
+        with tempfile.TemporaryDirectory() as media_root, ImageServer() as server:
+            with override_settings(MEDIA_ROOT=media_root):
+                pipeline = Pipeline(server, user)
+                results = run_benchmarks(pipeline, iterations=1, warmup=0, only="png-64")
+
+        self.assertEqual(
+            set(results),
+            {"download[png-64]", "form_validation[png-64]", "save_object[png-64]", "import[png-64]"},
+        )
+        self.assertGreater(results["download[png-64]"]["bytes_per_second"], 0)
+        self.assertFalse(pipeline.view.model.objects.exists())
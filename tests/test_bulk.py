@@ -0,0 +1,222 @@
+"""
+Tests for bulk imports from CSV/NDJSON input.
+"""
+
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from wagtail.images import get_image_model
+from wagtail.models import Collection
+
+from image_url_upload.bulk import BulkImporter, Checkpoint, read_rows
+from tests.server import ImageServer, make_image_bytes
+
+Image = get_image_model()
+User = get_user_model()
+
+
+class ReadRowsTests(SimpleTestCase):
+    """Test parsing of bulk import input."""
+
+    def test_csv(self):
+        """CSV rows should be read by header name."""
+        stream = StringIO(
+            "url,title,tags,collection\n"
+            'https://example.com/a.png,Photo,"a, b",2\n'
+            "https://example.com/b.png,,,\n"
+        )
+
+        rows = list(read_rows(stream, "csv"))
+
+        self.assertEqual(rows[0].url, "https://example.com/a.png")
+        self.assertEqual(rows[0].title, "Photo")
+        self.assertEqual(rows[0].tags, ["a", "b"])
+        self.assertEqual(rows[0].collection, "2")
+        self.assertEqual(rows[0].line, 2)
+        self.assertIsNone(rows[1].title)
+        self.assertIsNone(rows[1].collection)
+        self.assertEqual(rows[1].tags, [])
+
+    def test_csv_requires_url_column(self):
+        """CSV without a 'url' column should be rejected."""
+        with self.assertRaises(ValueError):
+            list(read_rows(StringIO("link\nhttps://example.com/a.png\n"), "csv"))
+
+    def test_ndjson(self):
+        """NDJSON lines may be objects or plain URL strings."""
+        stream = StringIO(
+            '{"url": "https://example.com/a.png", "tags": ["x", "y"], "collection": 3}\n'
+            "\n"
+            '"https://example.com/b.png"\n'
+            "not json\n"
+            '{"title": "No URL"}\n'
+        )
+
+        rows = list(read_rows(stream, "ndjson"))
+
+        self.assertEqual([row.url for row in rows], ["https://example.com/a.png", "https://example.com/b.png", "", ""])
+        self.assertEqual(rows[0].tags, ["x", "y"])
+        self.assertEqual(rows[0].collection, 3)
+        self.assertEqual(rows[1].line, 3)
+        self.assertIsNone(rows[1].error)
+        self.assertEqual(rows[2].error, "Invalid JSON.")
+        self.assertEqual(rows[3].error, "Missing URL.")
+
+    def test_detect_format(self):
+        """The format should be detected from the first line."""
+        rows = list(read_rows(StringIO('{"url": "https://example.com/a.png"}\n')))
+        self.assertEqual(rows[0].url, "https://example.com/a.png")
+
+        rows = list(read_rows(StringIO("url\nhttps://example.com/a.png\n")))
+        self.assertEqual(rows[0].url, "https://example.com/a.png")
+
+    def test_rows_are_streamed(self):
+        """Rows should be read lazily."""
+        lines = iter(["url\n", "https://example.com/a.png\n"])
+        rows = read_rows(lines, "csv")
+
+        self.assertEqual(next(rows).url, "https://example.com/a.png")
+
+
+@override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False)
+class ImportImagesFromURLCommandTests(TestCase):
+    """Test the import_images_from_url management command."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.routes = {
+            name: self.server.add(f"/{name}.png", make_image_bytes(color=color))
+            for name, color in (("a", (255, 0, 0)), ("b", (0, 255, 0)), ("c", (0, 0, 255)))
+        }
+        self.server.add("/page", b"<html>", content_type="text/html")
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def _call(self, *args, **kwargs):
+        stdout, stderr = StringIO(), StringIO()
+        call_command("import_images_from_url", *args, user="admin", stdout=stdout, stderr=stderr, **kwargs)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_csv_file(self):
+        """Rows should be imported with their title, tags and collection."""
+        child = Collection.get_first_root_node().add_child(name="Imports")
+        path = self._write(
+            "urls.csv",
+            "url,title,tags,collection\n"
+            f'{self.server.url("/a.png")},Red square,"red, shapes",\n'
+            f"{self.server.url('/b.png')},,,{child.pk}\n"
+            f"{self.server.url('/page')},,,\n",
+        )
+
+        stdout, stderr = self._call(path)
+
+        self.assertIn("Saved 2, duplicates 0, failed 1", stdout)
+        self.assertIn("Line 4", stderr)
+        self.assertIn("Invalid file type", stderr)
+        red = Image.objects.get(title="Red square")
+        self.assertEqual(sorted(red.tags.names()), ["red", "shapes"])
+        self.assertEqual(Image.objects.get(title="b").collection, child)
+
+    def test_import_ndjson_from_stdin(self):
+        """NDJSON should be read from stdin."""
+        stdin = StringIO(
+            json.dumps({"url": self.server.url("/a.png")}) + "\n" + json.dumps(self.server.url("/a.png")) + "\n"
+        )
+
+        stdout, stderr = self._call(stdin=stdin, workers=2, chunk_size=1)
+
+        self.assertIn("Saved 1, duplicates 1, failed 0", stdout)
+        self.assertEqual(Image.objects.count(), 1)
+        self.assertEqual(len(self.routes["a"].requests), 1)
+
+    def test_invalid_collection(self):
+        """Rows with an unknown collection should fail on their own."""
+        Collection.get_first_root_node().add_child(name="Imports")
+        stdin = StringIO(json.dumps({"url": self.server.url("/a.png"), "collection": 9999}) + "\n")
+
+        stdout, stderr = self._call(stdin=stdin)
+
+        self.assertIn("failed 1", stdout)
+        self.assertIn("collection", stderr)
+
+    def test_resume_from_checkpoint(self):
+        """A resumed run should skip finished rows without downloading them again."""
+        path = self._write("urls.ndjson", "".join(json.dumps(self.server.url(f"/{name}.png")) + "\n" for name in "abc"))
+        checkpoint = os.path.join(self.tmpdir.name, "import.checkpoint")
+        original_import_chunk = BulkImporter.import_chunk
+        chunks = []
+
+        def crash_on_second_chunk(importer, executor, chunk):
+            chunks.append(chunk)
+            if len(chunks) == 2:
+                raise KeyboardInterrupt
+            return original_import_chunk(importer, executor, chunk)
+
+        with patch.object(BulkImporter, "import_chunk", crash_on_second_chunk):
+            with self.assertRaises(KeyboardInterrupt):
+                self._call(path, checkpoint=checkpoint, chunk_size=1)
+
+        with open(checkpoint) as f:
+            self.assertEqual(json.load(f)["position"], 1)
+
+        stdout, stderr = self._call(path, checkpoint=checkpoint, chunk_size=1)
+
+        self.assertIn("Resuming after 1 rows", stdout)
+        self.assertIn("Saved 3, duplicates 0, failed 0", stdout)
+        self.assertEqual(Image.objects.count(), 3)
+        self.assertEqual([len(route.requests) for route in self.routes.values()], [1, 1, 1])
+
+    def test_rerun_after_partial_chunk_skips_downloads(self):
+        """Rows of an unfinished chunk that were saved should not be downloaded again."""
+        path = self._write("urls.ndjson", json.dumps(self.server.url("/a.png")) + "\n")
+        self._call(path)
+        checkpoint = Checkpoint(os.path.join(self.tmpdir.name, "import.checkpoint"), os.path.abspath(path))
+        checkpoint.save()
+
+        stdout, stderr = self._call(path, checkpoint=checkpoint.path)
+
+        self.assertIn("duplicates 1", stdout)
+        self.assertEqual(len(self.routes["a"].requests), 1)
+
+    def test_checkpoint_for_other_input(self):
+        """A checkpoint should not be resumed for a different input."""
+        path = self._write("urls.csv", "url\n")
+        checkpoint = Checkpoint(os.path.join(self.tmpdir.name, "import.checkpoint"), "/other/file.csv")
+        checkpoint.save()
+
+        with self.assertRaisesMessage(CommandError, "belongs to the input"):
+            self._call(path, checkpoint=checkpoint.path)
+
+    def test_unknown_user(self):
+        """An unknown user should be reported."""
+        with self.assertRaisesMessage(CommandError, "does not exist"):
+            call_command("import_images_from_url", "-", user="nobody", stdin=StringIO(""))
+
+    def test_requires_add_permission(self):
+        """Users without permission to add images should be rejected."""
+        User.objects.create_user(username="editor", password="password")
+
+        with self.assertRaisesMessage(CommandError, "permission"):
+            call_command("import_images_from_url", user="editor", stdin=StringIO(""))
+
+    def test_missing_file(self):
+        """A missing input file should be reported."""
+        with self.assertRaisesMessage(CommandError, "Cannot read"):
+            self._call(os.path.join(self.tmpdir.name, "missing.csv"))
@@ -0,0 +1,382 @@
+"""
+Tests for discovering image URLs in sitemaps and feeds.
+"""
+
+import gzip
+import json
+import xml.etree.ElementTree as ET
+from unittest.mock import Mock, patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from wagtail.images import get_image_model
+
+from image_url_upload.discovery import discover_image_urls, parse_links, read_document
+from image_url_upload.exceptions import DiscoveryError
+from tests.server import ImageServer, make_image_bytes
+
+Image = get_image_model()
+
+BASE_URL = "https://example.com/sitemap.xml"
+
+IMAGE_SITEMAP = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
+        xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">
+  <url>
+    <loc>https://example.com/page</loc>
+    <image:image><image:loc>https://cdn.example.com/a.jpg</image:loc></image:image>
+    <image:image><image:loc>/b.png</image:loc></image:image>
+  </url>
+  <url>
+    <loc>https://example.com/other</loc>
+    <image:image><image:loc> https://cdn.example.com/c.jpg </image:loc></image:image>
+  </url>
+</urlset>
+"""
+
+MEDIA_RSS = b"""<?xml version="1.0"?>
+<rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/">
+  <channel>
+    <title>Photos</title>
+    <item>
+      <media:content url="https://example.com/a.jpg" medium="image"/>
+      <media:content url="https://example.com/clip.mp4" medium="video"/>
+      <media:thumbnail url="https://example.com/a-thumb.jpg"/>
+      <enclosure url="https://example.com/b.png" type="image/png" length="10"/>
+      <enclosure url="https://example.com/podcast.mp3" type="audio/mpeg" length="10"/>
+    </item>
+  </channel>
+</rss>
+"""
+
+ATOM_FEED = b"""<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <entry>
+    <link href="https://example.com/post"/>
+    <link rel="enclosure" type="image/jpeg" href="https://example.com/a.jpg"/>
+    <link rel="enclosure" type="video/mp4" href="https://example.com/a.mp4"/>
+  </entry>
+</feed>
+"""
+
+
+def make_sitemap(image_urls):
+    """Build an image sitemap listing each URL on its own page."""
+    entries = "".join(
+        f"<url><loc>https://example.com/{i}</loc><image:image><image:loc>{url}</image:loc></image:image></url>"
+        for i, url in enumerate(image_urls)
+    )
+    return (
+        '<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+        f'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">{entries}</urlset>'
+    ).encode()
+
+
+def make_sitemap_index(sitemap_urls):
+    """Build a sitemap index of the given sitemaps."""
+    entries = "".join(f"<sitemap><loc>{url}</loc></sitemap>" for url in sitemap_urls)
+    return (
+        f'<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}'
+        "</sitemapindex>"
+    ).encode()
+
+
+def parse(document, chunk_size=None):
+    chunks = [document[i : i + chunk_size] for i in range(0, len(document), chunk_size)] if chunk_size else [document]
+    return [link for links in parse_links(chunks, BASE_URL) for link in links]
+
+
+def make_response(chunks):
+    """Create a mock streamed response yielding the given chunks."""
+    response = Mock()
+    response.iter_content.return_value = iter(chunks)
+    return response
+
+
+class TestParseLinks:
+    """Test finding links in sitemaps and feeds."""
+
+    def test_image_sitemap(self):
+        """Test image locations are found and resolved against the sitemap URL."""
+        assert parse(IMAGE_SITEMAP) == [
+            ("image", "https://cdn.example.com/a.jpg"),
+            ("image", "https://example.com/b.png"),
+            ("image", "https://cdn.example.com/c.jpg"),
+        ]
+
+    def test_sitemap_index(self):
+        """Test the child sitemaps of an index are found."""
+        document = make_sitemap_index(["https://example.com/a.xml", "https://example.com/b.xml"])
+
+        assert parse(document) == [("sitemap", "https://example.com/a.xml"), ("sitemap", "https://example.com/b.xml")]
+
+    def test_media_rss(self):
+        """Test Media RSS images and image enclosures are found, other media skipped."""
+        assert parse(MEDIA_RSS) == [
+            ("image", "https://example.com/a.jpg"),
+            ("image", "https://example.com/a-thumb.jpg"),
+            ("image", "https://example.com/b.png"),
+        ]
+
+    def test_atom(self):
+        """Test Atom image enclosures are found."""
+        assert parse(ATOM_FEED) == [("image", "https://example.com/a.jpg")]
+
+    def test_skips_other_schemes(self):
+        """Test only HTTP(S) links are kept."""
+        assert parse(make_sitemap(["ftp://example.com/a.jpg", "data:image/png;base64,AA=="])) == []
+
+    def test_incremental(self):
+        """Test links are reported as soon as the chunk that completes them is parsed."""
+        document = make_sitemap([f"https://example.com/{i}.jpg" for i in range(3)])
+        ends = [document.index(b"</url>", document.index(f"{i}.jpg".encode())) + 6 for i in range(3)]
+        chunks = [document[start:end] for start, end in zip([0] + ends, ends + [len(document)])]
+
+        batches = list(parse_links(chunks, BASE_URL))
+
+        # Each chunk completes one entry
+        assert [len(links) for links in batches if links] == [1, 1, 1]
+        assert [link for links in batches for link in links] == [
+            ("image", f"https://example.com/{i}.jpg") for i in range(3)
+        ]
+
+    def test_byte_at_a_time(self):
+        """Test documents split at any byte are parsed the same."""
+        assert parse(MEDIA_RSS, chunk_size=1) == parse(MEDIA_RSS)
+
+    def test_entries_are_released(self):
+        """Test read entries are removed from the tree, so it does not grow with the document."""
+        roots = []
+
+        class RecordingParser(ET.XMLPullParser):
+            def read_events(self):
+                for event, element in super().read_events():
+                    if event == "start" and not roots:
+                        roots.append(element)
+                    yield event, element
+
+        with patch("image_url_upload.discovery.ET.XMLPullParser", RecordingParser):
+            links = parse(make_sitemap([f"https://example.com/{i}.jpg" for i in range(100)]), chunk_size=100)
+
+        assert len(links) == 100
+        assert len(roots[0]) == 0
+
+    def test_invalid_xml(self):
+        """Test malformed documents raise a parse error."""
+        with pytest.raises(ET.ParseError):
+            parse(b"<html><body>Not a feed")
+
+    def test_rejects_dtd(self):
+        """Test documents with a DTD are rejected before it is parsed."""
+        document = b'<?xml version="1.0"?><!DOCTYPE lolz [<!ENTITY lol "lol">]><urlset/>'
+
+        with pytest.raises(DiscoveryError):
+            parse(document, chunk_size=4)
+
+
+class TestReadDocument:
+    """Test downloading sitemaps and feeds."""
+
+    @pytest.fixture(autouse=True)
+    def allow_local(self):
+        with override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False):
+            yield
+
+    @patch("image_url_upload.discovery.get_session")
+    def test_streams_chunks(self, get_session):
+        """Test the document is requested with stream=True and read chunk by chunk."""
+        get_session.return_value.get.return_value = response = make_response([b"<a>", b"", b"</a>"])
+
+        assert list(read_document(BASE_URL)) == [b"<a>", b"</a>"]
+        get_session.return_value.get.assert_called_once_with(BASE_URL, timeout=10, stream=True)
+        response.close.assert_called_once()
+
+    @patch("image_url_upload.discovery.get_session")
+    def test_gzip(self, get_session):
+        """Test gzip-compressed sitemaps are decompressed as they are read."""
+        data = gzip.compress(IMAGE_SITEMAP)
+        get_session.return_value.get.return_value = make_response([data[:10], data[10:]])
+
+        assert b"".join(read_document(BASE_URL)) == IMAGE_SITEMAP
+
+    @patch("image_url_upload.discovery.get_session")
+    def test_too_large(self, get_session):
+        """Test reading stops once the document exceeds the size limit."""
+        get_session.return_value.get.return_value = response = make_response([b"x" * 6, b"x" * 6, b"x" * 6])
+
+        with pytest.raises(DiscoveryError):
+            list(read_document(BASE_URL, max_size=10))
+        response.close.assert_called_once()
+
+    @patch("image_url_upload.discovery.get_session")
+    def test_gzip_bomb(self, get_session):
+        """Test compressed documents are limited by their decompressed size."""
+        get_session.return_value.get.return_value = make_response([gzip.compress(b"x" * 10_000_000)])
+
+        with pytest.raises(DiscoveryError):
+            list(read_document(BASE_URL, max_size=1000))
+
+    @patch("image_url_upload.discovery.host_throttle")
+    @patch("image_url_upload.discovery.get_session")
+    def test_throttle_held_while_reading(self, get_session, host_throttle):
+        """Test the host's throttle slot is held until the body has been read and the response closed."""
+        get_session.return_value.get.return_value = response = make_response([b"<a>", b"</a>"])
+        response.close.side_effect = lambda: host_throttle.return_value.__exit__.assert_not_called()
+
+        chunks = read_document(BASE_URL)
+        assert next(chunks) == b"<a>"
+        host_throttle.return_value.__exit__.assert_not_called()
+        assert list(chunks) == [b"</a>"]
+
+        host_throttle.assert_called_once_with(BASE_URL)
+        response.close.assert_called_once()
+        host_throttle.return_value.__exit__.assert_called_once()
+
+    def test_blocked_url(self):
+        """Test URLs that are not allowed are never requested."""
+        with (
+            override_settings(WAGTAIL_IMAGE_URL_BLOCKED_DOMAINS=["example.com"]),
+            patch("image_url_upload.discovery.get_session") as get_session,
+            pytest.raises(DiscoveryError),
+        ):
+            list(read_document(BASE_URL))
+        get_session.assert_not_called()
+
+
+class TestDiscoverImageUrls:
+    """Test discovering the image URLs of a sitemap or feed over HTTP."""
+
+    @pytest.fixture(autouse=True)
+    def server(self):
+        with override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False), ImageServer() as server:
+            yield server
+
+    def discover(self, url, **kwargs):
+        return [image_url for batch in discover_image_urls(url, **kwargs) for image_url in batch]
+
+    def test_deduplicates(self, server):
+        """Test each URL is reported once, by its normalized form."""
+        server.add(
+            "/sitemap.xml",
+            make_sitemap(["https://example.com/a.jpg", "HTTPS://EXAMPLE.com:443/a.jpg", "https://example.com/b.jpg"]),
+            content_type="application/xml",
+        )
+
+        assert self.discover(server.url("/sitemap.xml")) == ["https://example.com/a.jpg", "https://example.com/b.jpg"]
+
+    def test_sitemap_index(self, server):
+        """Test the child sitemaps of an index are read in turn, skipping unreadable ones."""
+        server.add("/a.xml", make_sitemap(["https://example.com/a.jpg"]), content_type="application/xml")
+        server.add(
+            "/b.xml.gz",
+            gzip.compress(make_sitemap(["https://example.com/a.jpg", "https://example.com/b.jpg"])),
+            content_type="application/x-gzip",
+        )
+        server.add(
+            "/index.xml",
+            make_sitemap_index([server.url("/a.xml"), server.url("/missing.xml"), server.url("/b.xml.gz")]),
+            content_type="application/xml",
+        )
+
+        assert self.discover(server.url("/index.xml")) == ["https://example.com/a.jpg", "https://example.com/b.jpg"]
+
+    def test_max_urls(self, server):
+        """Test discovery stops at the URL limit."""
+        server.add(
+            "/sitemap.xml",
+            make_sitemap([f"https://example.com/{i}.jpg" for i in range(10)]),
+            content_type="application/xml",
+        )
+
+        assert self.discover(server.url("/sitemap.xml"), max_urls=3) == [
+            f"https://example.com/{i}.jpg" for i in range(3)
+        ]
+
+    def test_http_error(self, server):
+        """Test an unreadable document raises a DiscoveryError."""
+        with pytest.raises(DiscoveryError, match="404"):
+            self.discover(server.url("/missing.xml"))
+
+    def test_invalid_xml(self, server):
+        """Test a document that is not XML raises a DiscoveryError."""
+        server.add("/page.html", b"<html><body><p>Hi", content_type="text/html")
+
+        with pytest.raises(DiscoveryError, match="not valid XML"):
+            self.discover(server.url("/page.html"))
+
+
+@override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False)
+class AddFromURLDiscoverViewTests(TestCase):
+    """Test cases for the sitemap and feed import view."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        get_user_model().objects.create_superuser(username="admin", email="admin@example.com", password="password")
+        self.client.login(username="admin", password="password")
+        self.url = reverse("add_from_url_discover")
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+    def _discover(self, document_url):
+        response = self.client.post(self.url, {"url": document_url})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_imports_discovered_images(self):
+        """Every image in the feed should be queued and imported once."""
+        self.server.add("/a.png", make_image_bytes(color=(255, 0, 0)))
+        self.server.add("/b.png", make_image_bytes(color=(0, 255, 0)))
+        self.server.add(
+            "/sitemap.xml",
+            make_sitemap([self.server.url("/a.png"), self.server.url("/b.png"), self.server.url("/a.png")]),
+            content_type="application/xml",
+            chunk_size=64,
+        )
+
+        events = self._discover(self.server.url("/sitemap.xml"))
+
+        self.assertEqual(events[-1], {"status": "complete"})
+        queued = [event["url"] for event in events if event["status"] == "queued"]
+        self.assertEqual(queued, [self.server.url("/a.png"), self.server.url("/b.png")])
+        saved = [event for event in events if event["status"] == "saved"]
+        self.assertEqual(len(saved), 2)
+        self.assertEqual(Image.objects.count(), 2)
+
+    def test_known_images_are_duplicates(self):
+        """URLs imported before should be reported as duplicates."""
+        self.server.add("/a.png", make_image_bytes())
+        self.client.post(reverse("add_from_url"), {"url": self.server.url("/a.png")})
+        self.server.add("/feed.xml", make_sitemap([self.server.url("/a.png")]), content_type="application/rss+xml")
+
+        events = self._discover(self.server.url("/feed.xml"))
+
+        self.assertEqual([event["status"] for event in events], ["queued", "downloading", "duplicate", "complete"])
+
+    def test_unreadable_document_returns_json(self):
+        """A document that cannot be read at all should be reported as a plain JSON error."""
+        response = self.client.post(self.url, {"url": self.server.url("/missing.xml")})
+
+        self.assertFalse(response.json()["success"])
+        self.assertIn("404", response.json()["error_message"])
+
+    def test_missing_url(self):
+        """A request without a URL should be rejected."""
+        response = self.client.post(self.url, {})
+
+        self.assertFalse(response.json()["success"])
+
+    def test_error_while_reading(self):
+        """The images found before a document turns out broken should still be imported."""
+        self.server.add("/a.png", make_image_bytes())
+        document = make_sitemap([self.server.url("/a.png")]).replace(b"</urlset>", b"<url></urlset>")
+        self.server.add("/sitemap.xml", document, content_type="application/xml", chunk_size=64)
+
+        events = self._discover(self.server.url("/sitemap.xml"))
+
+        statuses = [event["status"] for event in events]
+        self.assertIn("error", statuses)
+        self.assertIn("saved", statuses)
+        self.assertEqual(statuses[-1], "complete")
+        self.assertEqual(Image.objects.count(), 1)
@@ -0,0 +1,301 @@
+"""
+Tests for streaming image downloads.
+"""
+
+import asyncio
+import os
+import time
+from unittest.mock import Mock, patch
+
+import httpx
+import pytest
+from django.test import override_settings
+from requests.exceptions import HTTPError, ReadTimeout
+from wagtail.utils.file import hash_filelike
+
+from image_url_upload.download import (
+    DownloadBuffer,
+    EmptyFileError,
+    FileTooLargeError,
+    InvalidContentTypeError,
+    InvalidImageError,
+    TemporaryDownloadedFile,
+    aread_limited,
+    download_image,
+    get_content_length,
+    read_limited,
+)
+from tests.server import make_image_bytes
+
+PNG = make_image_bytes("PNG", (4, 3))
+
+
+def make_response(chunks, headers=None):
+    """Create a mock streamed response yielding the given chunks."""
+    response = Mock()
+    response.status_code = 200
+    response.headers = {"Content-Type": "image/png", **(headers or {})}
+    response.iter_content.return_value = iter(chunks)
+    response.raise_for_status = Mock()
+    return response
+
+
+class TestGetContentLength:
+    """Test parsing of the Content-Length header."""
+
+    def test_valid_length(self):
+        """Test a numeric Content-Length."""
+        assert get_content_length(make_response([], {"Content-Length": "1024"})) == 1024
+
+    def test_missing_length(self):
+        """Test a response without Content-Length."""
+        assert get_content_length(make_response([])) is None
+
+    def test_malformed_length(self):
+        """Test a non-numeric Content-Length."""
+        assert get_content_length(make_response([], {"Content-Length": "lots"})) is None
+
+
+class TestReadLimited:
+    """Test bounded reading of response bodies."""
+
+    def test_reads_all_chunks(self):
+        """Test the buffer contains every chunk in order."""
+        buffer, size, content_hash = read_limited(make_response([b"abc", b"", b"def"]), max_size=10)
+        assert size == 6
+        assert buffer.read() == b"abcdef"
+
+    def test_hashes_while_reading(self):
+        """Test the digest matches Wagtail's file_hash for the same bytes."""
+        buffer, size, content_hash = read_limited(make_response([b"abc", b"def"]), max_size=10)
+        assert content_hash == hash_filelike(buffer)
+
+    def test_stops_when_budget_exceeded(self):
+        """Test reading stops at the first chunk over the budget."""
+        consumed = []
+
+        def chunks():
+            for chunk in (b"a" * 4, b"b" * 4, b"c" * 4):
+                consumed.append(chunk)
+                yield chunk
+
+        with pytest.raises(FileTooLargeError):
+            read_limited(make_response(chunks()), max_size=6)
+        assert len(consumed) == 2
+
+    @patch("image_url_upload.download.settings")
+    def test_spools_to_disk_above_memory_threshold(self, mock_settings):
+        """Test large bodies roll over from memory to a temporary file."""
+        mock_settings.FILE_UPLOAD_MAX_MEMORY_SIZE = 4
+        mock_settings.FILE_UPLOAD_TEMP_DIR = None
+        buffer, size, content_hash = read_limited(make_response([b"abcdefgh"]), max_size=100)
+        assert size == 8
+        assert buffer.on_disk is True
+
+    def test_skips_empty_chunks(self):
+        """Test empty chunks are skipped without reporting progress, sync and async."""
+        progress = []
+        read_limited(make_response([b"abc", b"", b"def"]), max_size=10, progress=progress.append)
+
+        async def chunks(chunk_size):
+            for chunk in (b"abc", b"", b"def"):
+                yield chunk
+
+        response = Mock(headers={})
+        response.aiter_bytes = chunks
+        aprogress = []
+        buffer, size, content_hash = asyncio.run(aread_limited(response, max_size=10, progress=aprogress.append))
+
+        assert progress == aprogress == [3, 6]
+        assert buffer.read() == b"abcdef"
+
+    def test_stops_at_deadline(self):
+        """Test a body trickling in past the deadline is abandoned, sync and async."""
+        consumed = []
+
+        def chunks():
+            for _ in range(100):
+                consumed.append(b"a")
+                time.sleep(0.01)
+                yield b"a"
+
+        with pytest.raises(ReadTimeout):
+            read_limited(make_response(chunks()), max_size=1000, deadline_at=time.monotonic() + 0.05)
+        assert len(consumed) < 100
+
+        async def achunks(chunk_size):
+            for _ in range(100):
+                consumed.append(b"a")
+                await asyncio.sleep(0.01)
+                yield b"a"
+
+        consumed.clear()
+        response = Mock(headers={})
+        response.aiter_bytes = achunks
+        with pytest.raises(httpx.ReadTimeout):
+            asyncio.run(aread_limited(response, max_size=1000, deadline_at=time.monotonic() + 0.05))
+        assert len(consumed) < 100
+
+
+class TestDownloadBuffer:
+    """Test spooling downloads to disk."""
+
+    @pytest.fixture(autouse=True)
+    def memory_size(self, tmp_path):
+        with override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=4, FILE_UPLOAD_TEMP_DIR=str(tmp_path)):
+            yield
+
+    def test_in_memory(self):
+        """Test small data stays in memory."""
+        buffer = DownloadBuffer()
+        buffer.write(b"abcd")
+        buffer.seek(0)
+
+        assert not buffer.on_disk
+        assert buffer.read() == b"abcd"
+
+    def test_rollover(self):
+        """Test the data written so far moves to a named file once the limit is passed."""
+        buffer = DownloadBuffer()
+        buffer.write(b"abc")
+        buffer.write(b"def")
+        buffer.seek(0)
+
+        assert buffer.on_disk
+        assert os.path.exists(buffer.name)
+        assert buffer.read() == b"abcdef"
+
+    def test_expected_size(self):
+        """Test downloads declared over the limit go to disk from the start."""
+        assert DownloadBuffer(expected_size=5).on_disk
+        assert not DownloadBuffer(expected_size=4).on_disk
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_temporary_downloaded_file(self, mock_get, tmp_path):
+        """Test spooled downloads expose their path, like Django's TemporaryUploadedFile."""
+        mock_get.return_value = make_response([PNG[:10], PNG[10:]])
+        file = download_image("https://example.com/photo.png")
+
+        assert isinstance(file, TemporaryDownloadedFile)
+        assert os.path.dirname(file.temporary_file_path()) == str(tmp_path)
+        with open(file.temporary_file_path(), "rb") as f:
+            assert f.read() == PNG
+
+    def test_close_after_move(self, tmp_path):
+        """Test closing a file that storage moved away does not fail."""
+        buffer = DownloadBuffer(expected_size=5)
+        buffer.write(PNG)
+        file = TemporaryDownloadedFile(buffer.file, "a.png", "image/png", len(PNG), "https://example.com/a.png")
+        os.rename(file.temporary_file_path(), tmp_path / "moved.png")
+
+        file.close()
+
+
+class TestDownloadImage:
+    """Test the streaming download entry point."""
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_uses_streaming_request(self, mock_get):
+        """Test the request is made with stream=True and a timeout."""
+        mock_get.return_value = make_response([PNG])
+        download_image("https://example.com/a.png")
+        mock_get.assert_called_once_with("https://example.com/a.png", timeout=10, stream=True, headers=None)
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_returns_uploaded_file(self, mock_get):
+        """Test the downloaded file has name, size and content type."""
+        mock_get.return_value = make_response([PNG[:10], PNG[10:]])
+        file = download_image("https://example.com/photo.png?v=1")
+        assert file.name == "photo.png"
+        assert file.size == len(PNG)
+        assert file.content_type == "image/png"
+        assert file.read() == PNG
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_probes_image(self, mock_get):
+        """Test the file carries the probed format and dimensions."""
+        mock_get.return_value = make_response([PNG])
+        file = download_image("https://example.com/photo.png")
+        assert file.image_info == ("image/png", 4, 3, 1)
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_sniffed_type_overrides_generic_content_type(self, mock_get):
+        """Test images served as application/octet-stream are accepted and typed."""
+        jpeg = make_image_bytes("JPEG")
+        mock_get.return_value = make_response([jpeg], {"Content-Type": "application/octet-stream"})
+        file = download_image("https://example.com/download?id=1")
+        assert file.content_type == "image/jpeg"
+        assert file.name == "image.jpg"
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_rejects_mislabeled_non_image(self, mock_get):
+        """Test a non-image body is rejected despite an image Content-Type."""
+        chunks = [b"<html>" + b" " * 1024, b"never read"]
+        response = make_response(iter(chunks))
+        mock_get.return_value = response
+        with pytest.raises(InvalidImageError):
+            download_image("https://example.com/fake.png")
+        response.close.assert_called_once()
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_rejects_large_content_length_without_reading(self, mock_get):
+        """Test a large Content-Length is rejected before the body is read."""
+        response = make_response([PNG], {"Content-Length": str(20 * 1024 * 1024)})
+        mock_get.return_value = response
+        with pytest.raises(FileTooLargeError):
+            download_image("https://example.com/huge.png")
+        response.iter_content.assert_not_called()
+        response.close.assert_called_once()
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_rejects_body_over_limit(self, mock_get):
+        """Test a body larger than max_size is rejected without Content-Length."""
+        mock_get.return_value = make_response([b"x" * 8, b"x" * 8])
+        with pytest.raises(FileTooLargeError):
+            download_image("https://example.com/huge.png", max_size=10)
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_rejects_invalid_content_type(self, mock_get):
+        """Test non-image responses are rejected before reading."""
+        response = make_response([b"<html>"], {"Content-Type": "text/html; charset=utf-8"})
+        mock_get.return_value = response
+        with pytest.raises(InvalidContentTypeError):
+            download_image("https://example.com/page")
+        response.iter_content.assert_not_called()
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_rejects_empty_body(self, mock_get):
+        """Test an empty body is rejected."""
+        mock_get.return_value = make_response([])
+        with pytest.raises(EmptyFileError):
+            download_image("https://example.com/empty.png")
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_http_error_is_propagated(self, mock_get):
+        """Test HTTP errors are raised and the response is closed."""
+        response = make_response([])
+        response.raise_for_status.side_effect = HTTPError(response=response)
+        mock_get.return_value = response
+        with pytest.raises(HTTPError):
+            download_image("https://example.com/missing.png")
+        response.close.assert_called_once()
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_slow_body_hits_deadline(self, mock_get):
+        """Test a body sent a byte at a time is cut off at the download deadline, without retrying."""
+
+        def chunks():
+            for byte in PNG:
+                time.sleep(0.02)
+                yield bytes([byte])
+
+        mock_get.return_value = make_response(chunks())
+        started = time.monotonic()
+        with override_settings(WAGTAIL_IMAGE_URL_DOWNLOAD_DEADLINE=0.1), pytest.raises(ReadTimeout):
+            download_image("https://example.com/slow.png")
+        assert time.monotonic() - started < 0.02 * len(PNG)
+        mock_get.assert_called_once()
+
+    def test_file_too_large_message(self):
+        """Test the size limit is reported in megabytes."""
+        assert "5 MB" in str(FileTooLargeError(5 * 1024 * 1024).message)
@@ -0,0 +1,229 @@
+"""
+Tests for negative caching of failed downloads.
+"""
+
+import asyncio
+import time
+from unittest.mock import Mock, patch
+
+import httpx
+import pytest
+import requests
+from django.core.cache import cache
+from django.test import override_settings
+
+from image_url_upload.download import download_image
+from image_url_upload.exceptions import CachedFailureError, HostThrottledError, HostUnavailableError
+from image_url_upload.failures import (
+    CLIENT_ERROR,
+    CONNECTION_ERROR,
+    SERVER_ERROR,
+    TIMEOUT,
+    HostCircuitBreaker,
+    atrack_failures,
+    cache_failure,
+    classify_failure,
+    clear_cached_failure,
+    get_cached_failure,
+    track_failures,
+)
+
+
+def http_error(status):
+    return requests.exceptions.HTTPError(response=Mock(status_code=status))
+
+
+class TestClassifyFailure:
+    """Test which failures are cached."""
+
+    def test_http_errors(self):
+        """Test HTTP errors are classified by status code."""
+        assert classify_failure(http_error(404)) == (CLIENT_ERROR, 404)
+        assert classify_failure(http_error(503)) == (SERVER_ERROR, 503)
+
+    def test_transient_client_errors(self):
+        """Test rate limiting and request timeouts are not cached."""
+        assert classify_failure(http_error(429)) is None
+        assert classify_failure(http_error(408)) is None
+
+    def test_network_errors(self):
+        """Test timeouts and connection failures."""
+        assert classify_failure(requests.exceptions.ReadTimeout()) == (TIMEOUT, None)
+        assert classify_failure(requests.exceptions.ConnectTimeout()) == (TIMEOUT, None)
+        assert classify_failure(requests.exceptions.ConnectionError()) == (CONNECTION_ERROR, None)
+
+    def test_httpx_errors(self):
+        """Test the async client's exceptions."""
+        request = httpx.Request("GET", "https://example.com/a.png")
+        response = httpx.Response(410, request=request)
+        assert classify_failure(httpx.HTTPStatusError("", request=request, response=response)) == (CLIENT_ERROR, 410)
+        assert classify_failure(httpx.ReadTimeout("")) == (TIMEOUT, None)
+        assert classify_failure(httpx.ConnectError("")) == (CONNECTION_ERROR, None)
+
+    def test_other_errors(self):
+        """Test other exceptions are not cached."""
+        assert classify_failure(ValueError()) is None
+        assert classify_failure(requests.exceptions.InvalidURL()) is None
+
+
+class TestFailureCache:
+    """Test caching failures per URL."""
+
+    def test_cache_failure(self):
+        """Test a cached failure is found under the normalized URL."""
+        cache_failure("https://EXAMPLE.com/a.png", CLIENT_ERROR, 404)
+
+        failure = get_cached_failure("https://example.com/a.png")
+        assert failure.failure_class == CLIENT_ERROR
+        assert failure.status == 404
+        assert failure.expires == pytest.approx(time.time() + 300, abs=5)
+        assert get_cached_failure("https://example.com/b.png") is None
+
+    def test_clear_cached_failure(self):
+        """Test a cached failure can be forgotten."""
+        cache_failure("https://example.com/a.png", TIMEOUT)
+        clear_cached_failure("https://example.com/a.png")
+        assert get_cached_failure("https://example.com/a.png") is None
+
+    def test_ttl_settings(self):
+        """Test TTLs can be changed, or set to 0 to disable caching a class."""
+        with override_settings(WAGTAIL_IMAGE_URL_FAILURE_CACHE_TTLS={CLIENT_ERROR: 0, TIMEOUT: 10}):
+            assert cache_failure("https://example.com/a.png", CLIENT_ERROR, 404) is None
+            assert get_cached_failure("https://example.com/a.png") is None
+            failure = cache_failure("https://example.com/a.png", TIMEOUT)
+            assert failure.expires == pytest.approx(time.time() + 10, abs=5)
+
+    def test_error_message(self):
+        """Test the message says the failure is cached and until when."""
+        failure = cache_failure("https://example.com/a.png", CLIENT_ERROR, 404)
+        error = CachedFailureError(failure)
+        assert "HTTP error: 404" in str(error.message)
+        assert "cached until" in str(error.message)
+        assert 295 <= error.retry_after <= 300
+
+
+class TestHostCircuitBreaker:
+    """Test the per-host circuit breaker."""
+
+    def test_opens_after_consecutive_failures(self):
+        """Test the circuit opens once the threshold is reached."""
+        breaker = HostCircuitBreaker("example.com", threshold=3, cooldown=30)
+        assert not breaker.record_failure()
+        assert not breaker.record_failure()
+        assert breaker.record_failure()
+
+        with pytest.raises(HostUnavailableError) as excinfo:
+            breaker.before_request()
+        assert "example.com" in str(excinfo.value.message)
+        assert "cached until" in str(excinfo.value.message)
+        assert 25 <= excinfo.value.retry_after <= 30
+
+        # Other hosts are unaffected
+        assert not HostCircuitBreaker("other.com", threshold=3).before_request()
+
+    def test_success_resets_count(self):
+        """Test only consecutive failures count."""
+        breaker = HostCircuitBreaker("example.com", threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        assert not breaker.record_failure()
+
+    def test_half_open(self):
+        """Test a single trial download is let through after the cooldown."""
+        breaker = HostCircuitBreaker("example.com", threshold=1, cooldown=30)
+        breaker.record_failure()
+        # The cooldown passes
+        cache.delete(breaker.make_key("open_until"))
+
+        trial = HostCircuitBreaker("example.com", threshold=1, cooldown=30)
+        assert trial.before_request()
+        with pytest.raises(HostUnavailableError):
+            HostCircuitBreaker("example.com", threshold=1).before_request()
+
+        trial.record_success()
+        assert not HostCircuitBreaker("example.com", threshold=1).before_request()
+
+    def test_failed_trial_reopens(self):
+        """Test a failed trial opens the circuit again."""
+        breaker = HostCircuitBreaker("example.com", threshold=1, cooldown=30)
+        breaker.record_failure()
+        cache.delete(breaker.make_key("open_until"))
+
+        assert breaker.before_request()
+        assert breaker.record_failure()
+        with pytest.raises(HostUnavailableError):
+            breaker.before_request()
+
+    def test_disabled(self):
+        """Test the breaker can be turned off."""
+        with override_settings(WAGTAIL_IMAGE_URL_CIRCUIT_BREAKER_THRESHOLD=0):
+            assert HostCircuitBreaker.for_url("https://example.com/a.png") is None
+
+
+class TestTrackFailures:
+    """Test failing fast around downloads."""
+
+    def test_caches_http_errors(self):
+        """Test a URL that returned 404 fails without another request."""
+        with pytest.raises(requests.exceptions.HTTPError):
+            with track_failures("https://example.com/missing.png"):
+                raise http_error(404)
+
+        with pytest.raises(CachedFailureError):
+            with track_failures("https://example.com/missing.png"):
+                pytest.fail("The download should not start")
+
+        # The host responded, so other URLs are still tried
+        with track_failures("https://example.com/other.png"):
+            pass
+
+    def test_opens_circuit_on_timeouts(self):
+        """Test repeated timeouts on different URLs of a host open its circuit."""
+        with override_settings(WAGTAIL_IMAGE_URL_CIRCUIT_BREAKER_THRESHOLD=2):
+            for name in ("a", "b"):
+                with pytest.raises(requests.exceptions.Timeout):
+                    with track_failures(f"https://example.com/{name}.png"):
+                        raise requests.exceptions.Timeout()
+
+            with pytest.raises(HostUnavailableError):
+                with track_failures("https://example.com/c.png"):
+                    pass
+
+    def test_throttled_trial_is_released(self):
+        """Test a trial that never reached the host lets the next download try."""
+        breaker = HostCircuitBreaker("example.com", threshold=1)
+        breaker.record_failure()
+        cache.delete(breaker.make_key("open_until"))
+
+        with override_settings(WAGTAIL_IMAGE_URL_CIRCUIT_BREAKER_THRESHOLD=1):
+            with pytest.raises(HostThrottledError):
+                with track_failures("https://example.com/a.png"):
+                    raise HostThrottledError("example.com")
+
+            with track_failures("https://example.com/a.png"):
+                pass
+            with track_failures("https://example.com/b.png"):
+                pass
+
+    def test_async(self):
+        """Test the async version records and checks failures the same way."""
+
+        async def download():
+            async with atrack_failures("https://example.com/missing.png"):
+                raise http_error(500)
+
+        with pytest.raises(requests.exceptions.HTTPError):
+            asyncio.run(download())
+        with pytest.raises(CachedFailureError):
+            asyncio.run(download())
+
+    def test_fails_fast(self):
+        """Test cached failures do not wait for the network."""
+        with patch("image_url_upload.session.requests.Session.get", side_effect=requests.exceptions.Timeout()):
+            with pytest.raises(requests.exceptions.Timeout):
+                download_image("https://example.com/slow.png")
+
+            start = time.monotonic()
+            with pytest.raises(CachedFailureError):
+                download_image("https://example.com/slow.png")
+            assert time.monotonic() - start < 0.1
@@ -0,0 +1,137 @@
+"""
+Tests for indexing images inserted with bulk_create().
+"""
+
+from unittest.mock import Mock, patch
+
+from django.test import TestCase, override_settings
+from wagtail.images import get_image_model
+from wagtail.images.rect import Rect
+from wagtail.images.tests.utils import get_test_image_file
+from wagtail.models import Collection, ReferenceIndex
+
+from image_url_upload import indexing
+from image_url_upload.indexing import (
+    add_to_search_index,
+    flush_search_index,
+    get_queued_count,
+    index_new_images,
+    queue_for_search_index,
+)
+
+Image = get_image_model()
+
+
+class IndexNewImagesTests(TestCase):
+    """Test the work of Wagtail's post_save handlers is done for bulk inserts."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        collection = Collection.get_first_root_node()
+        self.images = Image.objects.bulk_create(
+            [Image(title=title, file=get_test_image_file(), collection=collection) for title in ("red", "blue")]
+        )
+
+    def test_search_index(self):
+        """The images should be searchable once the transaction commits."""
+        with self.captureOnCommitCallbacks(execute=True):
+            index_new_images(self.images)
+
+        self.assertEqual(list(Image.objects.search("blue")), [self.images[1]])
+
+    def test_references(self):
+        """The images' references should be added to the reference index."""
+        with patch.object(ReferenceIndex, "create_or_update_for_object") as create_or_update:
+            index_new_images(self.images)
+
+        self.assertEqual([call.args[0] for call in create_or_update.call_args_list], self.images)
+
+    def test_search_backend_error(self):
+        """A failing search backend should be logged, not raised."""
+        backend = Mock()
+        backend.add_bulk.side_effect = RuntimeError("down")
+        with (
+            patch("image_url_upload.indexing.get_search_backends_with_name", return_value=[("default", backend)]),
+            self.assertLogs("image_url_upload.indexing", "ERROR"),
+        ):
+            add_to_search_index(Image, [image.pk for image in self.images])
+
+    @override_settings(WAGTAILIMAGES_FEATURE_DETECTION_ENABLED=True)
+    def test_feature_detection(self):
+        """Focal point detection should be queued when Wagtail's feature detection is on."""
+        with patch("image_url_upload.indexing.set_image_focal_point_task") as task:
+            index_new_images(self.images)
+
+        self.assertEqual(task.enqueue.call_count, 2)
+
+    @override_settings(WAGTAILIMAGES_FEATURE_DETECTION_ENABLED=True)
+    def test_feature_detection_without_tasks(self):
+        """Without Wagtail's focal point task (before 6.4), focal points should be detected right away."""
+        with (
+            patch("image_url_upload.indexing.set_image_focal_point_task", None),
+            patch.object(Image, "get_suggested_focal_point", return_value=Rect(1, 2, 5, 8)),
+        ):
+            index_new_images(self.images)
+
+        self.assertEqual(
+            list(Image.objects.order_by("pk").values_list("focal_point_x", "focal_point_y", "focal_point_width")),
+            [(3, 5, 4), (3, 5, 4)],
+        )
+
+
+@override_settings(WAGTAIL_IMAGE_URL_DEFER_SEARCH_INDEX=True, WAGTAIL_IMAGE_URL_SEARCH_INDEX_BATCH_SIZE=3)
+class DeferredSearchIndexTests(TestCase):
+    """Test new images can be queued and indexed in batches."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        collection = Collection.get_first_root_node()
+        self.images = Image.objects.bulk_create(
+            [Image(title=title, file=get_test_image_file(), collection=collection) for title in ("red", "blue")]
+        )
+
+    def test_queued_until_flushed(self):
+        """New images should be searchable only once the queue is flushed."""
+        with self.captureOnCommitCallbacks(execute=True):
+            index_new_images(self.images)
+
+        self.assertEqual(get_queued_count(), 2)
+        self.assertEqual(list(Image.objects.search("blue")), [])
+
+        self.assertEqual(flush_search_index(), 2)
+
+        self.assertEqual(get_queued_count(), 0)
+        self.assertEqual(list(Image.objects.search("blue")), [self.images[1]])
+
+    def test_full_queue_is_flushed(self):
+        """Filling the queue should flush it."""
+        queue_for_search_index(Image, [self.images[0].pk])
+        queue_for_search_index(Image, [self.images[0].pk, self.images[1].pk])
+        self.assertEqual(get_queued_count(), 2)
+
+        other = Image.objects.create(title="green", file=get_test_image_file())
+        with patch.object(indexing, "add_to_search_index") as add:
+            queue_for_search_index(Image, [other.pk])
+
+        self.assertEqual(get_queued_count(), 0)
+        add.assert_called_once_with(Image, [self.images[0].pk, self.images[1].pk, other.pk])
+
+    def test_deleted_images_skipped(self):
+        """Images deleted since they were queued should be skipped."""
+        queue_for_search_index(Image, [image.pk for image in self.images])
+        self.images[0].delete()
+
+        self.assertEqual(flush_search_index(), 1)
+
+    def test_flusher_started_once(self):
+        """One flush thread should be started per process."""
+        with (
+            override_settings(WAGTAIL_IMAGE_URL_SEARCH_INDEX_FLUSH_INTERVAL=5),
+            patch.object(indexing, "_flusher_pid", None),
+            patch("image_url_upload.indexing.threading.Thread") as thread,
+        ):
+            queue_for_search_index(Image, [self.images[0].pk])
+            queue_for_search_index(Image, [self.images[1].pk])
+
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once()
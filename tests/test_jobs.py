@@ -0,0 +1,151 @@
+"""
+Tests for the background import worker.
+"""
+
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from wagtail.images import get_image_model
+
+from image_url_upload.indexing import get_queued_count
+from image_url_upload.jobs import ImportWorker
+from image_url_upload.models import ImageSource, ImportItem, ImportJob
+from tests.server import ImageServer, make_image_bytes
+
+Image = get_image_model()
+User = get_user_model()
+
+
+@override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False)
+class ImportWorkerTests(TestCase):
+    """Test cases for ImportWorker."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.server.add("/a.png", make_image_bytes())
+        self.server.add("/b.png", make_image_bytes(color=(0, 0, 255)))
+        self.server.add("/page", b"<html>", content_type="text/html")
+
+    def _statuses(self, job):
+        return list(job.items.order_by("pk").values_list("status", flat=True))
+
+    def test_processes_queued_items(self):
+        """The worker should import every item and record the outcome."""
+        job = ImportJob.objects.enqueue(
+            self.user, [self.server.url("/a.png"), self.server.url("/b.png"), self.server.url("/page")]
+        )
+
+        processed = ImportWorker(worker_id="test").run(once=True)
+
+        self.assertEqual(processed, 3)
+        self.assertEqual(self._statuses(job), ["succeeded", "succeeded", "failed"])
+        self.assertEqual(Image.objects.count(), 2)
+        failed = job.items.get(status=ImportItem.Status.FAILED)
+        self.assertIn("Invalid file type", failed.error_message)
+        self.assertIsNone(failed.lease_token)
+        self.assertEqual(ImageSource.objects.count(), 2)
+
+    def test_images_are_owned_by_job_user(self):
+        """Imported images should be attributed to the user who queued them."""
+        ImportJob.objects.enqueue(self.user, [self.server.url("/a.png")])
+
+        ImportWorker(worker_id="test").run(once=True)
+
+        self.assertEqual(Image.objects.get().uploaded_by_user, self.user)
+
+    @override_settings(WAGTAIL_IMAGE_URL_DEFER_SEARCH_INDEX=True)
+    def test_flushes_search_index_queue(self):
+        """Images queued for the search index should be indexed after each batch."""
+        ImportJob.objects.enqueue(self.user, [self.server.url("/a.png"), self.server.url("/b.png")])
+
+        # As outside a test transaction, where each import commits on its own
+        with patch("django.db.transaction.on_commit", side_effect=lambda func, **kwargs: func()):
+            ImportWorker(worker_id="test").run(once=True)
+
+        self.assertEqual(get_queued_count(), 0)
+        self.assertEqual(list(Image.objects.search("b")), [Image.objects.get(title="b")])
+
+    def test_duplicates_are_recorded(self):
+        """Re-queued URLs should be reported as duplicates."""
+        ImportJob.objects.enqueue(self.user, [self.server.url("/a.png")])
+        ImportWorker(worker_id="test").run(once=True)
+
+        job = ImportJob.objects.enqueue(self.user, [self.server.url("/a.png")])
+        ImportWorker(worker_id="test").run(once=True)
+
+        item = job.items.get()
+        self.assertEqual(item.status, ImportItem.Status.DUPLICATE)
+        self.assertEqual(item.image, Image.objects.get())
+
+    def test_lease_renewed_after_each_item(self):
+        """The items still waiting should have their lease renewed as each import completes."""
+        job = ImportJob.objects.enqueue(self.user, [self.server.url("/a.png"), self.server.url("/b.png")])
+        lease_expiries = []
+        renew_lease = ImportItem.objects.renew_lease
+
+        def record_renewal(token, duration):
+            renewed = renew_lease(token, duration)
+            lease_expiries.append(job.items.get(status=ImportItem.Status.RUNNING).lease_expires_at)
+            return renewed
+
+        with patch.object(ImportItem.objects, "renew_lease", side_effect=record_renewal) as mock_renew:
+            started = timezone.now()
+            ImportWorker(worker_id="test", lease_seconds=60).run(once=True)
+
+        mock_renew.assert_called_once()
+        self.assertGreaterEqual(lease_expiries[0], started + timedelta(seconds=60))
+        self.assertEqual(self._statuses(job), ["succeeded", "succeeded"])
+
+    def test_gives_up_after_max_attempts(self):
+        """Items whose lease expired too often should be marked as failed."""
+        job = ImportJob.objects.enqueue(self.user, [self.server.url("/a.png")])
+        job.items.update(
+            status=ImportItem.Status.RUNNING,
+            attempts=2,
+            lease_expires_at=timezone.now() - timedelta(seconds=1),
+        )
+
+        ImportWorker(worker_id="test", max_attempts=2).run(once=True)
+
+        item = job.items.get()
+        self.assertEqual(item.status, ImportItem.Status.FAILED)
+        self.assertIn("Gave up", item.error_message)
+        self.assertEqual(Image.objects.count(), 0)
+
+    def test_user_without_permission(self):
+        """Items queued by a user who lost access should fail."""
+        editor = User.objects.create_user(username="editor", password="password")
+        job = ImportJob.objects.enqueue(editor, [self.server.url("/a.png")])
+
+        ImportWorker(worker_id="test").run(once=True)
+
+        self.assertEqual(self._statuses(job), ["failed"])
+        self.assertEqual(Image.objects.count(), 0)
+
+    def test_deleted_user(self):
+        """Items whose user was deleted should fail."""
+        job = ImportJob.objects.enqueue(None, [self.server.url("/a.png")])
+
+        ImportWorker(worker_id="test").run(once=True)
+
+        self.assertEqual(self._statuses(job), ["failed"])
+
+    def test_management_command(self):
+        """The management command should drain the queue with --once."""
+        job = ImportJob.objects.enqueue(self.user, [self.server.url("/a.png")])
+        stdout = StringIO()
+
+        call_command("process_image_url_imports", "--once", "--batch-size=5", stdout=stdout)
+
+        self.assertEqual(self._statuses(job), ["succeeded"])
+        self.assertIn("Processed 1 items", stdout.getvalue())
@@ -0,0 +1,249 @@
+"""
+Tests for import metrics and the scrape endpoint.
+"""
+
+from unittest.mock import Mock, patch
+
+import pytest
+import requests
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from image_url_upload import metrics
+from image_url_upload.exceptions import InvalidContentTypeError, UnsafeAddressError
+from image_url_upload.metrics import (
+    MetricsRegistry,
+    flush,
+    get_error_code,
+    get_totals,
+    render_prometheus,
+)
+from image_url_upload.timing import ImportTimer, report_timings
+from tests.server import ImageServer, make_image_bytes
+
+
+def http_error(status):
+    return requests.exceptions.HTTPError(response=Mock(status_code=status))
+
+
+def report(success=True, error=None, duplicate=False, size=None, phases=None):
+    timer = ImportTimer("https://example.com/a.png")
+    for phase, seconds in (phases or {}).items():
+        timer.add(phase, seconds)
+    if size:
+        timer.add_bytes("download", size)
+    timer.error = error
+    report_timings(object, timer, {"success": success, "duplicate": duplicate})
+
+
+class TestErrorCode:
+    """Test failed imports get stable labels."""
+
+    @pytest.mark.parametrize(
+        "exc, code",
+        [
+            (InvalidContentTypeError("text/html"), "invalid_content_type"),
+            (UnsafeAddressError("10.0.0.1"), "unsafe_address"),
+            (http_error(404), "http_4xx"),
+            (http_error(429), "http_4xx"),
+            (http_error(503), "http_5xx"),
+            (requests.exceptions.ConnectTimeout(), "timeout"),
+            (requests.exceptions.ConnectionError(), "connection_error"),
+            (ValueError(), "unexpected"),
+        ],
+    )
+    def test_error_code(self, exc, code):
+        assert get_error_code(exc) == code
+
+
+class TestRegistry:
+    """Test recording and rendering metrics."""
+
+    def test_histogram(self):
+        """Test values go in the first bucket they fit, and buckets are rendered cumulatively."""
+        registry = MetricsRegistry()
+        registry.observe("image_url_import_duration_seconds", 0.003, (("phase", "form"),))
+        registry.observe("image_url_import_duration_seconds", 0.2, (("phase", "form"),))
+        registry.observe("image_url_import_duration_seconds", 60, (("phase", "form"),))
+
+        output = render_prometheus(registry.collect())
+
+        assert 'image_url_import_duration_seconds_bucket{phase="form",le="0.005"} 1' in output
+        assert 'image_url_import_duration_seconds_bucket{phase="form",le="0.1"} 1' in output
+        assert 'image_url_import_duration_seconds_bucket{phase="form",le="0.25"} 2' in output
+        assert 'image_url_import_duration_seconds_bucket{phase="form",le="30"} 2' in output
+        assert 'image_url_import_duration_seconds_bucket{phase="form",le="+Inf"} 3' in output
+        assert 'image_url_import_duration_seconds_sum{phase="form"} 60.203' in output
+        assert 'image_url_import_duration_seconds_count{phase="form"} 3' in output
+
+    def test_collect(self):
+        """Test collecting takes the changes recorded so far."""
+        registry = MetricsRegistry()
+        registry.inc("image_url_imports_total", (("outcome", "success"),))
+        registry.inc("image_url_imports_total", (("outcome", "success"),))
+
+        assert registry.collect() == {("image_url_imports_total", (("outcome", "success"),)): 2}
+        assert registry.collect() == {}
+
+    def test_render_empty(self):
+        """Test every metric is described, even before any import."""
+        output = render_prometheus({})
+
+        assert "# TYPE image_url_imports_total counter" in output
+        assert "# TYPE image_url_import_duration_seconds histogram" in output
+        assert "_bucket" not in output
+
+    def test_escape_labels(self):
+        """Test label values are escaped."""
+        output = render_prometheus({("image_url_imports_total", (("outcome", 'a"b\\c'),)): 1})
+
+        assert 'image_url_imports_total{outcome="a\\"b\\\\c"} 1' in output
+
+
+class TestRecordImport:
+    """Test finished imports update the metrics."""
+
+    def test_outcomes(self):
+        """Test imports are counted by outcome."""
+        report()
+        report()
+        report(duplicate=True)
+        report(success=False, error="http_4xx")
+        report(success=False)
+
+        totals = get_totals()
+
+        assert totals[("image_url_imports_total", (("outcome", "success"),))] == 2
+        assert totals[("image_url_imports_total", (("outcome", "duplicate"),))] == 1
+        assert totals[("image_url_imports_total", (("outcome", "http_4xx"),))] == 1
+        assert totals[("image_url_imports_total", (("outcome", "error"),))] == 1
+
+    def test_bytes_and_phases(self):
+        """Test downloaded bytes and phase durations are recorded."""
+        report(size=2000, phases={"download": 0.02, "save": 0.5})
+
+        totals = get_totals()
+
+        assert totals[("image_url_downloaded_bytes_total", ())] == 2000
+        assert totals[("image_url_download_size_bytes_bucket", (("le", "10000"),))] == 1
+        assert totals[("image_url_import_duration_seconds_count", (("phase", "download"),))] == 1
+        assert totals[("image_url_import_duration_seconds_sum", (("phase", "save"),))] == 500_000
+        assert ("image_url_import_duration_seconds_count", (("phase", "total"),)) in totals
+
+    def test_disabled(self):
+        """Test nothing is recorded when metrics are turned off."""
+        with override_settings(WAGTAIL_IMAGE_URL_METRICS=False):
+            report()
+
+        assert get_totals() == {}
+
+
+class TestAggregation:
+    """Test the totals of several processes are added up in the cache."""
+
+    def test_processes_add_up(self):
+        """Test each process's changes are added to the shared totals."""
+        report()
+        flush()
+        # Another worker process, with its own unflushed changes
+        with patch.object(metrics, "registry", MetricsRegistry()):
+            report()
+            report(duplicate=True)
+            flush()
+        report()
+
+        totals = get_totals()
+
+        assert totals[("image_url_imports_total", (("outcome", "success"),))] == 3
+        assert totals[("image_url_imports_total", (("outcome", "duplicate"),))] == 1
+
+    def test_evicted_index(self):
+        """Test series are listed again if the index was evicted from the cache."""
+        report()
+        flush()
+        metrics.get_metrics_cache().delete(metrics.INDEX_KEY)
+        report()
+
+        assert get_totals()[("image_url_imports_total", (("outcome", "success"),))] == 2
+
+    def test_cache_failure(self, caplog):
+        """Test a failing cache does not raise."""
+        report()
+        with patch.object(metrics, "get_metrics_cache", side_effect=RuntimeError("down")):
+            assert flush() == 0
+
+        assert "Could not write import metrics" in caplog.text
+
+    def test_flusher_started_once(self):
+        """Test one flush thread is started per process."""
+        with (
+            override_settings(WAGTAIL_IMAGE_URL_METRICS_FLUSH_INTERVAL=10),
+            patch.object(metrics, "_flusher_pid", None),
+            patch("image_url_upload.metrics.threading.Thread") as thread,
+        ):
+            report()
+            report()
+
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once()
+
+
+@override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False, WAGTAIL_IMAGE_URL_BLOCKED_DOMAINS=["blocked.example.com"])
+class MetricsViewTests(TestCase):
+    """Test the scrape endpoint."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.user = get_user_model().objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.server.add("/a.png", make_image_bytes(size=(20, 20)))
+
+    def test_metrics(self):
+        """Imports should show up in the scraped metrics."""
+        self.client.login(username="admin", password="password")
+        self.client.post(reverse("add_from_url"), {"url": self.server.url("/a.png")})
+        self.client.post(reverse("add_from_url"), {"url": self.server.url("/a.png")})
+        self.client.post(reverse("add_from_url"), {"url": self.server.url("/missing.png")})
+        self.client.post(reverse("add_from_url"), {"url": "https://blocked.example.com/a.png"})
+
+        response = self.client.get(reverse("add_from_url_metrics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        content = response.content.decode()
+        self.assertIn('image_url_imports_total{outcome="success"} 1', content)
+        self.assertIn('image_url_imports_total{outcome="duplicate"} 1', content)
+        self.assertIn('image_url_imports_total{outcome="http_4xx"} 1', content)
+        self.assertIn('image_url_imports_total{outcome="blocked"} 1', content)
+        # The repeated import is answered from the recorded source, without a download
+        self.assertIn(f"image_url_downloaded_bytes_total {len(make_image_bytes(size=(20, 20)))}", content)
+        self.assertIn('image_url_import_duration_seconds_count{phase="save"} 1', content)
+        self.assertIn('image_url_import_duration_seconds_count{phase="total"} 4', content)
+
+    def test_superusers_only(self):
+        """Other users should not see the metrics."""
+        get_user_model().objects.create_user(username="editor", password="password", is_staff=True)
+        self.client.login(username="editor", password="password")
+
+        response = self.client.get(reverse("add_from_url_metrics"))
+
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(WAGTAIL_IMAGE_URL_METRICS_TOKEN="secret")
+    def test_token(self):
+        """Scrapers can authenticate with the metrics token."""
+        url = reverse("image_url_metrics")
+
+        self.assertEqual(self.client.get(url, headers={"Authorization": "Bearer secret"}).status_code, 200)
+        self.assertEqual(self.client.get(url, headers={"Authorization": "Bearer wrong"}).status_code, 403)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_no_token(self):
+        """Without a configured token, only superusers have access."""
+        response = self.client.get(reverse("image_url_metrics"), headers={"Authorization": "Bearer "})
+
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,188 @@
+"""
+Tests for image URL upload models.
+"""
+
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from wagtail.images import get_image_model
+from wagtail.images.permissions import permission_policy
+from wagtail.images.tests.utils import get_test_image_file
+
+from image_url_upload.models import ImageSource, ImportItem, ImportJob, get_url_hash
+
+Image = get_image_model()
+User = get_user_model()
+
+
+class ImageSourceTests(TestCase):
+    """Test cases for the ImageSource registry."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.image = Image.objects.create(title="test", file=get_test_image_file())
+
+    def test_url_hash_uses_normalized_url(self):
+        """Equivalent URL spellings should share a lookup key."""
+        self.assertEqual(
+            get_url_hash("HTTPS://Example.com:443/a.png#top"),
+            get_url_hash("https://example.com/a.png"),
+        )
+        self.assertNotEqual(
+            get_url_hash("https://example.com/a.png?size=1"),
+            get_url_hash("https://example.com/a.png?size=2"),
+        )
+
+    def test_record_creates_source(self):
+        """record() should store the normalized URL and validators."""
+        source = ImageSource.objects.record(
+            "https://EXAMPLE.com/a.png", self.image, etag='"abc"', last_modified="Wed, 21 Oct 2015 07:28:00 GMT"
+        )
+        self.assertEqual(source.url, "https://example.com/a.png")
+        self.assertEqual(source.image, self.image)
+        self.assertEqual(source.etag, '"abc"')
+        self.assertEqual(source.content_hash, self.image.file_hash)
+
+    def test_record_updates_existing_source(self):
+        """Recording the same URL again should update the existing row."""
+        ImageSource.objects.record("https://example.com/a.png", self.image, etag='"old"')
+        ImageSource.objects.record("https://example.com/a.png", self.image, etag='"new"')
+        self.assertEqual(ImageSource.objects.count(), 1)
+        self.assertEqual(ImageSource.objects.get().etag, '"new"')
+
+    def test_record_many(self):
+        """record_many() should create and update sources in one query."""
+        other = Image.objects.create(title="other", file=get_test_image_file())
+        ImageSource.objects.record("https://example.com/a.png", self.image, etag='"old"')
+
+        with self.assertNumQueries(1):
+            ImageSource.objects.record_many(
+                [
+                    ("https://example.com/a.png", other, '"new"', ""),
+                    ("https://example.com/b.png", self.image, "", None),
+                    ("https://EXAMPLE.com/b.png", other, "", ""),
+                ]
+            )
+
+        self.assertEqual(ImageSource.objects.count(), 2)
+        updated = ImageSource.objects.for_url("https://example.com/a.png").get()
+        self.assertEqual((updated.image, updated.etag), (other, '"new"'))
+        self.assertEqual(ImageSource.objects.for_url("https://example.com/b.png").get().image, other)
+
+    def test_for_url(self):
+        """for_url() should find sources by any equivalent spelling."""
+        ImageSource.objects.record("https://example.com/a.png", self.image)
+        self.assertTrue(ImageSource.objects.for_url("https://example.com:443/a.png").exists())
+        self.assertFalse(ImageSource.objects.for_url("https://example.com/b.png").exists())
+
+    def test_for_urls(self):
+        """for_urls() should find every recorded source in one query."""
+        ImageSource.objects.record("https://example.com/a.png", self.image)
+        ImageSource.objects.record("https://example.com/b.png", self.image)
+        with self.assertNumQueries(1):
+            urls = {s.url for s in ImageSource.objects.for_urls(["https://example.com/a.png", "https://x.com/"])}
+        self.assertEqual(urls, {"https://example.com/a.png"})
+
+    def test_for_user_filters_by_choose_permission(self):
+        """for_user() should hide images the user cannot choose."""
+        from django.contrib.auth import get_user_model
+
+        ImageSource.objects.record("https://example.com/a.png", self.image)
+        user = get_user_model().objects.create_user(username="nobody", password="password")
+        self.assertFalse(ImageSource.objects.for_user(user, permission_policy).exists())
+
+    def test_deleting_image_deletes_source(self):
+        """Sources should be removed with their image."""
+        ImageSource.objects.record("https://example.com/a.png", self.image)
+        self.image.delete()
+        self.assertFalse(ImageSource.objects.exists())
+
+    def test_conditional_headers(self):
+        """Stored validators should become conditional request headers."""
+        source = ImageSource(etag='"abc"', last_modified="Wed, 21 Oct 2015 07:28:00 GMT")
+        self.assertEqual(
+            source.get_conditional_headers(),
+            {"If-None-Match": '"abc"', "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT"},
+        )
+        self.assertEqual(ImageSource().get_conditional_headers(), {})
+
+
+class ImportJobTests(TestCase):
+    """Test cases for the import job queue."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.user = User.objects.create_user(username="editor", password="password")
+        self.job = ImportJob.objects.enqueue(self.user, [f"https://example.com/{i}.png" for i in range(5)])
+
+    def test_enqueue_creates_items_in_order(self):
+        """enqueue() should create one pending item per URL."""
+        items = list(self.job.items.order_by("pk"))
+        self.assertEqual([item.url for item in items], [f"https://example.com/{i}.png" for i in range(5)])
+        self.assertTrue(all(item.status == ImportItem.Status.PENDING for item in items))
+
+    def test_lease_claims_items(self):
+        """lease() should mark items as running for the worker."""
+        items = ImportItem.objects.lease("worker-1", limit=2, duration=60)
+
+        self.assertEqual([item.url for item in items], ["https://example.com/0.png", "https://example.com/1.png"])
+        for item in items:
+            item.refresh_from_db()
+            self.assertEqual(item.status, ImportItem.Status.RUNNING)
+            self.assertEqual(item.leased_by, "worker-1")
+            self.assertEqual(item.attempts, 1)
+            self.assertIsNotNone(item.lease_token)
+
+    def test_leases_do_not_overlap(self):
+        """Concurrent leases should never claim the same item twice."""
+        first = ImportItem.objects.lease("worker-1", limit=3, duration=60)
+        second = ImportItem.objects.lease("worker-2", limit=3, duration=60)
+        third = ImportItem.objects.lease("worker-3", limit=3, duration=60)
+
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertEqual(third, [])
+        self.assertFalse({item.pk for item in first} & {item.pk for item in second})
+
+    def test_expired_lease_is_reclaimed(self):
+        """Items whose lease expired should be leased again."""
+        first = ImportItem.objects.lease("worker-1", limit=1, duration=60)
+        ImportItem.objects.filter(pk=first[0].pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+        second = ImportItem.objects.lease("worker-2", limit=1, duration=60)
+
+        self.assertEqual(second[0].pk, first[0].pk)
+        self.assertEqual(second[0].attempts, 2)
+
+    def test_complete_requires_current_lease(self):
+        """A worker whose lease was taken over should not overwrite the result."""
+        stale = ImportItem.objects.lease("worker-1", limit=1, duration=60)[0]
+        ImportItem.objects.filter(pk=stale.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        current = ImportItem.objects.lease("worker-2", limit=1, duration=60)[0]
+
+        self.assertFalse(stale.complete({"success": False, "error_message": "stale"}))
+        self.assertTrue(current.complete({"success": True, "image_id": None}))
+        current.refresh_from_db()
+        self.assertEqual(current.status, ImportItem.Status.SUCCEEDED)
+
+    def test_renew_lease(self):
+        """renew_lease() should extend only the unfinished items still held under the token."""
+        items = ImportItem.objects.lease("worker-1", limit=3, duration=60)
+        items[0].complete({"success": True, "image_id": None})
+        ImportItem.objects.filter(pk=items[1].pk).update(lease_token=None)
+
+        self.assertEqual(ImportItem.objects.renew_lease(items[0].lease_token, 600), 1)
+        items[2].refresh_from_db()
+        self.assertGreater(items[2].lease_expires_at, timezone.now() + timedelta(seconds=300))
+
+    def test_status_counts(self):
+        """get_status_counts() should count every status."""
+        item = ImportItem.objects.lease("worker-1", limit=1, duration=60)[0]
+        item.complete({"success": False, "error_message": "boom"})
+
+        self.assertEqual(
+            self.job.get_status_counts(),
+            {"pending": 4, "running": 0, "succeeded": 0, "duplicate": 0, "failed": 1},
+        )
@@ -0,0 +1,312 @@
+"""
+Tests for ingest-time image normalization.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from concurrent.futures import BrokenExecutor
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from django.test import override_settings
+from PIL import Image as PILImage
+
+from image_url_upload.download import DownloadedFile, TemporaryDownloadedFile, create_buffer
+from image_url_upload.normalize import (
+    anormalize_download,
+    get_normalize_options,
+    get_pool,
+    get_target_size,
+    normalize_download,
+    normalize_image_data,
+    shutdown_pool,
+)
+from tests.server import make_image_bytes
+
+
+def make_options(**options):
+    with override_settings(WAGTAIL_IMAGE_URL_NORMALIZE=options):
+        return get_normalize_options()
+
+
+def make_file(data, name="image.png", content_type="image/png"):
+    return DownloadedFile(
+        file=BytesIO(data),
+        name=name,
+        content_type=content_type,
+        size=len(data),
+        url=f"https://example.com/{name}",
+        content_hash=hashlib.sha1(data).hexdigest(),
+        etag='"v1"',
+    )
+
+
+def make_spooled_file(data, name="image.png", content_type="image/png"):
+    with override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0):
+        buffer = create_buffer(len(data))
+    buffer.write(data)
+    buffer.seek(0)
+    return DownloadedFile.from_buffer(
+        buffer,
+        name=name,
+        content_type=content_type,
+        size=len(data),
+        url=f"https://example.com/{name}",
+        content_hash=hashlib.sha1(data).hexdigest(),
+    )
+
+
+def open_result(result):
+    return PILImage.open(BytesIO(result[0]))
+
+
+def slow_normalize_image_data(source, options):
+    """Stand in for normalize_image_data() in a worker that gets stuck."""
+    time.sleep(2)
+
+
+class TestGetTargetSize:
+    """Test downscaled dimensions."""
+
+    def test_fits(self):
+        """Test images within the limits are not resized."""
+        assert get_target_size(800, 600, 1000, 1000) is None
+        assert get_target_size(800, 600, None, None) is None
+
+    def test_keeps_aspect_ratio(self):
+        """Test the most restrictive limit decides the scale."""
+        assert get_target_size(4000, 2000, 1000, 1000) == (1000, 500)
+        assert get_target_size(2000, 4000, 1000, None) == (1000, 2000)
+
+
+class TestNormalizeImageData:
+    """Test the Pillow work done in the worker processes."""
+
+    def test_downscale(self):
+        """Test oversized images are scaled down in their own format."""
+        data = make_image_bytes("PNG", size=(400, 200))
+        result = normalize_image_data(data, make_options(max_width=100, max_height=100))
+
+        assert result[1:] == ("PNG", 100, 50)
+        assert open_result(result).size == (100, 50)
+
+    def test_unchanged(self):
+        """Test images needing no change are kept."""
+        data = make_image_bytes("PNG", size=(40, 20))
+        assert normalize_image_data(data, make_options(max_width=100, max_height=100)) is None
+
+    def test_file_path(self):
+        """Test images can be read from a file, which is memory-mapped."""
+        data = make_image_bytes("PNG", size=(400, 200))
+        with make_spooled_file(data) as file:
+            result = normalize_image_data(file.temporary_file_path(), make_options(max_width=100))
+
+        assert result == normalize_image_data(data, make_options(max_width=100))
+
+    def test_jpeg_draft(self):
+        """Test large JPEGs are decoded at reduced scale and resized exactly."""
+        data = make_image_bytes("JPEG", size=(1600, 1200))
+        result = normalize_image_data(data, make_options(max_width=200, quality=70))
+
+        assert result[1:] == ("JPEG", 200, 150)
+        assert open_result(result).size == (200, 150)
+
+    def test_exif_orientation(self):
+        """Test the EXIF orientation is applied to the pixels."""
+        image = PILImage.new("RGB", (40, 20), (255, 0, 0))
+        exif = image.getexif()
+        exif[0x0112] = 6  # Rotated 90 degrees
+        buffer = BytesIO()
+        image.save(buffer, format="JPEG", exif=exif)
+
+        result = normalize_image_data(buffer.getvalue(), make_options(auto_orient=True))
+
+        assert result[2:] == (20, 40)
+        assert open_result(result).getexif().get(0x0112, 1) == 1
+
+    def test_exif_orientation_ignored(self):
+        """Test orientation is left alone if auto_orient is off."""
+        image = PILImage.new("RGB", (40, 20))
+        exif = image.getexif()
+        exif[0x0112] = 6
+        buffer = BytesIO()
+        image.save(buffer, format="JPEG", exif=exif)
+
+        assert normalize_image_data(buffer.getvalue(), make_options(auto_orient=False)) is None
+
+    def test_transcode(self):
+        """Test configured formats are transcoded."""
+        data = make_image_bytes("BMP", size=(64, 64))
+        result = normalize_image_data(data, make_options(transcode={"bmp": "webp"}))
+
+        assert result[1:] == ("WEBP", 64, 64)
+        assert open_result(result).format == "WEBP"
+        assert len(result[0]) < len(data)
+
+    def test_transcode_min_size(self):
+        """Test files below the format's threshold are not transcoded."""
+        data = make_image_bytes("PNG", size=(64, 64))
+        options = make_options(transcode={"PNG": "WEBP"}, transcode_min_size={"PNG": len(data) + 1})
+
+        assert normalize_image_data(data, options) is None
+
+    def test_alpha_not_transcoded_to_jpeg(self):
+        """Test transparent images keep a format that supports transparency."""
+        buffer = BytesIO()
+        PILImage.new("RGBA", (400, 400), (255, 0, 0, 128)).save(buffer, format="PNG")
+
+        assert normalize_image_data(buffer.getvalue(), make_options(transcode={"PNG": "JPEG"})) is None
+
+        result = normalize_image_data(buffer.getvalue(), make_options(max_width=100, transcode={"PNG": "JPEG"}))
+        assert result[1] == "PNG"
+        assert open_result(result).mode == "RGBA"
+
+    def test_animated_skipped(self):
+        """Test animated images are kept as they are."""
+        frames = [PILImage.new("RGB", (400, 400), color) for color in ((255, 0, 0), (0, 255, 0))]
+        buffer = BytesIO()
+        frames[0].save(buffer, format="GIF", save_all=True, append_images=frames[1:])
+
+        assert normalize_image_data(buffer.getvalue(), make_options(max_width=100)) is None
+
+
+class TestNormalizeDownload:
+    """Test normalization of downloaded files."""
+
+    @pytest.fixture(autouse=True)
+    def inline(self):
+        with override_settings(WAGTAIL_IMAGE_URL_NORMALIZE_WORKERS=0):
+            yield
+
+    def test_disabled_by_default(self):
+        """Test files are untouched without the setting."""
+        file = make_file(make_image_bytes("PNG", size=(400, 200)))
+        assert normalize_download(file) is file
+
+    def test_normalized_file(self):
+        """Test the new file's name, type, size, hash and dimensions match its contents."""
+        file = make_file(make_image_bytes("BMP", size=(400, 200)), name="photo.bmp", content_type="image/bmp")
+
+        with override_settings(WAGTAIL_IMAGE_URL_NORMALIZE={"max_width": 100, "transcode": {"BMP": "WEBP"}}):
+            normalized = normalize_download(file)
+
+        data = normalized.read()
+        assert normalized.name == "photo.webp"
+        assert normalized.content_type == "image/webp"
+        assert normalized.size == len(data)
+        assert normalized.content_hash == hashlib.sha1(data).hexdigest()
+        assert tuple(normalized.image_info) == ("image/webp", 100, 50, 1)
+        assert normalized.url == file.url
+        assert normalized.etag == '"v1"'
+
+    def test_spooled_file(self):
+        """Test files spooled to disk are normalized from their path, not read into memory."""
+        file = make_spooled_file(make_image_bytes("PNG", size=(400, 200)))
+
+        with (
+            override_settings(WAGTAIL_IMAGE_URL_NORMALIZE={"max_width": 100}),
+            patch("image_url_upload.normalize.normalize_image_data", wraps=normalize_image_data) as normalize,
+        ):
+            normalized = normalize_download(file)
+
+        assert normalize.call_args.args[0] == file.temporary_file_path()
+        assert tuple(normalized.image_info) == ("image/png", 100, 50, 1)
+
+    def test_large_result_spooled(self):
+        """Test normalized images over the in-memory limit are spooled to disk too."""
+        file = make_file(make_image_bytes("BMP", size=(400, 200)), name="photo.bmp", content_type="image/bmp")
+
+        with override_settings(
+            WAGTAIL_IMAGE_URL_NORMALIZE={"max_width": 100, "transcode": {"BMP": "PNG"}},
+            FILE_UPLOAD_MAX_MEMORY_SIZE=10,
+        ):
+            normalized = normalize_download(file)
+
+        assert isinstance(normalized, TemporaryDownloadedFile)
+        assert PILImage.open(normalized.temporary_file_path()).size == (100, 50)
+
+    def test_invalid_image_kept(self):
+        """Test files Pillow cannot read are passed on unchanged."""
+        file = make_file(b"not an image")
+
+        with override_settings(WAGTAIL_IMAGE_URL_NORMALIZE={"max_width": 100}):
+            assert normalize_download(file) is file
+        assert file.read() == b"not an image"
+
+    def test_async(self):
+        """Test the async version produces the same result."""
+        file = make_file(make_image_bytes("PNG", size=(400, 200)))
+
+        with override_settings(WAGTAIL_IMAGE_URL_NORMALIZE={"max_width": 100}):
+            normalized = asyncio.run(anormalize_download(file))
+
+        assert tuple(normalized.image_info) == ("image/png", 100, 50, 1)
+
+
+class TestProcessPool:
+    """Test normalization in worker processes."""
+
+    @pytest.fixture(autouse=True)
+    def pool(self):
+        with override_settings(WAGTAIL_IMAGE_URL_NORMALIZE_WORKERS=1):
+            yield
+        shutdown_pool()
+
+    def test_pool(self):
+        """Test images are normalized in the pool, sync and async."""
+        with override_settings(WAGTAIL_IMAGE_URL_NORMALIZE={"max_width": 100}):
+            normalized = normalize_download(make_file(make_image_bytes("PNG", size=(400, 200))))
+            anormalized = asyncio.run(anormalize_download(make_file(make_image_bytes("PNG", size=(200, 400)))))
+
+        assert tuple(normalized.image_info) == ("image/png", 100, 50, 1)
+        assert tuple(anormalized.image_info) == ("image/png", 100, 200, 1)
+
+    def test_spooled_file(self):
+        """Test workers read files spooled to disk by path."""
+        with override_settings(WAGTAIL_IMAGE_URL_NORMALIZE={"max_width": 100}):
+            normalized = normalize_download(make_spooled_file(make_image_bytes("PNG", size=(400, 200))))
+
+        assert tuple(normalized.image_info) == ("image/png", 100, 50, 1)
+
+    def test_broken_pool_replaced(self):
+        """Test a pool whose worker died is replaced, instead of failing every later normalization."""
+        with pytest.raises(BrokenExecutor):
+            get_pool().submit(os._exit, 1).result()
+
+        with override_settings(WAGTAIL_IMAGE_URL_NORMALIZE={"max_width": 100}):
+            file = make_file(make_image_bytes("PNG", size=(400, 200)))
+            assert normalize_download(file) is file
+
+            normalized = normalize_download(make_file(make_image_bytes("PNG", size=(400, 200))))
+
+        assert tuple(normalized.image_info) == ("image/png", 100, 50, 1)
+
+    def test_broken_pool_replaced_async(self):
+        """Test the async version replaces a broken pool too."""
+        with pytest.raises(BrokenExecutor):
+            get_pool().submit(os._exit, 1).result()
+
+        with override_settings(WAGTAIL_IMAGE_URL_NORMALIZE={"max_width": 100}):
+            file = make_file(make_image_bytes("PNG", size=(400, 200)))
+            assert asyncio.run(anormalize_download(file)) is file
+
+            normalized = asyncio.run(anormalize_download(make_file(make_image_bytes("PNG", size=(400, 200)))))
+
+        assert tuple(normalized.image_info) == ("image/png", 100, 50, 1)
+
+    @pytest.mark.parametrize("normalize", [normalize_download, lambda file: asyncio.run(anormalize_download(file))])
+    def test_timeout(self, normalize):
+        """Test a pool that takes too long is replaced and the original kept, sync and async."""
+        stuck_pool = get_pool()
+        file = make_file(make_image_bytes("PNG", size=(400, 200)))
+
+        with (
+            override_settings(WAGTAIL_IMAGE_URL_NORMALIZE={"max_width": 100}, WAGTAIL_IMAGE_URL_NORMALIZE_TIMEOUT=0.5),
+            patch("image_url_upload.normalize.normalize_image_data", slow_normalize_image_data),
+        ):
+            assert normalize(file) is file
+
+        assert get_pool() is not stuck_pool
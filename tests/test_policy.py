@@ -0,0 +1,126 @@
+"""
+Tests for the compiled domain allow/block policy.
+"""
+
+from django.test import override_settings
+
+from image_url_upload.policy import (
+    DomainPolicy,
+    DomainTrie,
+    get_domain_policy,
+    normalize_hostname,
+    reset_domain_policy,
+)
+
+
+class TestNormalizeHostname:
+    """Test hostname normalization."""
+
+    def test_lowercase(self):
+        """Test hostnames are lowercased."""
+        assert normalize_hostname("EXAMPLE.com") == "example.com"
+
+    def test_port_removed(self):
+        """Test ports are stripped."""
+        assert normalize_hostname("example.com:443") == "example.com"
+
+    def test_trailing_dot_removed(self):
+        """Test fully qualified names lose their trailing dot."""
+        assert normalize_hostname("example.com.") == "example.com"
+
+    def test_idna(self):
+        """Test internationalized names are converted to punycode."""
+        assert normalize_hostname("bücher.example") == "xn--bcher-kva.example"
+
+    def test_ipv6(self):
+        """Test IPv6 literals keep their colons and lose brackets and ports."""
+        assert normalize_hostname("[::1]:8080") == "::1"
+        assert normalize_hostname("::1") == "::1"
+
+
+class TestDomainTrie:
+    """Test exact and wildcard matching."""
+
+    def test_exact_match(self):
+        """Test exact rules match only the same hostname."""
+        trie = DomainTrie(["example.com"])
+        assert trie.match("example.com")
+        assert not trie.match("cdn.example.com")
+        assert not trie.match("com")
+        assert not trie.match("notexample.com")
+
+    def test_wildcard_matches_subdomains(self):
+        """Test wildcard rules match subdomains at any depth but not the apex."""
+        trie = DomainTrie(["*.example.com"])
+        assert trie.match("cdn.example.com")
+        assert trie.match("img.cdn.example.com")
+        assert not trie.match("example.com")
+        assert not trie.match("badexample.com")
+
+    def test_exact_and_wildcard(self):
+        """Test an apex rule and a wildcard rule can coexist."""
+        trie = DomainTrie(["example.com", "*.example.com"])
+        assert trie.match("example.com")
+        assert trie.match("cdn.example.com")
+
+    def test_rules_are_normalized(self):
+        """Test rules with case, ports and unicode are normalized."""
+        trie = DomainTrie(["EXAMPLE.com:443", "*.BÜCHER.example"])
+        assert trie.match("example.com")
+        assert trie.match("shop.xn--bcher-kva.example")
+
+    def test_empty_labels(self):
+        """Test hostnames with empty labels are compared, not walked into a rule's end marker."""
+        trie = DomainTrie(["example.com", "*.cdn.example.com"])
+        assert not trie.match("a..example.com")
+        assert not trie.match(".example.com")
+        assert trie.match("a..cdn.example.com")
+
+    def test_large_list(self):
+        """Test lookups against tens of thousands of rules."""
+        trie = DomainTrie(f"host{i}.example.com" for i in range(50000))
+        assert len(trie) == 50000
+        assert trie.match("host49999.example.com")
+        assert not trie.match("host50000.example.com")
+
+
+class TestDomainPolicy:
+    """Test allow/block precedence."""
+
+    def test_allow_list_takes_precedence(self):
+        """Test the block list is ignored when an allow list is set."""
+        policy = DomainPolicy(allowed_domains=["*.example.com"], blocked_domains=["cdn.example.com"])
+        assert policy.is_allowed("cdn.example.com") == (True, None)
+        assert policy.is_allowed("other.com") == (False, "not_allowed")
+
+    def test_block_list(self):
+        """Test hosts matching the block list are rejected."""
+        policy = DomainPolicy(blocked_domains=["*.spam.com"])
+        assert policy.is_allowed("a.spam.com") == (False, "blocked")
+        assert policy.is_allowed("spam.com") == (True, None)
+
+    def test_block_list_empty_label(self):
+        """Test a hostname with an empty label is checked without raising."""
+        policy = DomainPolicy(blocked_domains=["example.com"])
+        assert policy.is_allowed("a..example.com") == (True, None)
+
+    def test_empty_allow_list_blocks_everything(self):
+        """Test an empty allow list allows nothing."""
+        assert DomainPolicy(allowed_domains=[]).is_allowed("example.com") == (False, "not_allowed")
+
+
+class TestGetDomainPolicy:
+    """Test caching of the compiled policy."""
+
+    def test_policy_is_cached(self):
+        """Test the policy is compiled once."""
+        reset_domain_policy()
+        assert get_domain_policy() is get_domain_policy()
+
+    def test_rebuilt_on_setting_changed(self):
+        """Test changing the domain settings rebuilds the policy."""
+        policy = get_domain_policy()
+        with override_settings(WAGTAIL_IMAGE_URL_BLOCKED_DOMAINS=["spam.com"]):
+            assert get_domain_policy() is not policy
+            assert get_domain_policy().is_allowed("spam.com") == (False, "blocked")
+        assert get_domain_policy().is_allowed("spam.com") == (True, None)
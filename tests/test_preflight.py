@@ -0,0 +1,273 @@
+"""
+Tests for preflight checks of image URLs.
+"""
+
+from contextlib import contextmanager
+from unittest.mock import Mock, patch
+
+import pytest
+import requests
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from wagtail.images import get_image_model
+
+from image_url_upload.exceptions import FileTooLargeError, InvalidImageError
+from image_url_upload.failures import (
+    CLIENT_ERROR,
+    HostCircuitBreaker,
+    cache_failure,
+    get_cached_failure,
+    track_failures,
+)
+from image_url_upload.preflight import PREFLIGHT_BYTES, check_url, fetch_image_head, get_total_size
+from tests.server import ImageServer, make_image_bytes, make_noise_image_bytes
+
+Image = get_image_model()
+
+
+def make_response(chunks, status_code=200, headers=None):
+    """Create a mock streamed response yielding the given chunks."""
+    response = Mock()
+    response.status_code = status_code
+    response.headers = {"Content-Type": "image/png", **(headers or {})}
+    response.iter_content.return_value = iter(chunks)
+    return response
+
+
+class TestGetTotalSize:
+    """Test finding the size of the whole file from a range response."""
+
+    def test_partial_content(self):
+        """Test the size comes from Content-Range on partial responses."""
+        response = make_response([], 206, {"Content-Range": "bytes 0-65535/1234567", "Content-Length": "65536"})
+
+        assert get_total_size(response) == 1234567
+
+    def test_unknown_size(self):
+        """Test an unknown total size."""
+        assert get_total_size(make_response([], 206, {"Content-Range": "bytes 0-65535/*"})) is None
+
+    def test_full_content(self):
+        """Test servers that ignore Range report the size in Content-Length."""
+        assert get_total_size(make_response([], 200, {"Content-Length": "100"})) == 100
+
+
+@patch("image_url_upload.preflight.get_session")
+class TestFetchImageHead:
+    """Test inspecting the start of an image."""
+
+    def test_requests_range(self, get_session):
+        """Test only the start of the image is requested."""
+        png = make_image_bytes(size=(30, 20))
+        get_session.return_value.get.return_value = make_response([png])
+
+        fetch_image_head("https://example.com/a.png")
+
+        get_session.return_value.get.assert_called_once_with(
+            "https://example.com/a.png", timeout=5, stream=True, headers={"Range": f"bytes=0-{PREFLIGHT_BYTES - 1}"}
+        )
+
+    def test_partial_image(self, get_session):
+        """Test the dimensions are read from the header of a partial response."""
+        bmp = make_image_bytes("BMP", size=(300, 200))
+        get_session.return_value.get.return_value = response = make_response(
+            [bmp[:PREFLIGHT_BYTES]], 206, {"Content-Type": "image/bmp", "Content-Range": f"bytes 0-65535/{len(bmp)}"}
+        )
+
+        head = fetch_image_head("https://example.com/a.bmp")
+
+        assert head == {"content_type": "image/bmp", "size": len(bmp), "width": 300, "height": 200, "content_hash": ""}
+        response.close.assert_called_once()
+
+    def test_range_ignored(self, get_session):
+        """Test reading stops at the range when the server sends the whole file."""
+        bmp = make_image_bytes("BMP", size=(300, 200))
+        chunks = [bmp[i : i + 1000] for i in range(0, len(bmp), 1000)]
+        get_session.return_value.get.return_value = response = make_response(chunks, 200, {"Content-Type": "image/bmp"})
+
+        head = fetch_image_head("https://example.com/a.bmp")
+
+        assert (head["width"], head["height"], head["content_hash"]) == (300, 200, "")
+        response.close.assert_called_once()
+
+    def test_too_large(self, get_session):
+        """Test files larger than an import accepts are rejected from the headers."""
+        get_session.return_value.get.return_value = make_response(
+            [b""], 206, {"Content-Range": "bytes 0-65535/20000000"}
+        )
+
+        with pytest.raises(FileTooLargeError):
+            fetch_image_head("https://example.com/a.png")
+
+    def test_not_an_image(self, get_session):
+        """Test files that are not images are rejected."""
+        get_session.return_value.get.return_value = make_response([b"<html>" * 10])
+
+        with pytest.raises(InvalidImageError):
+            fetch_image_head("https://example.com/a.png")
+
+
+    def test_throttle_held_while_reading(self, get_session):
+        """Test the host's throttle slot is held until the body has been read."""
+        held = []
+
+        @contextmanager
+        def throttle(url):
+            held.append(True)
+            yield
+            held.pop()
+
+        def chunks():
+            assert held
+            yield make_image_bytes()
+
+        response = make_response([])
+        response.iter_content.return_value = chunks()
+        get_session.return_value.get.return_value = response
+
+        with patch("image_url_upload.preflight.host_throttle", throttle):
+            fetch_image_head("https://example.com/a.png")
+
+        assert not held
+
+
+@patch("image_url_upload.preflight.get_session")
+class TestCheckUrl:
+    """Test checks read the failure cache without updating it."""
+
+    def test_failures_not_recorded(self, get_session):
+        """Test a timed out check neither caches a failure nor counts toward opening the circuit."""
+        get_session.return_value.get.side_effect = requests.exceptions.Timeout()
+
+        with override_settings(WAGTAIL_IMAGE_URL_CIRCUIT_BREAKER_THRESHOLD=1):
+            result = check_url("https://example.com/slow.png")
+
+            assert not result["valid"]
+            assert get_cached_failure("https://example.com/slow.png") is None
+            with track_failures("https://example.com/slow.png"):
+                pass
+
+    def test_known_failures(self, get_session):
+        """Test URLs whose import failed recently are reported without a request."""
+        cache_failure("https://example.com/missing.png", CLIENT_ERROR, 404)
+
+        result = check_url("https://example.com/missing.png")
+
+        assert not result["valid"]
+        get_session.return_value.get.assert_not_called()
+
+    def test_trial_left_to_import(self, get_session):
+        """Test a check does not take the one trial download of a half-open circuit."""
+        get_session.return_value.get.return_value = make_response([make_image_bytes()])
+        breaker = HostCircuitBreaker("example.com", threshold=1)
+        breaker.record_failure()
+        cache.delete(breaker.make_key("open_until"))
+
+        with override_settings(WAGTAIL_IMAGE_URL_CIRCUIT_BREAKER_THRESHOLD=1):
+            assert check_url("https://example.com/a.png")["valid"]
+            with track_failures("https://example.com/b.png"):
+                pass
+
+
+@override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False, WAGTAIL_IMAGE_URL_BLOCKED_DOMAINS=["blocked.example.com"])
+class AddFromURLPreflightViewTests(TestCase):
+    """Test cases for the preflight view."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        get_user_model().objects.create_superuser(username="admin", email="admin@example.com", password="password")
+        self.client.login(username="admin", password="password")
+        self.url = reverse("add_from_url_preflight")
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+    def _preflight(self, urls):
+        response = self.client.post(self.url, {"urls": urls})
+        self.assertTrue(response.json()["success"])
+        return response.json()["results"]
+
+    def test_checks_each_url(self):
+        """Each URL should get its details or the reason it would fail, in order."""
+        png = make_image_bytes(size=(30, 20))
+        self.server.add("/a.png", png)
+        self.server.add("/page", b"<html>", content_type="text/html")
+        urls = [
+            self.server.url("/a.png"),
+            self.server.url("/page"),
+            self.server.url("/missing.png"),
+            "https://blocked.example.com/a.png",
+        ]
+
+        results = self._preflight(urls)
+
+        self.assertEqual([result["url"] for result in results], urls)
+        self.assertEqual(
+            results[0],
+            {
+                "url": urls[0],
+                "valid": True,
+                "duplicate": False,
+                "content_type": "image/png",
+                "size": len(png),
+                "width": 30,
+                "height": 20,
+            },
+        )
+        self.assertEqual([result["valid"] for result in results[1:]], [False, False, False])
+        self.assertIn("Invalid file type", results[1]["error_message"])
+        self.assertEqual(results[2]["error_message"], "HTTP error: 404")
+
+    def test_large_image(self):
+        """Images larger than the range should be reported without being downloaded whole."""
+        body = make_noise_image_bytes("PNG", size=(400, 400))
+        self.assertGreater(len(body), PREFLIGHT_BYTES)
+        self.server.add("/big.png", body, chunk_size=16 * 1024)
+
+        (result,) = self._preflight([self.server.url("/big.png")])
+
+        self.assertTrue(result["valid"])
+        self.assertEqual((result["width"], result["height"], result["size"]), (400, 400, None))
+
+    def test_known_url_is_not_fetched(self):
+        """URLs imported before should be reported as duplicates without a request."""
+        route = self.server.add("/a.png", make_image_bytes())
+        self.client.post(reverse("add_from_url"), {"url": self.server.url("/a.png")})
+
+        (result,) = self._preflight([self.server.url("/a.png")])
+
+        self.assertTrue(result["duplicate"])
+        self.assertEqual(result["image_id"], Image.objects.get().pk)
+        self.assertEqual(len(route.requests), 1)
+
+    def test_known_contents(self):
+        """Small images should be matched against the library by contents."""
+        png = make_image_bytes()
+        self.server.add("/a.png", png)
+        self.server.add("/copy.png", png)
+        self.client.post(reverse("add_from_url"), {"url": self.server.url("/a.png")})
+
+        (result,) = self._preflight([self.server.url("/copy.png")])
+
+        self.assertTrue(result["duplicate"])
+        self.assertEqual(result["image_id"], Image.objects.get().pk)
+
+    def test_results_are_cached(self):
+        """Checking a URL again should not fetch it again."""
+        route = self.server.add("/a.png", make_image_bytes())
+        self.server.add("/page", b"<html>", content_type="text/html")
+
+        self._preflight([self.server.url("/a.png"), self.server.url("/page")])
+        results = self._preflight(["HTTP://" + self.server.url("/a.png")[7:], self.server.url("/page")])
+
+        self.assertTrue(results[0]["valid"])
+        self.assertFalse(results[1]["valid"])
+        self.assertEqual(len(route.requests), 1)
+        self.assertEqual(len(self.server.httpd.routes["/page"].requests), 1)
+
+    def test_invalid_request(self):
+        """A request without URLs should be rejected."""
+        response = self.client.post(self.url, {})
+
+        self.assertFalse(response.json()["success"])
@@ -0,0 +1,170 @@
+"""
+Tests for early image inspection.
+"""
+
+import random
+from io import BytesIO
+
+import pytest
+from PIL import Image as PILImage
+
+from image_url_upload.exceptions import ImageTooLargeError, InvalidImageError
+from image_url_upload.probe import (
+    SNIFF_SIZE,
+    GIFFrameCounter,
+    ImageProbe,
+    get_webp_size,
+    sniff_image_type,
+)
+from tests.server import make_image_bytes
+
+
+def make_gif(frames, size=(8, 8), noise=False):
+    """Create an animated GIF with the given number of distinct frames."""
+    if noise:
+        # Noise compresses badly, so each frame takes up real space in the file
+        rng = random.Random(0)
+        images = [PILImage.frombytes("L", size, rng.randbytes(size[0] * size[1])) for _ in range(frames)]
+    else:
+        images = [PILImage.new("RGB", size, (i * 20 % 256, 0, 0)) for i in range(frames)]
+    buffer = BytesIO()
+    images[0].save(buffer, format="GIF", save_all=True, append_images=images[1:], duration=10)
+    return buffer.getvalue()
+
+
+def feed_in_chunks(probe, data, chunk_size):
+    """Feed data to a probe in fixed-size chunks and return the number of bytes fed."""
+    fed = 0
+    for offset in range(0, len(data), chunk_size):
+        chunk = data[offset:offset + chunk_size]
+        probe.feed(chunk)
+        fed += len(chunk)
+    return fed
+
+
+class TestSniffImageType:
+    """Test signature matching."""
+
+    @pytest.mark.parametrize(
+        "image_format, content_type",
+        [
+            ("JPEG", "image/jpeg"),
+            ("PNG", "image/png"),
+            ("GIF", "image/gif"),
+            ("BMP", "image/bmp"),
+            ("WEBP", "image/webp"),
+        ],
+    )
+    def test_known_formats(self, image_format, content_type):
+        """Test each supported format is recognised."""
+        assert sniff_image_type(make_image_bytes(image_format)[:12]) == content_type
+
+    def test_unknown_data(self):
+        """Test non-image data is not recognised."""
+        assert sniff_image_type(b"<!DOCTYPE html>") is None
+        assert sniff_image_type(b"RIFF\x00\x00\x00\x00WAVE") is None
+
+
+class TestGetWebpSize:
+    """Test WEBP header parsing."""
+
+    @pytest.mark.parametrize("lossless", [False, True])
+    def test_simple_formats(self, lossless):
+        """Test lossy (VP8) and lossless (VP8L) headers."""
+        buffer = BytesIO()
+        PILImage.new("RGB", (300, 200)).save(buffer, format="WEBP", lossless=lossless)
+        assert get_webp_size(buffer.getvalue()[:64]) == (300, 200)
+
+    def test_extended_format(self):
+        """Test VP8X headers, as used by animated images."""
+        buffer = BytesIO()
+        frames = [PILImage.new("RGB", (40, 30), (i, 0, 0)) for i in (0, 255)]
+        frames[0].save(buffer, format="WEBP", save_all=True, append_images=frames[1:])
+        data = buffer.getvalue()
+        assert data[12:16] == b"VP8X"
+        assert get_webp_size(data[:64]) == (40, 30)
+
+    def test_incomplete_header(self):
+        """Test a truncated header."""
+        assert get_webp_size(make_image_bytes("WEBP")[:20]) is None
+
+
+class TestGIFFrameCounter:
+    """Test incremental GIF frame counting."""
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 64, 100000])
+    def test_counts_frames(self, chunk_size):
+        """Test frames are counted whatever the chunk boundaries."""
+        data = make_gif(5)
+        counter = GIFFrameCounter()
+        for offset in range(0, len(data), chunk_size):
+            counter.feed(data[offset:offset + chunk_size])
+        assert counter.frames == 5
+        assert counter.finished
+
+    def test_partial_data(self):
+        """Test only frames seen so far are counted."""
+        data = make_gif(4, size=(64, 64))
+        counter = GIFFrameCounter()
+        counter.feed(data[: len(data) // 2])
+        assert 1 <= counter.frames < 4
+
+
+class TestImageProbe:
+    """Test chunk-by-chunk inspection of downloads."""
+
+    @pytest.mark.parametrize("image_format", ["JPEG", "PNG", "GIF", "BMP", "WEBP"])
+    def test_reports_info(self, image_format):
+        """Test format and dimensions are found for every supported format."""
+        data = make_image_bytes(image_format, size=(30, 20))
+        probe = ImageProbe()
+        feed_in_chunks(probe, data, 5)
+        info = probe.close()
+        assert (info.width, info.height, info.frames) == (30, 20, 1)
+        assert info.content_type == sniff_image_type(data)
+
+    def test_rejects_non_image_immediately(self):
+        """Test non-images are rejected on the first chunk."""
+        with pytest.raises(InvalidImageError):
+            ImageProbe().feed(b"<!DOCTYPE html><html>")
+
+    def test_rejects_truncated_image(self):
+        """Test a complete download without a parsable header is rejected."""
+        probe = ImageProbe()
+        probe.feed(make_image_bytes("JPEG")[:20])
+        with pytest.raises(InvalidImageError):
+            probe.close()
+
+    def test_rejects_too_many_pixels_early(self):
+        """Test oversized images are rejected after the header, not the whole body."""
+        data = make_image_bytes("BMP", size=(500, 500))
+        probe = ImageProbe(max_pixels=100 * 100)
+        with pytest.raises(ImageTooLargeError):
+            feed_in_chunks(probe, data, 1024)
+        assert probe.size == (500, 500)
+        assert len(data) > 10 * SNIFF_SIZE
+
+    def test_rejects_animated_gif_by_frame_count(self):
+        """Test the pixel budget counts every frame, like Wagtail does."""
+        data = make_gif(10, size=(100, 100), noise=True)
+        probe = ImageProbe(max_pixels=100 * 100 * 5)
+        fed = 0
+        with pytest.raises(ImageTooLargeError) as excinfo:
+            for offset in range(0, len(data), 1024):
+                probe.feed(data[offset:offset + 1024])
+                fed = offset + 1024
+        assert probe.frames == 6
+        assert fed < len(data) * 0.7
+        assert "60000" in str(excinfo.value)
+
+    def test_animated_gif_within_budget(self):
+        """Test animated GIFs within the budget report their frame count."""
+        probe = ImageProbe(max_pixels=10 * 10 * 5)
+        feed_in_chunks(probe, make_gif(5, size=(10, 10)), 16)
+        assert probe.close().frames == 5
+
+    def test_no_limit(self):
+        """Test the pixel check can be disabled."""
+        probe = ImageProbe(max_pixels=None)
+        feed_in_chunks(probe, make_image_bytes("PNG", size=(50, 50)), 100)
+        assert probe.close().width == 50
@@ -0,0 +1,181 @@
+"""
+Tests for rendition pre-warming.
+"""
+
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from wagtail.images import get_image_model
+from wagtail.images.tests.utils import get_test_image_file
+
+from image_url_upload.bulk import BulkImporter, ImportRow
+from image_url_upload.jobs import ImportWorker
+from image_url_upload.models import ImportJob
+from image_url_upload.renditions import (
+    generate_renditions,
+    get_new_image_ids,
+    get_rendition_specs,
+    schedule_renditions,
+    shutdown_pool,
+)
+from tests.server import ImageServer, make_image_bytes
+
+Image = get_image_model()
+Rendition = Image.get_rendition_model()
+User = get_user_model()
+
+SPECS = ["fill-30x20", "width-40|format-webp"]
+
+
+class RenditionsTests(TestCase):
+    """Test cases for generating renditions of new images."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.image = Image.objects.create(title="Test", file=get_test_image_file())
+
+    def test_specs(self):
+        """Specs should default to none and drop repeats."""
+        self.assertEqual(get_rendition_specs(), [])
+        with override_settings(WAGTAIL_IMAGE_URL_PREWARM_RENDITIONS=["fill-30x20", "fill-30x20", "width-40"]):
+            self.assertEqual(get_rendition_specs(), ["fill-30x20", "width-40"])
+
+    def test_new_image_ids(self):
+        """Only newly saved images should be pre-warmed, once each."""
+        results = [
+            {"success": True, "image_id": 1},
+            {"success": True, "image_id": 2, "duplicate": True},
+            {"success": False, "error_message": "Failed"},
+            {"success": True, "image_id": 1},
+            {"success": True, "image_id": 3},
+        ]
+        self.assertEqual(get_new_image_ids(results), [1, 3])
+
+    def test_generate_renditions(self):
+        """Renditions should be created for every spec."""
+        self.assertEqual(generate_renditions([self.image.pk], SPECS), 1)
+
+        self.assertEqual(
+            set(Rendition.objects.filter(image=self.image).values_list("filter_spec", flat=True)), set(SPECS)
+        )
+
+    def test_failing_image_is_skipped(self):
+        """A failing image should not stop the others."""
+        other = Image.objects.create(title="Other", file=get_test_image_file())
+
+        with patch.object(Image, "get_renditions", side_effect=[OSError("Broken"), {}]):
+            with self.assertLogs("image_url_upload.renditions", "ERROR"):
+                self.assertEqual(generate_renditions([self.image.pk, other.pk], SPECS), 1)
+
+    def test_nothing_scheduled_without_specs(self):
+        """Without the setting, nothing should be queued."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertFalse(schedule_renditions([self.image.pk]))
+        self.assertEqual(callbacks, [])
+
+    @override_settings(WAGTAIL_IMAGE_URL_PREWARM_RENDITIONS=SPECS, WAGTAIL_IMAGE_URL_PREWARM_WORKERS=0)
+    def test_scheduled_after_commit(self):
+        """Renditions should be generated once the transaction commits."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(schedule_renditions([self.image.pk]))
+            self.assertFalse(Rendition.objects.exists())
+
+        self.assertEqual(Rendition.objects.filter(image=self.image).count(), 2)
+
+    @override_settings(WAGTAIL_IMAGE_URL_PREWARM_RENDITIONS=SPECS, WAGTAIL_IMAGE_URL_PREWARM_WORKERS=1)
+    def test_background_pool(self):
+        """Scheduled images should be handed to the thread pool once while queued."""
+        started = threading.Event()
+        release = threading.Event()
+
+        def generate(image_ids, specs):
+            started.set()
+            release.wait(5)
+
+        with patch("image_url_upload.renditions.generate_renditions", side_effect=generate) as mock_generate:
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_renditions([self.image.pk, self.image.pk])
+                schedule_renditions([self.image.pk])
+            started.wait(5)
+            release.set()
+            shutdown_pool()
+
+            mock_generate.assert_called_once_with([self.image.pk], SPECS)
+
+            # No longer queued once generated
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_renditions([self.image.pk])
+            shutdown_pool()
+            self.assertEqual(mock_generate.call_count, 2)
+
+
+@override_settings(
+    WAGTAIL_IMAGE_URL_PREVENT_SSRF=False,
+    WAGTAIL_IMAGE_URL_PREWARM_RENDITIONS=SPECS,
+    WAGTAIL_IMAGE_URL_PREWARM_WORKERS=0,
+)
+class ImportRenditionsTests(TestCase):
+    """Test renditions are pre-warmed by each import path."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.server.add("/a.png", make_image_bytes(size=(80, 60)))
+        self.server.add("/b.png", make_image_bytes(size=(80, 60), color=(0, 0, 255)))
+
+    def assertPrewarmed(self):
+        for image in Image.objects.all():
+            self.assertEqual(
+                set(Rendition.objects.filter(image=image).values_list("filter_spec", flat=True)), set(SPECS)
+            )
+
+    def test_view(self):
+        """Images saved by the admin view should be pre-warmed after commit."""
+        self.client.login(username="admin", password="password")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            data = self.client.post(reverse("add_from_url"), {"url": self.server.url("/a.png")}).json()
+
+        self.assertTrue(data["success"])
+        self.assertPrewarmed()
+
+    def test_batch_view(self):
+        """A batch should queue each new image once, and not existing images."""
+        self.client.login(username="admin", password="password")
+        urls = [self.server.url("/a.png"), self.server.url("/b.png"), self.server.url("/a.png?copy")]
+
+        with patch("image_url_upload.renditions.generate_renditions") as mock_generate:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse("add_from_url_batch"), {"urls": urls})
+
+        queued_ids = [image_id for call in mock_generate.call_args_list for image_id in call.args[0]]
+        self.assertEqual(sorted(queued_ids), sorted(Image.objects.values_list("pk", flat=True)))
+        self.assertEqual(Image.objects.count(), 2)
+
+    def test_job_worker(self):
+        """The job worker should pre-warm images itself after each batch."""
+        ImportJob.objects.enqueue(self.user, [self.server.url("/a.png"), self.server.url("/b.png")])
+
+        # Commit callbacks are not run, so renditions must come from the worker
+        with self.captureOnCommitCallbacks():
+            ImportWorker(worker_id="test").run(once=True)
+
+        self.assertEqual(Image.objects.count(), 2)
+        self.assertPrewarmed()
+
+    def test_bulk_importer(self):
+        """The bulk importer should pre-warm each chunk's new images."""
+        rows = [ImportRow(1, self.server.url("/a.png"), None, None, [], None)]
+
+        with patch("image_url_upload.bulk.generate_renditions") as mock_generate:
+            BulkImporter(self.user).run(rows)
+
+        image = Image.objects.get()
+        mock_generate.assert_called_once_with([image.pk])
@@ -0,0 +1,194 @@
+"""
+Tests for DNS resolution, SSRF vetting and connection pinning.
+"""
+
+import socket
+from unittest.mock import patch
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import override_settings
+
+from image_url_upload.download import adownload_image, download_image
+from image_url_upload.exceptions import UnsafeAddressError
+from image_url_upload.resolver import (
+    TTLCache,
+    get_dns_cache,
+    get_safe_addresses,
+    is_private_address,
+    resolve_host,
+)
+from image_url_upload.session import reset_session
+from tests.server import ImageServer, make_image_bytes
+
+
+def addrinfo(*addresses):
+    """Build a getaddrinfo() result for the given addresses."""
+    return [
+        (socket.AF_INET6 if ":" in address else socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, 0))
+        for address in addresses
+    ]
+
+
+@pytest.fixture(autouse=True)
+def clear_dns_cache():
+    """Make every test start with an empty resolution cache."""
+    get_dns_cache().clear()
+    yield
+    get_dns_cache().clear()
+
+
+class TestTTLCache:
+    """Test the TTL-bounded LRU cache."""
+
+    def test_get_and_set(self):
+        """Test values can be stored and retrieved."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+
+    @patch("image_url_upload.resolver.time.monotonic")
+    def test_entries_expire(self, mock_monotonic):
+        """Test entries are dropped after the TTL."""
+        mock_monotonic.return_value = 100
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        mock_monotonic.return_value = 159
+        assert cache.get("a") == 1
+        mock_monotonic.return_value = 160
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_least_recently_used_evicted(self):
+        """Test the least recently used entry is evicted when full."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+
+class TestIsPrivateAddress:
+    """Test classification of IP addresses."""
+
+    @pytest.mark.parametrize(
+        "address", ["10.1.2.3", "127.0.0.1", "169.254.169.254", "0.0.0.0", "::1", "fd00::1", "::ffff:192.168.0.1"]
+    )
+    def test_private(self, address):
+        """Test private, loopback, link-local and mapped addresses are rejected."""
+        assert is_private_address(address) is True
+
+    @pytest.mark.parametrize("address", ["93.184.216.34", "2606:2800:220:1::1"])
+    def test_public(self, address):
+        """Test public addresses are accepted."""
+        assert is_private_address(address) is False
+
+
+class TestResolveHost:
+    """Test cached hostname resolution."""
+
+    @patch("image_url_upload.resolver.socket")
+    def test_results_are_cached(self, mock_socket):
+        """Test repeated lookups hit the cache."""
+        mock_socket.getaddrinfo.return_value = addrinfo("93.184.216.34", "93.184.216.34", "2606:2800:220:1::1")
+        assert resolve_host("Example.com.") == ("93.184.216.34", "2606:2800:220:1::1")
+        assert resolve_host("example.com") == ("93.184.216.34", "2606:2800:220:1::1")
+        mock_socket.getaddrinfo.assert_called_once()
+
+    @patch("image_url_upload.resolver.socket")
+    def test_ip_literal_not_resolved(self, mock_socket):
+        """Test IP literals are returned without a lookup."""
+        assert resolve_host("8.8.8.8") == ("8.8.8.8",)
+        assert resolve_host("[::1]") == ("::1",)
+        mock_socket.getaddrinfo.assert_not_called()
+
+    @patch("image_url_upload.resolver.socket")
+    def test_failures_propagate(self, mock_socket):
+        """Test resolution errors are raised and not cached."""
+        mock_socket.getaddrinfo.side_effect = socket.gaierror("no such host")
+        with pytest.raises(socket.gaierror):
+            resolve_host("missing.example")
+        with pytest.raises(socket.gaierror):
+            resolve_host("missing.example")
+        assert mock_socket.getaddrinfo.call_count == 2
+
+    @override_settings(WAGTAIL_IMAGE_URL_DNS_CACHE_TTL=5, WAGTAIL_IMAGE_URL_DNS_CACHE_SIZE=7)
+    def test_cache_settings(self):
+        """Test the cache is rebuilt from settings."""
+        assert get_dns_cache().ttl == 5
+        assert get_dns_cache().maxsize == 7
+
+
+class TestGetSafeAddresses:
+    """Test SSRF vetting of resolved addresses."""
+
+    @patch("image_url_upload.resolver.socket")
+    def test_public_addresses(self, mock_socket):
+        """Test hosts resolving to public addresses are accepted."""
+        mock_socket.getaddrinfo.return_value = addrinfo("93.184.216.34")
+        assert get_safe_addresses("example.com") == ("93.184.216.34",)
+
+    @patch("image_url_upload.resolver.socket")
+    def test_any_private_address_rejected(self, mock_socket):
+        """Test a host is rejected if any of its addresses is private."""
+        mock_socket.getaddrinfo.return_value = addrinfo("93.184.216.34", "10.0.0.5")
+        with pytest.raises(UnsafeAddressError):
+            get_safe_addresses("internal.corp")
+
+
+class TestConnectionPinning:
+    """Test that connections go to the vetted addresses (SSRF protection is on by default)."""
+
+    @pytest.fixture(autouse=True)
+    def server(self):
+        reset_session()
+        with ImageServer() as server:
+            server.add("/a.png", make_image_bytes())
+            self.port = server.httpd.server_address[1]
+            yield server
+        reset_session()
+
+    @patch("image_url_upload.resolver.socket")
+    def test_private_resolution_blocked(self, mock_socket):
+        """Test a hostname resolving to a private address is never connected to."""
+        mock_socket.getaddrinfo.return_value = addrinfo("127.0.0.1")
+        with pytest.raises(UnsafeAddressError):
+            download_image(f"http://rebind.test:{self.port}/a.png")
+
+    @patch("image_url_upload.resolver.is_private_address", return_value=False)
+    @patch("image_url_upload.resolver.socket")
+    def test_connects_to_vetted_address(self, mock_socket, mock_is_private):
+        """Test the connection uses the cached, vetted address instead of a new lookup."""
+        mock_socket.getaddrinfo.return_value = addrinfo("127.0.0.1")
+        get_safe_addresses("pinned.test")
+        file = download_image(f"http://pinned.test:{self.port}/a.png")
+        assert file.read() == make_image_bytes()
+        mock_socket.getaddrinfo.assert_called_once()
+
+    @patch("image_url_upload.resolver.is_private_address", return_value=False)
+    @patch("image_url_upload.resolver.socket")
+    def test_falls_back_to_next_address(self, mock_socket, mock_is_private):
+        """Test the next vetted address is tried if connecting to the first fails."""
+        mock_socket.getaddrinfo.return_value = addrinfo("127.0.0.2", "127.0.0.1")
+        with patch("image_url_upload.download.DOWNLOAD_TIMEOUT", 2):
+            file = download_image(f"http://fallback.test:{self.port}/a.png")
+        assert file.size > 0
+
+    @patch("image_url_upload.resolver.socket")
+    def test_async_private_resolution_blocked(self, mock_socket):
+        """Test the async client applies the same check."""
+        mock_socket.getaddrinfo.return_value = addrinfo("127.0.0.1")
+        with pytest.raises(UnsafeAddressError):
+            async_to_sync(adownload_image)(f"http://rebind.test:{self.port}/a.png")
+
+    @patch("image_url_upload.resolver.is_private_address", return_value=False)
+    @patch("image_url_upload.resolver.socket")
+    def test_async_connects_to_vetted_address(self, mock_socket, mock_is_private):
+        """Test the async client connects to the vetted address."""
+        mock_socket.getaddrinfo.return_value = addrinfo("127.0.0.1")
+        file = async_to_sync(adownload_image)(f"http://pinned.test:{self.port}/a.png")
+        assert file.read() == make_image_bytes()
@@ -0,0 +1,243 @@
+"""
+Tests for retrying transient download failures.
+"""
+
+import asyncio
+from email.utils import formatdate
+from unittest.mock import Mock, patch
+
+import httpx
+import pytest
+import requests
+from django.test import override_settings
+
+from image_url_upload.download import download_image
+from image_url_upload.exceptions import InvalidContentTypeError
+from image_url_upload.retry import (
+    RetryBudget,
+    RetryPolicy,
+    get_retry_budget,
+    is_retryable,
+    parse_retry_after,
+)
+from tests.server import ImageServer, make_image_bytes
+
+
+def http_error(status, headers=None):
+    return requests.exceptions.HTTPError(response=Mock(status_code=status, headers=headers or {}))
+
+
+def failing(*errors, result="ok"):
+    """Return a function raising each of ``errors`` in turn, then returning ``result``."""
+    errors = list(errors)
+    timeouts = []
+
+    def func(timeout):
+        timeouts.append(timeout)
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    func.timeouts = timeouts
+    return func
+
+
+@pytest.fixture
+def sleeps():
+    """Record sleeps instead of waiting."""
+    with patch("image_url_upload.retry.time.sleep") as mock_sleep:
+        yield mock_sleep
+
+
+class TestIsRetryable:
+    """Test which failures are retried."""
+
+    def test_status_codes(self):
+        """Test rate limiting and gateway errors are retried, other errors are not."""
+        for status in (408, 429, 502, 503, 504):
+            assert is_retryable(http_error(status))
+        for status in (400, 403, 404, 500):
+            assert not is_retryable(http_error(status))
+
+    def test_network_errors(self):
+        """Test timeouts and connection failures are retried."""
+        assert is_retryable(requests.exceptions.ReadTimeout())
+        assert is_retryable(requests.exceptions.ConnectionError())
+        assert is_retryable(httpx.ConnectTimeout(""))
+        assert is_retryable(httpx.RemoteProtocolError(""))
+
+    def test_other_errors(self):
+        """Test invalid responses are not retried."""
+        assert not is_retryable(InvalidContentTypeError())
+        assert not is_retryable(ValueError())
+
+
+class TestParseRetryAfter:
+    """Test parsing the Retry-After header."""
+
+    def test_seconds(self):
+        assert parse_retry_after("120") == 120
+
+    def test_http_date(self):
+        assert parse_retry_after(formatdate(1000030, usegmt=True), now=1000000) == 30
+
+    def test_date_in_the_past(self):
+        assert parse_retry_after(formatdate(1000000, usegmt=True), now=1000030) == 0
+
+    def test_invalid(self):
+        assert parse_retry_after("") is None
+        assert parse_retry_after("soon") is None
+
+
+class TestRetryBudget:
+    """Test limiting the share of retries."""
+
+    def test_exhausted(self):
+        """Test retries stop once the saved-up budget is spent."""
+        budget = RetryBudget(ratio=0.5, min_per_second=0, max_tokens=2)
+        assert budget.withdraw()
+        assert budget.withdraw()
+        assert not budget.withdraw()
+
+        budget.deposit()
+        assert not budget.withdraw()
+        budget.deposit()
+        assert budget.withdraw()
+
+    def test_shared_per_host(self):
+        """Test downloads from the same host share a budget."""
+        assert get_retry_budget("example.com") is get_retry_budget("example.com")
+        assert get_retry_budget("example.com") is not get_retry_budget("other.com")
+
+
+class TestRetryPolicy:
+    """Test the retry loop."""
+
+    def test_retries_transient_failures(self, sleeps):
+        """Test transient failures are retried until the call succeeds."""
+        func = failing(http_error(503), requests.exceptions.ConnectionError())
+
+        assert RetryPolicy(attempts=3).call("https://example.com/a.png", func, 10) == "ok"
+        assert len(func.timeouts) == 3
+        assert sleeps.call_count == 2
+
+    def test_gives_up_after_attempts(self, sleeps):
+        """Test the last failure is raised once the attempts are used up."""
+        func = failing(http_error(503), http_error(502), http_error(504))
+
+        with pytest.raises(requests.exceptions.HTTPError) as excinfo:
+            RetryPolicy(attempts=3).call("https://example.com/a.png", func, 10)
+        assert excinfo.value.response.status_code == 504
+
+    def test_permanent_failure_not_retried(self, sleeps):
+        """Test permanent failures are raised immediately."""
+        func = failing(http_error(404))
+
+        with pytest.raises(requests.exceptions.HTTPError):
+            RetryPolicy(attempts=3).call("https://example.com/a.png", func, 10)
+        assert len(func.timeouts) == 1
+        sleeps.assert_not_called()
+
+    def test_capped_exponential_backoff(self):
+        """Test delays double per retry up to the cap, with full jitter."""
+        policy = RetryPolicy(backoff=0.5, max_backoff=3)
+        with patch("image_url_upload.retry.random.uniform", side_effect=lambda low, high: high):
+            assert [policy.get_backoff(retry) for retry in range(1, 6)] == [0.5, 1, 2, 3, 3]
+        with patch("image_url_upload.retry.random.uniform", side_effect=lambda low, high: low):
+            assert policy.get_backoff(3) == 0
+
+    def test_honours_retry_after(self, sleeps):
+        """Test the server's Retry-After delay is used instead of the backoff."""
+        func = failing(http_error(429, {"Retry-After": "5"}))
+
+        RetryPolicy(attempts=2, backoff=0.5).call("https://example.com/a.png", func, 10)
+
+        delay = sleeps.call_args[0][0]
+        assert 5 <= delay <= 5.5
+
+    def test_retry_after_beyond_deadline(self, sleeps):
+        """Test a retry is not attempted if the server asks to wait past the deadline."""
+        func = failing(http_error(503, {"Retry-After": "60"}))
+
+        with pytest.raises(requests.exceptions.HTTPError):
+            RetryPolicy(attempts=3, deadline=30).call("https://example.com/a.png", func, 10)
+        sleeps.assert_not_called()
+
+    def test_attempt_timeout_fits_deadline(self, sleeps):
+        """Test attempts are given no more time than is left before the deadline."""
+        clock = [100]
+        timeouts = []
+
+        def func(timeout):
+            timeouts.append(timeout)
+            if len(timeouts) == 1:
+                clock[0] += 7
+                raise requests.exceptions.ReadTimeout()
+            return "ok"
+
+        with patch("image_url_upload.retry.time.monotonic", side_effect=lambda: clock[0]):
+            RetryPolicy(attempts=2, backoff=0, deadline=10).call("https://example.com/a.png", func, 5)
+
+        assert timeouts == [5, 3]
+
+    def test_non_idempotent_not_retried(self, sleeps):
+        """Test requests that are not idempotent are not retried."""
+        assert RetryPolicy(attempts=3, method="POST").attempts == 1
+        assert RetryPolicy(attempts=3, method="HEAD").attempts == 3
+
+    def test_budget_limits_retries(self, sleeps):
+        """Test retries stop when the host's retry budget is exhausted."""
+        get_retry_budget("example.com").tokens = 0
+        get_retry_budget("example.com").min_per_second = 0
+        func = failing(http_error(503))
+
+        with pytest.raises(requests.exceptions.HTTPError):
+            RetryPolicy(attempts=3).call("https://example.com/a.png", func, 10)
+        sleeps.assert_not_called()
+
+    def test_async(self):
+        """Test the async loop retries with asyncio.sleep."""
+        errors = [httpx.ReadTimeout("")]
+
+        async def func(timeout):
+            if errors:
+                raise errors.pop()
+            return "ok"
+
+        with patch("image_url_upload.retry.asyncio.sleep") as mock_sleep:
+            result = asyncio.run(RetryPolicy(attempts=2).acall("https://example.com/a.png", func, 10))
+
+        assert result == "ok"
+        mock_sleep.assert_called_once()
+
+
+class TestDownloadRetries:
+    """Test retries against a local HTTP server."""
+
+    @pytest.fixture(autouse=True)
+    def settings(self):
+        with override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False, WAGTAIL_IMAGE_URL_RETRY_BACKOFF=0.01):
+            yield
+
+    def test_recovers_from_unavailable_origin(self):
+        """Test a download succeeds after the origin recovers."""
+        with ImageServer() as server:
+            route = server.add("/a.png", make_image_bytes(), fail_first=2, fail_headers={"Retry-After": "0"})
+
+            file = download_image(server.url("/a.png"))
+
+        assert file.size == len(make_image_bytes())
+        assert len(route.requests) == 3
+
+    def test_failure_cached_after_last_attempt(self):
+        """Test only the final outcome of a download is cached."""
+        with ImageServer() as server:
+            route = server.add("/a.png", make_image_bytes(), fail_first=5)
+
+            with pytest.raises(requests.exceptions.HTTPError):
+                download_image(server.url("/a.png"))
+            assert len(route.requests) == 3
+
+            with pytest.raises(Exception, match="cached until"):
+                download_image(server.url("/a.png"))
+            assert len(route.requests) == 3
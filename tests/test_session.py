@@ -0,0 +1,87 @@
+"""
+Tests for the shared HTTP session.
+"""
+
+import asyncio
+
+import pytest
+from django.test import override_settings
+
+from image_url_upload.session import get_async_client, get_session, reset_session
+from tests.server import ImageServer
+
+
+@pytest.fixture(autouse=True)
+def fresh_session():
+    """Make every test start and end without a cached session."""
+    reset_session()
+    yield
+    reset_session()
+
+
+class TestGetSession:
+    """Test creation and reuse of the shared session."""
+
+    def test_session_is_reused(self):
+        """Test the same session is returned on every call."""
+        assert get_session() is get_session()
+
+    def test_reset_creates_new_session(self):
+        """Test reset_session() discards the cached session."""
+        session = get_session()
+        reset_session()
+        assert get_session() is not session
+
+    def test_default_pool_sizes(self):
+        """Test the default pool sizes are applied to both schemes."""
+        for prefix in ("http://", "https://"):
+            adapter = get_session().get_adapter(prefix + "example.com")
+            assert adapter._pool_connections == 10
+            assert adapter._pool_maxsize == 10
+
+    def test_pool_sizes_from_settings(self):
+        """Test pool sizes are read from settings and the session is rebuilt on change."""
+        session = get_session()
+        with override_settings(WAGTAIL_IMAGE_URL_POOL_CONNECTIONS=3, WAGTAIL_IMAGE_URL_POOL_MAXSIZE=25):
+            adapter = get_session().get_adapter("https://example.com")
+            assert get_session() is not session
+            assert adapter._pool_connections == 3
+            assert adapter._pool_maxsize == 25
+
+    def test_unrelated_setting_keeps_session(self):
+        """Test unrelated setting changes do not rebuild the session."""
+        session = get_session()
+        with override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False):
+            assert get_session() is session
+
+
+class TestCookies:
+    """Test the shared clients do not carry cookies from one import to the next."""
+
+    @pytest.fixture(autouse=True)
+    def server(self):
+        with override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False), ImageServer() as server:
+            self.server = server
+            self.login = server.add("/login.png", b"a", headers={"Set-Cookie": "session=secret; Path=/"})
+            self.other = server.add("/other.png", b"b")
+            yield
+
+    def test_session(self):
+        """Test cookies set by a response are not kept by the session."""
+        get_session().get(self.server.url("/login.png")).raise_for_status()
+        get_session().get(self.server.url("/other.png")).raise_for_status()
+
+        assert len(get_session().cookies) == 0
+        assert "Cookie" not in self.other.requests[0].headers
+
+    def test_async_client(self):
+        """Test cookies set by a response are not kept by the async client."""
+
+        async def fetch():
+            client = get_async_client()
+            (await client.get(self.server.url("/login.png"))).raise_for_status()
+            (await client.get(self.server.url("/other.png"))).raise_for_status()
+            return len(client.cookies.jar)
+
+        assert asyncio.run(fetch()) == 0
+        assert "Cookie" not in self.other.requests[0].headers
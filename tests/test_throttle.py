@@ -0,0 +1,172 @@
+"""
+Tests for per-host outbound rate limiting.
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from django.test import override_settings
+
+from image_url_upload.exceptions import HostThrottledError
+from image_url_upload.throttle import HostLimiter, ahost_throttle, get_host_limits, host_throttle
+
+
+class TestGetHostLimits:
+    """Test lookup of configured limits."""
+
+    def test_no_limits_by_default(self):
+        """Test hosts are not limited without settings."""
+        assert get_host_limits("example.com") is None
+
+    def test_default_limits(self):
+        """Test the global limits apply to every host."""
+        with override_settings(WAGTAIL_IMAGE_URL_RATE_LIMIT={"rate": 5}):
+            assert get_host_limits("example.com") == {"rate": 5}
+
+    def test_host_overrides(self):
+        """Test exact entries win over wildcards and wildcards over the default."""
+        host_limits = {
+            "*.example.com": {"rate": 1},
+            "*.img.example.com": {"rate": 2},
+            "CDN.Example.com": {"rate": 3},
+        }
+        with override_settings(
+            WAGTAIL_IMAGE_URL_RATE_LIMIT={"rate": 10}, WAGTAIL_IMAGE_URL_HOST_RATE_LIMITS=host_limits
+        ):
+            assert get_host_limits("cdn.example.com") == {"rate": 3}
+            assert get_host_limits("a.img.example.com") == {"rate": 2}
+            assert get_host_limits("www.example.com") == {"rate": 1}
+            assert get_host_limits("example.com") == {"rate": 10}
+
+    def test_for_url(self):
+        """Test limiters are keyed on the normalized host."""
+        with override_settings(WAGTAIL_IMAGE_URL_HOST_RATE_LIMITS={"example.com": {"concurrency": 1}}):
+            limiter = HostLimiter.for_url("https://EXAMPLE.com:443/a.png")
+            assert limiter.host == "example.com"
+            assert limiter.concurrency == 1
+            assert HostLimiter.for_url("https://other.com/a.png") is None
+
+
+class TestHostLimiter:
+    """Test the token bucket and concurrency cap."""
+
+    def test_token_bucket(self):
+        """Test a burst is allowed, then requests are spaced at the rate."""
+        limiter = HostLimiter("example.com", rate=2, burst=2)
+        with patch("image_url_upload.throttle.time.time", return_value=1000.0):
+            assert limiter.take_token() == 0
+            assert limiter.take_token() == 0
+            assert limiter.take_token() == pytest.approx(0.5)
+        with patch("image_url_upload.throttle.time.time", return_value=1000.5):
+            assert limiter.take_token() == 0
+            assert limiter.take_token() > 0
+
+    def test_bucket_is_shared(self):
+        """Test limiters for the same host share state through the cache."""
+        first = HostLimiter("example.com", rate=1, burst=1)
+        second = HostLimiter("example.com", rate=1, burst=1)
+        other = HostLimiter("other.com", rate=1, burst=1)
+        assert first.take_token() == 0
+        assert second.take_token() > 0
+        assert other.take_token() == 0
+
+    def test_concurrency_slots(self):
+        """Test at most `concurrency` permits are held at once."""
+        limiter = HostLimiter("example.com", concurrency=2)
+        first, _wait = limiter.try_acquire()
+        second, _wait = limiter.try_acquire()
+        third, wait = limiter.try_acquire()
+        assert first and second and first != second
+        assert third is None
+        assert wait > 0
+
+        limiter.release(first)
+        assert limiter.try_acquire()[0] == first
+
+    def test_slot_returned_when_rate_limited(self):
+        """Test a slot is not held while waiting for a token."""
+        limiter = HostLimiter("example.com", rate=1, burst=1, concurrency=1)
+        permit, _wait = limiter.try_acquire()
+        limiter.release(permit)
+
+        assert limiter.try_acquire()[0] is None
+        assert limiter.acquire_slot() is not None
+
+
+class TestHostThrottle:
+    """Test waiting for permits."""
+
+    def test_unlimited_host(self):
+        """Test unlimited hosts pass straight through."""
+        with host_throttle("https://example.com/a.png"):
+            pass
+
+    @override_settings(WAGTAIL_IMAGE_URL_RATE_LIMIT={"rate": 20, "burst": 1})
+    def test_waits_for_rate(self):
+        """Test downloads beyond the burst wait for the bucket to refill."""
+        start = time.monotonic()
+        for _ in range(3):
+            with host_throttle("https://example.com/a.png"):
+                pass
+        assert time.monotonic() - start >= 0.09
+
+    @override_settings(WAGTAIL_IMAGE_URL_RATE_LIMIT={"concurrency": 2})
+    def test_caps_concurrency(self):
+        """Test no more than `concurrency` downloads run at once."""
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def download():
+            with host_throttle("https://example.com/a.png"):
+                with lock:
+                    running.append(1)
+                    peak.append(len(running))
+                time.sleep(0.05)
+                with lock:
+                    running.pop()
+
+        threads = [threading.Thread(target=download) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(peak) == 6
+        assert max(peak) == 2
+
+    @override_settings(WAGTAIL_IMAGE_URL_RATE_LIMIT={"concurrency": 1}, WAGTAIL_IMAGE_URL_THROTTLE_TIMEOUT=0.1)
+    def test_gives_up_after_timeout(self):
+        """Test waiting is bounded."""
+        with host_throttle("https://example.com/a.png"):
+            with pytest.raises(HostThrottledError) as excinfo:
+                with host_throttle("https://example.com/b.png"):
+                    pass
+        assert "example.com" in str(excinfo.value.message)
+
+        # The slot is free again afterwards
+        with host_throttle("https://example.com/a.png"):
+            pass
+
+    @override_settings(WAGTAIL_IMAGE_URL_RATE_LIMIT={"concurrency": 1}, WAGTAIL_IMAGE_URL_THROTTLE_TIMEOUT=1)
+    def test_async(self):
+        """Test the async version waits without blocking the event loop."""
+        order = []
+
+        async def download(name):
+            async with ahost_throttle("https://example.com/a.png"):
+                order.append(f"{name} start")
+                await asyncio.sleep(0.05)
+                order.append(f"{name} end")
+
+        async def main():
+            await asyncio.gather(download("a"), download("b"))
+
+        asyncio.run(main())
+        assert order in (
+            ["a start", "a end", "b start", "b end"],
+            ["b start", "b end", "a start", "a end"],
+        )
@@ -0,0 +1,126 @@
+"""
+Tests for per-phase import timing.
+"""
+
+import logging
+from unittest.mock import patch
+
+import pytest
+
+from image_url_upload.signals import image_import_timed
+from image_url_upload.timing import (
+    ImportTimer,
+    get_current_timer,
+    record_bytes,
+    record_duration,
+    record_phase,
+    report_timings,
+)
+
+
+class TestImportTimer:
+    """Test recording phases."""
+
+    def test_phases_add_up(self):
+        """Test repeated phases, e.g. retried downloads, are added together."""
+        timer = ImportTimer("https://example.com/a.png")
+        timer.add("download", 0.25)
+        timer.add("download", 0.5)
+        timer.add_bytes("download", 100)
+        timer.add_bytes("download", 50)
+
+        assert timer.durations == {"download": 0.75}
+        assert timer.bytes == {"download": 150}
+
+    def test_phase(self):
+        """Test a block is timed, even if it raises."""
+        timer = ImportTimer("https://example.com/a.png")
+        with patch("image_url_upload.timing.time.perf_counter", side_effect=[10.0, 10.5]):
+            with pytest.raises(ValueError):
+                with timer.phase("form"):
+                    raise ValueError()
+
+        assert timer.durations == {"form": 0.5}
+
+    def test_server_timing(self):
+        """Test the header lists phases in order, with bytes and the total."""
+        timer = ImportTimer("https://example.com/a.png")
+        timer.add("validate", 0.0002)
+        timer.add("download", 0.0415)
+        timer.add_bytes("download", 48213)
+
+        with patch("image_url_upload.timing.time.perf_counter", return_value=timer.started + 0.063):
+            header = timer.get_server_timing()
+
+        assert header == 'validate;dur=0.2, download;dur=41.5;desc="48213 bytes", total;dur=63.0'
+
+    def test_as_dict(self):
+        """Test timings are reported in milliseconds."""
+        timer = ImportTimer("https://example.com/a.png")
+        timer.add("save", 0.012)
+        timer.add_bytes("download", 10)
+
+        with patch("image_url_upload.timing.time.perf_counter", return_value=timer.started + 0.02):
+            assert timer.as_dict() == {
+                "url": "https://example.com/a.png",
+                "total_ms": 20.0,
+                "phases_ms": {"save": 12.0},
+                "bytes": {"download": 10},
+                "error": None,
+            }
+
+
+class TestRecording:
+    """Test recording into the active timer."""
+
+    def test_no_active_timer(self):
+        """Test recording outside an import does nothing."""
+        assert get_current_timer() is None
+        with record_phase("validate"):
+            pass
+        record_duration("throttle", 1.0)
+        record_bytes("download", 10)
+
+    def test_active_timer(self):
+        """Test phases are recorded in the active timer only while it is active."""
+        timer = ImportTimer("https://example.com/a.png")
+
+        with timer.activate():
+            assert get_current_timer() is timer
+            with record_phase("validate"):
+                pass
+            record_duration("throttle", 1.0)
+            record_bytes("download", 10)
+        record_duration("throttle", 1.0)
+
+        assert get_current_timer() is None
+        assert set(timer.durations) == {"validate", "throttle"}
+        assert timer.durations["throttle"] == 1.0
+        assert timer.bytes == {"download": 10}
+
+    def test_report(self, caplog):
+        """Test timings are logged as a structured record and sent as a signal."""
+        timer = ImportTimer("https://example.com/a.png")
+        timer.add("download", 0.01)
+        received = []
+
+        def receiver(sender, **kwargs):
+            received.append((sender, kwargs))
+
+        image_import_timed.connect(receiver)
+        try:
+            with caplog.at_level(logging.INFO, logger="image_url_upload.timing"):
+                report_timings(object, timer, {"success": True, "image_id": 1})
+        finally:
+            image_import_timed.disconnect(receiver)
+
+        [(sender, kwargs)] = received
+        assert sender is object
+        assert kwargs["url"] == "https://example.com/a.png"
+        assert kwargs["success"] is True
+        assert kwargs["timings"]["phases_ms"] == {"download": 10.0}
+        assert kwargs["response_data"] == {"success": True, "image_id": 1}
+        [record] = caplog.records
+        assert "download=10.0ms" in record.getMessage()
+        assert record.image_import["success"] is True
+        assert record.image_import["phases_ms"] == {"download": 10.0}
@@ -2,13 +2,19 @@
 Tests for utility functions including domain validation and SSRF protection.
 """
 
+import socket
+from unittest.mock import patch
+
 import pytest
 from django.test import override_settings
 
+from image_url_upload.resolver import get_dns_cache
 from image_url_upload.utils import (
     get_domain_from_url,
+    get_filename_from_url,
     is_domain_allowed,
     is_private_ip,
+    normalize_url,
     validate_url_security,
 )
 
@@ -45,6 +51,56 @@ class TestGetDomainFromUrl:
         assert get_domain_from_url(12345) is None
 
 
+class TestNormalizeUrl:
+    """Test URL normalization."""
+
+    def test_scheme_and_host_lowercased(self):
+        """Test scheme and host are lowercased but the path is not."""
+        assert normalize_url("HTTPS://Example.COM/Photo.JPG") == "https://example.com/Photo.JPG"
+
+    def test_default_port_removed(self):
+        """Test default ports are dropped and others kept."""
+        assert normalize_url("https://example.com:443/a.png") == "https://example.com/a.png"
+        assert normalize_url("http://example.com:80/a.png") == "http://example.com/a.png"
+        assert normalize_url("http://example.com:8080/a.png") == "http://example.com:8080/a.png"
+
+    def test_fragment_removed_query_kept(self):
+        """Test fragments are dropped and query strings kept."""
+        assert normalize_url("https://example.com/a.png?w=100#top") == "https://example.com/a.png?w=100"
+
+    def test_empty_path(self):
+        """Test an empty path becomes '/'."""
+        assert normalize_url("https://example.com") == "https://example.com/"
+
+    def test_idna_host(self):
+        """Test internationalized hosts are punycoded."""
+        assert normalize_url("https://bücher.example/a.png") == "https://xn--bcher-kva.example/a.png"
+
+
+class TestGetFilenameFromUrl:
+    """Test filename extraction from URLs."""
+
+    def test_filename_from_path(self):
+        """Test the last path segment is used as the filename."""
+        assert get_filename_from_url("https://example.com/a/photo.png", "image/png") == "photo.png"
+
+    def test_query_and_fragment_ignored(self):
+        """Test query params and fragments are stripped."""
+        assert get_filename_from_url("https://example.com/photo.jpg?v=2#top") == "photo.jpg"
+
+    def test_fallback_uses_content_type(self):
+        """Test a filename is generated when the URL has none."""
+        assert get_filename_from_url("https://example.com/", "image/webp") == "image.webp"
+
+    def test_fallback_defaults_to_jpg(self):
+        """Test unknown content types fall back to .jpg."""
+        assert get_filename_from_url("https://example.com/download") == "image.jpg"
+
+    def test_length_is_limited(self):
+        """Test long filenames are truncated to 255 characters."""
+        assert len(get_filename_from_url("https://example.com/" + "a" * 300 + ".png")) == 255
+
+
 class TestIsDomainAllowed:
     """Test domain allow/block list functionality."""
 
@@ -106,6 +162,20 @@ class TestIsDomainAllowed:
         assert is_allowed is False
 
 
+    @override_settings(WAGTAIL_IMAGE_URL_ALLOWED_DOMAINS=['*.example.com'])
+    def test_wildcard_allowed(self):
+        """Test wildcard rules in the allowed list match subdomains."""
+        assert is_domain_allowed("https://img.cdn.example.com/image.jpg") == (True, None)
+        assert is_domain_allowed("https://example.com/image.jpg")[0] is False
+
+    @override_settings(WAGTAIL_IMAGE_URL_BLOCKED_DOMAINS=['spam.com'])
+    def test_port_ignored(self):
+        """Test ports do not bypass the blocked list."""
+        is_allowed, error = is_domain_allowed("https://spam.com:443/image.jpg")
+        assert is_allowed is False
+        assert "'spam.com'" in str(error)
+
+
 class TestIsPrivateIp:
     """Test SSRF protection for private IP addresses."""
 
@@ -134,6 +204,20 @@ class TestIsPrivateIp:
         """Test detection of link-local addresses."""
         assert is_private_ip("http://169.254.1.1/image.jpg") is True
 
+    @patch("image_url_upload.resolver.socket")
+    def test_hostname_resolving_to_private_ip(self, mock_socket):
+        """Test hostnames are resolved and their addresses checked."""
+        get_dns_cache().clear()
+        mock_socket.getaddrinfo.return_value = [(2, 1, 6, "", ("10.0.0.7", 0))]
+        assert is_private_ip("http://internal.corp/image.jpg") is True
+
+    @patch("image_url_upload.resolver.socket")
+    def test_unresolvable_hostname(self, mock_socket):
+        """Test unresolvable hostnames are left to fail at connection time."""
+        get_dns_cache().clear()
+        mock_socket.getaddrinfo.side_effect = socket.gaierror("no such host")
+        assert is_private_ip("http://missing.invalid/image.jpg") is False
+
 
 class TestValidateUrlSecurity:
     """Test comprehensive URL security validation."""
@@ -2,16 +2,35 @@
 Test cases for image URL upload views.
 """
 
+import json
+import os
+import re
+import tempfile
+import tracemalloc
+from functools import partial
 from unittest.mock import patch, Mock
 
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.models.signals import post_save, pre_save
 from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from requests.exceptions import Timeout, HTTPError, RequestException
 from wagtail.images import get_image_model
-from wagtail.models import Collection
+from wagtail.images.tests.utils import get_test_image_file
+from wagtail.models import Collection, GroupCollectionPermission
+from wagtail.signal_handlers import disable_reference_index_auto_update
 
-from image_url_upload.views import CustomImageIndexView, AddFromURLView
+from image_url_upload.download import adownload_image
+from image_url_upload.indexing import flush_search_index, get_queued_count
+from image_url_upload.models import ImageSource, ImportItem, ImportJob
+from image_url_upload.signals import image_import_timed
+from image_url_upload.views import BATCH_MAX_URLS, CustomImageIndexView, AddFromURLView, AsyncAddFromURLView
+from tests.server import ImageServer, make_image_bytes, make_noise_image_bytes
 
 Image = get_image_model()
 User = get_user_model()
@@ -119,13 +138,13 @@ class AddFromURLViewTests(TestCase):
         self.assertFalse(data.get("success", True))
         self.assertIn("Please provide a URL", data["error_message"])
 
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_successful_image_upload(self, mock_get):
         """Should successfully upload image from URL."""
         # Create mock response
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.content = self._create_test_image_bytes()
+        mock_response.iter_content.return_value = [self._create_test_image_bytes()]
         mock_response.headers = {"Content-Type": "image/jpeg"}
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
@@ -141,12 +160,12 @@ class AddFromURLViewTests(TestCase):
         # Should create an image
         self.assertTrue(Image.objects.filter(title="test").exists())
 
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_successful_upload_with_png(self, mock_get):
         """Should handle PNG images correctly."""
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.content = self._create_test_png_bytes()
+        mock_response.iter_content.return_value = [self._create_test_png_bytes()]
         mock_response.headers = {"Content-Type": "image/png"}
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
@@ -159,12 +178,12 @@ class AddFromURLViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTrue(Image.objects.filter(title="photo").exists())
 
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_url_with_query_params(self, mock_get):
         """Should handle URLs with query parameters correctly."""
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.content = self._create_test_image_bytes()
+        mock_response.iter_content.return_value = [self._create_test_image_bytes()]
         mock_response.headers = {"Content-Type": "image/jpeg"}
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
@@ -178,7 +197,7 @@ class AddFromURLViewTests(TestCase):
         # Filename should be extracted without query params
         self.assertTrue(Image.objects.filter(title="photo").exists())
 
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_timeout_error(self, mock_get):
         """Should handle timeout errors gracefully."""
         mock_get.side_effect = Timeout("Connection timeout")
@@ -189,7 +208,7 @@ class AddFromURLViewTests(TestCase):
         self.assertFalse(data["success"])
         self.assertIn("timeout", data["error_message"].lower())
 
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_http_404_error(self, mock_get):
         """Should handle 404 HTTP errors."""
         mock_response = Mock()
@@ -204,7 +223,7 @@ class AddFromURLViewTests(TestCase):
         self.assertIn("HTTP error", data["error_message"])
         self.assertIn("404", data["error_message"])
 
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_http_500_error(self, mock_get):
         """Should handle 500 HTTP errors."""
         mock_response = Mock()
@@ -219,7 +238,7 @@ class AddFromURLViewTests(TestCase):
         self.assertIn("HTTP error", data["error_message"])
         self.assertIn("500", data["error_message"])
 
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_connection_error(self, mock_get):
         """Should handle connection errors."""
         mock_get.side_effect = RequestException("Connection refused")
@@ -230,7 +249,7 @@ class AddFromURLViewTests(TestCase):
         self.assertFalse(data["success"])
         self.assertIn("Download failed", data["error_message"])
 
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_generic_exception(self, mock_get):
         """Should handle unexpected exceptions."""
         mock_get.side_effect = Exception("Unexpected error")
@@ -242,12 +261,12 @@ class AddFromURLViewTests(TestCase):
         self.assertIn("Unexpected error", data["error_message"])
 
 
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_timeout_value_is_set(self, mock_get):
         """Should set timeout for requests."""
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.content = self._create_test_image_bytes()
+        mock_response.iter_content.return_value = [self._create_test_image_bytes()]
         mock_response.headers = {"Content-Type": "image/jpeg"}
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
@@ -263,12 +282,12 @@ class AddFromURLViewTests(TestCase):
         else:
             self.assertEqual(call_args[1]["timeout"], 10)  # keyword arg
 
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_default_filename_when_missing(self, mock_get):
         """Should use default filename when URL has no filename."""
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.content = self._create_test_image_bytes()
+        mock_response.iter_content.return_value = [self._create_test_image_bytes()]
         mock_response.headers = {"Content-Type": "image/jpeg"}
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
@@ -281,7 +300,7 @@ class AddFromURLViewTests(TestCase):
         # Should create image with default name
         self.assertTrue(Image.objects.exists())
 
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_collection_assignment(self, mock_get):
         """Should assign image to specified collection."""
         custom_collection = Collection.objects.create(
@@ -292,7 +311,7 @@ class AddFromURLViewTests(TestCase):
 
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.content = self._create_test_image_bytes()
+        mock_response.iter_content.return_value = [self._create_test_image_bytes()]
         mock_response.headers = {"Content-Type": "image/jpeg"}
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
@@ -304,12 +323,12 @@ class AddFromURLViewTests(TestCase):
         image = Image.objects.latest("id")
         self.assertEqual(image.collection_id, custom_collection.id)
 
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_duplicate_detection(self, mock_get):
         """Should detect duplicate images."""
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.content = self._create_test_image_bytes()
+        mock_response.iter_content.return_value = [self._create_test_image_bytes()]
         mock_response.headers = {"Content-Type": "image/jpeg"}
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
@@ -332,6 +351,39 @@ class AddFromURLViewTests(TestCase):
         # The duplicate should either not be created or be removed
         self.assertLessEqual(final_count, initial_count + 1)
 
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_large_content_length_rejected(self, mock_get):
+        """Should reject responses whose Content-Length exceeds the limit."""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Type": "image/jpeg", "Content-Length": str(2 * 1024 ** 3)}
+        mock_response.raise_for_status = Mock()
+        mock_get.return_value = mock_response
+
+        response = self.client.post(self.url, {"url": "https://example.com/huge.jpg"})
+        data = response.json()
+
+        self.assertFalse(data["success"])
+        self.assertIn("exceeds maximum allowed size", data["error_message"])
+        mock_response.iter_content.assert_not_called()
+        self.assertFalse(Image.objects.exists())
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_empty_file_rejected(self, mock_get):
+        """Should reject empty responses."""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.iter_content.return_value = []
+        mock_response.headers = {"Content-Type": "image/jpeg"}
+        mock_response.raise_for_status = Mock()
+        mock_get.return_value = mock_response
+
+        response = self.client.post(self.url, {"url": "https://example.com/empty.jpg"})
+        data = response.json()
+
+        self.assertFalse(data["success"])
+        self.assertIn("empty", data["error_message"])
+
     def test_requires_authentication(self):
         """Should require user to be authenticated."""
         self.client.logout()
@@ -339,12 +391,12 @@ class AddFromURLViewTests(TestCase):
         # Should redirect to login or return 403
         self.assertIn(response.status_code, [302, 403])
 
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_title_extracted_from_filename(self, mock_get):
         """Should extract title from filename without extension."""
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.content = self._create_test_image_bytes()
+        mock_response.iter_content.return_value = [self._create_test_image_bytes()]
         mock_response.headers = {"Content-Type": "image/jpeg"}
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
@@ -357,12 +409,12 @@ class AddFromURLViewTests(TestCase):
         image = Image.objects.latest("id")
         self.assertEqual(image.title, "my-awesome-photo")
 
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_logging_on_success(self, mock_get):
         """Should log successful uploads."""
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.content = self._create_test_image_bytes()
+        mock_response.iter_content.return_value = [self._create_test_image_bytes()]
         mock_response.headers = {"Content-Type": "image/jpeg"}
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
@@ -376,7 +428,7 @@ class AddFromURLViewTests(TestCase):
             log_output = "\n".join(logs.output)
             self.assertIn("Downloading image from", log_output)
 
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_logging_on_timeout(self, mock_get):
         """Should log timeout errors."""
         mock_get.side_effect = Timeout("Connection timeout")
@@ -426,12 +478,12 @@ class DomainValidationIntegrationTests(TestCase):
         self.collection = Collection.get_first_root_node()
 
     @override_settings(WAGTAIL_IMAGE_URL_ALLOWED_DOMAINS=['example.com', 'trusted.com'])
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_allowed_domain_succeeds(self, mock_get):
         """Should allow domains in the allowed list."""
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.content = self._create_test_image_bytes()
+        mock_response.iter_content.return_value = [self._create_test_image_bytes()]
         mock_response.headers = {"Content-Type": "image/jpeg"}
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
@@ -472,12 +524,12 @@ class DomainValidationIntegrationTests(TestCase):
         self.assertIn("is blocked", data.get("error_message"))
 
     @override_settings(WAGTAIL_IMAGE_URL_BLOCKED_DOMAINS=['spam.com'])
-    @patch("image_url_upload.views.requests.get")
+    @patch("image_url_upload.session.requests.Session.get")
     def test_not_blocked_domain_succeeds(self, mock_get):
         """Should allow domains not in the blocked list."""
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.content = self._create_test_image_bytes()
+        mock_response.iter_content.return_value = [self._create_test_image_bytes()]
         mock_response.headers = {"Content-Type": "image/jpeg"}
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
@@ -531,3 +583,1033 @@ class DomainValidationIntegrationTests(TestCase):
             b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\xff'
             b'\xda\x00\x08\x01\x01\x00\x00?\x00\x7f\x00\xff\xd9'
         )
+
+
+class AddFromURLBatchViewTests(TestCase):
+    """Test cases for AddFromURLBatchView."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.collection = Collection.get_first_root_node()
+        self.url = reverse("add_from_url_batch")
+
+    def _mock_response(self, content):
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.iter_content.return_value = [content]
+        mock_response.headers = {"Content-Type": "image/png"}
+        mock_response.raise_for_status = Mock()
+        return mock_response
+
+    def test_missing_urls_returns_error(self):
+        """POST without URLs should return error."""
+        response = self.client.post(self.url, {"urls": ["", " "]})
+        data = response.json()
+        self.assertFalse(data["success"])
+        self.assertIn("at least one URL", data["error_message"])
+
+    def test_get_not_allowed(self):
+        """Batch view should only accept POST."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 405)
+
+    @override_settings(WAGTAIL_IMAGE_URL_BATCH_MAX_URLS=2)
+    def test_too_many_urls_returns_error(self):
+        """Batches larger than the configured maximum should be rejected."""
+        response = self.client.post(
+            self.url, {"urls": ["https://example.com/1.png", "https://example.com/2.png", "https://example.com/3.png"]}
+        )
+        data = response.json()
+        self.assertFalse(data["success"])
+        self.assertIn("Too many URLs", data["error_message"])
+
+    def test_page_publishes_batch_size(self):
+        """The import page should tell its script how many URLs fit in one request."""
+        response = self.client.get(reverse("add_from_url"))
+        self.assertContains(response, f'data-batch-size="{BATCH_MAX_URLS}"')
+
+        with override_settings(WAGTAIL_IMAGE_URL_BATCH_MAX_URLS=2):
+            response = self.client.get(reverse("add_from_url"))
+        self.assertContains(response, 'data-batch-size="2"')
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_more_urls_than_a_batch(self, mock_get):
+        """Lists longer than a batch should be imported when split at the published batch size, as the page does."""
+        page = self.client.get(reverse("add_from_url")).content.decode()
+        batch_size = int(re.search(r'data-batch-size="(\d+)"', page).group(1))
+        # Private addresses fail validation, so nothing is downloaded
+        urls = [f"http://192.168.1.{i}/a.png" for i in range(BATCH_MAX_URLS + 1)]
+
+        self.assertFalse(self.client.post(self.url, {"urls": urls}).json()["success"])
+
+        results = []
+        for start in range(0, len(urls), batch_size):
+            data = self.client.post(self.url, {"urls": urls[start:start + batch_size]}).json()
+            self.assertTrue(data["success"])
+            results.extend(data["results"])
+
+        self.assertEqual([result["url"] for result in results], urls)
+        mock_get.assert_not_called()
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_results_in_input_order(self, mock_get):
+        """Each URL should get a result in the same order as the input."""
+        def get(url, **kwargs):
+            if "missing" in url:
+                mock_response = Mock()
+                mock_response.status_code = 404
+                mock_response.raise_for_status.side_effect = HTTPError(response=mock_response)
+                return mock_response
+            return self._mock_response(AddFromURLViewTests._create_test_png_bytes())
+
+        mock_get.side_effect = get
+
+        response = self.client.post(
+            self.url,
+            {
+                "urls": ["https://example.com/first.png", "https://example.com/missing.png"],
+                "collection": self.collection.id,
+            },
+        )
+        results = response.json()["results"]
+
+        self.assertEqual([r["url"] for r in results], ["https://example.com/first.png", "https://example.com/missing.png"])
+        self.assertTrue(results[0]["success"])
+        self.assertIn("image_id", results[0])
+        self.assertFalse(results[1]["success"])
+        self.assertIn("404", results[1]["error_message"])
+        self.assertTrue(Image.objects.filter(title="first").exists())
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_security_validation_per_url(self, mock_get):
+        """Blocked URLs should fail without affecting the rest of the batch."""
+        mock_get.return_value = self._mock_response(AddFromURLViewTests._create_test_png_bytes())
+
+        response = self.client.post(
+            self.url,
+            {"urls": ["http://192.168.1.1/a.png", "https://example.com/ok.png"], "collection": self.collection.id},
+        )
+        results = response.json()["results"]
+
+        self.assertIn("private IP", results[0]["error_message"])
+        self.assertTrue(results[1]["success"])
+        mock_get.assert_called_once()
+
+    @override_settings(WAGTAIL_IMAGE_URL_BATCH_MAX_WORKERS=3)
+    @patch("image_url_upload.views.ThreadPoolExecutor")
+    def test_pool_size_from_settings(self, mock_executor):
+        """The thread pool size should come from settings and not exceed the batch size."""
+        mock_executor.return_value.__enter__.return_value.map.return_value = []
+        self.client.post(self.url, {"urls": ["https://example.com/1.png", "https://example.com/2.png"]})
+        mock_executor.assert_called_once_with(max_workers=2)
+
+        mock_executor.reset_mock()
+        self.client.post(self.url, {"urls": [f"https://example.com/{i}.png" for i in range(5)]})
+        mock_executor.assert_called_once_with(max_workers=3)
+
+
+@override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False)
+class AsyncAddFromURLViewTests(TestCase):
+    """Test cases for AsyncAddFromURLView against a local HTTP server."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.collection = Collection.get_first_root_node()
+        self.url = reverse("add_from_url_async")
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+    def test_view_is_async(self):
+        """The view should be served as a coroutine."""
+        self.assertTrue(AsyncAddFromURLView.view_is_async)
+
+    def test_missing_url_returns_error(self):
+        """POST without URL should return error."""
+        data = self.client.post(self.url, {}).json()
+        self.assertFalse(data["success"])
+        self.assertIn("Please provide a URL", data["error_message"])
+
+    def test_successful_image_upload(self):
+        """Should download and save an image from the local server."""
+        self.server.add("/photo.png", make_image_bytes("PNG", (4, 3)))
+
+        data = self.client.post(
+            self.url, {"url": self.server.url("/photo.png"), "collection": self.collection.id}
+        ).json()
+
+        self.assertTrue(data["success"])
+        image = Image.objects.get(pk=data["image_id"])
+        self.assertEqual(image.title, "photo")
+        self.assertEqual((image.width, image.height), (4, 3))
+
+    def test_chunked_response(self):
+        """Should accept chunked responses without Content-Length."""
+        self.server.add("/chunked.jpg", make_image_bytes("JPEG", (16, 16)), content_type="image/jpeg", chunk_size=64)
+
+        data = self.client.post(self.url, {"url": self.server.url("/chunked.jpg")}).json()
+
+        self.assertTrue(data["success"])
+
+    def test_http_404_error(self):
+        """Should report HTTP errors with their status code."""
+        data = self.client.post(self.url, {"url": self.server.url("/missing.png")}).json()
+
+        self.assertFalse(data["success"])
+        self.assertIn("404", data["error_message"])
+
+    def test_invalid_content_type(self):
+        """Should reject non-image responses."""
+        self.server.add("/page", b"<html></html>", content_type="text/html")
+
+        data = self.client.post(self.url, {"url": self.server.url("/page")}).json()
+
+        self.assertFalse(data["success"])
+        self.assertIn("Invalid file type", data["error_message"])
+
+    def test_mislabeled_non_image_rejected(self):
+        """Should reject non-image data served with an image content type."""
+        self.server.add("/fake.png", b"<html>" + b" " * 100000, content_type="image/png")
+
+        data = self.client.post(self.url, {"url": self.server.url("/fake.png")}).json()
+
+        self.assertFalse(data["success"])
+        self.assertIn("not a valid image", data["error_message"])
+
+    @override_settings(WAGTAILIMAGES_MAX_IMAGE_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        """Should reject images over Wagtail's pixel limit before saving."""
+        self.server.add("/big.png", make_image_bytes(size=(20, 20)))
+
+        data = self.client.post(self.url, {"url": self.server.url("/big.png")}).json()
+
+        self.assertFalse(data["success"])
+        self.assertIn("too many pixels", data["error_message"])
+        self.assertFalse(Image.objects.exists())
+
+    @patch("image_url_upload.views.adownload_image", partial(adownload_image, max_size=1024))
+    def test_large_chunked_response_aborted(self):
+        """Should stop reading once the size limit is exceeded."""
+        self.server.add("/big.png", b"x" * 4096, chunk_size=512)
+
+        data = self.client.post(self.url, {"url": self.server.url("/big.png")}).json()
+
+        self.assertFalse(data["success"])
+        self.assertIn("exceeds maximum allowed size", data["error_message"])
+
+    @patch("image_url_upload.views.adownload_image", partial(adownload_image, timeout=0.2))
+    def test_timeout(self):
+        """Should report timeouts from slow servers."""
+        self.server.add("/slow.png", make_image_bytes(), delay=1)
+
+        data = self.client.post(self.url, {"url": self.server.url("/slow.png")}).json()
+
+        self.assertFalse(data["success"])
+        self.assertIn("timeout", data["error_message"].lower())
+
+    def test_security_validation(self):
+        """Should apply the same URL security checks as the sync view."""
+        with override_settings(WAGTAIL_IMAGE_URL_BLOCKED_DOMAINS=["spam.com"]):
+            data = self.client.post(self.url, {"url": "https://spam.com/image.png"}).json()
+
+        self.assertFalse(data["success"])
+        self.assertIn("is blocked", data["error_message"])
+
+    def test_requires_authentication(self):
+        """Should reject anonymous users."""
+        self.client.logout()
+        response = self.client.post(self.url, {"url": self.server.url("/photo.png")})
+        self.assertEqual(response.status_code, 403)
+
+    def test_requires_add_permission(self):
+        """Should reject admin users without permission to add images."""
+        from django.contrib.auth.models import Permission
+
+        user = User.objects.create_user(username="editor", password="password")
+        user.user_permissions.add(Permission.objects.get(codename="access_admin"))
+        self.client.login(username="editor", password="password")
+
+        response = self.client.post(self.url, {"url": self.server.url("/photo.png")})
+        self.assertEqual(response.status_code, 403)
+
+    def test_get_not_allowed(self):
+        """Should only accept POST."""
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+@override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False)
+class ImageSourceRegistryTests(TestCase):
+    """Test short-circuiting re-imports of known source URLs."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.url = reverse("add_from_url")
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+    def _import(self, image_url):
+        return self.client.post(self.url, {"url": image_url}).json()
+
+    def test_import_records_source(self):
+        """A successful import should record the source URL and validators."""
+        self.server.add("/a.png", make_image_bytes(), etag='"v1"')
+
+        data = self._import(self.server.url("/a.png"))
+
+        source = ImageSource.objects.get()
+        self.assertEqual(source.image_id, data["image_id"])
+        self.assertEqual(source.etag, '"v1"')
+
+    def test_reimport_returns_existing_image_without_download(self):
+        """Re-importing a known URL should not contact the server."""
+        route = self.server.add("/a.png", make_image_bytes())
+        first = self._import(self.server.url("/a.png"))
+
+        second = self._import(self.server.url("/a.png#again"))
+
+        self.assertTrue(second["success"])
+        self.assertTrue(second["duplicate"])
+        self.assertEqual(second["image_id"], first["image_id"])
+        self.assertEqual(len(route.requests), 1)
+        self.assertEqual(Image.objects.count(), 1)
+
+    @override_settings(WAGTAIL_IMAGE_URL_REVALIDATE_SOURCES=True)
+    def test_revalidation_not_modified(self):
+        """With revalidation on, an unchanged source should cost one conditional request."""
+        route = self.server.add("/a.png", make_image_bytes(), etag='"v1"')
+        first = self._import(self.server.url("/a.png"))
+
+        second = self._import(self.server.url("/a.png"))
+
+        self.assertTrue(second["duplicate"])
+        self.assertEqual(second["image_id"], first["image_id"])
+        self.assertEqual(len(route.requests), 2)
+        self.assertEqual(route.requests[1].headers["If-None-Match"], '"v1"')
+
+    @override_settings(WAGTAIL_IMAGE_URL_REVALIDATE_SOURCES=True)
+    def test_revalidation_changed(self):
+        """With revalidation on, a changed source should be imported again."""
+        route = self.server.add("/a.png", make_image_bytes(), etag='"v1"')
+        first = self._import(self.server.url("/a.png"))
+        route.body, route.etag = make_image_bytes(color=(0, 0, 255)), '"v2"'
+
+        second = self._import(self.server.url("/a.png"))
+
+        self.assertFalse(second["duplicate"])
+        self.assertNotEqual(second["image_id"], first["image_id"])
+        source = ImageSource.objects.get()
+        self.assertEqual((source.image_id, source.etag), (second["image_id"], '"v2"'))
+
+    def test_duplicate_content_records_new_url(self):
+        """A new URL serving known content should be recorded against the existing image."""
+        self.server.add("/a.png", make_image_bytes())
+        self.server.add("/copy.png", make_image_bytes())
+        first = self._import(self.server.url("/a.png"))
+
+        second = self._import(self.server.url("/copy.png"))
+
+        self.assertTrue(second["duplicate"])
+        self.assertEqual(Image.objects.count(), 1)
+        self.assertEqual(
+            ImageSource.objects.for_url(self.server.url("/copy.png")).get().image_id, first["image_id"]
+        )
+
+    def test_batch_short_circuits_known_urls(self):
+        """The batch view should look up known sources before downloading."""
+        known = self.server.add("/known.png", make_image_bytes())
+        self.server.add("/new.png", make_image_bytes(color=(0, 255, 0)))
+        first = self._import(self.server.url("/known.png"))
+
+        results = self.client.post(
+            reverse("add_from_url_batch"), {"urls": [self.server.url("/known.png"), self.server.url("/new.png")]}
+        ).json()["results"]
+
+        self.assertEqual(results[0]["image_id"], first["image_id"])
+        self.assertTrue(results[0]["duplicate"])
+        self.assertFalse(results[1]["duplicate"])
+        self.assertEqual(len(known.requests), 1)
+
+    def test_async_view_short_circuits_known_urls(self):
+        """The async view should use the registry too."""
+        route = self.server.add("/a.png", make_image_bytes())
+        first = self._import(self.server.url("/a.png"))
+
+        second = self.client.post(reverse("add_from_url_async"), {"url": self.server.url("/a.png")}).json()
+
+        self.assertEqual(second["image_id"], first["image_id"])
+        self.assertEqual(len(route.requests), 1)
+
+
+@override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False)
+class ContentHashDeduplicationTests(TestCase):
+    """Test duplicates are found by content hash before anything is saved."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.url = reverse("add_from_url")
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.server.add("/a.png", make_image_bytes())
+        self.server.add("/copy.png", make_image_bytes())
+
+    def test_duplicate_is_not_saved(self):
+        """A duplicate should return the existing image without saving a new one."""
+        first = self.client.post(self.url, {"url": self.server.url("/a.png")}).json()
+
+        with patch.object(Image, "save") as mock_save:
+            second = self.client.post(self.url, {"url": self.server.url("/copy.png")}).json()
+
+        mock_save.assert_not_called()
+        self.assertEqual(second, {"success": True, "image_id": first["image_id"], "duplicate": True})
+
+    def test_hash_matches_wagtail_file_hash(self):
+        """The streamed hash should be the one Wagtail stores for the image."""
+        data = self.client.post(self.url, {"url": self.server.url("/a.png")}).json()
+
+        source = ImageSource.objects.get()
+        self.assertEqual(source.content_hash, Image.objects.get(pk=data["image_id"]).file_hash)
+
+    def test_lookup_respects_choose_permission(self):
+        """Images the user cannot choose should not be returned as duplicates."""
+        other = Image.objects.create(title="other", file=get_test_image_file(), file_hash="a" * 40)
+        view = AddFromURLView()
+        view.request = RequestFactory().post(self.url)
+        view.request.user = self.user
+        file = Mock(content_hash=other.file_hash)
+
+        self.assertEqual(view.find_existing_image(file), other)
+        with patch.object(
+            view.permission_policy, "instances_user_has_permission_for", return_value=Image.objects.none()
+        ):
+            self.assertIsNone(view.find_existing_image(file))
+
+    def test_duplicate_within_batch(self):
+        """Two URLs with the same content in one batch should yield one image."""
+        results = self.client.post(
+            reverse("add_from_url_batch"), {"urls": [self.server.url("/a.png"), self.server.url("/copy.png")]}
+        ).json()["results"]
+
+        self.assertFalse(results[0]["duplicate"])
+        self.assertTrue(results[1]["duplicate"])
+        self.assertEqual(results[1]["image_id"], results[0]["image_id"])
+        self.assertEqual(Image.objects.count(), 1)
+
+    def test_async_duplicate_is_not_saved(self):
+        """The async view should skip saving duplicates too."""
+        first = self.client.post(self.url, {"url": self.server.url("/a.png")}).json()
+
+        second = self.client.post(reverse("add_from_url_async"), {"url": self.server.url("/copy.png")}).json()
+
+        self.assertEqual(second["image_id"], first["image_id"])
+        self.assertEqual(Image.objects.count(), 1)
+
+
+class ImportJobViewTests(TestCase):
+    """Test cases for the job enqueue and status views."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.url = reverse("add_from_url_job")
+
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_enqueue_returns_immediately(self, mock_get):
+        """Enqueueing should store the job without downloading anything."""
+        response = self.client.post(self.url, {"urls": ["https://example.com/a.png", "https://example.com/b.png"]})
+
+        self.assertEqual(response.status_code, 202)
+        data = response.json()
+        job = ImportJob.objects.get()
+        self.assertEqual(data["job_id"], job.pk)
+        self.assertEqual(data["status_url"], reverse("add_from_url_job_status", args=(job.pk,)))
+        self.assertEqual(job.user, self.user)
+        self.assertEqual(job.items.count(), 2)
+        mock_get.assert_not_called()
+
+    def test_enqueue_requires_urls(self):
+        """Enqueueing without URLs should fail."""
+        data = self.client.post(self.url, {}).json()
+        self.assertFalse(data["success"])
+        self.assertFalse(ImportJob.objects.exists())
+
+    @override_settings(WAGTAIL_IMAGE_URL_JOB_MAX_URLS=1)
+    def test_enqueue_limits_urls(self):
+        """Enqueueing more URLs than allowed should fail."""
+        data = self.client.post(self.url, {"urls": ["https://example.com/a.png", "https://example.com/b.png"]}).json()
+        self.assertFalse(data["success"])
+
+    def test_enqueue_invalid_collection(self):
+        """Enqueueing into a collection that is not a valid ID should fail."""
+        data = self.client.post(self.url, {"urls": ["https://example.com/a.png"], "collection": "abc"}).json()
+        self.assertFalse(data["success"])
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_enqueue_unknown_collection(self):
+        """Enqueueing into a collection that does not exist should fail."""
+        data = self.client.post(self.url, {"urls": ["https://example.com/a.png"], "collection": "9999"}).json()
+        self.assertFalse(data["success"])
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_enqueue_collection_without_permission(self):
+        """Enqueueing into a collection the user cannot add images to should fail."""
+        root = Collection.get_first_root_node()
+        allowed = root.add_child(name="Allowed")
+        other = root.add_child(name="Other")
+        group = Group.objects.create(name="Image importers")
+        group.permissions.add(Permission.objects.get(codename="access_admin"))
+        GroupCollectionPermission.objects.create(
+            group=group, collection=allowed, permission=Permission.objects.get(codename="add_image")
+        )
+        editor = User.objects.create_user(username="editor", email="editor@example.com", password="password")
+        editor.groups.add(group)
+        self.client.login(username="editor", password="password")
+
+        data = self.client.post(self.url, {"urls": ["https://example.com/a.png"], "collection": other.pk}).json()
+        self.assertFalse(data["success"])
+        self.assertFalse(ImportJob.objects.exists())
+
+        response = self.client.post(self.url, {"urls": ["https://example.com/a.png"], "collection": allowed.pk})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(ImportJob.objects.get().collection, allowed)
+
+    def test_status(self):
+        """The status view should report counts and per-URL results."""
+        job = ImportJob.objects.enqueue(self.user, ["https://example.com/a.png", "https://example.com/b.png"])
+        item = ImportItem.objects.lease("test", limit=1, duration=60)[0]
+        item.complete({"success": False, "error_message": "Invalid content type"})
+
+        data = self.client.get(reverse("add_from_url_job_status", args=(job.pk,))).json()
+
+        self.assertFalse(data["finished"])
+        self.assertEqual(data["counts"]["failed"], 1)
+        self.assertEqual(data["counts"]["pending"], 1)
+        self.assertEqual(
+            data["results"][0],
+            {
+                "url": "https://example.com/a.png",
+                "status": "failed",
+                "image_id": None,
+                "error_message": "Invalid content type",
+            },
+        )
+
+    def test_status_finished(self):
+        """A job with no pending or running items should be finished."""
+        job = ImportJob.objects.enqueue(self.user, ["https://example.com/a.png"])
+        job.items.update(status=ImportItem.Status.SUCCEEDED)
+
+        data = self.client.get(reverse("add_from_url_job_status", args=(job.pk,))).json()
+
+        self.assertTrue(data["finished"])
+
+    def test_status_of_other_users_job(self):
+        """Users should not see other users' jobs."""
+        other = User.objects.create_superuser(username="other", email="other@example.com", password="password")
+        job = ImportJob.objects.enqueue(other, ["https://example.com/a.png"])
+
+        response = self.client.get(reverse("add_from_url_job_status", args=(job.pk,)))
+
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False)
+class AddFromURLStreamViewTests(TestCase):
+    """Test cases for the streaming batch import view."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.url = reverse("add_from_url_stream")
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+    def _stream(self, urls):
+        response = self.client.post(self.url, {"urls": urls})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_streams_events_per_url(self):
+        """Each URL should go from queued to a final status."""
+        self.server.add("/a.png", make_image_bytes())
+        self.server.add("/page", b"<html>", content_type="text/html")
+
+        events = self._stream([self.server.url("/a.png"), self.server.url("/page")])
+
+        self.assertEqual(events[-1], {"status": "complete"})
+        saved = [event["status"] for event in events if event.get("index") == 0]
+        self.assertEqual(saved, ["queued", "downloading", "validating", "saved"])
+        failed = [event["status"] for event in events if event.get("index") == 1]
+        self.assertEqual(failed, ["queued", "downloading", "failed"])
+
+        final = next(event for event in events if event["status"] == "saved")
+        self.assertTrue(final["success"])
+        self.assertEqual(final["image_id"], Image.objects.get().pk)
+        self.assertEqual(final["url"], self.server.url("/a.png"))
+
+    def test_download_progress(self):
+        """Large downloads should report the bytes received so far."""
+        body = make_image_bytes(image_format="BMP", size=(400, 400))
+        self.server.add("/big.bmp", body, content_type="image/bmp", chunk_size=64 * 1024)
+
+        events = self._stream([self.server.url("/big.bmp")])
+
+        progress = [event["bytes"] for event in events if event["status"] == "downloading"]
+        self.assertEqual(progress[0], 0)
+        self.assertGreater(len(progress), 1)
+        self.assertEqual(progress, sorted(progress))
+        self.assertLessEqual(progress[-1], len(body))
+
+    def test_duplicate_event(self):
+        """Known URLs should be reported as duplicates."""
+        self.server.add("/a.png", make_image_bytes())
+        self._stream([self.server.url("/a.png")])
+
+        events = self._stream([self.server.url("/a.png")])
+
+        self.assertEqual(events[-2]["status"], "duplicate")
+        self.assertTrue(events[-2]["duplicate"])
+
+    def test_invalid_request_returns_json(self):
+        """Request errors should be returned as a plain JSON response."""
+        response = self.client.post(self.url, {})
+        self.assertFalse(response.json()["success"])
+
+
+@override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False)
+class FailureCacheViewTests(TestCase):
+    """Test failed URLs and unresponsive hosts fail fast."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.url = reverse("add_from_url")
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+    def test_failed_url_is_not_requested_again(self):
+        """A URL that returned 404 should fail from the cache on retry."""
+        route = self.server.add("/missing.png", b"Not found", content_type="text/plain", status=404)
+
+        first = self.client.post(self.url, {"url": self.server.url("/missing.png")}).json()
+        second = self.client.post(self.url, {"url": self.server.url("/missing.png")}).json()
+
+        self.assertIn("404", first["error_message"])
+        self.assertNotIn("cached", first["error_message"])
+        self.assertFalse(second["success"])
+        self.assertIn("404", second["error_message"])
+        self.assertIn("cached until", second["error_message"])
+        self.assertEqual(len(route.requests), 1)
+
+    def test_async_view_uses_cached_failure(self):
+        """The async view should share the sync view's failure cache."""
+        route = self.server.add("/missing.png", b"Not found", content_type="text/plain", status=404)
+        self.client.post(self.url, {"url": self.server.url("/missing.png")})
+
+        data = self.client.post(reverse("add_from_url_async"), {"url": self.server.url("/missing.png")}).json()
+
+        self.assertIn("cached until", data["error_message"])
+        self.assertEqual(len(route.requests), 1)
+
+    @override_settings(WAGTAIL_IMAGE_URL_CIRCUIT_BREAKER_THRESHOLD=2, WAGTAIL_IMAGE_URL_RETRY_ATTEMPTS=1)
+    @patch("image_url_upload.session.requests.Session.get")
+    def test_circuit_opens_for_unresponsive_host(self, mock_get):
+        """Repeated timeouts from a host should stop further downloads from it."""
+        mock_get.side_effect = Timeout("Connection timeout")
+
+        for name in ("a", "b"):
+            data = self.client.post(self.url, {"url": f"https://example.com/{name}.png"}).json()
+            self.assertIn("timeout", data["error_message"].lower())
+
+        data = self.client.post(self.url, {"url": "https://example.com/c.png"}).json()
+
+        self.assertFalse(data["success"])
+        self.assertIn("example.com did not respond", data["error_message"])
+        self.assertEqual(mock_get.call_count, 2)
+
+    @override_settings(WAGTAIL_IMAGE_URL_RETRY_BACKOFF=0.01)
+    def test_transient_failure_is_retried(self):
+        """A 503 should be retried rather than reported or cached."""
+        route = self.server.add("/a.png", make_image_bytes(), fail_first=1, fail_headers={"Retry-After": "0"})
+
+        data = self.client.post(self.url, {"url": self.server.url("/a.png")}).json()
+
+        self.assertTrue(data["success"])
+        self.assertEqual(len(route.requests), 2)
+
+
+@override_settings(
+    WAGTAIL_IMAGE_URL_PREVENT_SSRF=False,
+    WAGTAIL_IMAGE_URL_NORMALIZE={"max_width": 100, "transcode": {"BMP": "WEBP"}},
+    WAGTAIL_IMAGE_URL_NORMALIZE_WORKERS=0,
+)
+class NormalizeViewTests(TestCase):
+    """Test downloads are normalized before they are saved."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.server.add("/photo.bmp", make_image_bytes("BMP", size=(400, 200)), content_type="image/bmp")
+
+    def test_image_is_normalized(self):
+        """The saved image should be downscaled and transcoded."""
+        data = self.client.post(reverse("add_from_url"), {"url": self.server.url("/photo.bmp")}).json()
+
+        self.assertTrue(data["success"])
+        image = Image.objects.get(pk=data["image_id"])
+        self.assertEqual((image.width, image.height), (100, 50))
+        self.assertTrue(image.file.name.endswith(".webp"))
+
+    def test_normalized_image_is_deduplicated(self):
+        """A second copy of the same original should match the normalized image's hash."""
+        self.server.add("/copy.bmp", make_image_bytes("BMP", size=(400, 200)), content_type="image/bmp")
+        first = self.client.post(reverse("add_from_url"), {"url": self.server.url("/photo.bmp")}).json()
+
+        second = self.client.post(reverse("add_from_url_async"), {"url": self.server.url("/copy.bmp")}).json()
+
+        self.assertTrue(second["duplicate"])
+        self.assertEqual(second["image_id"], first["image_id"])
+
+
+@override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False)
+class ImportTimingViewTests(TestCase):
+    """Test per-phase timings are reported for each import."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.server.add("/a.png", make_image_bytes(size=(20, 20)))
+        self.server.add("/b.png", make_image_bytes(size=(20, 20), color=(0, 0, 255)))
+        self.timings = []
+        image_import_timed.connect(self.receive)
+        self.addCleanup(image_import_timed.disconnect, self.receive)
+
+    def receive(self, sender, url, timings, success, **kwargs):
+        self.timings.append((sender, url, timings, success))
+
+    def get_metrics(self, response):
+        return [metric.split(";")[0] for metric in response["Server-Timing"].split(", ")]
+
+    def test_server_timing_header(self):
+        """The response should time each phase of the import."""
+        response = self.client.post(reverse("add_from_url"), {"url": self.server.url("/a.png")})
+
+        self.assertTrue(response.json()["success"])
+        self.assertEqual(
+            self.get_metrics(response),
+            ["validate", "throttle", "connect", "ttfb", "download", "duplicate_check", "form", "save", "total"],
+        )
+        self.assertIn("download;dur=", response["Server-Timing"])
+        self.assertIn(f'desc="{len(make_image_bytes(size=(20, 20)))} bytes"', response["Server-Timing"])
+
+    def test_signal(self):
+        """Each import should send its timings, including failures."""
+        self.client.post(reverse("add_from_url"), {"url": self.server.url("/a.png")})
+        self.client.post(reverse("add_from_url"), {"url": self.server.url("/missing.png")})
+
+        [(sender, url, timings, success), failed] = self.timings
+        self.assertIs(sender, AddFromURLView)
+        self.assertEqual(url, self.server.url("/a.png"))
+        self.assertTrue(success)
+        self.assertIn("save", timings["phases_ms"])
+        self.assertFalse(failed[3])
+        self.assertNotIn("save", failed[2]["phases_ms"])
+
+    @override_settings(WAGTAIL_IMAGE_URL_SERVER_TIMING=False)
+    def test_header_disabled(self):
+        """The header can be turned off; the signal is still sent."""
+        response = self.client.post(reverse("add_from_url"), {"url": self.server.url("/a.png")})
+
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(len(self.timings), 1)
+
+    def test_async_view(self):
+        """The async view should time its phases too."""
+        response = self.client.post(reverse("add_from_url_async"), {"url": self.server.url("/a.png")})
+
+        metrics = self.get_metrics(response)
+        for phase in ("validate", "ttfb", "download", "form", "save", "total"):
+            self.assertIn(phase, metrics)
+        self.assertIs(self.timings[0][0], AsyncAddFromURLView)
+
+    def test_batch_view(self):
+        """Each URL of a batch should be timed separately."""
+        urls = [self.server.url("/a.png"), self.server.url("/b.png")]
+
+        self.client.post(reverse("add_from_url_batch"), {"urls": urls})
+
+        self.assertEqual([url for sender, url, timings, success in self.timings], urls)
+        for sender, url, timings, success in self.timings:
+            self.assertIn("download", timings["phases_ms"])
+            self.assertIn("save", timings["phases_ms"])
+
+    def test_stream_view(self):
+        """Each URL of a stream should be timed separately."""
+        urls = [self.server.url("/a.png"), self.server.url("/b.png")]
+
+        response = self.client.post(reverse("add_from_url_stream"), {"urls": urls})
+        b"".join(response.streaming_content)
+
+        self.assertEqual(sorted(url for sender, url, timings, success in self.timings), urls)
+        for sender, url, timings, success in self.timings:
+            self.assertIn("save", timings["phases_ms"])
+
+
+@override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False, FILE_UPLOAD_MAX_MEMORY_SIZE=256 * 1024)
+class SpooledDownloadViewTests(TestCase):
+    """Test large downloads are handed to Wagtail without copies in memory."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.body = make_noise_image_bytes(size=(1000, 800))
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.server.add("/large.png", self.body)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def import_large_image(self, view_name="add_from_url"):
+        with override_settings(FILE_UPLOAD_TEMP_DIR=self.temp_dir.name):
+            # Warm up imports and caches outside the measurement
+            self.client.get(reverse("add_from_url_metrics"))
+            tracemalloc.start()
+            try:
+                data = self.client.post(reverse(view_name), {"url": self.server.url("/large.png")}).json()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        return data, peak
+
+    def test_peak_memory(self):
+        """Importing a large image should not hold a copy of it in memory."""
+        data, peak = self.import_large_image()
+
+        self.assertTrue(data["success"])
+        self.assertLess(peak, len(self.body) / 2)
+        with Image.objects.get(pk=data["image_id"]).file.open() as f:
+            self.assertEqual(f.read(), self.body)
+
+    def test_async_peak_memory(self):
+        """The async view should hand the spooled file over in the same way."""
+        data, peak = self.import_large_image("add_from_url_async")
+
+        self.assertTrue(data["success"])
+        self.assertLess(peak, len(self.body) / 2)
+
+    def test_temporary_file_removed(self):
+        """The spooled file should be moved into storage, or deleted for duplicates."""
+        self.server.add("/copy.png", self.body)
+
+        self.import_large_image()
+        with override_settings(FILE_UPLOAD_TEMP_DIR=self.temp_dir.name):
+            data = self.client.post(reverse("add_from_url"), {"url": self.server.url("/copy.png")}).json()
+
+        self.assertTrue(data["duplicate"])
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+
+@override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False, WAGTAIL_IMAGE_URL_BULK_SAVE=True)
+class BulkSaveViewTests(TestCase):
+    """Test batches are saved together, with a fixed number of queries."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.collection = Collection.get_first_root_node()
+        self.url = reverse("add_from_url_batch")
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        for i in range(8):
+            self.server.add(f"/{i}.png", make_image_bytes(size=(i + 1, 2)))
+
+    def import_urls(self, urls, **data):
+        response = self.client.post(self.url, {"urls": urls, "collection": self.collection.id, **data})
+        return response.json()["results"]
+
+    def count_queries(self, count):
+        urls = [self.server.url(f"/{i}.png") for i in range(len(Image.objects.all()), count)]
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            results = self.import_urls(urls)
+        self.assertTrue(all(result["success"] and not result["duplicate"] for result in results))
+        return len(queries)
+
+    def test_queries_do_not_grow_with_batch(self):
+        """Apart from reference indexing, saving more images in a batch should not take more queries."""
+        with disable_reference_index_auto_update():
+            # The first import in the process also runs one-off lookups of the search backend
+            self.count_queries(1)
+            self.assertEqual(self.count_queries(3), self.count_queries(8))
+
+    def test_images_saved(self):
+        """Images should be saved with their metadata, sources and search index entries."""
+        urls = [self.server.url("/0.png"), self.server.url("/1.png")]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            results = self.import_urls(urls)
+
+        images = [Image.objects.get(pk=result["image_id"]) for result in results]
+        self.assertEqual([(image.width, image.height) for image in images], [(1, 2), (2, 2)])
+        self.assertEqual(images[0].uploaded_by_user, self.user)
+        self.assertEqual(images[0].file_hash, ImageSource.objects.for_url(urls[0]).get().content_hash)
+        self.assertEqual(images[1].file_size, len(make_image_bytes(size=(2, 2))))
+        self.assertEqual(list(Image.objects.search("1")), [images[1]])
+
+    def test_collections_looked_up_once(self):
+        """The user's collections should be checked once per batch."""
+        child = self.collection.add_child(name="Child")
+        policy = AddFromURLView.permission_policy
+
+        with patch.object(
+            type(policy), "collections_user_has_permission_for", autospec=True,
+            side_effect=lambda policy, user, action: Collection.objects.all(),
+        ) as lookup:
+            results = self.import_urls(
+                [self.server.url(f"/{i}.png") for i in range(3)], collection=child.id
+            )
+
+        lookup.assert_called_once()
+        self.assertTrue(all(result["success"] for result in results))
+        self.assertEqual(Image.objects.filter(collection=child).count(), 3)
+
+    def test_invalid_collection(self):
+        """An unknown collection should fail the form, as for single imports."""
+        self.collection.add_child(name="Child")
+
+        results = self.import_urls([self.server.url("/0.png"), self.server.url("/1.png")], collection=9999)
+
+        self.assertFalse(results[0]["success"])
+        self.assertIn("collection: Select a valid choice", results[0]["error_message"])
+        self.assertEqual(Image.objects.count(), 0)
+
+    def test_failed_save_saves_nothing(self):
+        """If saving fails, no image of the batch should be kept."""
+        default_storage.save("original_images/keep.txt", ContentFile(b""))
+        stored_files = set(default_storage.listdir("original_images")[1])
+        with patch.object(ImageSource.objects, "record_many", side_effect=RuntimeError("boom")):
+            results = self.import_urls([self.server.url("/0.png"), self.server.url("/1.png")])
+
+        self.assertEqual([result["success"] for result in results], [False, False])
+        self.assertIn("boom", results[0]["error_message"])
+        self.assertEqual(Image.objects.count(), 0)
+        self.assertEqual(set(default_storage.listdir("original_images")[1]), stored_files)
+
+    def test_concurrent_duplicate(self):
+        """An image saved by another import in the meantime should be returned instead."""
+        existing = Image.objects.create(title="other", file=get_test_image_file())
+        find_existing_images = AddFromURLView.find_existing_images
+
+        def find(view, content_hashes, exclude_ids=()):
+            content_hashes = list(content_hashes)
+            if not exclude_ids:
+                # Not there yet when the batch is checked before saving
+                return {}
+            Image.objects.filter(pk=existing.pk).update(file_hash=content_hashes[0])
+            return find_existing_images(view, content_hashes, exclude_ids)
+
+        with patch.object(AddFromURLView, "find_existing_images", autospec=True, side_effect=find):
+            results = self.import_urls([self.server.url("/0.png"), self.server.url("/1.png")])
+
+        self.assertEqual(results[0]["image_id"], existing.pk)
+        self.assertTrue(results[0]["duplicate"])
+        self.assertFalse(results[1]["duplicate"])
+        self.assertEqual(Image.objects.count(), 2)
+        self.assertEqual(ImageSource.objects.for_url(self.server.url("/0.png")).get().image, existing)
+
+    @override_settings(WAGTAIL_IMAGE_URL_BULK_SAVE=False)
+    def test_disabled(self):
+        """Without bulk save, images should be saved one by one, with their edit forms."""
+        with patch.object(AddFromURLView, "create_images") as create_images:
+            results = self.import_urls([self.server.url("/0.png"), self.server.url("/1.png")])
+
+        create_images.assert_not_called()
+        self.assertIn("form", results[0])
+        self.assertEqual(Image.objects.count(), 2)
+
+
+@override_settings(WAGTAIL_IMAGE_URL_PREVENT_SSRF=False, WAGTAIL_IMAGE_URL_DEFER_SEARCH_INDEX=True)
+class DeferredSearchIndexViewTests(TestCase):
+    """Test imported images can be indexed after the response."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        User.objects.create_superuser(username="admin", email="admin@example.com", password="password")
+        self.client.login(username="admin", password="password")
+        self.server = ImageServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.server.add("/red.png", make_image_bytes())
+
+    def test_single_import_queued(self):
+        """A single import should queue its image instead of indexing it on commit."""
+        with (
+            patch("wagtail.search.signal_handlers.insert_or_update_object_task") as index_task,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            data = self.client.post(reverse("add_from_url"), {"url": self.server.url("/red.png")}).json()
+
+        index_task.enqueue.assert_not_called()
+        self.assertEqual(get_queued_count(), 1)
+        self.assertEqual(list(Image.objects.search("red")), [])
+
+        flush_search_index()
+
+        self.assertEqual(list(Image.objects.search("red")), [Image.objects.get(pk=data["image_id"])])
+
+    def test_single_import_sends_save_signals(self):
+        """A deferred single import should still run the image model's pre_save and post_save receivers."""
+        received = []
+
+        def receiver(signal, instance, **kwargs):
+            received.append((signal, instance.pk))
+
+        pre_save.connect(receiver, sender=Image)
+        self.addCleanup(pre_save.disconnect, receiver, sender=Image)
+        post_save.connect(receiver, sender=Image)
+        self.addCleanup(post_save.disconnect, receiver, sender=Image)
+
+        data = self.client.post(reverse("add_from_url"), {"url": self.server.url("/red.png")}).json()
+
+        self.assertEqual(received, [(pre_save, None), (post_save, data["image_id"])])
@@ -10,6 +10,7 @@ def test_register_admin_urls():
     names = [getattr(u, "name", None) or getattr(getattr(u, "pattern", None), "name", None) for u in urls]
     assert "images_w_url_index" in names
     assert "add_from_url" in names
+    assert "add_from_url_batch" in names
 
 
 def test_register_admin_menu_item():
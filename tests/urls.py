@@ -13,7 +13,19 @@ urlpatterns = [
     path("documents/", include(wagtaildocs_urls)),
     # Image URL upload views
     path("images/add_from_url/", views.AddFromURLView.as_view(), name="add_from_url"),
+    path("images/add_from_url/batch/", views.AddFromURLBatchView.as_view(), name="add_from_url_batch"),
+    path("images/add_from_url/stream/", views.AddFromURLStreamView.as_view(), name="add_from_url_stream"),
+    path("images/add_from_url/discover/", views.AddFromURLDiscoverView.as_view(), name="add_from_url_discover"),
+    path("images/add_from_url/preflight/", views.AddFromURLPreflightView.as_view(), name="add_from_url_preflight"),
+    path("images/add_from_url/jobs/", views.ImportJobCreateView.as_view(), name="add_from_url_job"),
+    path(
+        "images/add_from_url/jobs/<int:job_id>/",
+        views.ImportJobStatusView.as_view(),
+        name="add_from_url_job_status",
+    ),
+    path("images/add_from_url/metrics/", views.MetricsView.as_view(), name="add_from_url_metrics"),
     path("images-w-url/", views.CustomImageIndexView.as_view(), name="images_w_url_index"),
+    path("image-url-upload/", include("image_url_upload.urls")),
     # Wagtail core URLs
     path("", include(wagtail_urls)),
 ]